@@ -100,3 +100,11 @@
         CREATE INDEX IF NOT EXISTS idx_edges_source_target ON skin_twin.supplier_edges(source, target);
         
 
+
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_supplier_edges_source_target ON skin_twin.supplier_edges(source, target);
+        
+
+
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_supplier_capabilities_supplier ON skin_twin.supplier_capabilities(supplier_id);
+        
+
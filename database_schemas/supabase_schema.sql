@@ -80,3 +80,6 @@
     );
     
 
+
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_supplier_edges_source_target ON supplier_edges(source, target);
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_supplier_capabilities_supplier ON supplier_capabilities(supplier_id);
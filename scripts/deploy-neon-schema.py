@@ -4,6 +4,7 @@ Deploy Neon Schema using MCP CLI
 Deploys the skin_twin schema tables, indexes, and views to Neon database
 """
 
+import argparse
 import json
 import subprocess
 import sys
@@ -85,6 +86,7 @@ INDEXES = [
     "CREATE INDEX IF NOT EXISTS idx_hypergraph_edges_source ON skin_twin.hypergraph_edges(source_id)",
     "CREATE INDEX IF NOT EXISTS idx_hypergraph_edges_target ON skin_twin.hypergraph_edges(target_id)",
     "CREATE INDEX IF NOT EXISTS idx_hypergraph_edges_weight ON skin_twin.hypergraph_edges(weight DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_hypergraph_edges_key ON skin_twin.hypergraph_edges(edge_type, source_id, target_id)",
     "CREATE INDEX IF NOT EXISTS idx_hypergraph_nodes_type ON skin_twin.hypergraph_nodes(node_type)",
     "CREATE INDEX IF NOT EXISTS idx_hypergraph_nodes_label ON skin_twin.hypergraph_nodes(label)",
     "CREATE INDEX IF NOT EXISTS idx_audit_log_entity ON skin_twin.audit_log(entity_type, entity_id)",
@@ -121,6 +123,15 @@ def run_mcp_command(sql_statements):
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description="Deploy the skin_twin schema to Neon")
+    parser.add_argument('--dry-run', action='store_true', help="Print the SQL statements without executing them")
+    args = parser.parse_args()
+    
+    if args.dry_run:
+        for statement in SQL_STATEMENTS + INDEXES:
+            print(statement.rstrip() + ';\n')
+        return
+    
     print("=" * 60)
     print("Deploying Neon Schema: skin_twin")
     print("=" * 60)
@@ -2,18 +2,27 @@
 """
 Import COSING data to Supabase via REST API
 Assumes schema is already deployed via Supabase dashboard
+
+Progress is checkpointed after every batch: the last committed source offset
+plus any failed row ranges with their error text. `--resume` continues from
+the checkpoint and `--retry-failed` re-sends only the failed ranges, bisecting
+them into smaller sub-batches to isolate bad rows. Rows are upserted on
+cosing_ref_no, so re-sending a range never collides with rows already stored.
 """
 
 import os
-import json
+import sys
 import csv
+import gzip
+import json
+import time
+import argparse
+from pathlib import Path
 from datetime import datetime
-from supabase import create_client, Client
 
-# Initialize Supabase client
-url = os.environ.get("SUPABASE_URL")
-key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+CHECKPOINT_VERSION = 1
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
 
 def parse_date(date_str):
     """Parse date from DD/MM/YYYY format"""
@@ -22,24 +31,259 @@ def parse_date(date_str):
     try:
         dt = datetime.strptime(date_str.strip(), '%d/%m/%Y')
         return dt.strftime('%Y-%m-%d')  # PostgreSQL format
-    except:
+    except ValueError:
         return None
 
-def import_batch(batch_data, batch_num):
-    """Import a batch of ingredients via Supabase REST API"""
-    try:
-        result = supabase.table('cosing_ingredients').insert(batch_data).execute()
-        return True, len(batch_data)
-    except Exception as e:
-        return False, str(e)
+
+def get_client():
+    """Create the Supabase client from SUPABASE_URL / SUPABASE_KEY"""
+    from supabase import create_client
+
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        print("❌ SUPABASE_URL and SUPABASE_KEY must be set")
+        sys.exit(1)
+    return create_client(url, key)
+
+
+def default_csv_path():
+    """COSING export shipped in vessels/cosing (plain or gzipped)"""
+    cosing_dir = REPO_ROOT / 'vessels' / 'cosing'
+    for name in ('cosing_ingredients.csv', 'cosing_ingredients.csv.gz'):
+        if (cosing_dir / name).exists():
+            return cosing_dir / name
+    return cosing_dir / 'cosing_ingredients.csv'
+
+
+def open_csv(path):
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def to_ingredient(row):
+    """Map a COSING CSV row to a cosing_ingredients record"""
+    def value(*keys):
+        for k in keys:
+            if row.get(k):
+                return row[k].strip() or None
+        return None
+
+    return {
+        'cosing_ref_no': int(row['cosing_ref_no']),
+        'inci_name': row.get('inci_name', ''),
+        'inn_name': value('inn_name'),
+        'ph_eur_name': value('ph_eur_name'),
+        'cas_no': value('cas_no'),
+        'ec_no': value('ec_no'),
+        'chem_iupac_name_description': value('chem_iupac_name_description', 'chem_iupac_name___description'),
+        'restriction': value('restriction'),
+        'function': value('function'),
+        'update_date': parse_date(row.get('update_date', ''))
+    }
+
+
+def iter_source(csv_file, start=0):
+    """Yield (offset, row) pairs from the CSV, skipping the first `start` rows"""
+    with open_csv(csv_file) as f:
+        for offset, row in enumerate(csv.DictReader(f)):
+            if offset >= start:
+                yield offset, row
+
+
+class Checkpoint:
+    """Durable import progress: committed offset and failed ranges"""
+
+    def __init__(self, path, csv_file):
+        self.path = Path(path)
+        stat = Path(csv_file).stat()
+        self.data = {
+            'version': CHECKPOINT_VERSION,
+            'csv': str(csv_file),
+            'csv_size': stat.st_size,
+            'csv_mtime': int(stat.st_mtime),
+            'committed_offset': 0,
+            'imported': 0,
+            'failed': [],
+            'updated_at': None,
+        }
+
+    def load(self):
+        """Load an existing checkpoint; returns an error string if it does not match the CSV"""
+        if not self.path.exists():
+            return f"No checkpoint at {self.path}"
+        with open(self.path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        if stored.get('version') != CHECKPOINT_VERSION:
+            return f"Unsupported checkpoint version: {stored.get('version')}"
+        if (stored.get('csv_size'), stored.get('csv_mtime')) != (self.data['csv_size'], self.data['csv_mtime']):
+            return "CSV file changed since the checkpoint was written"
+        self.data.update(stored)
+        return None
+
+    def save(self):
+        self.data['updated_at'] = datetime.now().isoformat()
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def commit(self, end_offset, imported):
+        self.data['committed_offset'] = end_offset
+        self.data['imported'] += imported
+        self.save()
+
+    def add_failure(self, start, end, error):
+        self.data['failed'].append({'start': start, 'end': end, 'error': str(error)[:500]})
+
+
+class CosingImporter:
+    def __init__(self, client, checkpoint, batch_size=100, max_retries=3, sub_batch_size=10):
+        self.client = client
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.sub_batch_size = sub_batch_size
+        self.total_imported = 0
+        self.total_errors = 0
+
+    def send(self, batch_data):
+        """Upsert a batch, retrying transient failures with exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.client.table('cosing_ingredients').upsert(
+                    batch_data, on_conflict='cosing_ref_no', ignore_duplicates=True).execute()
+                return None
+            except Exception as e:
+                error = e
+                if attempt < self.max_retries:
+                    time.sleep(min(2 ** attempt, 30))
+        return error
+
+    def import_range(self, rows):
+        """Send (offset, row) pairs as one batch; returns list of (start, end, error) failures"""
+        records, failures = [], []
+        for offset, row in rows:
+            try:
+                records.append(to_ingredient(row))
+            except (KeyError, ValueError) as e:
+                failures.append((offset, offset + 1, f"Invalid row: {e}"))
+        if records:
+            error = self.send(records)
+            if error is not None:
+                return [(rows[0][0], rows[-1][0] + 1, error)]
+        self.total_imported += len(records)
+        return failures
+
+    def run(self, csv_file):
+        start = self.checkpoint.data['committed_offset']
+        if start:
+            print(f"Resuming at row {start} ({self.checkpoint.data['imported']} already imported)")
+
+        batch_num = start // self.batch_size + 1
+        batch = []
+        for offset, row in iter_source(csv_file, start):
+            batch.append((offset, row))
+            if len(batch) >= self.batch_size:
+                self._flush(batch, batch_num)
+                batch = []
+                batch_num += 1
+        if batch:
+            self._flush(batch, batch_num)
+
+    def _flush(self, batch, batch_num):
+        before = self.total_imported
+        print(f"Importing batch {batch_num} (rows {batch[0][0]}-{batch[-1][0]})...", end=" ")
+        failures = self.import_range(batch)
+        for start, end, error in failures:
+            self.checkpoint.add_failure(start, end, error)
+            self.total_errors += end - start
+        imported = self.total_imported - before
+        if failures:
+            print(f"❌ {sum(e - s for s, e, _ in failures)} failed: {str(failures[0][2])[:80]}")
+        else:
+            print(f"✅ ({imported} imported)")
+        self.checkpoint.commit(batch[-1][0] + 1, imported)
+
+    def retry_failed(self, csv_file):
+        """Re-send failed ranges, bisecting into sub-batches until bad rows are isolated"""
+        failed = sorted(self.checkpoint.data['failed'], key=lambda r: r['start'])
+        if not failed:
+            print("No failed ranges recorded")
+            return
+        print(f"Retrying {len(failed)} failed ranges ({sum(r['end'] - r['start'] for r in failed)} rows)...")
+
+        wanted = {}
+        ranges = iter(failed)
+        current = next(ranges)
+        for offset, row in iter_source(csv_file, failed[0]['start']):
+            while current is not None and offset >= current['end']:
+                current = next(ranges, None)
+            if current is None:
+                break
+            if offset >= current['start']:
+                wanted.setdefault(current['start'], []).append((offset, row))
+
+        still_failed = []
+        for rng in failed:
+            rows = wanted.get(rng['start'], [])
+            pending = [rows[i:i + self.sub_batch_size] for i in range(0, len(rows), self.sub_batch_size)]
+            while pending:
+                chunk = pending.pop()
+                failures = self.import_range(chunk)
+                for start, end, error in failures:
+                    if end - start > 1 and not str(error).startswith('Invalid row'):
+                        part = [r for r in chunk if start <= r[0] < end]
+                        middle = len(part) // 2
+                        pending.extend([part[:middle], part[middle:]])
+                    else:
+                        still_failed.append({'start': start, 'end': end, 'error': str(error)[:500]})
+            print(f"  Range {rng['start']}-{rng['end'] - 1}: "
+                  f"{sum(1 for f in still_failed if rng['start'] <= f['start'] < rng['end'])} rows still failing")
+
+        self.total_errors = sum(f['end'] - f['start'] for f in still_failed)
+        self.checkpoint.data['failed'] = sorted(still_failed, key=lambda r: r['start'])
+        self.checkpoint.data['imported'] += self.total_imported
+        self.checkpoint.save()
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Import COSING data to Supabase")
+    parser.add_argument('--csv', help="COSING CSV export (default: vessels/cosing/cosing_ingredients.csv[.gz])")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: cosing_import_checkpoint.json next to the CSV)")
+    parser.add_argument('--resume', action='store_true', help="Continue from the checkpoint")
+    parser.add_argument('--retry-failed', action='store_true', help="Re-send only the failed ranges")
+    parser.add_argument('--batch-size', type=int, default=100, help="Supabase REST API batch size")
+    parser.add_argument('--sub-batch-size', type=int, default=10, help="Initial batch size when retrying")
+    parser.add_argument('--max-retries', type=int, default=3, help="Retries per batch before recording a failure")
+    args = parser.parse_args()
+
+    csv_file = Path(args.csv) if args.csv else default_csv_path()
+    if not csv_file.exists():
+        print(f"❌ CSV file not found: {csv_file}")
+        sys.exit(1)
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else csv_file.with_name('cosing_import_checkpoint.json')
+    checkpoint = Checkpoint(checkpoint_path, csv_file)
+    if args.resume or args.retry_failed:
+        error = checkpoint.load()
+        if error:
+            print(f"❌ {error}")
+            sys.exit(1)
+    elif checkpoint_path.exists():
+        print(f"⚠️  Starting over; existing checkpoint {checkpoint_path} will be replaced (use --resume to continue)")
+
     print("=" * 60)
     print("COSING Data Import to Supabase")
     print("=" * 60)
     print(f"Start time: {datetime.now()}")
     print("")
-    
+
+    supabase = get_client()
+
     # Check connection and table existence
     print("Checking Supabase connection and schema...", end=" ")
     try:
@@ -57,75 +301,27 @@ def main():
         print("  3. Copy and execute: database_schemas/cosing_ingredients_schema.sql")
         print("  4. Run this script again")
         return
-    
+
     print("")
-    print("Reading CSV file...")
-    csv_file = '/home/ubuntu/skintwinformx/vessels/cosing/cosing_ingredients.csv'
-    
-    batch_size = 100  # Supabase REST API batch size
-    batch = []
-    batch_num = 1
-    total_imported = 0
-    total_errors = 0
-    
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        
-        for row_num, row in enumerate(reader, 1):
-            # Prepare ingredient data
-            ingredient = {
-                'cosing_ref_no': int(row['cosing_ref_no']) if row.get('cosing_ref_no') else None,
-                'inci_name': row.get('inci_name', ''),
-                'inn_name': row.get('inn_name') if row.get('inn_name') else None,
-                'ph_eur_name': row.get('ph_eur_name') if row.get('ph_eur_name') else None,
-                'cas_no': row.get('cas_no') if row.get('cas_no') else None,
-                'ec_no': row.get('ec_no') if row.get('ec_no') else None,
-                'chem_iupac_name_description': row.get('chem_iupac_name_description') if row.get('chem_iupac_name_description') else None,
-                'restriction': row.get('restriction') if row.get('restriction') else None,
-                'function': row.get('function') if row.get('function') else None,
-                'update_date': parse_date(row.get('update_date', ''))
-            }
-            
-            batch.append(ingredient)
-            
-            if len(batch) >= batch_size:
-                print(f"Importing batch {batch_num} ({len(batch)} ingredients)...", end=" ")
-                success, result = import_batch(batch, batch_num)
-                
-                if success:
-                    print(f"✅ ({result} imported)")
-                    total_imported += result
-                else:
-                    print(f"❌ Error: {result[:80]}")
-                    total_errors += len(batch)
-                
-                batch = []
-                batch_num += 1
-                
-                # Progress indicator
-                if batch_num % 10 == 0:
-                    print(f"Progress: {total_imported} ingredients imported")
-        
-        # Import remaining batch
-        if batch:
-            print(f"Importing final batch {batch_num} ({len(batch)} ingredients)...", end=" ")
-            success, result = import_batch(batch, batch_num)
-            
-            if success:
-                print(f"✅ ({result} imported)")
-                total_imported += result
-            else:
-                print(f"❌ Error: {result[:80]}")
-                total_errors += len(batch)
-    
+    print(f"Reading CSV file {csv_file}...")
+    importer = CosingImporter(supabase, checkpoint, args.batch_size, args.max_retries, args.sub_batch_size)
+    if args.retry_failed:
+        importer.retry_failed(csv_file)
+    else:
+        checkpoint.save()
+        importer.run(csv_file)
+
     print("")
     print("=" * 60)
     print("Import Complete!")
     print(f"End time: {datetime.now()}")
-    print(f"Total imported: {total_imported}")
-    print(f"Total errors: {total_errors}")
+    print(f"Total imported: {importer.total_imported}")
+    print(f"Total errors: {importer.total_errors}")
+    if checkpoint.data['failed']:
+        print(f"Failed ranges: {len(checkpoint.data['failed'])} (rerun with --retry-failed)")
+    print(f"Checkpoint: {checkpoint_path}")
     print("=" * 60)
-    
+
     # Verify import
     print("")
     print("Verifying import...", end=" ")
@@ -136,5 +332,9 @@ def main():
     except Exception as e:
         print(f"❌ Verification failed: {e}")
 
+    if checkpoint.data['failed']:
+        sys.exit(1)
+
+
 if __name__ == '__main__':
     main()
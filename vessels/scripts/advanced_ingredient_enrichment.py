@@ -4,65 +4,106 @@ Advanced Ingredient Enrichment with Trade Name Mapping
 Uses fuzzy matching and common trade name patterns to improve COSING lookups.
 """
 
-import json
+import copy
 import csv
 import re
+import argparse
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from collections import defaultdict
-from difflib import SequenceMatcher
+
+from similarity import CandidateBlock
+from sharding import shard_files
+from audit_log import AuditLogWriter, SINKS as AUDIT_SINKS
+from changeset import Changeset, apply_changeset
+from vessel_schema import Ingredient, read_entity
+
+# Common trade names and their INCI equivalents
+TRADE_NAME_PATTERNS = {
+    'WATER': 'AQUA',
+    'DE ION WATER': 'AQUA',
+    'DEIONISED WATER': 'AQUA',
+    'DEIONIZED WATER': 'AQUA',
+    'PURIFIED WATER': 'AQUA',
+    'DISTILLED WATER': 'AQUA',
+    'GLYCERIN': 'GLYCERIN',
+    'GLYCERINE': 'GLYCERIN',
+    'VITAMIN E': 'TOCOPHEROL',
+    'VITAMIN C': 'ASCORBIC ACID',
+    'HYALURONIC ACID': 'SODIUM HYALURONATE',
+    'SHEA BUTTER': 'BUTYROSPERMUM PARKII BUTTER',
+    'COCOA BUTTER': 'THEOBROMA CACAO SEED BUTTER',
+    'JOJOBA OIL': 'SIMMONDSIA CHINENSIS SEED OIL',
+    'ARGAN OIL': 'ARGANIA SPINOSA KERNEL OIL',
+    'ROSEHIP OIL': 'ROSA CANINA FRUIT OIL',
+    'ROSE HIPS OIL': 'ROSA CANINA FRUIT OIL',
+    'SWEET ALMOND OIL': 'PRUNUS AMYGDALUS DULCIS OIL',
+    'ALMOND OIL': 'PRUNUS AMYGDALUS DULCIS OIL',
+    'COCONUT OIL': 'COCOS NUCIFERA OIL',
+    'OLIVE OIL': 'OLEA EUROPAEA FRUIT OIL',
+    'SUNFLOWER OIL': 'HELIANTHUS ANNUUS SEED OIL',
+    'AVOCADO OIL': 'PERSEA GRATISSIMA OIL',
+    'GRAPESEED OIL': 'VITIS VINIFERA SEED OIL',
+    'MACADAMIA OIL': 'MACADAMIA TERNIFOLIA SEED OIL',
+    'BEESWAX': 'CERA ALBA',
+    'BEESWAX WHITE': 'CERA ALBA',
+    'CARNAUBA WAX': 'COPERNICIA CERIFERA CERA',
+    'XANTHAN GUM': 'XANTHAN GUM',
+    'CARBOMER': 'CARBOMER',
+    'PHENOXYETHANOL': 'PHENOXYETHANOL',
+    'PRESERVATIVE': 'PHENOXYETHANOL',
+    'FRAGRANCE': 'PARFUM',
+    'PERFUME': 'PARFUM',
+}
+
+# Supplier grade/brand suffixes appended to trade names ("Crodamol ISIS LQ [MV]")
+BRAND_SUFFIXES = [' LQ', ' MV', ' AJ', ' SG', ' RB', ' MH', ' GR', ' OP', ' PH', ' TM', ' MBAL', ' SE']
+
+def normalize_name(name: str) -> str:
+    """Normalize ingredient name for matching."""
+    name = name.upper().strip()
+    
+    # Remove brackets and contents
+    name = re.sub(r'\[.*?\]', '', name)
+    name = re.sub(r'\(.*?\)', '', name)
+    
+    # Remove special characters
+    name = re.sub(r'[^\w\s-]', ' ', name)
+    
+    # Normalize whitespace
+    name = ' '.join(name.split())
+    
+    # Remove brand indicators (repeatedly: "LQ MV")
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in BRAND_SUFFIXES:
+            if name.endswith(suffix):
+                name = name[:-len(suffix)].strip()
+                stripped = True
+    
+    return name
 
 class AdvancedIngredientEnricher:
-    def __init__(self, cosing_csv: str, vessels_root: str = "."):
+    def __init__(self, cosing_csv: str, vessels_root: str = ".", audit: Optional[AuditLogWriter] = None):
         self.vessels_root = Path(vessels_root)
         self.cosing_data = {}
         self.inci_to_cosing = {}
         self.cas_to_cosing = {}
         self.trade_name_patterns = self.load_trade_name_patterns()
         self.stats = defaultdict(int)
+        self.changeset = Changeset(vessels_root, source='advanced_ingredient_enrichment', audit=audit)
+        self.last_match: Dict[str, Any] = {}
         
         print("Loading COSING database...")
         self.load_cosing_database(cosing_csv)
         
+        # Preprocessed candidate block for fuzzy matching (keys are already normalized)
+        self.inci_block = CandidateBlock(self.inci_to_cosing.keys())
+        
     def load_trade_name_patterns(self) -> Dict[str, str]:
         """Load common trade name to INCI mappings."""
-        return {
-            # Common trade names and their INCI equivalents
-            'WATER': 'AQUA',
-            'DE ION WATER': 'AQUA',
-            'DEIONISED WATER': 'AQUA',
-            'DEIONIZED WATER': 'AQUA',
-            'PURIFIED WATER': 'AQUA',
-            'DISTILLED WATER': 'AQUA',
-            'GLYCERIN': 'GLYCERIN',
-            'GLYCERINE': 'GLYCERIN',
-            'VITAMIN E': 'TOCOPHEROL',
-            'VITAMIN C': 'ASCORBIC ACID',
-            'HYALURONIC ACID': 'SODIUM HYALURONATE',
-            'SHEA BUTTER': 'BUTYROSPERMUM PARKII BUTTER',
-            'COCOA BUTTER': 'THEOBROMA CACAO SEED BUTTER',
-            'JOJOBA OIL': 'SIMMONDSIA CHINENSIS SEED OIL',
-            'ARGAN OIL': 'ARGANIA SPINOSA KERNEL OIL',
-            'ROSEHIP OIL': 'ROSA CANINA FRUIT OIL',
-            'ROSE HIPS OIL': 'ROSA CANINA FRUIT OIL',
-            'SWEET ALMOND OIL': 'PRUNUS AMYGDALUS DULCIS OIL',
-            'ALMOND OIL': 'PRUNUS AMYGDALUS DULCIS OIL',
-            'COCONUT OIL': 'COCOS NUCIFERA OIL',
-            'OLIVE OIL': 'OLEA EUROPAEA FRUIT OIL',
-            'SUNFLOWER OIL': 'HELIANTHUS ANNUUS SEED OIL',
-            'AVOCADO OIL': 'PERSEA GRATISSIMA OIL',
-            'GRAPESEED OIL': 'VITIS VINIFERA SEED OIL',
-            'MACADAMIA OIL': 'MACADAMIA TERNIFOLIA SEED OIL',
-            'BEESWAX': 'CERA ALBA',
-            'BEESWAX WHITE': 'CERA ALBA',
-            'CARNAUBA WAX': 'COPERNICIA CERIFERA CERA',
-            'XANTHAN GUM': 'XANTHAN GUM',
-            'CARBOMER': 'CARBOMER',
-            'PHENOXYETHANOL': 'PHENOXYETHANOL',
-            'PRESERVATIVE': 'PHENOXYETHANOL',
-            'FRAGRANCE': 'PARFUM',
-            'PERFUME': 'PARFUM',
-        }
+        return dict(TRADE_NAME_PATTERNS)
     
     def load_cosing_database(self, cosing_csv: str):
         """Load COSING database with enhanced indexing."""
@@ -96,50 +137,35 @@ class AdvancedIngredientEnricher:
     
     def normalize_name(self, name: str) -> str:
         """Normalize ingredient name for matching."""
-        # Remove common suffixes and prefixes
-        name = name.upper().strip()
-        
-        # Remove brand indicators
-        for suffix in [' LQ', ' MV', ' AJ', ' SG', ' RB', ' MH', ' GR', ' OP', ' PH', ' TM', ' MBAL', ' SE']:
-            if name.endswith(suffix):
-                name = name[:-len(suffix)].strip()
-        
-        # Remove brackets and contents
-        name = re.sub(r'\[.*?\]', '', name)
-        name = re.sub(r'\(.*?\)', '', name)
-        
-        # Remove special characters
-        name = re.sub(r'[^\w\s-]', ' ', name)
-        
-        # Normalize whitespace
-        name = ' '.join(name.split())
-        
-        return name
+        return normalize_name(name)
+    
+    def fuzzy_match(self, query: str, candidates, threshold: float = 0.8) -> Optional[str]:
+        """Find best fuzzy match from candidates (a list of names or a CandidateBlock)."""
+        match = self.fuzzy_match_scored(query, candidates, threshold)
+        return match[0] if match else None
     
-    def fuzzy_match(self, query: str, candidates: List[str], threshold: float = 0.8) -> Optional[str]:
-        """Find best fuzzy match from candidates."""
+    def fuzzy_match_scored(self, query: str, candidates, threshold: float = 0.8):
+        """Best fuzzy match and its similarity score, or None."""
         query_norm = self.normalize_name(query)
-        best_match = None
-        best_ratio = 0
+        if not isinstance(candidates, CandidateBlock):
+            candidates = CandidateBlock(candidates, processor=self.normalize_name)
         
-        for candidate in candidates:
-            candidate_norm = self.normalize_name(candidate)
-            ratio = SequenceMatcher(None, query_norm, candidate_norm).ratio()
-            
-            if ratio > best_ratio and ratio >= threshold:
-                best_ratio = ratio
-                best_match = candidate
-        
-        return best_match
+        match = candidates.extract_one(query_norm, score_cutoff=threshold)
+        return (match[0], match[1]) if match else None
     
     def lookup_ingredient_advanced(self, ingredient_name: str, cas_number: Optional[str] = None) -> Optional[Dict[str, Any]]:
-        """Advanced ingredient lookup with multiple strategies."""
+        """Advanced ingredient lookup with multiple strategies.
+        
+        The strategy and score of the returned match are left in self.last_match.
+        """
+        self.last_match = {}
         
         # Strategy 1: Direct INCI match
         inci_normalized = self.normalize_name(ingredient_name)
         if inci_normalized in self.inci_to_cosing:
             cosing_id = self.inci_to_cosing[inci_normalized][0]
             self.stats['direct_match'] += 1
+            self.last_match = {'strategy': 'direct', 'score': 1.0}
             return self.cosing_data[cosing_id]
         
         # Strategy 2: Trade name mapping
@@ -150,6 +176,7 @@ class AdvancedIngredientEnricher:
                 if inci_normalized in self.inci_to_cosing:
                     cosing_id = self.inci_to_cosing[inci_normalized][0]
                     self.stats['trade_name_match'] += 1
+                    self.last_match = {'strategy': 'trade_name', 'score': 1.0, 'trade_name': trade_name}
                     return self.cosing_data[cosing_id]
         
         # Strategy 3: CAS number lookup
@@ -158,14 +185,16 @@ class AdvancedIngredientEnricher:
             if cas_clean in self.cas_to_cosing:
                 cosing_id = self.cas_to_cosing[cas_clean][0]
                 self.stats['cas_match'] += 1
+                self.last_match = {'strategy': 'cas', 'score': 1.0}
                 return self.cosing_data[cosing_id]
         
         # Strategy 4: Fuzzy matching on INCI names
-        all_inci_names = list(self.inci_to_cosing.keys())
-        best_match = self.fuzzy_match(ingredient_name, all_inci_names, threshold=0.85)
-        if best_match:
+        fuzzy = self.fuzzy_match_scored(ingredient_name, self.inci_block, threshold=0.85)
+        if fuzzy:
+            best_match, score = fuzzy
             cosing_id = self.inci_to_cosing[best_match][0]
             self.stats['fuzzy_match'] += 1
+            self.last_match = {'strategy': 'fuzzy', 'score': round(score, 4)}
             return self.cosing_data[cosing_id]
         
         # Strategy 5: Partial word matching
@@ -183,6 +212,7 @@ class AdvancedIngredientEnricher:
         
         if best_cosing_id:
             self.stats['partial_match'] += 1
+            self.last_match = {'strategy': 'partial', 'score': round(best_overlap / len(ingredient_words), 4)}
             return self.cosing_data[best_cosing_id]
         
         self.stats['not_found'] += 1
@@ -191,28 +221,27 @@ class AdvancedIngredientEnricher:
     def enrich_ingredient_file(self, ingredient_file: Path) -> bool:
         """Enrich ingredient file with advanced lookup."""
         try:
-            with open(ingredient_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            inci_name = data.get('inci_name', '') or data.get('label', '')
-            if not inci_name:
+            ingredient, data = read_entity(ingredient_file, Ingredient)
+            if not ingredient.inci_name:
                 self.stats['no_inci_name'] += 1
                 return False
+            original = copy.deepcopy(data)
+            inci_name = ingredient.inci_name
             
             # Skip if already enriched
-            if data.get('cas_number') and data.get('function') and data.get('function') != 'Unknown':
+            if ingredient.enriched:
                 self.stats['already_enriched'] += 1
                 return False
             
             # Advanced lookup
-            cosing_data = self.lookup_ingredient_advanced(inci_name, data.get('cas_number'))
+            cosing_data = self.lookup_ingredient_advanced(inci_name, ingredient.cas_number)
             
             if cosing_data:
                 # Update with COSING data
-                if not data.get('cas_number'):
+                if not ingredient.cas_number:
                     data['cas_number'] = cosing_data.get('cas_number', '')
                 
-                if not data.get('function') or data.get('function') == 'Unknown':
+                if not ingredient.function or ingredient.function == 'Unknown':
                     data['function'] = cosing_data.get('function', 'Unknown')
                 
                 data['cosing_id'] = cosing_data.get('id', '')
@@ -228,9 +257,11 @@ class AdvancedIngredientEnricher:
                 if cosing_data.get('is_natural') == 'true':
                     data['is_natural'] = True
                 
-                # Write back
-                with open(ingredient_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
+                # Record the patch; the file is written when the changeset is applied
+                provenance = dict(self.last_match, cosing_id=data['cosing_id'])
+                if not self.changeset.record(ingredient_file, original, data, provenance):
+                    self.stats['unchanged'] += 1
+                    return False
                 
                 self.stats['enriched'] += 1
                 return True
@@ -243,8 +274,12 @@ class AdvancedIngredientEnricher:
             print(f"  ✗ Error: {ingredient_file.name} - {e}")
             return False
     
-    def enrich_all_ingredients(self):
-        """Enrich all ingredient files."""
+    def enrich_all_ingredients(self, shard: int = 0, num_shards: int = 1, dry_run: bool = False):
+        """Enrich all ingredient files (or one shard of them).
+        
+        Changes are collected into self.changeset and applied at the end;
+        with dry_run the changeset is only printed.
+        """
         print("\nEnriching ingredients with advanced matching...")
         
         ingredients_dir = self.vessels_root / 'ingredients'
@@ -252,7 +287,7 @@ class AdvancedIngredientEnricher:
             print("  ✗ Ingredients directory not found")
             return
         
-        ingredient_files = list(ingredients_dir.glob('*.json'))
+        ingredient_files = shard_files(ingredients_dir.glob('*.json'), shard, num_shards)
         print(f"  Found {len(ingredient_files)} ingredient files")
         
         for i, ingredient_file in enumerate(ingredient_files, 1):
@@ -269,21 +304,38 @@ class AdvancedIngredientEnricher:
         print(f"    Fuzzy matches: {self.stats['fuzzy_match']}")
         print(f"    Partial matches: {self.stats['partial_match']}")
         print(f"    Not found: {self.stats['not_found']}")
+        print(f"    Unchanged: {self.stats['unchanged']}")
         print(f"    Errors: {self.stats['errors']}")
+        
+        apply_changeset(self.changeset, self.stats, dry_run)
 
 def main():
     """Main entry point."""
     import sys
     
-    vessels_root = sys.argv[1] if len(sys.argv) > 1 else "."
+    parser = argparse.ArgumentParser(description="Advanced ingredient enrichment")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--dry-run', action='store_true', help="Print the changeset without writing files")
+    parser.add_argument('--changeset', help="Also save the changeset to this file")
+    parser.add_argument('--audit', choices=AUDIT_SINKS, help="Record applied changes in audit_log via this sink")
+    args = parser.parse_args()
+    
+    vessels_root = args.vessels_root
     cosing_csv = Path(vessels_root) / "cosing" / "ingredients.csv"
     
     if not cosing_csv.exists():
         print(f"✗ COSING database not found: {cosing_csv}")
         sys.exit(1)
     
-    enricher = AdvancedIngredientEnricher(str(cosing_csv), vessels_root)
-    enricher.enrich_all_ingredients()
+    audit = AuditLogWriter.open(args.audit, vessels_root) if args.audit and not args.dry_run else None
+    enricher = AdvancedIngredientEnricher(str(cosing_csv), vessels_root, audit)
+    enricher.enrich_all_ingredients(dry_run=args.dry_run)
+    if audit is not None:
+        metrics = audit.close()
+        print(f"  Audit: {metrics.get('written', 0)} row(s) written, {metrics.get('spooled', 0)} spooled")
+    if args.changeset:
+        enricher.changeset.save(args.changeset)
+        print(f"  Changeset saved to: {args.changeset}")
     
     print("\n✅ Advanced enrichment complete!")
 
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Batched Audit-Log Writer
+Records what the vessel mutators change as skin_twin.audit_log rows
+(entity_type, entity_id, action, user_id, timestamp, changes, metadata; see
+scripts/deploy-neon-schema.py) without slowing bulk runs down:
+
+- `log()` only puts the row on a bounded in-process queue;
+- a background thread (batch_worker.BatchWorker) drains it in batches of
+  up to `batch_size` rows, or whatever arrived within `flush_interval`
+  seconds, and writes each batch with one multi-row INSERT through a
+  seed_loader sink;
+- when the sink fails, the batch goes to a local JSONL spool and the sink is
+  left alone for `retry_interval` seconds; `--replay` loads the spool later;
+- a full queue blocks the producer (backpressure), and the time spent
+  blocked is reported with the other metrics.
+
+Changeset.apply logs every applied file change when a writer is attached.
+"""
+
+import json
+import sys
+import time
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from batch_worker import BatchWorker
+
+AUDIT_TABLE = 'audit_log'
+AUDIT_DIR = 'audit'
+SPOOL_NAME = 'audit_spool.jsonl'
+SINKS = ('supabase', 'neon', 'sql', 'spool')
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0     # seconds a partial batch may wait
+MAX_QUEUE = 10000        # rows buffered before log() blocks
+RETRY_INTERVAL = 30.0    # seconds to spool after a sink failure
+
+
+class AuditLogWriter(BatchWorker):
+    """Queue + background batch writer for audit rows, spooling when the sink is down."""
+
+    def __init__(self, sink=None, spool_path=None, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, max_queue: int = MAX_QUEUE,
+                 retry_interval: float = RETRY_INTERVAL):
+        self.spool_path = Path(spool_path) if spool_path else None
+        self.retry_interval = retry_interval
+        self._retry_at = 0.0
+        super().__init__('audit-log-writer', sink, batch_size, max_queue, flush_interval)
+
+    @classmethod
+    def open(cls, sink_name: str, vessels_root: str = ".", sql_out: str = 'audit_log.sql',
+             **options) -> 'AuditLogWriter':
+        """Writer for a sink name ('spool' only writes the local spool)."""
+        spool_path = Path(vessels_root) / AUDIT_DIR / SPOOL_NAME
+        sink = None
+        if sink_name != 'spool':
+            from seed_loader import open_sink
+            sink = open_sink(sink_name, sql_out, sql_schema='skin_twin')
+        return cls(sink, spool_path, **options)
+
+    def log(self, entity_type: str, entity_id: str, action: str, changes: Any = None,
+            metadata: Optional[Dict[str, Any]] = None, user_id: Optional[str] = None):
+        """Queue one audit row; blocks only while the queue is full."""
+        row = {
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'action': action,
+            'user_id': user_id,
+            'timestamp': datetime.now().isoformat(),
+            'changes': changes,
+            'metadata': metadata,
+        }
+        self.producer_stats['enqueued'] += 1
+        self.put(AUDIT_TABLE, [row])
+
+    def _write(self, table: str, rows: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        if self.sink is not None and time.monotonic() >= self._retry_at:
+            try:
+                self.sink.write(table, rows)
+                self.writer_stats['written'] += len(rows)
+                self.writer_stats['batches'] += 1
+                self.writer_stats['write_seconds'] += time.perf_counter() - started
+                return
+            except Exception as e:
+                self.writer_stats['sink_errors'] += 1
+                self.last_error = str(e)[:200]
+                self._retry_at = time.monotonic() + self.retry_interval
+        self._spool(rows)
+        self.writer_stats['write_seconds'] += time.perf_counter() - started
+
+    def _spool(self, rows: List[Dict[str, Any]]):
+        if self.spool_path is None:
+            self.writer_stats['dropped'] += len(rows)
+            return
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spool_path, 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(row, ensure_ascii=False, default=str) + '\n' for row in rows)
+        self.writer_stats['spooled'] += len(rows)
+
+
+def spooled_rows(spool_path) -> List[Dict[str, Any]]:
+    with open(spool_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay_spool(spool_path, sink, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """Write spooled rows to a sink; rows that fail stay in the spool."""
+    from jsonl_export import iter_batches
+
+    spool_path = Path(spool_path)
+    rows = spooled_rows(spool_path)
+    result = {'replayed': 0, 'failed': 0}
+    remaining: List[Dict[str, Any]] = []
+    for batch in iter_batches(rows, batch_size):
+        if remaining:
+            remaining.extend(batch)
+            continue
+        try:
+            sink.write(AUDIT_TABLE, batch)
+            result['replayed'] += len(batch)
+        except Exception as e:
+            print(f"  ✗ Batch of {len(batch)} row(s): {str(e)[:100]}")
+            remaining.extend(batch)
+    sink.close()
+    result['failed'] = len(remaining)
+
+    tmp = spool_path.with_name(f".{spool_path.name}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(row, ensure_ascii=False, default=str) + '\n' for row in remaining)
+    tmp.replace(spool_path)
+    return result
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Inspect or replay the local audit-log spool")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--replay', choices=[s for s in SINKS if s != 'spool'],
+                        help="Write spooled rows to the audit_log table")
+    parser.add_argument('--sql-out', default='audit_log.sql', help="Output file for --replay sql")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    spool_path = Path(args.vessels_root) / AUDIT_DIR / SPOOL_NAME
+    if not spool_path.exists():
+        print(f"✓ No spooled audit rows ({spool_path})")
+        return
+    if not args.replay:
+        counts = defaultdict(int)
+        for row in spooled_rows(spool_path):
+            counts[(row['entity_type'], row['action'])] += 1
+        print(f"Spooled audit rows ({spool_path}):")
+        for (entity_type, action), count in sorted(counts.items()):
+            print(f"  {entity_type} {action}: {count}")
+        return
+
+    from seed_loader import open_sink
+    result = replay_spool(spool_path, open_sink(args.replay, args.sql_out, sql_schema='skin_twin'),
+                          args.batch_size)
+    print(f"  Replayed {result['replayed']} row(s), {result['failed']} left in the spool")
+    sys.exit(1 if result['failed'] else 0)
+
+
+if __name__ == '__main__':
+    main()
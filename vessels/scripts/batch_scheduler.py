@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Manufacturing Batch Scheduler
+Plans a production order (formulation -> number of batches) on the available
+vessels from the `formulation_phases` of the formulations/*.form files.
+
+Each phase runs at its `temperature` for its `mixing_time`; moving between
+phase temperatures costs a heating or cooling ramp, and a vessel keeps the
+temperature its last batch ended at, so the next batch starts with a ramp
+from there. Changing formulation on a vessel adds a cleaning step, so
+batches of one formulation are kept together as campaigns where that does
+not lengthen the plan. A batch can only run on a vessel that accepts the
+formulation's `vessel_type`.
+
+The schedule minimises the makespan. A greedy campaign heuristic with a
+local improvement pass handles weekly orders of hundreds of batches in well
+under a second; small orders can be solved exactly by branch and bound.
+"""
+
+import json
+import sys
+import time
+import argparse
+from pathlib import Path
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+
+from vessel_reader import read_vessel, vessel_id, iter_vessel_files, VesselParseError
+
+HEAT_RATE = 2.0              # degC per minute
+COOL_RATE = 1.0              # degC per minute; jacket cooling is slower than heating
+AMBIENT_TEMPERATURE = 25.0   # degC of an idle vessel
+DEFAULT_MIXING_TIME = 10.0   # minutes, for phases without mixing_time (adjustments)
+CLEANING_TIME = 30.0         # minutes between batches of different formulations
+
+EXACT_BATCH_LIMIT = 10       # largest order the exact solver is run on
+EXACT_NODE_LIMIT = 2_000_000
+IMPROVE_ROUNDS = 10_000
+EPSILON = 1e-9
+
+# (last formulation on the vessel, vessel temperature)
+VesselState = Tuple[Optional[str], float]
+IDLE: VesselState = (None, AMBIENT_TEMPERATURE)
+
+
+def ramp_time(current: float, target: float) -> float:
+    """Minutes to bring a vessel from one temperature to another."""
+    if target >= current:
+        return (target - current) / HEAT_RATE
+    return (current - target) / COOL_RATE
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.strip().rstrip('%'))
+        except ValueError:
+            return None
+    return None
+
+
+def load_process(formulation_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The phase program of one formulation, or None if it has no phases."""
+    phases = []
+    temperature = None
+    work = 0.0
+    for name, phase in (data.get('formulation_phases') or {}).items():
+        if not isinstance(phase, dict):
+            continue
+        target = _number(phase.get('temperature'))
+        if target is None:
+            target = temperature if temperature is not None else AMBIENT_TEMPERATURE
+        mixing = _number(phase.get('mixing_time'))
+        if mixing is None:
+            mixing = DEFAULT_MIXING_TIME
+        if temperature is not None:
+            work += ramp_time(temperature, target)
+        work += mixing
+        phases.append({'phase': name, 'temperature': target, 'mixing_time': mixing})
+        temperature = target
+    if not phases:
+        return None
+    return {
+        'formulation_id': formulation_id,
+        'vessel_type': data.get('vessel_type') or 'Professional_Formulation_Reactor',
+        'phases': phases,
+        'first_temperature': phases[0]['temperature'],
+        'last_temperature': phases[-1]['temperature'],
+        'work': work,   # minutes, excluding the ramp into the first phase
+    }
+
+
+def load_processes(vessels_root: str = ".") -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """Phase programs of all .form files, and warnings for files that were skipped."""
+    processes: Dict[str, Dict[str, Any]] = {}
+    warnings = []
+    for path in iter_vessel_files(Path(vessels_root) / 'formulations', ('*.form',)):
+        try:
+            document = read_vessel(path)
+        except VesselParseError as e:
+            warnings.append(str(e))
+            continue
+        formulation_id = vessel_id(document) or path.stem
+        process = load_process(formulation_id, document['data'])
+        if process is None:
+            warnings.append(f"{path.name}: no formulation_phases")
+            continue
+        processes[formulation_id] = process
+    return processes, warnings
+
+
+def fleet_from_counts(specs: List[str]) -> List[Dict[str, Any]]:
+    """Vessels from "Vessel_Type=count" specifications."""
+    vessels = []
+    for spec in specs:
+        vessel_type, _, count = spec.partition('=')
+        for i in range(int(count or 1)):
+            vessels.append({'id': f"{vessel_type}_{i + 1}", 'vessel_type': vessel_type})
+    return vessels
+
+
+def load_fleet(path: str) -> List[Dict[str, Any]]:
+    """Vessels from a JSON list of {"id", "vessel_type", "accepts": [...]}."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class BatchScheduler:
+    """Assigns and sequences formulation batches on vessels to minimise the makespan."""
+
+    def __init__(self, processes: Dict[str, Dict[str, Any]], vessels: List[Dict[str, Any]]):
+        self.processes = processes
+        self.vessels = vessels
+        self.accepts = [{v['vessel_type'], *v.get('accepts', [])} for v in vessels]
+        self.eligible: Dict[str, List[int]] = {}
+        self.stats = {'nodes': 0, 'improvements': 0}
+
+    # ------------------------------------------------------------------
+    # Durations
+    # ------------------------------------------------------------------
+
+    def duration(self, state: VesselState, formulation_id: str) -> float:
+        """Minutes a batch occupies a vessel in the given state, changeover included."""
+        process = self.processes[formulation_id]
+        last, temperature = state
+        changeover = CLEANING_TIME if last is not None and last != formulation_id else 0.0
+        return changeover + ramp_time(temperature, process['first_temperature']) + process['work']
+
+    def after(self, formulation_id: str) -> VesselState:
+        return formulation_id, self.processes[formulation_id]['last_temperature']
+
+    def sequence_end(self, sequence: List[str]) -> float:
+        end = 0.0
+        state = IDLE
+        for formulation_id in sequence:
+            end += self.duration(state, formulation_id)
+            state = self.after(formulation_id)
+        return end
+
+    # ------------------------------------------------------------------
+    # Orders
+    # ------------------------------------------------------------------
+
+    def batches(self, order: Dict[str, int]) -> List[str]:
+        """One entry per batch; raises ValueError for unknown or unplaceable formulations."""
+        batches = []
+        for formulation_id, count in order.items():
+            process = self.processes.get(formulation_id)
+            if process is None:
+                raise ValueError(f"Unknown formulation or no phases: {formulation_id}")
+            eligible = [i for i, accepts in enumerate(self.accepts) if process['vessel_type'] in accepts]
+            if not eligible:
+                raise ValueError(f"No vessel accepts {process['vessel_type']} (needed by {formulation_id})")
+            self.eligible[formulation_id] = eligible
+            batches.extend([formulation_id] * int(count))
+        return batches
+
+    # ------------------------------------------------------------------
+    # Heuristic
+    # ------------------------------------------------------------------
+
+    def heuristic(self, batches: List[str]) -> List[List[str]]:
+        """Greedy campaign assignment followed by local improvement."""
+        counts = Counter(batches)
+        # Least flexible formulations first, then the largest campaigns
+        campaigns = sorted(counts, key=lambda f: (len(self.eligible[f]),
+                                                  -counts[f] * self.processes[f]['work'], f))
+        sequences: List[List[str]] = [[] for _ in self.vessels]
+        ends = [0.0] * len(self.vessels)
+        states = [IDLE] * len(self.vessels)
+        for formulation_id in campaigns:
+            for _ in range(counts[formulation_id]):
+                best = min(self.eligible[formulation_id],
+                           key=lambda i: (ends[i] + self.duration(states[i], formulation_id),
+                                          states[i][0] != formulation_id, i))
+                ends[best] += self.duration(states[best], formulation_id)
+                states[best] = self.after(formulation_id)
+                sequences[best].append(formulation_id)
+        self.improve(sequences)
+        return sequences
+
+    @staticmethod
+    def _last_index(sequence: List[str]) -> Dict[str, int]:
+        """Index of the last batch of each formulation on a vessel."""
+        return {formulation_id: i for i, formulation_id in enumerate(sequence)}
+
+    @staticmethod
+    def _slot(sequence: List[str], last: Dict[str, int], formulation_id: str) -> int:
+        """Insertion index next to a formulation's campaign on a vessel, else the end."""
+        return last[formulation_id] + 1 if formulation_id in last else len(sequence)
+
+    def _state_before(self, sequence: List[str], i: int) -> VesselState:
+        return self.after(sequence[i - 1]) if i else IDLE
+
+    def removal_delta(self, sequence: List[str], i: int) -> float:
+        """Change of a vessel's end time when the batch at index i is removed (O(1))."""
+        before = self._state_before(sequence, i)
+        delta = -self.duration(before, sequence[i])
+        if i + 1 < len(sequence):
+            following = sequence[i + 1]
+            delta += self.duration(before, following) - self.duration(self.after(sequence[i]), following)
+        return delta
+
+    def insertion_delta(self, sequence: List[str], i: int, formulation_id: str) -> float:
+        """Change of a vessel's end time when a batch is inserted at index i (O(1))."""
+        before = self._state_before(sequence, i)
+        delta = self.duration(before, formulation_id)
+        if i < len(sequence):
+            following = sequence[i]
+            delta += self.duration(self.after(formulation_id), following) - self.duration(before, following)
+        return delta
+
+    def improve(self, sequences: List[List[str]]) -> None:
+        """Move or swap batches off the vessel that finishes last while that shortens it."""
+        ends = [self.sequence_end(s) for s in sequences]
+        for _ in range(IMPROVE_ROUNDS):
+            critical = max(range(len(ends)), key=ends.__getitem__)
+            source = sequences[critical]
+            lasts = [self._last_index(s) for s in sequences]
+            best = None   # (new pair end, source index, target, target index)
+            for formulation_id, i in lasts[critical].items():
+                source_end = ends[critical] + self.removal_delta(source, i)
+                for target in self.eligible[formulation_id]:
+                    if target == critical:
+                        continue
+                    j = self._slot(sequences[target], lasts[target], formulation_id)
+                    pair_end = max(source_end,
+                                   ends[target] + self.insertion_delta(sequences[target], j, formulation_id))
+                    if pair_end < ends[critical] - EPSILON and (best is None or pair_end < best[0]):
+                        best = (pair_end, i, target, j)
+            if best is not None:
+                _, i, target, j = best
+                sequences[target].insert(j, source.pop(i))
+            else:
+                swap = self._best_swap(sequences, ends, critical, lasts)
+                if swap is None:
+                    return
+                _, target, sequences[critical], sequences[target] = swap
+            ends[critical] = self.sequence_end(sequences[critical])
+            ends[target] = self.sequence_end(sequences[target])
+            self.stats['improvements'] += 1
+
+    def _without(self, sequence: List[str], i: int, end: float) -> Tuple[List[str], float, Dict[str, int]]:
+        """A sequence with the batch at index i removed, its end time and last indexes."""
+        removed = sequence[:i] + sequence[i + 1:]
+        return removed, end + self.removal_delta(sequence, i), self._last_index(removed)
+
+    def _best_swap(self, sequences: List[List[str]], ends: List[float], critical: int,
+                   lasts: List[Dict[str, int]]):
+        """Best exchange of one batch between the critical vessel and another, if any shortens it."""
+        source = sequences[critical]
+        outgoing = {f: self._without(source, i, ends[critical]) for f, i in lasts[critical].items()}
+        best = None   # (new pair end, target, new source, new target)
+        for target, sequence in enumerate(sequences):
+            if target == critical:
+                continue
+            for other, k in lasts[target].items():
+                if critical not in self.eligible[other]:
+                    continue
+                target_removed, target_end, target_last = self._without(sequence, k, ends[target])
+                for formulation_id, (removed, removed_end, removed_last) in outgoing.items():
+                    if formulation_id == other or target not in self.eligible[formulation_id]:
+                        continue
+                    source_slot = self._slot(removed, removed_last, other)
+                    target_slot = self._slot(target_removed, target_last, formulation_id)
+                    pair_end = max(removed_end + self.insertion_delta(removed, source_slot, other),
+                                   target_end + self.insertion_delta(target_removed, target_slot, formulation_id))
+                    if pair_end < ends[critical] - EPSILON and (best is None or pair_end < best[0]):
+                        new_source = removed[:source_slot] + [other] + removed[source_slot:]
+                        new_target = target_removed[:target_slot] + [formulation_id] + target_removed[target_slot:]
+                        best = (pair_end, target, new_source, new_target)
+        return best
+
+    # ------------------------------------------------------------------
+    # Exact solver
+    # ------------------------------------------------------------------
+
+    def exact(self, batches: List[str], upper: float) -> Tuple[Optional[List[List[str]]], bool]:
+        """Branch and bound over vessel sequences, filling one vessel at a time.
+
+        Returns the best schedule strictly shorter than `upper` (None if the
+        bound was already optimal) and whether the search completed.
+        """
+        remaining = Counter(batches)
+        count = len(self.vessels)
+        sequences: List[List[str]] = [[] for _ in self.vessels]
+        best: Dict[str, Any] = {'makespan': upper, 'sequences': None}
+        self.stats['nodes'] = 0
+
+        def bound(vessel: int, state: VesselState, end: float, closed: float) -> float:
+            lower = max(closed, end)
+            work = end
+            for formulation_id, left in remaining.items():
+                if not left:
+                    continue
+                open_vessels = [i for i in self.eligible[formulation_id] if i >= vessel]
+                if not open_vessels:
+                    return float('inf')
+                own = self.processes[formulation_id]['work']
+                first = end + self.duration(state, formulation_id) if open_vessels[0] == vessel else own
+                lower = max(lower, min(first, own) if len(open_vessels) > 1 else first)
+                work += left * own
+            return max(lower, work / (count - vessel))
+
+        def search(vessel: int, state: VesselState, end: float, closed: float) -> bool:
+            self.stats['nodes'] += 1
+            if self.stats['nodes'] > EXACT_NODE_LIMIT:
+                return False
+            if not any(remaining.values()):
+                makespan = max(closed, end)
+                if makespan < best['makespan'] - EPSILON:
+                    best['makespan'] = makespan
+                    best['sequences'] = [list(s) for s in sequences]
+                return True
+            if bound(vessel, state, end, closed) >= best['makespan'] - EPSILON:
+                return True
+            for formulation_id in sorted(remaining):
+                if not remaining[formulation_id] or vessel not in self.eligible[formulation_id]:
+                    continue
+                new_end = end + self.duration(state, formulation_id)
+                if max(closed, new_end) >= best['makespan'] - EPSILON:
+                    continue
+                remaining[formulation_id] -= 1
+                sequences[vessel].append(formulation_id)
+                complete = search(vessel, self.after(formulation_id), new_end, closed)
+                sequences[vessel].pop()
+                remaining[formulation_id] += 1
+                if not complete:
+                    return False
+            if vessel + 1 < count:
+                return search(vessel + 1, IDLE, 0.0, max(closed, end))
+            return True
+
+        complete = search(0, IDLE, 0.0, 0.0)
+        return best['sequences'], complete
+
+    # ------------------------------------------------------------------
+    # Schedule
+    # ------------------------------------------------------------------
+
+    def schedule(self, order: Dict[str, int], exact: bool = False,
+                 exact_limit: int = EXACT_BATCH_LIMIT) -> Dict[str, Any]:
+        """Phase-level schedule for a production order."""
+        batches = self.batches(order)
+        sequences = self.heuristic(batches)
+        solver, optimal = 'heuristic', False
+        if exact and len(batches) <= exact_limit:
+            found, optimal = self.exact(batches, self.makespan(sequences) + EPSILON)
+            if found is not None:
+                sequences = found
+            solver = 'exact' if optimal else 'exact (node limit reached)'
+        return self.plan(sequences, solver, optimal)
+
+    def makespan(self, sequences: List[List[str]]) -> float:
+        return max((self.sequence_end(s) for s in sequences), default=0.0)
+
+    def plan(self, sequences: List[List[str]], solver: str = 'heuristic',
+             optimal: bool = False) -> Dict[str, Any]:
+        """Expand vessel sequences into timed phases."""
+        steps = []
+        vessels = []
+        batch_numbers: Counter = Counter()
+        for vessel, sequence in zip(self.vessels, sequences):
+            clock = 0.0
+            last, temperature = IDLE
+            for formulation_id in sequence:
+                process = self.processes[formulation_id]
+                batch_numbers[formulation_id] += 1
+                batch = f"{formulation_id}#{batch_numbers[formulation_id]}"
+                if last is not None and last != formulation_id:
+                    steps.append(self._step(vessel, batch, 'cleaning', clock, 0.0, CLEANING_TIME, temperature))
+                    clock += CLEANING_TIME
+                for phase in process['phases']:
+                    ramp = ramp_time(temperature, phase['temperature'])
+                    steps.append(self._step(vessel, batch, phase['phase'], clock, ramp,
+                                            phase['mixing_time'], phase['temperature']))
+                    clock += ramp + phase['mixing_time']
+                    temperature = phase['temperature']
+                last = formulation_id
+            vessels.append({'vessel': vessel['id'], 'vessel_type': vessel['vessel_type'],
+                            'batches': len(sequence), 'end': round(clock, 1)})
+        makespan = max((v['end'] for v in vessels), default=0.0)
+        for v in vessels:
+            v['utilization'] = round(v['end'] / makespan, 3) if makespan else 0
+        return {
+            'makespan': makespan,
+            'solver': solver,
+            'optimal': optimal,
+            'batches': sum(len(s) for s in sequences),
+            'vessels': vessels,
+            'phases': sorted(steps, key=lambda s: (s['start'], s['vessel'])),
+        }
+
+    @staticmethod
+    def _step(vessel: Dict[str, Any], batch: str, phase: str, start: float,
+              ramp: float, hold: float, temperature: float) -> Dict[str, Any]:
+        return {
+            'vessel': vessel['id'],
+            'batch': batch,
+            'phase': phase,
+            'start': round(start, 1),
+            'end': round(start + ramp + hold, 1),
+            'ramp': round(ramp, 1),
+            'temperature': temperature,
+        }
+
+
+def _clock(minutes: float) -> str:
+    return f"{int(minutes // 60)}h{int(round(minutes % 60)):02d}"
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Schedule formulation batches on manufacturing vessels")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--order', action='append', default=[], metavar='FORMULATION_ID=BATCHES',
+                        help="Batches of a formulation (repeatable)")
+    parser.add_argument('--order-file', help="JSON object of formulation id -> batch count")
+    parser.add_argument('--all', type=int, metavar='BATCHES', help="Order this many batches of every formulation")
+    parser.add_argument('--vessel', action='append', default=[], metavar='VESSEL_TYPE=COUNT',
+                        help="Available vessels of a type (repeatable)")
+    parser.add_argument('--vessels-file', help="JSON list of vessels: {id, vessel_type, accepts}")
+    parser.add_argument('--exact', action='store_true',
+                        help="Solve exactly by branch and bound (orders up to --exact-limit batches)")
+    parser.add_argument('--exact-limit', type=int, default=EXACT_BATCH_LIMIT)
+    parser.add_argument('--output', help="Write the phase-level schedule as JSON")
+    args = parser.parse_args()
+
+    processes, warnings = load_processes(args.vessels_root)
+    for warning in warnings:
+        print(f"⚠ Skipped {warning}")
+
+    order: Dict[str, int] = {}
+    if args.all:
+        order.update({formulation_id: args.all for formulation_id in sorted(processes)})
+    if args.order_file:
+        with open(args.order_file, 'r', encoding='utf-8') as f:
+            order.update(json.load(f))
+    for spec in args.order:
+        formulation_id, _, count = spec.partition('=')
+        order[formulation_id] = int(count or 1)
+    if not order:
+        parser.error("empty order: use --order, --order-file or --all")
+
+    vessels = load_fleet(args.vessels_file) if args.vessels_file else fleet_from_counts(args.vessel)
+    if not vessels:
+        # One vessel of every type the order needs
+        needed = sorted({processes[f]['vessel_type'] for f in order if f in processes})
+        vessels = fleet_from_counts(needed)
+
+    scheduler = BatchScheduler(processes, vessels)
+    started = time.perf_counter()
+    try:
+        schedule = scheduler.schedule(order, exact=args.exact, exact_limit=args.exact_limit)
+    except ValueError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+
+    print(f"Scheduled {schedule['batches']} batches on {len(vessels)} vessels "
+          f"({schedule['solver']}, {elapsed * 1000:.0f} ms)")
+    if args.exact and schedule['batches'] > args.exact_limit:
+        print(f"⚠ Order exceeds --exact-limit {args.exact_limit}; kept the heuristic schedule")
+    for v in schedule['vessels']:
+        print(f"  {v['vessel']}: {v['batches']} batches, done at {_clock(v['end'])} "
+              f"({v['utilization']:.0%} of makespan)")
+    print(f"✓ Makespan: {_clock(schedule['makespan'])} ({schedule['makespan']:.1f} min)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(schedule, f, indent=2)
+        print(f"✓ Schedule written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
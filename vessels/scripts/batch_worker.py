@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Batching Worker
+The bounded queue + background writer thread shared by the audit-log writer
+(audit_log.AuditLogWriter) and the multi-sink sync (multi_sync.SinkWorker):
+
+- `put()` queues a (table, rows) item and blocks only while the queue is
+  full (backpressure); the time spent blocked is part of the metrics;
+- one thread re-batches the queued rows per table to `batch_size` rows,
+  flushing early when the table changes, when a partial batch has waited
+  `flush_interval` seconds (if set), on `flush()` and on close;
+- subclasses implement `_write(table, rows)`; an exception escaping it is
+  counted as failed rows and never stops the thread, so `flush()` and
+  `close()` always return.
+"""
+
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Any, Optional
+
+_STOP = object()
+_FLUSH = object()
+
+
+class BatchWorker:
+    """Bounded queue + writer thread that hands rows to `_write` in per-table batches."""
+
+    def __init__(self, name: str, sink=None, batch_size: int = 100, max_queue: int = 100,
+                 flush_interval: Optional[float] = None):
+        self.name = name
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, max_queue))
+        # Producer and writer counters are kept apart: each is written by one thread
+        self.producer_stats = defaultdict(float)
+        self.writer_stats = defaultdict(float)
+        self.last_error: Optional[str] = None
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def put(self, table: str, rows: List[Dict[str, Any]]):
+        """Queue rows for a table; blocks only while the queue is full."""
+        try:
+            self.queue.put_nowait((table, rows))
+        except queue.Full:
+            started = time.perf_counter()
+            self.queue.put((table, rows))
+            self.producer_stats['blocked'] += 1
+            self.producer_stats['blocked_seconds'] += time.perf_counter() - started
+        depth = self.queue.qsize()
+        if depth > self.producer_stats['max_depth']:
+            self.producer_stats['max_depth'] = depth
+
+    def flush(self):
+        """Write out every queued row, partial batches included, and wait for it."""
+        if self._thread.is_alive():
+            self.queue.put(_FLUSH)
+            self.queue.join()
+
+    def close(self) -> Dict[str, Any]:
+        """Drain the queue, stop the writer thread and close the sink; returns the metrics."""
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+            if self.sink is not None:
+                self.sink.close()
+        return self.metrics()
+
+    def metrics(self) -> Dict[str, Any]:
+        stats = {**self.producer_stats, **self.writer_stats}
+        stats['depth'] = self.queue.qsize()
+        stats = {key: round(value, 4) if key.endswith('_seconds') else int(value)
+                 for key, value in stats.items()}
+        if self.last_error:
+            stats['last_error'] = self.last_error
+        return stats
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        batch: List[Dict[str, Any]] = []
+        current: Optional[str] = None
+        items = 0          # queued items whose rows are (partly) in the batch
+        deadline = 0.0
+        stopping = False
+        while not stopping:
+            timeout = None
+            if batch and self.flush_interval is not None:
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            forced = item is _STOP or item is _FLUSH
+            if forced:
+                stopping = item is _STOP
+                self.queue.task_done()
+            elif item is not None:
+                table, rows = item
+                if table != current and batch:
+                    batch = self._flush(current, batch, len(batch))
+                    items = self._done(items)
+                if not batch and self.flush_interval is not None:
+                    deadline = time.monotonic() + self.flush_interval
+                current = table
+                batch.extend(rows)
+                items += 1
+            while len(batch) >= self.batch_size:
+                batch = self._flush(current, batch, self.batch_size)
+            if not batch:
+                items = self._done(items)
+            elif forced or (self.flush_interval is not None and time.monotonic() >= deadline):
+                batch = self._flush(current, batch, len(batch))
+                items = self._done(items)
+        self.writer_stats['finished_seconds'] = time.perf_counter() - self._started
+
+    def _flush(self, table: str, batch: List[Dict[str, Any]], size: int) -> List[Dict[str, Any]]:
+        """Write the first `size` rows of the batch; returns the rest."""
+        rows, rest = batch[:size], batch[size:]
+        try:
+            self._write(table, rows)
+        except Exception as e:
+            self.writer_stats['failed'] += len(rows)
+            self.last_error = f"{table}: {str(e)[:200]}"
+        return rest
+
+    def _done(self, items: int) -> int:
+        for _ in range(items):
+            self.queue.task_done()
+        return 0
+
+    def _write(self, table: str, rows: List[Dict[str, Any]]):
+        raise NotImplementedError
+
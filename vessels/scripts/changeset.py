@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Vessel Changesets
+Collects per-file JSON patches (RFC 6902 add/replace/remove operations) with
+provenance instead of rewriting vessel files in place. Files whose content
+would not change are never recorded, so a no-op enrichment run touches
+nothing.
+
+A changeset is applied in grouped batches: every file of a batch is first
+written to a temporary file next to it and fsynced, then all are renamed into
+place. An interrupted run therefore leaves each file either old or new, never
+truncated. Files edited since the changeset was computed are reported as
+conflicts and left alone. With a FormulationHistory attached, every applied
+formulation change is also appended to the local history store, and with an
+AuditLogWriter attached every applied change is queued as an audit_log row.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sys
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+CHANGESET_VERSION = 1
+# Vessel directory -> audit_log entity_type
+ENTITY_TYPES = {
+    'formulations': 'formulation',
+    'ingredients': 'ingredient',
+    'suppliers': 'supplier',
+    'products': 'product',
+    'edges': 'edge',
+    'msdspif': 'safety_document',
+}
+
+
+def _pointer(path: str, key) -> str:
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def _unpointer(pointer: str) -> List[str]:
+    return [part.replace('~1', '/').replace('~0', '~') for part in pointer.split('/')[1:]]
+
+
+def diff(old: Any, new: Any, path: str = '') -> List[Dict[str, Any]]:
+    """JSON patch operations turning `old` into `new`.
+
+    Objects are diffed per key and equal-length arrays per element; other
+    arrays are replaced whole.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': _pointer(path, key)})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': _pointer(path, key), 'value': value})
+            else:
+                ops.extend(diff(old[key], value, _pointer(path, key)))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            ops.extend(diff(a, b, _pointer(path, i)))
+        return ops
+    if old == new and type(old) is type(new):
+        return []
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def apply_patch(document: Any, ops: List[Dict[str, Any]]) -> Any:
+    """Apply patch operations to a copy of a document."""
+    document = copy.deepcopy(document)
+    for op in ops:
+        parts = _unpointer(op['path'])
+        if not parts:
+            document = copy.deepcopy(op['value'])
+            continue
+        parent = document
+        for part in parts[:-1]:
+            parent = parent[int(part)] if isinstance(parent, list) else parent[part]
+        key = int(parts[-1]) if isinstance(parent, list) else parts[-1]
+        if op['op'] == 'remove':
+            del parent[key]
+        else:
+            parent[key] = copy.deepcopy(op['value'])
+    return document
+
+
+def file_digest(path: Path) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def dump_json(data: Any) -> str:
+    """Serialize a vessel document the way the vessel tools write it."""
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+
+class Changeset:
+    def __init__(self, vessels_root: str = ".", source: str = '', history=None, audit=None):
+        self.vessels_root = Path(vessels_root)
+        self.source = source
+        self.history = history
+        self.audit = audit
+        self.entries: List[Dict[str, Any]] = []
+        self.stats = defaultdict(int)
+
+    def record(self, file_path: Path, old: Dict[str, Any], new: Dict[str, Any],
+               provenance: Optional[Dict[str, Any]] = None) -> bool:
+        """Record the patch from old to new for a file; returns False when nothing changes."""
+        ops = diff(old, new)
+        if not ops:
+            self.stats['unchanged'] += 1
+            return False
+        file_path = Path(file_path)
+        try:
+            relative = str(file_path.resolve().relative_to(self.vessels_root.resolve()))
+        except ValueError:
+            relative = str(file_path)
+        self.entries.append({
+            'file': relative,
+            'base_sha256': file_digest(file_path),
+            'patch': ops,
+            'provenance': provenance or {},
+        })
+        self.stats['changed'] += 1
+        return True
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': CHANGESET_VERSION,
+            'source': self.source,
+            'created_at': datetime.now().isoformat(),
+            'entries': self.entries,
+        }
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, vessels_root: str = ".") -> 'Changeset':
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != CHANGESET_VERSION:
+            raise ValueError(f"Unsupported changeset version: {payload.get('version')}")
+        changeset = cls(vessels_root, payload.get('source', ''))
+        changeset.entries = payload['entries']
+        return changeset
+
+    def print_changes(self, limit: Optional[int] = None):
+        """Print the changeset (used for --dry-run)."""
+        print(f"\n  Changeset: {len(self.entries)} file(s) would change")
+        for entry in self.entries[:limit]:
+            provenance = ', '.join(f"{k}={v}" for k, v in entry['provenance'].items())
+            print(f"    {entry['file']}" + (f" ({provenance})" if provenance else ''))
+            for op in entry['patch']:
+                value = '' if op['op'] == 'remove' else f" = {json.dumps(op['value'], ensure_ascii=False)[:80]}"
+                print(f"      {op['op']} {op['path']}{value}")
+
+    # ------------------------------------------------------------------
+    # Applying
+    # ------------------------------------------------------------------
+
+    def apply(self, batch_size: int = 50) -> Dict[str, int]:
+        """Apply all entries with write-to-temp-and-rename in grouped batches."""
+        result = {'applied': 0, 'conflicts': 0, 'errors': 0}
+        for start in range(0, len(self.entries), batch_size):
+            self._apply_batch(self.entries[start:start + batch_size], result)
+        return result
+
+    def _apply_batch(self, entries: List[Dict[str, Any]], result: Dict[str, int]):
+        staged = []
+        try:
+            for entry in entries:
+                target = self.vessels_root / entry['file']
+                try:
+                    with open(target, 'rb') as f:
+                        raw = f.read()
+                except OSError as e:
+                    result['errors'] += 1
+                    print(f"  ✗ {entry['file']}: {e}")
+                    continue
+                if hashlib.sha256(raw).hexdigest() != entry['base_sha256']:
+                    result['conflicts'] += 1
+                    print(f"  ⚠ {entry['file']} changed since the changeset was computed, skipped")
+                    continue
+                try:
+                    data = apply_patch(json.loads(raw), entry['patch'])
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    result['errors'] += 1
+                    print(f"  ✗ {entry['file']}: cannot apply patch: {e}")
+                    continue
+
+                tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(dump_json(data))
+                    f.flush()
+                    os.fsync(f.fileno())
+                staged.append((tmp, target, entry, raw, data))
+        except BaseException:
+            for tmp, *_ in staged:
+                tmp.unlink(missing_ok=True)
+            raise
+
+        directories = set()
+        try:
+            for tmp, target, entry, raw, data in staged:
+                os.replace(tmp, target)
+                directories.add(target.parent)
+                result['applied'] += 1
+            for tmp, target, entry, raw, data in staged:
+                directory = Path(entry['file']).parts[0]
+                if self.history is not None and directory == 'formulations':
+                    description = ', '.join(f"{k}={v}" for k, v in entry['provenance'].items())
+                    self.history.record_change(data.get('id') or target.stem, json.loads(raw), data,
+                                               self.source, description)
+                if self.audit is not None:
+                    self.audit.log(ENTITY_TYPES.get(directory, directory), data.get('id') or target.stem,
+                                   'update', entry['patch'],
+                                   {'file': entry['file'], 'provenance': entry['provenance']}, self.source)
+        finally:
+            for tmp, *_ in staged:
+                tmp.unlink(missing_ok=True)
+        for directory in directories:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+
+def apply_changeset(changeset: Changeset, stats: Dict[str, int], dry_run: bool = False):
+    """Print (dry run) or apply a collected changeset, adding conflicts/errors to stats."""
+    if dry_run:
+        changeset.print_changes()
+        return
+    if not len(changeset):
+        return
+    result = changeset.apply()
+    stats['conflicts'] += result['conflicts']
+    stats['errors'] += result['errors']
+    print(f"\n  Applied {result['applied']} file change(s), {result['conflicts']} conflict(s)")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Show or apply a saved vessel changeset")
+    parser.add_argument('changeset', help="Changeset JSON file")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--apply', action='store_true', help="Apply the changeset (default: only print it)")
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    changeset = Changeset.load(args.changeset, args.vessels_root)
+    if not args.apply:
+        changeset.print_changes()
+        return
+    result = changeset.apply(args.batch_size)
+    print(f"  Applied: {result['applied']}, conflicts: {result['conflicts']}, errors: {result['errors']}")
+    sys.exit(1 if result['conflicts'] or result['errors'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Ingredient Co-occurrence and Association Rules
+Builds a sparse ingredient co-occurrence matrix over vessels/formulations in
+one pass, including the concentration ratio of each ingredient pair, and mines
+frequent itemsets with FP-growth to derive association rules
+(support/confidence/lift) for reformulation suggestions.
+
+The matrix is maintained incrementally: a state file records each
+formulation's file signature and ingredient lines, so a refresh re-reads only
+changed files and applies their difference to the pair counts.
+"""
+
+import json
+import math
+import sys
+import argparse
+from pathlib import Path
+from collections import defaultdict, Counter
+from itertools import combinations
+from typing import Dict, List, Any, Optional, Iterable, Tuple, FrozenSet
+
+from advanced_ingredient_enrichment import normalize_name
+from formulation_engine import phase_ingredients
+from vessel_reader import iter_vessel_files, read_vessel, vessel_id
+
+STATE_VERSION = 1
+
+
+def line_item(line: Dict[str, Any]) -> Optional[str]:
+    """Item key of a formulation line: the ingredient id, else its normalized name."""
+    if line.get('ingredient_id'):
+        return line['ingredient_id']
+    name = normalize_name(line.get('inci_name') or '')
+    return f"INCI:{name}" if name else None
+
+
+def fp_growth(transactions: Iterable[Tuple[Iterable[str], int]], min_count: int,
+              max_len: int) -> Dict[FrozenSet[str], int]:
+    """Frequent itemsets of weighted transactions (items, count) via FP-growth."""
+    transactions = [(list(items), count) for items, count in transactions]
+    item_counts = Counter()
+    for items, count in transactions:
+        for item in items:
+            item_counts[item] += count
+    frequent = {item: c for item, c in item_counts.items() if c >= min_count}
+    if not frequent:
+        return {}
+
+    # FP-tree: node = [item, count, parent, children]
+    rank = {item: r for r, item in enumerate(sorted(frequent, key=lambda i: (-frequent[i], i)))}
+    root = [None, 0, None, {}]
+    header: Dict[str, List[list]] = defaultdict(list)
+    for items, count in transactions:
+        node = root
+        for item in sorted((i for i in set(items) if i in rank), key=rank.__getitem__):
+            child = node[3].get(item)
+            if child is None:
+                child = [item, 0, node, {}]
+                node[3][item] = child
+                header[item].append(child)
+            child[1] += count
+            node = child
+
+    itemsets: Dict[FrozenSet[str], int] = {}
+
+    def mine(header: Dict[str, List[list]], rank: Dict[str, int], suffix: Tuple[str, ...]):
+        # Least frequent first, so each conditional base only holds more frequent items
+        for item in sorted(header, key=rank.__getitem__, reverse=True):
+            nodes = header[item]
+            support = sum(node[1] for node in nodes)
+            if support < min_count:
+                continue
+            itemset = suffix + (item,)
+            itemsets[frozenset(itemset)] = support
+            if len(itemset) >= max_len:
+                continue
+
+            base = []
+            for node in nodes:
+                path = []
+                parent = node[2]
+                while parent[0] is not None:
+                    path.append(parent[0])
+                    parent = parent[2]
+                if path:
+                    base.append((path, node[1]))
+            if not base:
+                continue
+
+            counts = Counter()
+            for path, count in base:
+                for path_item in path:
+                    counts[path_item] += count
+            cond_rank = {i: rank[i] for i, c in counts.items() if c >= min_count}
+            if not cond_rank:
+                continue
+            cond_root = [None, 0, None, {}]
+            cond_header: Dict[str, List[list]] = defaultdict(list)
+            for path, count in base:
+                node = cond_root
+                for path_item in sorted((i for i in path if i in cond_rank), key=cond_rank.__getitem__):
+                    child = node[3].get(path_item)
+                    if child is None:
+                        child = [path_item, 0, node, {}]
+                        node[3][path_item] = child
+                        cond_header[path_item].append(child)
+                    child[1] += count
+                    node = child
+            mine(cond_header, cond_rank, itemset)
+
+    mine(header, rank, ())
+    return itemsets
+
+
+class CooccurrenceIndex:
+    def __init__(self, vessels_root: str = ".", state_path: Optional[str] = None):
+        self.vessels_root = Path(vessels_root)
+        self.state_path = Path(state_path) if state_path else self.vessels_root / 'cooccurrence_state.json'
+
+        # formulation_id -> {'file', 'signature', 'lines': {item: concentration}}
+        self.formulations: Dict[str, Dict[str, Any]] = {}
+        self.labels: Dict[str, str] = {}
+        self.item_counts: Counter = Counter()
+        # (a, b) with a < b -> [formulations, ratio samples, sum log(ca/cb), sum log^2]
+        self.pairs: Dict[Tuple[str, str], List[float]] = {}
+        self.version = 0
+        self._mined: Optional[Tuple[int, Tuple, Dict[FrozenSet[str], int]]] = None
+        self.stats = defaultdict(int)
+
+    # ------------------------------------------------------------------
+    # Matrix maintenance
+    # ------------------------------------------------------------------
+
+    def _apply(self, lines: Dict[str, float], sign: int):
+        """Add (sign=1) or remove (sign=-1) one formulation's contribution."""
+        for item in lines:
+            self.item_counts[item] += sign
+            if self.item_counts[item] <= 0:
+                del self.item_counts[item]
+        for a, b in combinations(sorted(lines), 2):
+            cell = self.pairs.get((a, b))
+            if cell is None:
+                cell = self.pairs[(a, b)] = [0, 0, 0.0, 0.0]
+            cell[0] += sign
+            ca, cb = lines[a], lines[b]
+            if ca > 0 and cb > 0:
+                log_ratio = math.log(ca / cb)
+                cell[1] += sign
+                cell[2] += sign * log_ratio
+                cell[3] += sign * log_ratio * log_ratio
+            if cell[0] <= 0:
+                del self.pairs[(a, b)]
+        self.version += 1
+
+    def add_formulation(self, formulation_id: str, lines: Dict[str, float],
+                        file_name: str = '', signature: Optional[List[int]] = None):
+        """Add or replace a formulation; only its own pairs are touched."""
+        self.remove_formulation(formulation_id)
+        self.formulations[formulation_id] = {'file': file_name, 'signature': signature, 'lines': lines}
+        self._apply(lines, 1)
+
+    def remove_formulation(self, formulation_id: str):
+        previous = self.formulations.pop(formulation_id, None)
+        if previous is not None:
+            self._apply(previous['lines'], -1)
+
+    def parse_formulation(self, data: Dict[str, Any]) -> Dict[str, float]:
+        """Item -> concentration map of a formulation (repeated items are summed)."""
+        lines: Dict[str, float] = defaultdict(float)
+        for line in data.get('ingredients', []):
+            item = line_item(line)
+            if item is None:
+                continue
+            try:
+                lines[item] += float(line.get('concentration') or 0)
+            except (TypeError, ValueError):
+                lines[item] += 0.0
+            self.labels.setdefault(item, line.get('inci_name') or item)
+        return dict(lines)
+
+    def refresh(self) -> Dict[str, int]:
+        """Re-read added/changed formulation files and drop deleted ones.
+
+        JSON files come first; a .form vessel whose id already came from a
+        JSON file is skipped.
+        """
+        formulations_dir = self.vessels_root / 'formulations'
+        changes = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+        by_file = {entry['file']: fid for fid, entry in self.formulations.items()}
+        seen, seen_ids = set(), set()
+
+        paths = iter_vessel_files(formulations_dir, ('*.json',)) + iter_vessel_files(formulations_dir, ('*.form',))
+        for path in paths:
+            st = path.stat()
+            signature = [st.st_mtime_ns, st.st_size]
+            seen.add(path.name)
+            known_id = by_file.get(path.name)
+            if known_id is not None and self.formulations[known_id]['signature'] == signature:
+                seen_ids.add(known_id)
+                changes['unchanged'] += 1
+                continue
+            try:
+                document = read_vessel(path)
+            except Exception:
+                self.stats['unreadable_formulation_files'] += 1
+                continue
+            data = document['data']
+            formulation_id = vessel_id(document) or path.stem
+            if path.suffix == '.form':
+                if formulation_id in seen_ids:
+                    continue
+                data = dict(data, ingredients=phase_ingredients(data))
+            seen_ids.add(formulation_id)
+            if known_id is not None:
+                self.remove_formulation(known_id)
+            self.add_formulation(formulation_id, self.parse_formulation(data), path.name, signature)
+            changes['changed' if known_id is not None else 'added'] += 1
+
+        for file_name, formulation_id in by_file.items():
+            if file_name in seen:
+                continue
+            # A .form may already have taken over the id of a deleted JSON file
+            if self.formulations.get(formulation_id, {}).get('file') == file_name:
+                self.remove_formulation(formulation_id)
+            changes['removed'] += 1
+        return changes
+
+    def rebuild(self):
+        """Recompute item and pair counts from the stored formulation lines."""
+        self.item_counts = Counter()
+        self.pairs = {}
+        for entry in self.formulations.values():
+            self._apply(entry['lines'], 1)
+
+    def save_state(self):
+        payload = {
+            'version': STATE_VERSION,
+            'labels': self.labels,
+            'formulations': self.formulations,
+        }
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+
+    def load_state(self) -> bool:
+        """Load stored formulation lines; the matrix is rebuilt from them in one pass."""
+        if not self.state_path.exists():
+            return False
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except Exception:
+            return False
+        if payload.get('version') != STATE_VERSION:
+            return False
+        self.labels = payload.get('labels', {})
+        self.formulations = payload.get('formulations', {})
+        self.rebuild()
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    @property
+    def total(self) -> int:
+        return len(self.formulations)
+
+    def pair(self, a: str, b: str) -> Dict[str, Any]:
+        """Co-occurrence statistics of two items, with their typical concentration ratio a:b."""
+        key = (a, b) if a < b else (b, a)
+        count, samples, sum_log, sum_sq = self.pairs.get(key, (0, 0, 0.0, 0.0))
+        expected = self.item_counts[a] * self.item_counts[b] / self.total if self.total else 0
+        result = {
+            'items': [a, b],
+            'formulations': count,
+            'support': count / self.total if self.total else 0.0,
+            'lift': count / expected if expected else 0.0,
+            'ratio': None,
+            'ratio_spread': None,
+        }
+        if samples:
+            mean = sum_log / samples
+            if key[0] != a:
+                mean = -mean
+            variance = max(sum_sq / samples - (sum_log / samples) ** 2, 0.0)
+            result['ratio'] = round(math.exp(mean), 4)
+            result['ratio_spread'] = round(math.exp(math.sqrt(variance)), 4)
+        return result
+
+    def partners(self, item: str, limit: int = 10, min_count: int = 2) -> List[Dict[str, Any]]:
+        """Items most often used with `item`, ranked by lift."""
+        rows = []
+        for (a, b), cell in self.pairs.items():
+            if cell[0] >= min_count and item in (a, b):
+                rows.append(self.pair(item, b if a == item else a))
+        rows.sort(key=lambda r: (-r['lift'], -r['formulations']))
+        return rows[:limit]
+
+    def frequent_itemsets(self, min_support: float = 0.05, max_len: int = 3) -> Dict[FrozenSet[str], int]:
+        """FP-growth itemsets; memoized until the formulation set changes."""
+        key = (min_support, max_len)
+        if self._mined and self._mined[0] == self.version and self._mined[1] == key:
+            return self._mined[2]
+        min_count = max(2, math.ceil(min_support * self.total))
+        weighted = Counter(frozenset(entry['lines']) for entry in self.formulations.values())
+        itemsets = fp_growth(weighted.items(), min_count, max_len)
+        self._mined = (self.version, key, itemsets)
+        return itemsets
+
+    def association_rules(self, min_support: float = 0.05, min_confidence: float = 0.5,
+                          max_len: int = 3) -> List[Dict[str, Any]]:
+        """Rules antecedent -> consequent with support, confidence and lift."""
+        itemsets = self.frequent_itemsets(min_support, max_len)
+        total = self.total
+        rules = []
+        for itemset, count in itemsets.items():
+            if len(itemset) < 2:
+                continue
+            for size in range(1, len(itemset)):
+                for antecedent in combinations(sorted(itemset), size):
+                    antecedent = frozenset(antecedent)
+                    consequent = itemset - antecedent
+                    confidence = count / itemsets[antecedent]
+                    if confidence < min_confidence:
+                        continue
+                    rules.append({
+                        'antecedent': sorted(antecedent),
+                        'consequent': sorted(consequent),
+                        'support': round(count / total, 4),
+                        'confidence': round(confidence, 4),
+                        'lift': round(confidence * total / itemsets[consequent], 4),
+                        'formulations': count,
+                    })
+        rules.sort(key=lambda r: (-r['lift'], -r['confidence'], r['antecedent'], r['consequent']))
+        return rules
+
+    def suggest(self, items: Iterable[str], rules: List[Dict[str, Any]], limit: int = 10) -> List[Dict[str, Any]]:
+        """Ingredients that usually accompany `items` but are missing from it."""
+        present = set(items)
+        best: Dict[str, Dict[str, Any]] = {}
+        for rule in rules:
+            if rule['lift'] <= 1 or not present.issuperset(rule['antecedent']):
+                continue
+            for item in rule['consequent']:
+                if item in present:
+                    break
+            else:
+                for item in rule['consequent']:
+                    current = best.get(item)
+                    if current is None or (rule['confidence'], rule['lift']) > (current['confidence'], current['lift']):
+                        best[item] = {'item': item, 'label': self.labels.get(item, item), **rule}
+        return sorted(best.values(), key=lambda s: (-s['confidence'], -s['lift'], s['item']))[:limit]
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Ingredient co-occurrence and association rules")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--min-support', type=float, default=0.05, help="Minimum itemset support (fraction)")
+    parser.add_argument('--min-confidence', type=float, default=0.5)
+    parser.add_argument('--max-len', type=int, default=3, help="Largest itemset size")
+    parser.add_argument('--state', help="State file (default: <vessels_root>/cooccurrence_state.json)")
+    parser.add_argument('--full', action='store_true', help="Ignore the state file and re-read everything")
+    parser.add_argument('--suggest', metavar='FORMULATION_ID', help="Suggest additions for a formulation")
+    parser.add_argument('--output', help="Rules output path (default: <vessels_root>/association_rules.json)")
+    args = parser.parse_args()
+
+    index = CooccurrenceIndex(args.vessels_root, args.state)
+    if not args.full and index.load_state():
+        print(f"Loaded state for {index.total} formulations")
+    changes = index.refresh()
+    index.save_state()
+    print(f"Formulations: {index.total} (added {changes['added']}, changed {changes['changed']}, "
+          f"removed {changes['removed']}, unchanged {changes['unchanged']})")
+    print(f"  Items: {len(index.item_counts)}, co-occurring pairs: {len(index.pairs)}")
+
+    rules = index.association_rules(args.min_support, args.min_confidence, args.max_len)
+    itemsets = index.frequent_itemsets(args.min_support, args.max_len)
+    print(f"  Frequent itemsets: {len(itemsets)}, rules: {len(rules)}")
+
+    if args.suggest:
+        entry = index.formulations.get(args.suggest)
+        if entry is None:
+            print(f"✗ Unknown formulation: {args.suggest}")
+            sys.exit(1)
+        print(f"\nSuggestions for {args.suggest}:")
+        for s in index.suggest(entry['lines'], rules):
+            because = ', '.join(index.labels.get(i, i) for i in s['antecedent'])
+            print(f"  + {s['label']} (confidence {s['confidence']:.0%}, lift {s['lift']:.1f}; with {because})")
+        return
+
+    for rule in rules[:10]:
+        lhs = ', '.join(index.labels.get(i, i) for i in rule['antecedent'])
+        rhs = ', '.join(index.labels.get(i, i) for i in rule['consequent'])
+        print(f"    {lhs} -> {rhs} (conf {rule['confidence']:.0%}, lift {rule['lift']:.1f})")
+
+    output = Path(args.output) if args.output else Path(args.vessels_root) / 'association_rules.json'
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'formulations': index.total,
+            'min_support': args.min_support,
+            'min_confidence': args.min_confidence,
+            'labels': {item: index.labels.get(item, item) for item in index.item_counts},
+            'rules': rules,
+        }, f, indent=2, ensure_ascii=False)
+    print(f"\nRules saved to: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+COSING Catalog Access
+Shared reader for the European Commission COSING export shipped in
+vessels/cosing (cosing_ingredients.csv[.gz]). Rows are keyed by
+cosing_ref_no, the identifier used by the cosing_ingredients table.
+"""
+
+import csv
+import gzip
+import re
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional
+
+def find_cosing_file(vessels_root: str = ".") -> Optional[Path]:
+    """Locate the COSING CSV export (plain or gzipped) under a vessels root."""
+    cosing_dir = Path(vessels_root) / 'cosing'
+    for name in ('cosing_ingredients.csv', 'cosing_ingredients.csv.gz'):
+        candidate = cosing_dir / name
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def open_text(path) -> Any:
+    """Open a text file, transparently decompressing .gz files."""
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_cosing_rows(cosing_csv) -> Iterator[Dict[str, str]]:
+    """Yield COSING rows as dicts with stripped string values."""
+    with open_text(cosing_csv) as f:
+        for row in csv.DictReader(f):
+            yield {k: (v or '').strip() for k, v in row.items()}
+
+
+def normalize_inci(name: str) -> str:
+    """Case- and whitespace-insensitive INCI key."""
+    return ' '.join(name.upper().split())
+
+
+def split_cas_numbers(value: str) -> List[str]:
+    """Split a COSING cas_no cell ("56-81-5, 8043-29-6" or "a / b") into numbers."""
+    return [cas for cas in re.split(r'[,/;\s]+', value or '') if re.match(r'^\d+-\d+-\d$', cas)]
+
+
+def split_ec_numbers(value: str) -> List[str]:
+    """EC numbers in a COSING ec_no cell ("200-289-5 / -", "*200-066-2 (I)"); '-' placeholders dropped."""
+    return re.findall(r'\b\d{3}-\d{3}-\d\b', value or '')
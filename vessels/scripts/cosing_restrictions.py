@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+COSING Restriction Rule Engine
+Compiles the free-text COSING `restriction` column (Annex references such as
+"III/62" or "V/7 ... maximum concentration of 0,15 % ... in leave-on") into
+structured rules, indexes them by cosing_ref_no and checks every formulation
+line against them in one vectorized pass.
+
+The COSING export carries Annex references but rarely the limits themselves;
+limits can be supplied per Annex entry with --limits (JSON keyed by reference,
+e.g. {"III/62": {"max_concentration": 2.5, "scope": ["rinse_off"]}}). Restricted
+entries without a known limit are reported for review.
+"""
+
+import json
+import re
+import sys
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Iterable
+
+import numpy as np
+
+from cosing_catalog import find_cosing_file, iter_cosing_rows, normalize_inci, split_cas_numbers
+from formulation_engine import phase_ingredients
+from vessel_reader import iter_vessel_files, read_vessel, vessel_id
+
+# Product-type scopes, one bit each
+SCOPES = ['leave_on', 'rinse_off', 'hair_dye', 'oral', 'eye', 'nail', 'inhalation']
+SCOPE_BITS = {scope: 1 << i for i, scope in enumerate(SCOPES)}
+
+# Scope phrases inside restriction text
+RULE_SCOPE_PATTERNS = [
+    ('hair_dye', re.compile(r'hair\s+dye', re.I)),
+    ('leave_on', re.compile(r'leave[\s-]+on', re.I)),
+    ('rinse_off', re.compile(r'rinse[\s-]+off', re.I)),
+    ('oral', re.compile(r'\boral\b|toothpaste|mouth\s*wash', re.I)),
+    ('eye', re.compile(r'\beye\s+(?:products|area|make-?up)', re.I)),
+    ('nail', re.compile(r'\bnail', re.I)),
+    ('inhalation', re.compile(r'inhalation|lungs|spray', re.I)),
+]
+
+# Product-type keywords in formulation names and categories
+PRODUCT_SCOPE_PATTERNS = [
+    ('rinse_off', re.compile(r'cleans|wash|shampoo|masque|\bmask|peel|scrub|exfoliat|soap', re.I)),
+    ('eye', re.compile(r'\beye', re.I)),
+    ('hair_dye', re.compile(r'hair\s+(?:dye|colou?r)', re.I)),
+    ('oral', re.compile(r'toothpaste|mouth\s*wash', re.I)),
+    ('nail', re.compile(r'\bnail', re.I)),
+    ('inhalation', re.compile(r'spray|aerosol|\bmist\b', re.I)),
+]
+
+ANNEX_REF = re.compile(r'(?:\bAnnex\s+)?\b(VI|V|IV|III|II)\s*/\s*(\d+[a-z]?)', re.I)
+ANNEX_KINDS = {'II': 'prohibited', 'III': 'restricted', 'IV': 'colorant', 'V': 'preservative', 'VI': 'uv_filter'}
+KINDS = list(ANNEX_KINDS.values())
+MAX_KEYWORD = re.compile(r'max(?:imum)?|up\s+to|not\s+(?:to\s+)?exceed|≤|<=', re.I)
+ENTRY_CONTINUATION = re.compile(r'^(\d+[a-z]?)\b[\s,]*', re.I)
+PERCENT = re.compile(r'(>\s*)?(\d+(?:[.,]\d+)?)\s*%')
+NOT_TO_BE_USED = re.compile(r'not\s+to\s+be\s+used|prohibited', re.I)
+SENTENCE_END = re.compile(r'(?<!\d)[.;](?!\d)')
+
+# Evaluation outcome per (line, rule) pair, in increasing severity
+COMPLIANT, REVIEW, NON_COMPLIANT = 0, 1, 2
+STATUS_NAMES = ['compliant', 'review', 'non_compliant']
+
+
+def scope_mask(scopes: Iterable[str]) -> int:
+    mask = 0
+    for scope in scopes:
+        mask |= SCOPE_BITS[scope]
+    return mask
+
+
+def _scopes_in(text: str) -> List[str]:
+    return [scope for scope, pattern in RULE_SCOPE_PATTERNS if pattern.search(text)]
+
+
+def compile_restriction(text: str) -> List[Dict[str, Any]]:
+    """Parse one COSING restriction cell into structured rules.
+
+    Each rule has: reference ("III/62"), annex, entry, kind, max_concentration
+    (percent or None), scope (product types it applies to; empty means all)
+    and conditions (the remaining free text). A "not to be used in <scope>"
+    sentence becomes a separate prohibited rule for that scope; the limits
+    of the same entry keep the Annex kind.
+    """
+    rules = []
+    matches = list(ANNEX_REF.finditer(text or ''))
+    for i, match in enumerate(matches):
+        annex, entry = match.group(1).upper(), match.group(2).lower()
+        clause_end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        clause = text[match.end():clause_end].strip(' .:=-;,')
+
+        # "III/15a, 15d" lists further entries of the same Annex
+        entries = [entry]
+        continuation = ENTRY_CONTINUATION.match(clause)
+        while continuation:
+            entries.append(continuation.group(1).lower())
+            clause = clause[continuation.end():]
+            continuation = ENTRY_CONTINUATION.match(clause)
+
+        kind = ANNEX_KINDS[annex]
+
+        # "Not to be used in <scope> products" sentences prohibit the entry in
+        # those scopes only; the rest of the clause carries the limits
+        prohibitions, limit_text = [], clause
+        if kind != 'prohibited':
+            sentences = [part.strip() for part in SENTENCE_END.split(clause) if part.strip()]
+            prohibitions = [part for part in sentences if NOT_TO_BE_USED.search(part) and _scopes_in(part)]
+            limit_text = '. '.join(part for part in sentences if part not in prohibitions)
+
+        # Limits: percentages in a clause that names a maximum; each limit takes
+        # the scope words that follow it ("0,15 % in leave-on and 0,2 % in rinse-off")
+        limits = []
+        if MAX_KEYWORD.search(limit_text):
+            percents = [p for p in PERCENT.finditer(limit_text) if not p.group(1)]
+            for j, p in enumerate(percents):
+                tail_end = percents[j + 1].start() if j + 1 < len(percents) else len(limit_text)
+                tail = limit_text[p.end():tail_end].split('.')[0]
+                limits.append((float(p.group(2).replace(',', '.')), _scopes_in(tail)))
+
+        for entry in entries:
+            base = {
+                'reference': f"{annex}/{entry}",
+                'annex': annex,
+                'entry': entry,
+                'kind': kind,
+                'max_concentration': None,
+                'scope': _scopes_in(limit_text),
+                'conditions': clause,
+            }
+            if not limits and (limit_text or not prohibitions):
+                rules.append(base)
+            for value, scopes in limits:
+                rules.append(dict(base, max_concentration=value, scope=scopes or base['scope']))
+            for sentence in prohibitions:
+                rules.append(dict(base, kind='prohibited', scope=_scopes_in(sentence)))
+    return rules
+
+
+def infer_product_scope(formulation: Dict[str, Any]) -> List[str]:
+    """Guess the product-type scopes of a formulation from its type, name and category."""
+    explicit = formulation.get('product_scope')
+    if explicit:
+        return [s for s in explicit if s in SCOPE_BITS]
+    text = ' '.join(str(formulation.get(k) or '') for k in ('product_type', 'category', 'name'))
+    scopes = [scope for scope, pattern in PRODUCT_SCOPE_PATTERNS if pattern.search(text)]
+    if 'rinse_off' not in scopes or re.search(r'toner|serum|cream|lotion|gel\b', text, re.I):
+        scopes.insert(0, 'leave_on')
+    return scopes
+
+
+class RestrictionIndex:
+    """Compiled rules keyed by cosing_ref_no, with columnar arrays for evaluation."""
+
+    def __init__(self, limits: Optional[Dict[str, Any]] = None):
+        self.limits = limits or {}
+        self.rules: List[Dict[str, Any]] = []
+        self.by_ref: Dict[int, List[int]] = defaultdict(list)
+        self.stats = defaultdict(int)
+        self._arrays = None
+
+    def add(self, cosing_ref_no: int, restriction: str):
+        compiled = compile_restriction(restriction)
+        if not compiled:
+            self.stats['unparsed_restrictions'] += 1
+            return
+        for rule in self._apply_limits(compiled):
+            rule['cosing_ref_no'] = cosing_ref_no
+            self.by_ref[cosing_ref_no].append(len(self.rules))
+            self.rules.append(rule)
+        self.stats['restricted_entries'] += 1
+        self._arrays = None
+
+    def _apply_limits(self, rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill missing limits from the external Annex limits table."""
+        result = []
+        for rule in rules:
+            extra = self.limits.get(rule['reference'])
+            if rule['max_concentration'] is not None or rule['kind'] == 'prohibited' or not extra:
+                result.append(rule)
+                continue
+            for limit in (extra if isinstance(extra, list) else [extra]):
+                result.append(dict(
+                    rule,
+                    max_concentration=limit.get('max_concentration'),
+                    scope=limit.get('scope', rule['scope']),
+                    conditions='; '.join(filter(None, [rule['conditions'], limit.get('conditions', '')])),
+                ))
+        return result
+
+    def arrays(self):
+        """Rule columns sorted by cosing_ref_no: (ref, max, scope, kind, rule index)."""
+        if self._arrays is None:
+            order = sorted(range(len(self.rules)), key=lambda i: self.rules[i]['cosing_ref_no'])
+            rules = [self.rules[i] for i in order]
+            self._arrays = (
+                np.array([r['cosing_ref_no'] for r in rules], dtype=np.int64),
+                np.array([np.nan if r['max_concentration'] is None else r['max_concentration'] for r in rules],
+                         dtype=np.float64),
+                np.array([scope_mask(r['scope']) for r in rules], dtype=np.int64),
+                np.array([KINDS.index(r['kind']) for r in rules], dtype=np.int8),
+                np.array(order, dtype=np.int64),
+            )
+        return self._arrays
+
+    def evaluate(self, line_refs: np.ndarray, line_conc: np.ndarray, line_scope: np.ndarray):
+        """Evaluate formulation lines against all rules in one vectorized pass.
+
+        Returns (line index, rule index, severity) arrays for every
+        (line, rule) pair whose severity is above COMPLIANT.
+        """
+        rule_ref, rule_max, rule_scope, rule_kind, rule_index = self.arrays()
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(rule_ref) or not len(line_refs):
+            return empty, empty, empty.astype(np.int8)
+
+        # Join lines to their rule ranges (rules are sorted by cosing_ref_no)
+        left = np.searchsorted(rule_ref, line_refs, side='left')
+        right = np.searchsorted(rule_ref, line_refs, side='right')
+        counts = right - left
+        pair_line = np.repeat(np.arange(len(line_refs)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_rule = np.repeat(left, counts) + offsets
+
+        conc = line_conc[pair_line]
+        limit = rule_max[pair_rule]
+        kind = rule_kind[pair_rule]
+        scope = rule_scope[pair_rule]
+        in_scope = (scope == 0) | ((scope & line_scope[pair_line]) != 0)
+        has_limit = ~np.isnan(limit)
+
+        prohibited = kind == KINDS.index('prohibited')
+        colorant = kind == KINDS.index('colorant')
+        severity = np.full(len(pair_line), COMPLIANT, dtype=np.int8)
+        severity[in_scope & ~prohibited & ~colorant & ~has_limit] = REVIEW
+        severity[in_scope & has_limit & (conc > np.nan_to_num(limit, nan=np.inf))] = NON_COMPLIANT
+        severity[in_scope & prohibited & (conc > 0)] = NON_COMPLIANT
+
+        flagged = severity > COMPLIANT
+        return pair_line[flagged], rule_index[pair_rule[flagged]], severity[flagged]
+
+
+class ComplianceChecker:
+    def __init__(self, cosing_csv: str, vessels_root: str = ".", limits: Optional[Dict[str, Any]] = None):
+        self.vessels_root = Path(vessels_root)
+        self.index = RestrictionIndex(limits)
+        self.inci_to_ref: Dict[str, int] = {}
+        self.cas_to_ref: Dict[str, int] = {}
+        self.cosing_names: Dict[int, str] = {}
+        self.ingredients: Dict[str, Dict[str, Any]] = {}
+        self.stats = defaultdict(int)
+
+        print("Compiling COSING restrictions...")
+        self.load_cosing(cosing_csv)
+
+    def load_cosing(self, cosing_csv: str):
+        for row in iter_cosing_rows(cosing_csv):
+            if not row.get('cosing_ref_no', '').isdigit():
+                continue
+            ref_no = int(row['cosing_ref_no'])
+            if row.get('inci_name'):
+                self.inci_to_ref.setdefault(normalize_inci(row['inci_name']), ref_no)
+                self.cosing_names[ref_no] = row['inci_name']
+            for cas in split_cas_numbers(row.get('cas_no', '')):
+                self.cas_to_ref.setdefault(cas, ref_no)
+            if row.get('restriction'):
+                self.index.add(ref_no, row['restriction'])
+
+        print(f"  Indexed {len(self.inci_to_ref)} INCI names")
+        print(f"  Compiled {len(self.index.rules)} rules for {self.index.stats['restricted_entries']} restricted entries")
+        print(f"  Unparsed restriction texts: {self.index.stats['unparsed_restrictions']}")
+
+    def load_ingredients(self):
+        """Ingredient records from vessels/ingredients (.json and .inci)."""
+        for path in iter_vessel_files(self.vessels_root / 'ingredients', ('*.json', '*.inci')):
+            try:
+                document = read_vessel(path)
+            except Exception:
+                continue
+            ingredient_id = vessel_id(document)
+            if ingredient_id and isinstance(document['data'], dict):
+                self.ingredients[ingredient_id] = document['data']
+
+    def resolve(self, line: Dict[str, Any]) -> int:
+        """Resolve a formulation line to a cosing_ref_no (-1 if unknown)."""
+        ingredient = self.ingredients.get(line.get('ingredient_id'), {})
+        for source in (line, ingredient):
+            ref_no = source.get('cosing_ref_no')
+            if ref_no is not None and str(ref_no).isdigit():
+                return int(ref_no)
+        for name in (ingredient.get('cosing_inci_name'), ingredient.get('inci_name'), line.get('inci_name')):
+            if name:
+                ref_no = self.inci_to_ref.get(normalize_inci(name))
+                if ref_no is not None:
+                    return ref_no
+        for cas in split_cas_numbers(ingredient.get('cas_number', '') or line.get('cas_number', '')):
+            if cas in self.cas_to_ref:
+                return self.cas_to_ref[cas]
+        return -1
+
+    def load_formulations(self) -> List[Dict[str, Any]]:
+        """Formulations from vessels/formulations: JSON files, then the .form vessels.
+
+        A .form vessel's lines are the numeric formulation_phases entries; a
+        .form whose id already came from a JSON file is skipped.
+        """
+        formulations, seen = [], set()
+        formulations_dir = self.vessels_root / 'formulations'
+        for path in iter_vessel_files(formulations_dir, ('*.json',)) + iter_vessel_files(formulations_dir, ('*.form',)):
+            try:
+                document = read_vessel(path)
+            except Exception as e:
+                self.stats['formulation_parse_errors'] += 1
+                print(f"  ✗ Error reading {path.name}: {e}")
+                continue
+            data = document['data']
+            formulation_id = vessel_id(document) or path.stem
+            if path.suffix == '.form':
+                if formulation_id in seen:
+                    continue
+                data = dict(data, name=data.get('name') or data.get('product_name'),
+                            ingredients=phase_ingredients(data))
+            data.setdefault('id', formulation_id)
+            seen.add(formulation_id)
+            formulations.append(data)
+        return formulations
+
+    def check_all(self, formulations: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Check all formulations and return the per-formulation compliance report."""
+        if not self.ingredients:
+            self.load_ingredients()
+        if formulations is None:
+            formulations = self.load_formulations()
+
+        # Flatten every formulation line into columns
+        line_form, line_refs, line_conc, line_scope, lines = [], [], [], [], []
+        scopes = []
+        for f_index, formulation in enumerate(formulations):
+            product_scope = infer_product_scope(formulation)
+            scopes.append(product_scope)
+            mask = scope_mask(product_scope)
+            for line in formulation.get('ingredients', []):
+                line_form.append(f_index)
+                line_refs.append(self.resolve(line))
+                line_conc.append(float(line.get('concentration') or 0))
+                line_scope.append(mask)
+                lines.append(line)
+
+        refs = np.array(line_refs, dtype=np.int64)
+        pair_line, pair_rule, severity = self.index.evaluate(
+            refs, np.array(line_conc, dtype=np.float64), np.array(line_scope, dtype=np.int64))
+
+        forms = np.array(line_form, dtype=np.int64)
+        status = np.zeros(len(formulations), dtype=np.int8)
+        np.maximum.at(status, forms[pair_line], severity)
+        unresolved = np.bincount(forms[refs < 0], minlength=len(formulations))
+
+        findings = defaultdict(list)
+        for line_i, rule_i, level in zip(pair_line.tolist(), pair_rule.tolist(), severity.tolist()):
+            rule = self.index.rules[rule_i]
+            line = lines[line_i]
+            findings[line_form[line_i]].append({
+                'ingredient': line.get('inci_name', ''),
+                'ingredient_id': line.get('ingredient_id'),
+                'cosing_ref_no': rule['cosing_ref_no'],
+                'cosing_inci_name': self.cosing_names.get(rule['cosing_ref_no'], ''),
+                'reference': rule['reference'],
+                'kind': rule['kind'],
+                'concentration': line_conc[line_i],
+                'max_concentration': rule['max_concentration'],
+                'scope': rule['scope'],
+                'conditions': rule['conditions'],
+                'severity': STATUS_NAMES[level],
+            })
+
+        report = []
+        for f_index, formulation in enumerate(formulations):
+            report.append({
+                'formulation_id': formulation['id'],
+                'name': formulation.get('name', ''),
+                'status': STATUS_NAMES[status[f_index]],
+                'product_scope': scopes[f_index],
+                'unresolved_ingredients': int(unresolved[f_index]),
+                'findings': findings.get(f_index, []),
+            })
+
+        summary = defaultdict(int)
+        for entry in report:
+            summary[entry['status']] += 1
+        return {
+            'summary': {
+                'formulations': len(report),
+                'lines': len(lines),
+                'resolved_lines': int((refs >= 0).sum()),
+                **{name: summary[name] for name in STATUS_NAMES},
+            },
+            'formulations': report,
+        }
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Check formulations against COSING restrictions")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--cosing', help="COSING CSV export (default: cosing/cosing_ingredients.csv[.gz])")
+    parser.add_argument('--limits', help="JSON table of Annex limits keyed by reference (e.g. III/62)")
+    parser.add_argument('--output', help="Report path (default: <vessels_root>/compliance_report.json)")
+    args = parser.parse_args()
+
+    cosing_csv = Path(args.cosing) if args.cosing else find_cosing_file(args.vessels_root)
+    if not cosing_csv or not cosing_csv.exists():
+        print(f"✗ COSING database not found: {cosing_csv or Path(args.vessels_root) / 'cosing'}")
+        sys.exit(1)
+
+    limits = None
+    if args.limits:
+        with open(args.limits, 'r', encoding='utf-8') as f:
+            limits = json.load(f)
+
+    checker = ComplianceChecker(str(cosing_csv), args.vessels_root, limits)
+    report = checker.check_all()
+
+    summary = report['summary']
+    print(f"\nChecked {summary['formulations']} formulations ({summary['resolved_lines']}/{summary['lines']} lines resolved)")
+    print(f"  Compliant: {summary['compliant']}")
+    print(f"  Review: {summary['review']}")
+    print(f"  Non-compliant: {summary['non_compliant']}")
+
+    output = Path(args.output) if args.output else Path(args.vessels_root) / 'compliance_report.json'
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nDetailed report saved to: {output}")
+
+    sys.exit(1 if summary['non_compliant'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+COSING Full-Text Search
+In-process BM25 search over the COSING export: INCI names, their INN/Ph. Eur.
+synonyms, functions and the chemical/IUPAC descriptions, e.g. "which entries describe Angelica root
+extracts" without a database round trip.
+
+    python cosing_search.py .. "angelica root extract"
+    python cosing_search.py .. "function:emollient shea*" --boost inci_name=5
+
+Each field has its own inverted index (CSR postings: term -> doc ids and term
+frequencies, as numpy arrays). A query scores every field with BM25 using the
+document frequency across all fields, weights the field scores by boosts and
+accumulates them into one dense score array, so a query costs a few array
+operations per term. `term*` expands to every indexed term with that prefix
+(binary search over the sorted vocabulary); `field:term` limits a term to
+one field. Terms are lowercased and reduced by a light plural stemmer. An
+entry whose INCI name is exactly the query terms ranks above every partial
+match, so "sodium hyaluronate" finds SODIUM HYALURONATE before its
+derivatives (whose descriptions repeat the name).
+
+The index is built once from the COSING export and persisted as .npz (strings
+packed as UTF-8 blobs); it records the export's size and mtime and is rebuilt
+when the export changes.
+"""
+
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+from collections import Counter
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+import numpy as np
+
+from cosing_catalog import find_cosing_file, iter_cosing_rows
+
+INDEX_VERSION = 2
+
+FIELDS = ('inci_name', 'synonyms', 'function', 'description')
+DEFAULT_BOOSTS = {'inci_name': 3.0, 'synonyms': 1.5, 'function': 1.5, 'description': 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_EXPANSION = 200   # most frequent expansions kept per prefix term
+
+TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset(
+    'a an and are as at be by for from in is it of on or that the to which with what who '
+    'where entries entry describe describes'.split()
+)
+
+
+def stem(token: str) -> str:
+    """Light plural stemmer: roots -> root, berries -> berry, leaves stay distinct."""
+    if len(token) <= 3 or not token.endswith('s') or token.endswith(('ss', 'us', 'is')):
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith(('ches', 'shes', 'xes', 'sses')):
+        return token[:-2]
+    return token[:-1]
+
+
+def tokenize(text: str) -> List[str]:
+    """Index terms of a text: lowercase alphanumeric runs, stemmed, stopwords dropped."""
+    return [stem(t) for t in TOKEN.findall((text or '').lower()) if t not in STOPWORDS]
+
+
+def row_fields(row: Dict[str, str]) -> Dict[str, str]:
+    description = row.get('chem_iupac_name___description') or row.get('chem_iupac_name_description', '')
+    synonyms = ' '.join(filter(None, (row.get('inn_name', ''), row.get('ph_eur_name', ''))))
+    return {'inci_name': row.get('inci_name', ''), 'synonyms': synonyms,
+            'function': row.get('function', ''), 'description': description}
+
+
+def _pack(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Strings as one UTF-8 blob and offsets (npz without pickled objects)."""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+
+
+def source_signature(path) -> List[int]:
+    stat = Path(path).stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class CosingSearch:
+    """BM25 inverted index over COSING rows with per-field boosts and prefix queries."""
+
+    def __init__(self):
+        self.ref_nos = np.zeros(0, dtype=np.int64)
+        self.inci_names: List[str] = []
+        self.functions: List[str] = []
+        self.descriptions: List[str] = []
+        self.vocabulary: List[str] = []          # sorted
+        self.term_ids: Dict[str, int] = {}
+        self.df = np.zeros(0, dtype=np.int32)    # documents containing a term in any field
+        self.postings: Dict[str, Dict[str, np.ndarray]] = {}
+        self.source: List[int] = []
+
+    # ------------------------------------------------------------------
+    # Building and persistence
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, cosing_csv) -> 'CosingSearch':
+        index = cls()
+        ref_nos = []
+        field_terms: Dict[str, List[Counter]] = {field: [] for field in FIELDS}
+        for row in iter_cosing_rows(cosing_csv):
+            if not row.get('cosing_ref_no', '').isdigit():
+                continue
+            ref_nos.append(int(row['cosing_ref_no']))
+            index.inci_names.append(row.get('inci_name', ''))
+            index.functions.append(row.get('function', ''))
+            fields = row_fields(row)
+            index.descriptions.append(fields['description'])
+            for field in FIELDS:
+                field_terms[field].append(Counter(tokenize(fields[field])))
+
+        index.ref_nos = np.array(ref_nos, dtype=np.int64)
+        vocabulary = set()
+        for counters in field_terms.values():
+            for counts in counters:
+                vocabulary.update(counts)
+        index.vocabulary = sorted(vocabulary)
+        index.term_ids = {term: i for i, term in enumerate(index.vocabulary)}
+
+        doc_terms = [set() for _ in ref_nos]
+        for field in FIELDS:
+            index.postings[field] = index._field_postings(field_terms[field], doc_terms)
+        index.df = np.bincount(
+            np.fromiter((t for terms in doc_terms for t in terms), dtype=np.int64),
+            minlength=len(index.vocabulary)).astype(np.int32)
+        index.source = source_signature(cosing_csv)
+        return index
+
+    def _field_postings(self, counters: List[Counter], doc_terms: List[set]) -> Dict[str, np.ndarray]:
+        """CSR postings of one field: term offsets, doc ids and term frequencies."""
+        terms, docs, freqs = [], [], []
+        lengths = np.zeros(len(counters), dtype=np.int32)
+        for doc, counts in enumerate(counters):
+            lengths[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                term_id = self.term_ids[term]
+                terms.append(term_id)
+                docs.append(doc)
+                freqs.append(tf)
+                doc_terms[doc].add(term_id)
+        terms = np.array(terms, dtype=np.int32)
+        order = np.argsort(terms, kind='stable')   # keeps doc ids ascending per term
+        offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)), out=offsets[1:])
+        return {
+            'offsets': offsets,
+            'docs': np.array(docs, dtype=np.int32)[order],
+            'tf': np.array(freqs, dtype=np.uint16)[order],
+            'lengths': lengths,
+        }
+
+    def save(self, path):
+        """Persist the index as compressed .npz."""
+        arrays = {
+            'version': np.array([INDEX_VERSION]),
+            'source': np.array(self.source, dtype=np.int64),
+            'ref_nos': self.ref_nos,
+            'df': self.df,
+        }
+        for name, strings in (('vocabulary', self.vocabulary), ('inci_names', self.inci_names),
+                              ('functions', self.functions), ('descriptions', self.descriptions)):
+            arrays[f'{name}_blob'], arrays[f'{name}_offsets'] = _pack(strings)
+        for field, postings in self.postings.items():
+            for key, array in postings.items():
+                arrays[f'{field}.{key}'] = array
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, path) -> 'CosingSearch':
+        with np.load(path) as payload:
+            if int(payload['version'][0]) != INDEX_VERSION:
+                raise ValueError(f"Unsupported search index version: {int(payload['version'][0])}")
+            index = cls()
+            index.source = payload['source'].tolist()
+            index.ref_nos = payload['ref_nos']
+            index.df = payload['df']
+            index.vocabulary = _unpack(payload['vocabulary_blob'], payload['vocabulary_offsets'])
+            index.inci_names = _unpack(payload['inci_names_blob'], payload['inci_names_offsets'])
+            index.functions = _unpack(payload['functions_blob'], payload['functions_offsets'])
+            index.descriptions = _unpack(payload['descriptions_blob'], payload['descriptions_offsets'])
+            for field in FIELDS:
+                index.postings[field] = {key: payload[f'{field}.{key}']
+                                         for key in ('offsets', 'docs', 'tf', 'lengths')}
+        index.term_ids = {term: i for i, term in enumerate(index.vocabulary)}
+        return index
+
+    @classmethod
+    def open(cls, vessels_root: str = ".", index_path=None, rebuild: bool = False) -> 'CosingSearch':
+        """Load the persisted index, (re)building it when missing or stale."""
+        cosing_csv = find_cosing_file(vessels_root)
+        path = Path(index_path) if index_path else Path(vessels_root) / 'cosing' / 'search_index.npz'
+        if path.exists() and not rebuild:
+            try:
+                index = cls.load(path)
+            except ValueError:
+                index = None   # older index version; rebuilt below
+            if index is not None and (cosing_csv is None or index.source == source_signature(cosing_csv)):
+                return index
+        if cosing_csv is None:
+            raise FileNotFoundError(f"COSING database not found under {Path(vessels_root) / 'cosing'}")
+        index = cls.build(cosing_csv)
+        index.save(path)
+        return index
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def expand(self, prefix: str) -> List[int]:
+        """Term ids starting with a prefix, most frequent first (capped)."""
+        start = _bisect(self.vocabulary, prefix)
+        end = _bisect(self.vocabulary, prefix + '￿')
+        ids = np.arange(start, end)
+        if len(ids) > MAX_PREFIX_EXPANSION:
+            ids = ids[np.argsort(-self.df[ids], kind='stable')[:MAX_PREFIX_EXPANSION]]
+        return ids.tolist()
+
+    def parse(self, query: str) -> List[Tuple[Optional[str], List[int]]]:
+        """Query clauses: (field or None, term ids). A prefix clause has several ids."""
+        clauses = []
+        for raw in query.split():
+            field, _, text = raw.rpartition(':')
+            field = field.lower() or None
+            if field is not None and field not in FIELDS:
+                raise ValueError(f"Unknown field: {field} (fields: {', '.join(FIELDS)})")
+            if text.endswith('*'):
+                for token in TOKEN.findall(text.lower())[:1]:
+                    clauses.append((field, self.expand(token)))
+                continue
+            for token in tokenize(text):
+                clauses.append((field, [self.term_ids[token]] if token in self.term_ids else []))
+        return clauses
+
+    def _term_scores(self, term_id: int, field: str, boost: float, idf: float,
+                     scores: np.ndarray) -> None:
+        postings = self.postings[field]
+        start, end = postings['offsets'][term_id], postings['offsets'][term_id + 1]
+        if start == end:
+            return
+        docs = postings['docs'][start:end]
+        tf = postings['tf'][start:end].astype(np.float64)
+        lengths = postings['lengths']
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / max(lengths.mean(), 1e-9))
+        scores[docs] += boost * idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+    def scores(self, query: str, boosts: Optional[Dict[str, float]] = None,
+               require_all: bool = False) -> np.ndarray:
+        """BM25 score of every row for a query (0 for rows that do not match)."""
+        boosts = {**DEFAULT_BOOSTS, **(boosts or {})}
+        count = len(self.ref_nos)
+        total = np.zeros(count)
+        matched = np.zeros(count, dtype=np.int32)
+        clauses = self.parse(query)
+        for field, term_ids in clauses:
+            clause = np.zeros(count)
+            for term_id in term_ids:
+                idf = np.log(1 + (count - self.df[term_id] + 0.5) / (self.df[term_id] + 0.5))
+                term = np.zeros(count)
+                for name in ((field,) if field else FIELDS):
+                    self._term_scores(term_id, name, boosts.get(name, 0.0), idf, term)
+                np.maximum(clause, term, out=clause)   # prefix expansions count once
+            total += clause
+            matched += clause > 0
+        if require_all:
+            total[matched < len(clauses)] = 0
+        exact = self.exact_name_docs(clauses)
+        if len(exact):
+            total[exact] += total.max()
+        return total
+
+    def exact_name_docs(self, clauses: List[Tuple[Optional[str], List[int]]]) -> np.ndarray:
+        """Rows whose INCI name consists of exactly the query's (non-prefix) terms."""
+        if not clauses or any(field not in (None, 'inci_name') or len(term_ids) != 1
+                              for field, term_ids in clauses):
+            return np.zeros(0, dtype=np.int32)
+        postings = self.postings['inci_name']
+        docs = None
+        for _, (term_id,) in clauses:
+            start, end = postings['offsets'][term_id], postings['offsets'][term_id + 1]
+            term_docs = postings['docs'][start:end]
+            docs = term_docs if docs is None else np.intersect1d(docs, term_docs, assume_unique=True)
+        docs = docs[postings['lengths'][docs] == len(clauses)]
+        wanted = Counter(term_id for _, (term_id,) in clauses)
+        return np.array([doc for doc in docs.tolist()
+                         if Counter(self.term_ids[t] for t in tokenize(self.inci_names[doc])) == wanted],
+                        dtype=np.int32)
+
+    def search(self, query: str, limit: int = 10, boosts: Optional[Dict[str, float]] = None,
+               require_all: bool = False) -> List[Dict[str, Any]]:
+        """Top rows for a query, best first."""
+        scores = self.scores(query, boosts, require_all)
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > limit:
+            hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+        hits = hits[np.lexsort((hits, -scores[hits]))]
+        return [{
+            'cosing_ref_no': int(self.ref_nos[i]),
+            'inci_name': self.inci_names[i],
+            'function': self.functions[i],
+            'description': self.descriptions[i],
+            'score': round(float(scores[i]), 4),
+        } for i in hits]
+
+
+def _bisect(sorted_terms: List[str], value: str) -> int:
+    low, high = 0, len(sorted_terms)
+    while low < high:
+        mid = (low + high) // 2
+        if sorted_terms[mid] < value:
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+
+def _boosts(specs: Iterable[str]) -> Dict[str, float]:
+    boosts = {}
+    for spec in specs:
+        field, _, value = spec.partition('=')
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field: {field} (fields: {', '.join(FIELDS)})")
+        boosts[field] = float(value)
+    return boosts
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="BM25 full-text search over COSING")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('query', nargs='?', default='', help="Terms, term* prefixes, field:term")
+    parser.add_argument('--index', help="Persisted index path (default: <vessels_root>/cosing/search_index.npz)")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild the index from the COSING export")
+    parser.add_argument('--boost', action='append', default=[], metavar='FIELD=WEIGHT',
+                        help=f"Field boost (defaults: {DEFAULT_BOOSTS})")
+    parser.add_argument('--all', action='store_true', help="Only rows matching every query term")
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        index = CosingSearch.open(args.vessels_root, args.index, args.rebuild)
+    except FileNotFoundError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    loaded = time.perf_counter()
+    print(f"Index: {len(index.ref_nos)} rows, {len(index.vocabulary)} terms ({(loaded - started) * 1000:.0f} ms)")
+    if not args.query:
+        return
+
+    try:
+        results = index.search(args.query, args.limit, _boosts(args.boost), args.all)
+    except ValueError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    print(f"\nTop {len(results)} for {args.query!r} ({(time.perf_counter() - loaded) * 1000:.1f} ms):")
+    for hit in results:
+        print(f"  {hit['score']:7.2f}  {hit['cosing_ref_no']}: {hit['inci_name']}")
+        if hit['function']:
+            print(f"           {hit['function']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,20 +5,33 @@ Looks up CAS numbers, functions, and other metadata from COSING database.
 Parses PIF text files to extract complete formulation data.
 """
 
-import json
+import copy
 import csv
 import re
+import argparse
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence, Tuple
 from collections import defaultdict
 
+import numpy as np
+
+from sharding import shard_files
+from audit_log import AuditLogWriter, SINKS as AUDIT_SINKS
+from changeset import Changeset, apply_changeset
+from formulation_history import FormulationHistory
+from vessel_schema import Formulation, Ingredient, load_entity, read_entity
+from vessel_corpus import (Corpus, CORRECT, INCOMPLETE, concentration_status, formulation_line_counts,
+                           formulation_totals, normalized_concentrations, round_to_sum)
+
 class IngredientEnricher:
-    def __init__(self, cosing_csv: str, vessels_root: str = "."):
+    def __init__(self, cosing_csv: str, vessels_root: str = ".", audit: Optional[AuditLogWriter] = None):
         self.vessels_root = Path(vessels_root)
         self.cosing_data = {}
         self.inci_to_cosing = {}
         self.cas_to_cosing = {}
         self.stats = defaultdict(int)
+        self.changeset = Changeset(vessels_root, source='enrich_ingredients', audit=audit)
+        self.last_match: Dict[str, Any] = {}
         
         print("Loading COSING database...")
         self.load_cosing_database(cosing_csv)
@@ -54,11 +67,17 @@ class IngredientEnricher:
         print(f"  Indexed {len(self.cas_to_cosing)} unique CAS numbers")
     
     def lookup_ingredient(self, inci_name: str, cas_number: Optional[str] = None) -> Optional[Dict[str, Any]]:
-        """Lookup ingredient in COSING database by INCI name or CAS number."""
+        """Lookup ingredient in COSING database by INCI name or CAS number.
+        
+        The strategy and score of the returned match are left in self.last_match.
+        """
+        self.last_match = {}
+        
         # Try INCI name first
         inci_upper = inci_name.strip().upper()
         if inci_upper in self.inci_to_cosing:
             cosing_id = self.inci_to_cosing[inci_upper][0]  # Take first match
+            self.last_match = {'strategy': 'inci', 'score': 1.0}
             return self.cosing_data[cosing_id]
         
         # Try CAS number if provided
@@ -66,12 +85,15 @@ class IngredientEnricher:
             cas_clean = cas_number.strip()
             if cas_clean in self.cas_to_cosing:
                 cosing_id = self.cas_to_cosing[cas_clean][0]  # Take first match
+                self.last_match = {'strategy': 'cas', 'score': 1.0}
                 return self.cosing_data[cosing_id]
         
         # Try partial match on INCI name
         for cosing_inci, cosing_ids in self.inci_to_cosing.items():
             if inci_upper in cosing_inci or cosing_inci in inci_upper:
                 cosing_id = cosing_ids[0]
+                shorter, longer = sorted((len(inci_upper), len(cosing_inci)))
+                self.last_match = {'strategy': 'partial', 'score': round(shorter / longer, 4) if longer else 0.0}
                 return self.cosing_data[cosing_id]
         
         return None
@@ -79,13 +101,12 @@ class IngredientEnricher:
     def enrich_ingredient_file(self, ingredient_file: Path) -> bool:
         """Enrich a single ingredient JSON file with COSING data."""
         try:
-            with open(ingredient_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            inci_name = data.get('inci_name', '')
-            if not inci_name:
+            ingredient, data = read_entity(ingredient_file, Ingredient)
+            if not ingredient.inci_name:
                 self.stats['no_inci_name'] += 1
                 return False
+            original = copy.deepcopy(data)
+            inci_name = ingredient.inci_name
             
             # Lookup in COSING
             cosing_data = self.lookup_ingredient(inci_name)
@@ -106,9 +127,11 @@ class IngredientEnricher:
                 if cosing_data.get('is_natural') == 'true':
                     data['is_natural'] = True
                 
-                # Write back
-                with open(ingredient_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
+                # Record the patch; unchanged files are skipped entirely
+                provenance = dict(self.last_match, cosing_id=data['cosing_id'])
+                if not self.changeset.record(ingredient_file, original, data, provenance):
+                    self.stats['unchanged'] += 1
+                    return False
                 
                 self.stats['enriched'] += 1
                 return True
@@ -122,8 +145,12 @@ class IngredientEnricher:
             print(f"  ✗ Error processing {ingredient_file.name}: {e}")
             return False
     
-    def enrich_all_ingredients(self):
-        """Enrich all ingredient files with COSING data."""
+    def enrich_all_ingredients(self, shard: int = 0, num_shards: int = 1, dry_run: bool = False):
+        """Enrich all ingredient files (or one shard of them) with COSING data.
+        
+        Changes are collected into self.changeset and applied at the end;
+        with dry_run the changeset is only printed.
+        """
         print("\n[1/2] Enriching ingredient files with COSING data...")
         
         ingredients_dir = self.vessels_root / 'ingredients'
@@ -131,7 +158,7 @@ class IngredientEnricher:
             print("  ✗ Ingredients directory not found")
             return
         
-        ingredient_files = list(ingredients_dir.glob('*.json'))
+        ingredient_files = shard_files(ingredients_dir.glob('*.json'), shard, num_shards)
         print(f"  Found {len(ingredient_files)} ingredient files")
         
         for i, ingredient_file in enumerate(ingredient_files, 1):
@@ -141,8 +168,11 @@ class IngredientEnricher:
         
         print(f"\n  Results:")
         print(f"    Enriched: {self.stats['enriched']}")
+        print(f"    Unchanged: {self.stats['unchanged']}")
         print(f"    Not found: {self.stats['not_found']}")
         print(f"    Errors: {self.stats['errors']}")
+        
+        apply_changeset(self.changeset, self.stats, dry_run)
     
     def parse_pif_formulation(self, pif_text: str, product_name: str) -> Optional[Dict[str, Any]]:
         """Parse formulation data from PIF text file."""
@@ -190,47 +220,52 @@ class IngredientEnricher:
         return None
 
 class FormulationFixer:
-    def __init__(self, vessels_root: str = "."):
+    def __init__(self, vessels_root: str = ".", history: Optional[FormulationHistory] = None,
+                 audit: Optional[AuditLogWriter] = None):
         self.vessels_root = Path(vessels_root)
         self.stats = defaultdict(int)
+        # Applied fixes are also appended to the local formulation history
+        self.changeset = Changeset(vessels_root, source='fix_formulations', history=history, audit=audit)
     
-    def fix_formulation_file(self, formulation_file: Path) -> bool:
-        """Fix concentration errors in a formulation file."""
+    def fix_formulation_file(self, formulation_file: Path, total: Optional[float] = None,
+                             status: Optional[int] = None,
+                             concentrations: Optional[Sequence[float]] = None) -> bool:
+        """Fix concentration errors in a formulation file.
+        
+        Applies the fix planned by plan_fixes; without a plan, the file's
+        own lines are checked and planned the same way.
+        """
         try:
-            with open(formulation_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if total is None:
+                planned = self.plan_file(formulation_file)
+                if planned is None:
+                    return False
+                total, status, concentrations = planned
             
-            ingredients = data.get('ingredients', [])
-            if not ingredients:
-                return False
-            
-            # Calculate total concentration
-            total = sum(ing.get('concentration', 0) for ing in ingredients)
-            
-            # Check if needs fixing
-            if abs(total - 100) < 0.1:
-                self.stats['already_correct'] += 1
-                return False
+            _, data = read_entity(formulation_file, Formulation)
+            original = copy.deepcopy(data)
             
             # Mark as incomplete if severely wrong
-            if total < 50 or total > 150:
+            if status == INCOMPLETE:
                 data['status'] = 'incomplete'
                 data['notes'] = f'Original total concentration: {total}%. Requires manual review.'
-                self.stats['marked_incomplete'] += 1
+                provenance = {'strategy': 'mark_incomplete', 'total': total}
+                outcome = 'marked_incomplete'
             else:
-                # Try to normalize if close to 100%
+                # Normalize if close to 100%
                 scale_factor = 100 / total
-                for ing in ingredients:
-                    ing['concentration'] = round(ing['concentration'] * scale_factor, 4)
+                for ing, concentration in zip(data['ingredients'], concentrations):
+                    ing['concentration'] = concentration
                 
                 data['total_concentration'] = 100
                 data['notes'] = f'Normalized from {total}% using scale factor {scale_factor:.4f}'
-                self.stats['normalized'] += 1
-            
-            # Write back
-            with open(formulation_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                provenance = {'strategy': 'normalize', 'total': total, 'score': round(scale_factor, 4)}
+                outcome = 'normalized'
             
+            # Record the patch; files already marked the same way are skipped
+            if not self.changeset.record(formulation_file, original, data, provenance):
+                return False
+            self.stats[outcome] += 1
             return True
         
         except Exception as e:
@@ -238,8 +273,41 @@ class FormulationFixer:
             print(f"  ✗ Error fixing {formulation_file.name}: {e}")
             return False
     
-    def fix_all_formulations(self):
-        """Fix concentration errors in all formulation files."""
+    def plan_file(self, formulation_file: Path) -> Optional[Tuple[float, int, List[float]]]:
+        """The fix plan_fixes would plan for one file, or None if it needs none."""
+        formulation = load_entity(formulation_file, Formulation)
+        if not formulation.ingredients:
+            return None
+        values = np.array([line.concentration for line in formulation.ingredients], dtype=np.float64)
+        groups = np.zeros(len(values), dtype=np.int32)
+        totals = np.bincount(groups, weights=values)
+        status = int(concentration_status(totals)[0])
+        if status == CORRECT:
+            self.stats['already_correct'] += 1
+            return None
+        scale = 100 / totals[0] if totals[0] > 0 else 1.0
+        targets = np.array([100.0 if totals[0] > 0 else 0.0])
+        concentrations = round_to_sum(values * scale, groups, targets).tolist()
+        return float(totals[0]), status, concentrations
+    
+    def plan_fixes(self, corpus: Corpus) -> List[Tuple[Path, float, int, List[float]]]:
+        """Formulations needing a fix, decided for the whole corpus in a few array operations."""
+        counts = formulation_line_counts(corpus)
+        totals = formulation_totals(corpus)
+        status = concentration_status(totals)
+        normalized = normalized_concentrations(corpus, totals)
+        offsets = np.cumsum(counts) - counts
+        
+        self.stats['already_correct'] += int(((status == CORRECT) & (counts > 0)).sum())
+        plan = []
+        for i in np.flatnonzero((status != CORRECT) & (counts > 0)):
+            path = self.vessels_root / 'formulations' / corpus.formulations['file'][i]
+            concentrations = normalized[offsets[i]:offsets[i] + counts[i]].tolist()
+            plan.append((path, float(totals[i]), int(status[i]), concentrations))
+        return plan
+    
+    def fix_all_formulations(self, shard: int = 0, num_shards: int = 1, dry_run: bool = False):
+        """Fix concentration errors in all formulation files (or one shard of them)."""
         print("\n[2/2] Fixing formulation concentration errors...")
         
         formulations_dir = self.vessels_root / 'formulations'
@@ -247,38 +315,66 @@ class FormulationFixer:
             print("  ✗ Formulations directory not found")
             return
         
-        formulation_files = list(formulations_dir.glob('*.json'))
-        print(f"  Found {len(formulation_files)} formulation files")
+        # Totals and normalized lines come from the columnar corpus;
+        # only files that need a change are re-read and patched
+        corpus = Corpus(self.vessels_root, shard, num_shards)
+        corpus.load_formulations()
+        print(f"  Found {corpus.stats['files']} formulation files")
+        for error in corpus.errors:
+            self.stats['errors'] += 1
+            print(f"  ✗ Error fixing {Path(error['file']).name}: {error['error']}")
         
-        for formulation_file in formulation_files:
-            self.fix_formulation_file(formulation_file)
+        for formulation_file, total, status, concentrations in self.plan_fixes(corpus):
+            self.fix_formulation_file(formulation_file, total, status, concentrations)
         
         print(f"\n  Results:")
         print(f"    Already correct: {self.stats['already_correct']}")
         print(f"    Normalized: {self.stats['normalized']}")
         print(f"    Marked incomplete: {self.stats['marked_incomplete']}")
+        print(f"    Unchanged: {self.changeset.stats['unchanged']}")
         print(f"    Errors: {self.stats['errors']}")
+        
+        apply_changeset(self.changeset, self.stats, dry_run)
 
 def main():
     """Main entry point."""
     import sys
     
-    vessels_root = sys.argv[1] if len(sys.argv) > 1 else "."
+    parser = argparse.ArgumentParser(description="Enrich ingredients with COSING data and fix formulations")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--dry-run', action='store_true', help="Print the changesets without writing files")
+    parser.add_argument('--only', choices=['enrich', 'fix'], help="Run only ingredient enrichment or formulation fixing")
+    parser.add_argument('--no-history', action='store_true', help="Do not record fixes in the formulation history")
+    parser.add_argument('--audit', choices=AUDIT_SINKS, help="Record applied changes in audit_log via this sink")
+    args = parser.parse_args()
+    
+    vessels_root = args.vessels_root
     cosing_csv = Path(vessels_root) / "cosing" / "ingredients.csv"
     
-    if not cosing_csv.exists():
+    if args.only != 'fix' and not cosing_csv.exists():
         print(f"✗ COSING database not found: {cosing_csv}")
         sys.exit(1)
     
+    audit = AuditLogWriter.open(args.audit, vessels_root) if args.audit and not args.dry_run else None
+    
     # Enrich ingredients
-    enricher = IngredientEnricher(str(cosing_csv), vessels_root)
-    enricher.enrich_all_ingredients()
+    if args.only != 'fix':
+        enricher = IngredientEnricher(str(cosing_csv), vessels_root, audit)
+        enricher.enrich_all_ingredients(dry_run=args.dry_run)
     
     # Fix formulations
-    fixer = FormulationFixer(vessels_root)
-    fixer.fix_all_formulations()
+    if args.only != 'enrich':
+        history = None if args.dry_run or args.no_history else FormulationHistory.open(vessels_root)
+        fixer = FormulationFixer(vessels_root, history, audit)
+        fixer.fix_all_formulations(dry_run=args.dry_run)
+        if history is not None:
+            print(f"  History: {history.stats['versions']} version(s) recorded")
+            history.close()
+    if audit is not None:
+        metrics = audit.close()
+        print(f"  Audit: {metrics.get('written', 0)} row(s) written, {metrics.get('spooled', 0)} spooled")
     
-    print("\n✅ Enrichment and fixing complete!")
+    print(f"\n✅ {'Enrichment' if args.only == 'enrich' else 'Fixing' if args.only == 'fix' else 'Enrichment and fixing'} complete!")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+COSING Facet Index
+Splits the compound COSING `function` field into multi-valued facets and adds
+restriction/Annex and origin flags, each stored as a bitmap over COSING rows.
+Facet queries ("humectants that are unrestricted and have a CAS number",
+"alternatives with the same function set") resolve as bitmap AND/OR/NOT.
+
+Bitmaps are Python integers (bit i = row i), so set operations run in C.
+The persisted index stores each bitmap zlib-compressed, which keeps sparse
+facets small on disk.
+"""
+
+import base64
+import json
+import re
+import sys
+import zlib
+import argparse
+from itertools import islice
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Iterable, Set
+
+from cosing_catalog import find_cosing_file, iter_cosing_rows, normalize_inci, split_cas_numbers, split_ec_numbers
+from cosing_restrictions import compile_restriction
+
+INDEX_VERSION = 2
+
+# Botanical/natural-origin markers in INCI names and descriptions. COSING has
+# no origin column, so `natural` is a heuristic flag.
+NATURAL_NAME = re.compile(
+    r'\b(?:EXTRACT|OIL|BUTTER|WAX|CERA|LEAF|ROOT|SEED|FLOWER|FRUIT|BARK|PEEL|JUICE|'
+    r'RHIZOME|KERNEL|STEM|HERB|POWDER|RESIN|GUM|CALLUS|FILTRATE|FERMENT|HYDROLATE|WATER)\b'
+)
+NATURAL_DESCRIPTION = re.compile(r'\b(?:extract|expressed|obtained|derived|distilled)\s+(?:of|from)\b', re.I)
+
+
+def split_functions(value: str) -> List[str]:
+    """Split a COSING function cell into individual function names."""
+    return [f.strip() for f in (value or '').split(',') if f.strip() and f.strip() != 'NOT REPORTED']
+
+
+def function_group(function: str) -> str:
+    """Parent of a compound function ("SKIN CONDITIONING - EMOLLIENT" -> "SKIN CONDITIONING")."""
+    return function.split(' - ')[0].strip()
+
+
+def iter_bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class FacetIndex:
+    def __init__(self):
+        self.ref_nos: List[int] = []
+        self.inci_names: List[str] = []
+        self.row_of_ref: Dict[int, int] = {}
+        self.row_of_inci: Dict[str, int] = {}
+        self.bitmaps: Dict[str, int] = defaultdict(int)
+        self.universe = 0
+
+    # ------------------------------------------------------------------
+    # Building and persistence
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, cosing_csv) -> 'FacetIndex':
+        index = cls()
+        for row in iter_cosing_rows(cosing_csv):
+            if row.get('cosing_ref_no', '').isdigit():
+                index.add_row(row)
+        return index
+
+    def add_row(self, row: Dict[str, str]):
+        position = len(self.ref_nos)
+        bit = 1 << position
+        ref_no = int(row['cosing_ref_no'])
+        inci_name = row.get('inci_name', '')
+        self.ref_nos.append(ref_no)
+        self.inci_names.append(inci_name)
+        self.row_of_ref[ref_no] = position
+        self.row_of_inci.setdefault(normalize_inci(inci_name), position)
+        self.universe |= bit
+
+        for key in self.facet_keys(row):
+            self.bitmaps[key] |= bit
+
+    @staticmethod
+    def facet_keys(row: Dict[str, str]) -> Set[str]:
+        """All facet keys a COSING row belongs to."""
+        keys = set()
+        for function in split_functions(row.get('function', '')):
+            keys.add(f"function:{function}")
+            keys.add(f"function_group:{function_group(function)}")
+
+        restriction = row.get('restriction', '')
+        if restriction:
+            keys.add('restricted')
+            for rule in compile_restriction(restriction):
+                keys.add(f"annex:{rule['annex']}")
+                keys.add(f"kind:{rule['kind']}")
+                for scope in rule['scope']:
+                    keys.add(f"restricted_scope:{scope}")
+
+        # '-' and '- / -' are COSING placeholders, not numbers
+        if split_cas_numbers(row.get('cas_no', '')):
+            keys.add('has_cas')
+        if split_ec_numbers(row.get('ec_no', '')):
+            keys.add('has_ec')
+        if row.get('inn_name'):
+            keys.add('has_inn')
+        description = row.get('chem_iupac_name___description') or row.get('chem_iupac_name_description', '')
+        if NATURAL_NAME.search(row.get('inci_name', '')) or NATURAL_DESCRIPTION.search(description):
+            keys.add('natural')
+        return keys
+
+    def save(self, path):
+        """Persist the index as JSON with zlib-compressed bitmaps."""
+        def encode(mask: int) -> str:
+            raw = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+            return base64.b64encode(zlib.compress(raw, 6)).decode('ascii')
+
+        payload = {
+            'version': INDEX_VERSION,
+            'ref_nos': self.ref_nos,
+            'inci_names': self.inci_names,
+            'bitmaps': {key: encode(mask) for key, mask in sorted(self.bitmaps.items())},
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path) -> 'FacetIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported facet index version: {payload.get('version')}")
+
+        index = cls()
+        index.ref_nos = payload['ref_nos']
+        index.inci_names = payload['inci_names']
+        index.row_of_ref = {ref_no: i for i, ref_no in enumerate(index.ref_nos)}
+        for i, name in enumerate(index.inci_names):
+            index.row_of_inci.setdefault(normalize_inci(name), i)
+        index.universe = (1 << len(index.ref_nos)) - 1
+        for key, encoded in payload['bitmaps'].items():
+            raw = zlib.decompress(base64.b64decode(encoded))
+            index.bitmaps[key] = int.from_bytes(raw, 'little')
+        return index
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def facets(self, prefix: str = '') -> Dict[str, int]:
+        """Facet keys (optionally with a prefix such as 'function:') and their row counts."""
+        return {key: mask.bit_count() for key, mask in sorted(self.bitmaps.items()) if key.startswith(prefix)}
+
+    def bitmap(self, key: str) -> int:
+        if key not in self.bitmaps:
+            raise KeyError(f"Unknown facet: {key}")
+        return self.bitmaps[key]
+
+    def query(self, all_of: Iterable[str] = (), any_of: Iterable[str] = (),
+              none_of: Iterable[str] = ()) -> int:
+        """Rows in every `all_of` facet, at least one `any_of` facet and no `none_of` facet."""
+        result = self.universe
+        for key in all_of:
+            result &= self.bitmap(key)
+        any_keys = list(any_of)
+        if any_keys:
+            union = 0
+            for key in any_keys:
+                union |= self.bitmap(key)
+            result &= union
+        for key in none_of:
+            result &= ~self.bitmap(key)
+        return result
+
+    def row(self, ref_or_inci) -> int:
+        """Row position of a cosing_ref_no or INCI name."""
+        if isinstance(ref_or_inci, int) or str(ref_or_inci).isdigit():
+            position = self.row_of_ref.get(int(ref_or_inci))
+        else:
+            position = self.row_of_inci.get(normalize_inci(ref_or_inci))
+        if position is None:
+            raise KeyError(f"Unknown COSING ingredient: {ref_or_inci}")
+        return position
+
+    def facets_of(self, ref_or_inci, prefix: str = 'function:') -> Set[str]:
+        bit = 1 << self.row(ref_or_inci)
+        return {key for key, mask in self.bitmaps.items() if key.startswith(prefix) and mask & bit}
+
+    def alternatives(self, ref_or_inci, exact: bool = True, none_of: Iterable[str] = ()) -> int:
+        """Rows sharing the function set of an ingredient (excluding itself).
+
+        `exact=False` also accepts rows with additional functions.
+        """
+        own = self.facets_of(ref_or_inci)
+        if not own:
+            return 0
+        result = self.query(all_of=own, none_of=none_of)
+        if exact:
+            for key, mask in self.bitmaps.items():
+                if key.startswith('function:') and key not in own:
+                    result &= ~mask
+        return result & ~(1 << self.row(ref_or_inci))
+
+    def ref_nos_of(self, mask: int, limit: Optional[int] = None) -> List[int]:
+        result = []
+        for position in iter_bits(mask):
+            result.append(self.ref_nos[position])
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def rows_of(self, mask: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [{'cosing_ref_no': self.ref_nos[p], 'inci_name': self.inci_names[p]}
+                for p in islice(iter_bits(mask), limit)]
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Faceted bitmap queries over COSING")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--index', help="Persisted index path (default: <vessels_root>/cosing/facet_index.json)")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild the index from the COSING export")
+    parser.add_argument('--all', dest='all_of', action='append', default=[], help="Required facet")
+    parser.add_argument('--any', dest='any_of', action='append', default=[], help="Alternative facet")
+    parser.add_argument('--none', dest='none_of', action='append', default=[], help="Excluded facet")
+    parser.add_argument('--alternatives', help="INCI name or cosing_ref_no to find substitutes for")
+    parser.add_argument('--list', metavar='PREFIX', help="List facets with this prefix (e.g. function:)")
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    index_path = Path(args.index) if args.index else Path(args.vessels_root) / 'cosing' / 'facet_index.json'
+    index = None
+    if index_path.exists() and not args.rebuild:
+        try:
+            index = FacetIndex.load(index_path)
+        except ValueError:
+            pass   # older index version; rebuilt below
+    if index is None:
+        cosing_csv = find_cosing_file(args.vessels_root)
+        if not cosing_csv:
+            print(f"✗ COSING database not found under {Path(args.vessels_root) / 'cosing'}")
+            sys.exit(1)
+        print("Building COSING facet index...")
+        index = FacetIndex.build(cosing_csv)
+        index.save(index_path)
+        print(f"  Indexed {len(index.ref_nos)} rows, {len(index.bitmaps)} facets -> {index_path}")
+
+    if args.list is not None:
+        for key, count in index.facets(args.list).items():
+            print(f"  {key}: {count}")
+        return
+
+    try:
+        if args.alternatives:
+            mask = index.alternatives(args.alternatives, none_of=args.none_of)
+        else:
+            mask = index.query(args.all_of, args.any_of, args.none_of)
+    except KeyError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    print(f"\nMatches: {mask.bit_count()}")
+    for row in index.rows_of(mask, args.limit):
+        print(f"  {row['cosing_ref_no']}: {row['inci_name']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Formulation Arithmetic Engine
+Packs every formulation into one sparse formulation x ingredient
+concentration matrix (CSR: row pointers, column indices, concentrations,
+plus a phase code per entry) and runs catalog-wide arithmetic as array
+operations on it:
+
+- totals and per-phase totals (group-by sums over the entries)
+- batch normalization to 100% with exact-sum rounding (round_to_sum)
+- cost per kg, joining ingredient and supplier pricing on the columns
+- what-if runs, e.g. "raise glycerin 1% across the line": the change is
+  applied to every formulation containing the ingredient and balanced
+  against its water phase (or proportionally), then totals and costs are
+  recomputed for the whole catalog at once
+
+Rows come from the formulation JSON files (through the columnar corpus; no
+phases) and from the .form vessels whose formulation_phases list numeric
+concentrations. Columns are ingredient ids where a line references one,
+otherwise normalized ingredient names.
+"""
+
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from vessel_corpus import Corpus, round_to_sum
+from vessel_reader import VesselParseError, iter_vessel_files, read_vessel, vessel_id
+
+NO_PHASE = ''
+INGREDIENT_ID = re.compile(r'^R\d+$')
+PERCENT = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*%?\s*$')
+# formulation_phases keys that describe the process, not an ingredient
+PROCESS_KEYS = frozenset({'temperature', 'mixing_time', 'ph', 'ph_critical', 'ph_target', 'duration',
+                          'speed', 'rpm', 'viscosity', 'cooling_rate', 'heating_rate'})
+BALANCE_NAMES = frozenset({'AQUA', 'WATER'})
+PACK_SIZE = re.compile(r'(\d+(?:\.\d+)?)\s*(kg|g|l|ml)\b', re.IGNORECASE)
+PACK_KG = {'kg': 1.0, 'l': 1.0, 'g': 0.001, 'ml': 0.001}
+DEFAULT_PRICE_UNIT_KG = 0.1   # .inci pricing_zar is quoted per 100 g
+
+
+def name_key(name: str) -> str:
+    """Join key for ingredient names: uppercase words, punctuation dropped."""
+    return ' '.join(re.findall(r'[A-Z0-9]+', (name or '').upper()))
+
+
+def phase_concentration(value: Any) -> Optional[float]:
+    """Concentration of a formulation_phases entry (number or "8.0%"), else None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = PERCENT.match(value)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class FormulationMatrix:
+    """Formulations x ingredients concentration matrix in CSR form."""
+
+    def __init__(self, formulation_ids: List[str], columns: List[str], labels: List[str],
+                 indptr: np.ndarray, indices: np.ndarray, data: np.ndarray,
+                 phases: np.ndarray, phase_names: List[str]):
+        self.formulation_ids = formulation_ids
+        self.columns = columns          # column key: ingredient id or name key
+        self.labels = labels            # display name per column
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.phases = phases            # phase code per entry
+        self.phase_names = phase_names  # code 0 is NO_PHASE
+        self.rows = np.repeat(np.arange(len(formulation_ids), dtype=np.int32), np.diff(indptr))
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.formulation_ids), len(self.columns)
+
+    def with_data(self, data: np.ndarray) -> 'FormulationMatrix':
+        """Same sparsity pattern, new concentrations."""
+        return FormulationMatrix(self.formulation_ids, self.columns, self.labels, self.indptr,
+                                 self.indices, data, self.phases, self.phase_names)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_entries(cls, entries: List[Tuple[str, str, str, str, float]]) -> 'FormulationMatrix':
+        """Build from (formulation id, column key, label, phase, concentration), grouped by formulation."""
+        formulation_ids: List[str] = []
+        column_index: Dict[str, int] = {}
+        labels: List[str] = []
+        phase_index: Dict[str, int] = {NO_PHASE: 0}
+        rows, indices, data, phases = [], [], [], []
+        for formulation_id, column, label, phase, concentration in entries:
+            if not formulation_ids or formulation_ids[-1] != formulation_id:
+                formulation_ids.append(formulation_id)
+            if column not in column_index:
+                column_index[column] = len(labels)
+                labels.append(label or column)
+            rows.append(len(formulation_ids) - 1)
+            indices.append(column_index[column])
+            data.append(concentration)
+            phases.append(phase_index.setdefault(phase, len(phase_index)))
+        indptr = np.zeros(len(formulation_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(np.array(rows, dtype=np.int64), minlength=len(formulation_ids)), out=indptr[1:])
+        return cls(formulation_ids, list(column_index), labels, indptr,
+                   np.array(indices, dtype=np.int32), np.array(data, dtype=np.float64),
+                   np.array(phases, dtype=np.int16), list(phase_index))
+
+    @classmethod
+    def load(cls, vessels_root: str = ".") -> 'FormulationMatrix':
+        """All formulation JSON files plus the .form vessels with phase concentrations."""
+        corpus = Corpus(vessels_root)
+        corpus.load_ingredients()
+        corpus.load_formulations()
+        entries = list(corpus_entries(corpus))
+        seen = set(corpus.formulations['id'])
+        for entry in phase_entries(vessels_root):
+            if entry[0] not in seen:
+                entries.append(entry)
+        return cls.from_entries(entries)
+
+    # ------------------------------------------------------------------
+    # Arithmetic
+    # ------------------------------------------------------------------
+
+    def totals(self) -> np.ndarray:
+        return np.bincount(self.rows, weights=self.data, minlength=self.shape[0])
+
+    def phase_totals(self) -> np.ndarray:
+        """Concentration per formulation and phase (rows x phase_names)."""
+        width = len(self.phase_names)
+        flat = np.bincount(self.rows.astype(np.int64) * width + self.phases, weights=self.data,
+                           minlength=self.shape[0] * width)
+        return flat.reshape(self.shape[0], width)
+
+    def normalized(self, target: float = 100.0, decimals: int = 4) -> 'FormulationMatrix':
+        """Every formulation scaled to `target`, rounded so the sums stay exact."""
+        totals = self.totals()
+        scale = np.divide(target, totals, out=np.ones_like(totals), where=totals > 0)
+        targets = np.where(totals > 0, target, 0.0)
+        return self.with_data(round_to_sum(self.data * scale[self.rows], self.rows, targets, decimals))
+
+    def price_vector(self, prices: Dict[str, float]) -> np.ndarray:
+        """Price per kg of every column (NaN where unknown)."""
+        return np.array([prices.get(column, prices.get(name_key(label), np.nan))
+                         for column, label in zip(self.columns, self.labels)])
+
+    def costs(self, column_prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Raw-material cost per kg of every formulation and the priced share of its concentration."""
+        price = column_prices[self.indices]
+        priced = ~np.isnan(price)
+        count = self.shape[0]
+        cost = np.bincount(self.rows[priced], weights=self.data[priced] / 100 * price[priced], minlength=count)
+        covered = np.bincount(self.rows[priced], weights=self.data[priced], minlength=count)
+        totals = self.totals()
+        return cost, np.divide(covered, totals, out=np.zeros(count), where=totals > 0)
+
+    def find_columns(self, name: str) -> List[int]:
+        """Columns for an ingredient id or name; exact matches win over word-prefix ones."""
+        key = name_key(name)
+        exact = [i for i, (column, label) in enumerate(zip(self.columns, self.labels))
+                 if column == name or column == key or name_key(label) == key]
+        if exact:
+            return exact
+        words = key.split()
+        return [i for i, label in enumerate(self.labels)
+                if words and all(any(part.startswith(word) for part in name_key(label).split()) for word in words)]
+
+    def balance_columns(self) -> np.ndarray:
+        """Mask of water columns, which absorb what-if changes."""
+        return np.array([bool(BALANCE_NAMES & set(name_key(label).split())) for label in self.labels])
+
+    def what_if(self, columns: List[int], delta: float,
+                proportional: bool = False) -> Tuple['FormulationMatrix', np.ndarray]:
+        """Add `delta` percentage points of the given ingredient columns to every formulation using them.
+
+        The change is balanced against the formulation's largest water entry,
+        or spread proportionally over its other entries (always with
+        `proportional`, or when it has no water). Returns the new matrix and
+        the formulations that became infeasible (a negative concentration).
+        """
+        count = self.shape[0]
+        data = self.data.copy()
+        target = np.isin(self.indices, columns)
+        target_sum = np.bincount(self.rows[target], weights=data[target], minlength=count)
+        target_lines = np.bincount(self.rows[target], minlength=count)
+        affected = target_lines > 0
+
+        # Split delta over the target entries of a row by their share (evenly if all zero)
+        share = np.where(target_sum[self.rows] > 0,
+                         np.divide(data, target_sum[self.rows], out=np.zeros_like(data),
+                                   where=target_sum[self.rows] > 0),
+                         1 / np.maximum(target_lines[self.rows], 1))
+        data[target] += delta * share[target]
+
+        # Balance: the largest water entry of each affected row, else proportional
+        water = self.balance_columns()[self.indices] & ~target & affected[self.rows]
+        balance_entry = np.full(count, -1, dtype=np.int64)
+        if not proportional and water.any():
+            entries = np.flatnonzero(water)
+            order = entries[np.lexsort((-data[entries], self.rows[entries]))]
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = self.rows[order][1:] != self.rows[order][:-1]
+            balance_entry[self.rows[order[first]]] = order[first]
+        has_balance = balance_entry >= 0
+        data[balance_entry[has_balance]] -= delta
+
+        rest = ~target & affected[self.rows] & ~has_balance[self.rows]
+        rest_sum = np.bincount(self.rows[rest], weights=data[rest], minlength=count)
+        factor = np.divide(rest_sum - delta, rest_sum, out=np.ones(count), where=rest_sum > 0)
+        data[rest] *= factor[self.rows[rest]]
+
+        infeasible = np.bincount(self.rows, weights=data < -1e-9, minlength=count) > 0
+        return self.with_data(data), infeasible
+
+
+# ----------------------------------------------------------------------
+# Sources
+# ----------------------------------------------------------------------
+
+def corpus_entries(corpus: Corpus):
+    """Matrix entries of the formulation JSON files (no phases)."""
+    lines = corpus.lines
+    ingredient_ids = corpus.ingredients.get('id', np.zeros(0, dtype=object))
+    for form, ingredient, inci, concentration in zip(lines['formulation'], lines['ingredient'],
+                                                     lines['inci'], lines['concentration']):
+        name = corpus.inci_names[inci]
+        column = ingredient_ids[ingredient] if ingredient >= 0 else name_key(name)
+        yield corpus.formulations['id'][form], column, name, NO_PHASE, float(concentration)
+
+
+def phase_entries(vessels_root: str = "."):
+    """Matrix entries of the .form vessels that give concentrations per phase."""
+    for path in iter_vessel_files(Path(vessels_root) / 'formulations', ('*.form',)):
+        try:
+            document = read_vessel(path)
+        except VesselParseError:
+            continue
+        formulation_id = vessel_id(document) or path.stem
+        for phase, key, concentration in phase_lines(document['data']):
+            column = key if INGREDIENT_ID.match(key) else name_key(key.replace('_', ' '))
+            yield formulation_id, column, key.replace('_', ' ').title(), phase, concentration
+
+
+def phase_lines(data: Dict[str, Any]):
+    """(phase, ingredient key, concentration) for the numeric entries of formulation_phases."""
+    for phase, contents in (data.get('formulation_phases') or {}).items():
+        if not isinstance(contents, dict):
+            continue
+        for key, value in contents.items():
+            concentration = phase_concentration(value)
+            if concentration is not None and key not in PROCESS_KEYS:
+                yield phase, key, concentration
+
+
+def phase_ingredients(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The phase_lines of a .form vessel as formulation-JSON ingredient lines."""
+    return [{'ingredient_id': key if INGREDIENT_ID.match(key) else None,
+             'inci_name': key.replace('_', ' '),
+             'concentration': concentration}
+            for _, key, concentration in phase_lines(data)]
+
+
+def _price_per_kg(value: Any) -> Optional[float]:
+    """ZAR per kg from a pricing_zar value: a number (per 100 g), "850.00/100g" or {pack size: price}."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) / DEFAULT_PRICE_UNIT_KG
+    if isinstance(value, str):
+        amount = re.match(r'\s*(\d+(?:\.\d+)?)', value)
+        pack = PACK_SIZE.search(value)
+        if not amount:
+            return None
+        kg = float(pack.group(1)) * PACK_KG[pack.group(2).lower()] if pack else DEFAULT_PRICE_UNIT_KG
+        return float(amount.group(1)) / kg
+    if isinstance(value, dict):
+        per_kg = [_price_per_kg(f"{price}/{size}") for size, price in value.items()
+                  if isinstance(price, (int, float)) and PACK_SIZE.search(size)]
+        return min(per_kg) if per_kg else None
+    return None
+
+
+def _find_pricing(data: Any) -> Any:
+    if isinstance(data, dict):
+        if 'pricing_zar' in data:
+            return data['pricing_zar']
+        for value in data.values():
+            found = _find_pricing(value)
+            if found is not None:
+                return found
+    return None
+
+
+def load_prices(vessels_root: str = ".") -> Dict[str, float]:
+    """ZAR per kg by ingredient id and by name key, from .inci pricing and supplier key products.
+
+    Where several sources price an ingredient the lowest price wins.
+    Supplier unit_price_zar is read as per kg.
+    """
+    prices: Dict[str, float] = {}
+
+    def offer(keys, price):
+        if price is None or price <= 0:
+            return
+        for key in filter(None, keys):
+            if key not in prices or price < prices[key]:
+                prices[key] = price
+
+    root = Path(vessels_root)
+    for path in iter_vessel_files(root / 'ingredients', ('*.inci',)):
+        try:
+            document = read_vessel(path)
+        except VesselParseError:
+            continue
+        data = document['data']
+        offer((vessel_id(document), name_key(data.get('inci_name', '')), name_key(data.get('label', ''))),
+              _price_per_kg(_find_pricing(data)))
+    for path in iter_vessel_files(root / 'suppliers', ('*.supp',)):
+        try:
+            data = read_vessel(path)['data']
+        except VesselParseError:
+            continue
+        for product in data.get('key_products') or []:
+            if isinstance(product, dict) and isinstance(product.get('unit_price_zar'), (int, float)):
+                offer((name_key(product.get('ingredient', '')), name_key(product.get('brand_name', ''))),
+                      float(product['unit_price_zar']))
+    return prices
+
+
+# ----------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------
+
+def _print_costs(matrix: FormulationMatrix, cost: np.ndarray, coverage: np.ndarray, limit: int):
+    order = np.argsort(-cost, kind='stable')[:limit]
+    for i in order:
+        print(f"  {matrix.formulation_ids[i]:<40} R{cost[i]:9.2f}/kg  ({coverage[i] * 100:5.1f}% priced)")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Catalog-wide formulation arithmetic")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--formulation', help="Print the phase totals of one formulation")
+    parser.add_argument('--what-if', metavar='INGREDIENT=DELTA',
+                        help="Change an ingredient by DELTA percentage points everywhere it is used")
+    parser.add_argument('--proportional', action='store_true',
+                        help="Balance what-if changes over all other ingredients instead of water")
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    matrix = FormulationMatrix.load(args.vessels_root)
+    prices = matrix.price_vector(load_prices(args.vessels_root))
+    loaded = time.perf_counter()
+    print(f"Matrix: {matrix.shape[0]} formulations x {matrix.shape[1]} ingredients, "
+          f"{len(matrix.data)} entries, {int((~np.isnan(prices)).sum())} priced "
+          f"({(loaded - started) * 1000:.0f} ms)")
+
+    totals = matrix.totals()
+    normalized = matrix.normalized()
+    units = np.round(normalized.totals() * 10 ** 4)
+    print(f"\nNormalization: {int((np.abs(totals - 100) >= 1e-9).sum())} formulations off 100%, "
+          f"{int(((units != 10 ** 6) & (totals > 0)).sum())} after exact-sum rounding")
+
+    if args.formulation:
+        if args.formulation not in matrix.formulation_ids:
+            print(f"✗ Unknown formulation: {args.formulation}")
+            sys.exit(1)
+        row = matrix.formulation_ids.index(args.formulation)
+        print(f"\nPhase totals of {args.formulation}:")
+        for name, total in zip(matrix.phase_names, matrix.phase_totals()[row]):
+            if total:
+                print(f"  {name or '(no phase)':<30} {total:8.3f}%")
+
+    cost, coverage = normalized.costs(prices)
+    print(f"\nHighest raw-material cost per kg:")
+    _print_costs(matrix, cost, coverage, args.limit)
+
+    if args.what_if:
+        name, _, delta = args.what_if.partition('=')
+        columns = matrix.find_columns(name)
+        if not columns:
+            print(f"✗ No ingredient matches {name!r}")
+            sys.exit(1)
+        run_started = time.perf_counter()
+        changed, infeasible = normalized.what_if(columns, float(delta), args.proportional)
+        new_cost, _ = changed.costs(prices)
+        elapsed = (time.perf_counter() - run_started) * 1000
+        affected = np.flatnonzero(np.bincount(matrix.rows[np.isin(matrix.indices, columns)],
+                                              minlength=matrix.shape[0]) > 0)
+        labels = ', '.join(sorted({matrix.labels[i] for i in columns}))
+        print(f"\nWhat-if {labels} {float(delta):+g}%: {len(affected)} formulations changed, "
+              f"{int(infeasible.sum())} infeasible ({elapsed:.1f} ms)")
+        diff = new_cost - cost
+        for i in affected[np.argsort(-np.abs(diff[affected]), kind='stable')][:args.limit]:
+            print(f"  {matrix.formulation_ids[i]:<40} R{cost[i]:9.2f} -> R{new_cost[i]:9.2f}/kg"
+                  f"{'  ⚠ infeasible' if infeasible[i] else ''}")
+
+
+if __name__ == '__main__':
+    main()
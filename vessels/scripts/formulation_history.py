@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Formulation History Store
+Local, append-only version history of formulation files, so auditing a
+change does not depend on git archaeology. Layout under <vessels_root>/history:
+
+    objects/ab/abcdef....json   content-addressed snapshots (sha256 of the
+                                canonical JSON); identical states are stored once
+    log.jsonl                   one line per version: formulation_id, version,
+                                sha256, parent, changed_at, changed_by,
+                                change_type, description and `changes`, the
+                                JSON patch from the previous version (see
+                                changeset.diff)
+    pushed.json                 last version pushed per formulation
+
+The log is only ever appended to. Opening the store reads it once into
+per-formulation lists of versions and timestamps, so "as of version N" is an
+index and "as of time T" a binary search, each followed by one snapshot
+read; a full replay applies the stored patches to the first snapshot without
+touching the object store again.
+
+Pending versions are pushed in batches to skin_twin.formulation_history
+(see scripts/deploy-neon-schema.py) through the seed_loader sinks; rows
+conflict on (formulation_id, version), so a repeated push is harmless.
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import sys
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+from changeset import diff, apply_patch
+from vessel_reader import VesselParseError, iter_vessel_files, read_vessel, vessel_id
+
+HISTORY_DIR = 'history'
+HISTORY_TABLE = 'formulation_history'
+
+# change_type values of database_schemas/formulation_history_schema.sql
+CREATE = 'create'
+UPDATE = 'update'
+INGREDIENT_ADD = 'ingredient_add'
+INGREDIENT_REMOVE = 'ingredient_remove'
+CONCENTRATION_CHANGE = 'concentration_change'
+
+
+def canonical_json(document: Any) -> bytes:
+    """Stable serialization used for content addressing."""
+    return json.dumps(document, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def content_hash(document: Any) -> str:
+    return hashlib.sha256(canonical_json(document)).hexdigest()
+
+
+def timestamp(value: Optional[str] = None) -> str:
+    """ISO timestamp with microseconds, so stored times compare as strings."""
+    moment = datetime.fromisoformat(value) if value else datetime.now()
+    return moment.isoformat(timespec='microseconds')
+
+
+def change_type(old: Optional[Dict[str, Any]], new: Dict[str, Any], ops: List[Dict[str, Any]]) -> str:
+    """Classify a version by its patch."""
+    if old is None:
+        return CREATE
+    old_lines, new_lines = old.get('ingredients') or [], new.get('ingredients') or []
+    if len(new_lines) > len(old_lines):
+        return INGREDIENT_ADD
+    if len(new_lines) < len(old_lines):
+        return INGREDIENT_REMOVE
+    line_ops = [op for op in ops if op['path'].startswith('/ingredients/')]
+    if line_ops and all(op['path'].endswith('/concentration') for op in line_ops):
+        return CONCENTRATION_CHANGE
+    return UPDATE
+
+
+class FormulationHistory:
+    """Append-only, content-addressed version store indexed by formulation id."""
+
+    def __init__(self, history_dir):
+        self.history_dir = Path(history_dir)
+        self.objects_dir = self.history_dir / 'objects'
+        self.log_path = self.history_dir / 'log.jsonl'
+        self.pushed_path = self.history_dir / 'pushed.json'
+        self.entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.times: Dict[str, List[str]] = defaultdict(list)
+        self.stats = defaultdict(int)
+        self._log = None
+        self._load_log()
+
+    @classmethod
+    def open(cls, vessels_root: str = ".") -> 'FormulationHistory':
+        return cls(Path(vessels_root) / HISTORY_DIR)
+
+    def _load_log(self):
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self.entries[entry['formulation_id']].append(entry)
+                self.times[entry['formulation_id']].append(entry['changed_at'])
+
+    def close(self):
+        if self._log is not None:
+            os.close(self._log)
+            self._log = None
+
+    def __enter__(self) -> 'FormulationHistory':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Objects
+    # ------------------------------------------------------------------
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / f"{sha256}.json"
+
+    def _store(self, document: Dict[str, Any]) -> str:
+        raw = canonical_json(document)
+        sha256 = hashlib.sha256(raw).hexdigest()
+        path = self._object_path(sha256)
+        if path.exists():
+            self.stats['objects_reused'] += 1
+            return sha256
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(raw)
+        os.replace(tmp, path)
+        self.stats['objects_written'] += 1
+        return sha256
+
+    def snapshot(self, sha256: str) -> Dict[str, Any]:
+        return json.loads(self._object_path(sha256).read_bytes())
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(self, formulation_id: str, document: Dict[str, Any], changed_by: str = '',
+               description: str = '', changed_at: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Append a version if the document differs from the latest one; returns the entry."""
+        versions = self.entries[formulation_id]
+        latest = versions[-1] if versions else None
+        if latest is not None and latest['sha256'] == content_hash(document):
+            self.stats['unchanged'] += 1
+            return None
+
+        previous = self.snapshot(latest['sha256']) if latest else None
+        ops = diff(previous, document) if previous is not None else [{'op': 'add', 'path': '', 'value': document}]
+        changed_at = timestamp(changed_at)
+        if latest is not None and changed_at < latest['changed_at']:
+            changed_at = latest['changed_at']   # keep per-formulation times ordered
+        entry = {
+            'formulation_id': formulation_id,
+            'version': len(versions) + 1,
+            'sha256': self._store(document),
+            'parent': latest['sha256'] if latest else None,
+            'changed_at': changed_at,
+            'changed_by': changed_by,
+            'change_type': change_type(previous, document, ops),
+            'description': description,
+            'changes': ops,
+        }
+        if self._log is None:
+            self.history_dir.mkdir(parents=True, exist_ok=True)
+            self._log = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        # One write per line on an O_APPEND descriptor: shards appending
+        # concurrently (shard_jobs.py) never interleave within a line
+        os.write(self._log, (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8'))
+        versions.append(entry)
+        self.times[formulation_id].append(changed_at)
+        self.stats['versions'] += 1
+        return entry
+
+    def record_change(self, formulation_id: str, old: Dict[str, Any], new: Dict[str, Any],
+                      changed_by: str = '', description: str = '') -> Optional[Dict[str, Any]]:
+        """Record an applied change; the old state becomes the baseline of untracked formulations."""
+        if not self.entries.get(formulation_id):
+            self.record(formulation_id, old, changed_by, 'baseline before first tracked change')
+        return self.record(formulation_id, new, changed_by, description)
+
+    def snapshot_tree(self, vessels_root: str = ".", changed_by: str = 'snapshot') -> int:
+        """Record the current state of every formulation file; returns new versions.
+
+        JSON files come first; a .form vessel whose id already came from a
+        JSON file is skipped, and so is a file that does not parse.
+        """
+        recorded = 0
+        seen = set()
+        formulations_dir = Path(vessels_root) / 'formulations'
+        for path in iter_vessel_files(formulations_dir, ('*.json',)) + iter_vessel_files(formulations_dir, ('*.form',)):
+            try:
+                document = read_vessel(path)
+            except VesselParseError as e:
+                self.stats['unreadable_files'] += 1
+                print(f"  ✗ {e}")
+                continue
+            formulation_id = vessel_id(document) or path.stem
+            if path.suffix == '.form' and formulation_id in seen:
+                continue
+            seen.add(formulation_id)
+            if self.record(formulation_id, document['data'], changed_by, 'snapshot of formulation file'):
+                recorded += 1
+        return recorded
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def versions(self, formulation_id: str) -> List[Dict[str, Any]]:
+        return self.entries.get(formulation_id, [])
+
+    def entry_at(self, formulation_id: str, version: Optional[int] = None,
+                 at: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The entry current as of a version number or a time (latest if neither).
+        
+        Raises KeyError for a version number the formulation does not have.
+        """
+        versions = self.versions(formulation_id)
+        if not versions:
+            return None
+        if version is not None:
+            # Versions are numbered 1..n in log order
+            if not 1 <= version <= len(versions):
+                raise KeyError(f"Unknown version {version} of {formulation_id} (latest: {len(versions)})")
+            return versions[version - 1]
+        if at is not None:
+            i = bisect.bisect_right(self.times[formulation_id], timestamp(at))
+            return versions[i - 1] if i > 0 else None
+        return versions[-1]
+
+    def as_of(self, formulation_id: str, version: Optional[int] = None,
+              at: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The formulation document as of a version or time."""
+        entry = self.entry_at(formulation_id, version, at)
+        return self.snapshot(entry['sha256']) if entry else None
+
+    def replay(self, formulation_id: str) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """(entry, document) for every version, rebuilt from the stored patches."""
+        document = None
+        for entry in self.versions(formulation_id):
+            document = apply_patch(document, entry['changes'])
+            yield entry, document
+
+    def changes_between(self, formulation_id: str, from_version: int, to_version: int) -> List[Dict[str, Any]]:
+        """Structural diff between two versions."""
+        return diff(self.as_of(formulation_id, from_version), self.as_of(formulation_id, to_version))
+
+    # ------------------------------------------------------------------
+    # Pushing
+    # ------------------------------------------------------------------
+
+    def pushed(self) -> Dict[str, int]:
+        if not self.pushed_path.exists():
+            return {}
+        with open(self.pushed_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_pushed(self, pushed: Dict[str, int]):
+        tmp = self.pushed_path.with_name(f".{self.pushed_path.name}.{os.getpid()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(pushed, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.pushed_path)
+
+    def pending(self) -> Iterator[Dict[str, Any]]:
+        """Versions not yet pushed, in formulation/version order."""
+        pushed = self.pushed()
+        for formulation_id in sorted(self.entries):
+            for entry in self.entries[formulation_id][pushed.get(formulation_id, 0):]:
+                yield entry
+
+    @staticmethod
+    def history_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """A skin_twin.formulation_history row for a log entry."""
+        return {
+            'formulation_id': entry['formulation_id'],
+            'version': entry['version'],
+            'changes': entry['changes'],
+            'changed_by': entry['changed_by'] or None,
+            'changed_at': entry['changed_at'],
+            'change_type': entry['change_type'],
+            'description': entry['description'] or None,
+            'metadata': {'sha256': entry['sha256'], 'parent': entry['parent']},
+        }
+
+    def push(self, sink, batch_size: int = 100) -> Dict[str, int]:
+        """Write pending versions to a seed_loader sink, advancing the watermark per batch."""
+        from jsonl_export import iter_batches
+
+        result = {'pushed': 0, 'failed': 0}
+        pushed = self.pushed()
+        for batch in iter_batches(self.pending(), batch_size):
+            try:
+                sink.write(HISTORY_TABLE, [self.history_row(entry) for entry in batch])
+            except Exception as e:
+                result['failed'] += len(batch)
+                print(f"  ✗ Batch of {len(batch)} version(s): {str(e)[:100]}")
+                break   # keep versions in order: later batches wait for the next push
+            for entry in batch:
+                pushed[entry['formulation_id']] = max(pushed.get(entry['formulation_id'], 0), entry['version'])
+            self._save_pushed(pushed)
+            result['pushed'] += len(batch)
+        sink.close()
+        return result
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Local append-only formulation history")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--snapshot', action='store_true', help="Record the current state of all formulation files")
+    parser.add_argument('--log', metavar='ID', help="List the versions of a formulation")
+    parser.add_argument('--show', metavar='ID', help="Print a formulation as of --version/--at (default: latest)")
+    parser.add_argument('--version', type=int, help="Version for --show")
+    parser.add_argument('--at', help="ISO time for --show")
+    parser.add_argument('--push', choices=['supabase', 'neon', 'sql'], help="Push pending versions to formulation_history")
+    parser.add_argument('--sql-out', default='formulation_history.sql', help="Output file for --push sql")
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    with FormulationHistory.open(args.vessels_root) as history:
+        if args.snapshot:
+            recorded = history.snapshot_tree(args.vessels_root)
+            print(f"✓ Recorded {recorded} new version(s), {history.stats['unchanged']} unchanged")
+
+        if args.log:
+            versions = history.versions(args.log)
+            if not versions:
+                print(f"✗ No history for {args.log}")
+                sys.exit(1)
+            for entry in versions:
+                print(f"  v{entry['version']}  {entry['changed_at']}  {entry['change_type']:<20} "
+                      f"{len(entry['changes'])} op(s)  {entry['changed_by']}  {entry['description']}")
+
+        if args.show:
+            try:
+                document = history.as_of(args.show, args.version, args.at)
+            except KeyError as e:
+                print(f"✗ {e.args[0]}")
+                sys.exit(1)
+            if document is None:
+                print(f"✗ No version of {args.show} at that point")
+                sys.exit(1)
+            print(json.dumps(document, indent=2, ensure_ascii=False))
+
+        if args.push:
+            from seed_loader import open_sink
+            result = history.push(open_sink(args.push, args.sql_out, sql_schema='skin_twin'), args.batch_size)
+            print(f"  Pushed {result['pushed']} version(s), {result['failed']} failed")
+            if result['failed']:
+                sys.exit(1)
+
+        if not (args.snapshot or args.log or args.show or args.push):
+            total = sum(len(v) for v in history.entries.values())
+            pending = sum(1 for _ in history.pending())
+            print(f"History: {len(history.entries)} formulations, {total} versions, {pending} pending push")
+
+
+if __name__ == '__main__':
+    main()
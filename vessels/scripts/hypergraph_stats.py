@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Incremental Hypergraph Statistics
+Keeps the numbers in vessels/database/hypergraph_statistics.json and the
+metrics of hypergraph_analysis.json (node/edge counts, layer densities,
+product complexity, supplier portfolios, centrality) current without
+recomputing them from scratch.
+
+Every edge add/remove is an O(1) counter update and a formulation
+add/remove is O(degree). The min/max product complexity comes from a
+histogram of product degrees, so removing the largest product does not
+trigger a rescan. A state file records each vessel file's signature and the
+edge or node it defines, so a refresh re-reads only changed files.
+`full_metrics` recomputes everything from the edge set for verification.
+"""
+
+import json
+import sys
+import heapq
+import argparse
+from pathlib import Path
+from collections import defaultdict, Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Iterable, Set, Tuple
+
+from vessel_reader import iter_vessel_files, read_vessel, vessel_id
+
+STATE_VERSION = 1
+
+FORMULATION_EDGE = 'INGREDIENT_IN_FORMULATION'    # ingredient -> product
+SUPPLY_EDGE = 'SUPPLIER_PROVIDES_INGREDIENT'      # supplier -> ingredient
+
+# Node directories whose vessel files are counted as `vessel_files`
+NODE_DIRECTORIES = {
+    'products': 'products',
+    'ingredients': 'ingredients',
+    'suppliers': 'suppliers',
+}
+
+EdgeKey = Tuple[str, str, str]
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    return numerator / denominator if denominator else 0
+
+
+def _top(counts: Dict[str, int], label: str, limit: int = 5) -> List[Dict[str, Any]]:
+    ranked = heapq.nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
+    return [{'id': node_id, label: count} for node_id, count in ranked]
+
+
+def full_metrics(edges: Iterable[EdgeKey], nodes: Dict[str, Set[str]]) -> Dict[str, Any]:
+    """Metrics recomputed from scratch (the reference the incremental state is checked against)."""
+    edges = set(edges)
+    product_ingredients: Dict[str, Set[str]] = defaultdict(set)
+    ingredient_products: Dict[str, Set[str]] = defaultdict(set)
+    supplier_ingredients: Dict[str, Set[str]] = defaultdict(set)
+    ingredient_suppliers: Dict[str, Set[str]] = defaultdict(set)
+    by_type: Counter = Counter()
+    for edge_type, source, target in edges:
+        by_type[edge_type] += 1
+        if edge_type == FORMULATION_EDGE:
+            product_ingredients[target].add(source)
+            ingredient_products[source].add(target)
+        elif edge_type == SUPPLY_EDGE:
+            supplier_ingredients[source].add(target)
+            ingredient_suppliers[target].add(source)
+
+    degrees = [len(v) for v in product_ingredients.values()]
+    return _metrics(
+        nodes={kind: len(ids) for kind, ids in nodes.items()},
+        by_type=dict(by_type),
+        products=len(product_ingredients),
+        ingredients=len(ingredient_products),
+        suppliers=len(supplier_ingredients),
+        min_degree=min(degrees) if degrees else 0,
+        max_degree=max(degrees) if degrees else 0,
+        ingredient_usage={k: len(v) for k, v in ingredient_products.items()},
+        supplier_portfolio={k: len(v) for k, v in supplier_ingredients.items()},
+        sourced=len(ingredient_suppliers),
+        single_sourced=sum(1 for v in ingredient_suppliers.values() if len(v) == 1),
+    )
+
+
+def _metrics(nodes: Dict[str, int], by_type: Dict[str, int], products: int, ingredients: int,
+             suppliers: int, min_degree: int, max_degree: int, ingredient_usage: Dict[str, int],
+             supplier_portfolio: Dict[str, int], sourced: int, single_sourced: int) -> Dict[str, Any]:
+    """Assemble both report shapes from the aggregate counts.
+
+    `nodes` counts the nodes of the edge layers (products with formulation
+    edges, ingredients used in them, suppliers with supply edges); the
+    averages and densities are taken over these. `vessel_files` counts the
+    distinct ids of the node vessel files, connected or not.
+    """
+    formulation = by_type.get(FORMULATION_EDGE, 0)
+    supply = by_type.get(SUPPLY_EDGE, 0)
+    layer_nodes = {'products': products, 'ingredients': ingredients, 'suppliers': suppliers,
+                   'total': products + ingredients + suppliers}
+    vessel_files = {**nodes, 'total': sum(nodes.values())}
+    return {
+        'statistics': {
+            'nodes': layer_nodes,
+            'vessel_files': vessel_files,
+            'edges': {'formulation': formulation, 'supply_chain': supply},
+            'network_metrics': {
+                'average_product_complexity': _ratio(formulation, products),
+                'average_supplier_portfolio': _ratio(supply, suppliers),
+                'ingredients_with_suppliers': sourced,
+                'single_sourced_ingredients': single_sourced,
+            },
+        },
+        'analysis': {
+            'nodes': layer_nodes,
+            'vessel_files': vessel_files,
+            'edges': {'formulation': formulation, 'supply': supply, 'total': sum(by_type.values()),
+                      'by_type': dict(sorted(by_type.items()))},
+            'density': {
+                'formulation_layer': _ratio(formulation, products * ingredients),
+                'supply_layer': _ratio(supply, suppliers * ingredients),
+            },
+            'complexity': {
+                'avg_product_ingredients': _ratio(formulation, products),
+                'min_product_ingredients': min_degree,
+                'max_product_ingredients': max_degree,
+                'avg_supplier_portfolio': _ratio(supply, suppliers),
+            },
+            'centrality': {
+                'most_used_ingredients': _top(ingredient_usage, 'product_count'),
+                'top_suppliers': _top(supplier_portfolio, 'ingredient_count'),
+            },
+        },
+    }
+
+
+class HypergraphStatistics:
+    def __init__(self, vessels_root: str = ".", state_path: Optional[str] = None):
+        self.vessels_root = Path(vessels_root)
+        self.state_path = Path(state_path) if state_path else self.vessels_root / 'hypergraph_stats_state.json'
+
+        self.edges: Set[EdgeKey] = set()
+        self.by_type: Counter = Counter()
+        self.nodes: Dict[str, Set[str]] = {kind: set() for kind in NODE_DIRECTORIES}
+
+        # Formulation layer: product -> ingredients, ingredient -> product count,
+        # product degree -> number of products (for min/max complexity)
+        self.product_ingredients: Dict[str, Set[str]] = {}
+        self.ingredient_usage: Counter = Counter()
+        self.degree_histogram: Counter = Counter()
+
+        # Supply layer: supplier -> ingredient count, ingredient -> supplier count
+        self.supplier_portfolio: Counter = Counter()
+        self.ingredient_suppliers: Counter = Counter()
+        self.single_sourced = 0
+
+        # relative file path -> {'signature', 'edge' | 'node'}; an edge or node
+        # defined by several files (e.g. a .json and a .prod) stays until the
+        # last of them is gone
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.edge_files: Counter = Counter()
+        self.node_files: Counter = Counter()
+        self.stats = defaultdict(int)
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _bump(counter: Counter, key: str, delta: int) -> int:
+        """Add delta to a counter entry, dropping it at zero; returns the new value."""
+        value = counter[key] + delta
+        if value > 0:
+            counter[key] = value
+        else:
+            del counter[key]
+        return value
+
+    def _shift_degree(self, old: int, new: int):
+        if old:
+            self._bump(self.degree_histogram, old, -1)
+        if new:
+            self._bump(self.degree_histogram, new, 1)
+
+    def add_edge(self, edge_type: str, source_id: str, target_id: str) -> bool:
+        """Add an edge in O(1); returns False if it was already present."""
+        key = (edge_type, source_id, target_id)
+        if key in self.edges:
+            return False
+        self.edges.add(key)
+        self.by_type[edge_type] += 1
+        if edge_type == FORMULATION_EDGE:
+            ingredients = self.product_ingredients.setdefault(target_id, set())
+            ingredients.add(source_id)
+            self._shift_degree(len(ingredients) - 1, len(ingredients))
+            self._bump(self.ingredient_usage, source_id, 1)
+        elif edge_type == SUPPLY_EDGE:
+            self._bump(self.supplier_portfolio, source_id, 1)
+            suppliers = self._bump(self.ingredient_suppliers, target_id, 1)
+            self.single_sourced += 1 if suppliers == 1 else -1 if suppliers == 2 else 0
+        return True
+
+    def remove_edge(self, edge_type: str, source_id: str, target_id: str) -> bool:
+        """Remove an edge in O(1); returns False if it was not present."""
+        key = (edge_type, source_id, target_id)
+        if key not in self.edges:
+            return False
+        self.edges.discard(key)
+        self._bump(self.by_type, edge_type, -1)
+        if edge_type == FORMULATION_EDGE:
+            ingredients = self.product_ingredients[target_id]
+            ingredients.discard(source_id)
+            self._shift_degree(len(ingredients) + 1, len(ingredients))
+            if not ingredients:
+                del self.product_ingredients[target_id]
+            self._bump(self.ingredient_usage, source_id, -1)
+        elif edge_type == SUPPLY_EDGE:
+            self._bump(self.supplier_portfolio, source_id, -1)
+            suppliers = self._bump(self.ingredient_suppliers, target_id, -1)
+            self.single_sourced += 1 if suppliers == 1 else -1 if suppliers == 0 else 0
+        return True
+
+    def add_formulation(self, product_id: str, ingredient_ids: Iterable[str]):
+        """Set a product's ingredients, touching only the edges that differ (O(degree))."""
+        wanted = set(ingredient_ids)
+        current = self.product_ingredients.get(product_id, set())
+        for ingredient_id in current - wanted:
+            self.remove_edge(FORMULATION_EDGE, ingredient_id, product_id)
+        for ingredient_id in wanted - current:
+            self.add_edge(FORMULATION_EDGE, ingredient_id, product_id)
+
+    def remove_formulation(self, product_id: str):
+        """Drop every ingredient edge of a product (O(degree))."""
+        for ingredient_id in list(self.product_ingredients.get(product_id, ())):
+            self.remove_edge(FORMULATION_EDGE, ingredient_id, product_id)
+
+    def register_node(self, kind: str, node_id: str):
+        self.nodes.setdefault(kind, set()).add(node_id)
+
+    def unregister_node(self, kind: str, node_id: str):
+        self.nodes.get(kind, set()).discard(node_id)
+
+    # ------------------------------------------------------------------
+    # Vessel files
+    # ------------------------------------------------------------------
+
+    def _read(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Parsed vessel document (any format) whose data is an object, else None."""
+        try:
+            document = read_vessel(path)
+        except Exception:
+            self.stats['unreadable_files'] += 1
+            return None
+        return document if isinstance(document['data'], dict) else None
+
+    def _forget(self, relative: str):
+        entry = self.files.pop(relative, None)
+        if entry is None:
+            return
+        if 'edge' in entry:
+            if self._bump(self.edge_files, tuple(entry['edge']), -1) <= 0:
+                self.remove_edge(*entry['edge'])
+        elif 'node' in entry:
+            if self._bump(self.node_files, tuple(entry['node']), -1) <= 0:
+                self.unregister_node(*entry['node'])
+
+    def _link(self, entry: Dict[str, Any]):
+        if 'edge' in entry:
+            self.edge_files[tuple(entry['edge'])] += 1
+            self.add_edge(*entry['edge'])
+        elif 'node' in entry:
+            self.node_files[tuple(entry['node'])] += 1
+            self.register_node(*entry['node'])
+
+    def _vessel_files(self):
+        """(relative path, path, kind) of every edge and node file; kind None for edges."""
+        edges_dir = self.vessels_root / 'edges'
+        if edges_dir.exists():
+            for path in sorted(edges_dir.glob('B19EDG_*.json')):
+                yield f"edges/{path.name}", path, None
+        for kind, directory in NODE_DIRECTORIES.items():
+            for path in iter_vessel_files(self.vessels_root / directory):
+                yield f"{directory}/{path.name}", path, kind
+
+    def refresh(self) -> Dict[str, int]:
+        """Re-read added/changed edge and node files and drop deleted ones."""
+        changes = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+        seen = set()
+        for relative, path, kind in self._vessel_files():
+            st = path.stat()
+            signature = [st.st_mtime_ns, st.st_size]
+            seen.add(relative)
+            known = self.files.get(relative)
+            if known is not None and known['signature'] == signature:
+                changes['unchanged'] += 1
+                continue
+            document = self._read(path)
+            self._forget(relative)
+            entry: Dict[str, Any] = {'signature': signature}
+            if document is not None and kind is None:
+                data = document['data']
+                if data.get('type') and data.get('source_id') and data.get('target_id'):
+                    entry['edge'] = [data['type'], data['source_id'], data['target_id']]
+            elif document is not None:
+                entry['node'] = [kind, vessel_id(document) or path.stem]
+            self._link(entry)
+            self.files[relative] = entry
+            changes['changed' if known is not None else 'added'] += 1
+
+        for relative in [r for r in self.files if r not in seen]:
+            self._forget(relative)
+            changes['removed'] += 1
+        return changes
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def rebuild(self):
+        """Recompute all counters from the stored file entries."""
+        files = self.files
+        self.__init__(str(self.vessels_root), str(self.state_path))
+        self.files = files
+        for entry in files.values():
+            self._link(entry)
+
+    def save_state(self):
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION, 'files': self.files}, f)
+
+    def load_state(self) -> bool:
+        """Load stored file entries; the counters are rebuilt from them in one pass."""
+        if not self.state_path.exists():
+            return False
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except Exception:
+            return False
+        if payload.get('version') != STATE_VERSION:
+            return False
+        self.files = payload.get('files', {})
+        self.rebuild()
+        return True
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current statistics and analysis metrics from the maintained counters."""
+        return _metrics(
+            nodes={kind: len(ids) for kind, ids in self.nodes.items()},
+            by_type=dict(self.by_type),
+            products=len(self.product_ingredients),
+            ingredients=len(self.ingredient_usage),
+            suppliers=len(self.supplier_portfolio),
+            min_degree=min(self.degree_histogram, default=0),
+            max_degree=max(self.degree_histogram, default=0),
+            ingredient_usage=self.ingredient_usage,
+            supplier_portfolio=self.supplier_portfolio,
+            sourced=len(self.ingredient_suppliers),
+            single_sourced=self.single_sourced,
+        )
+
+    def verify(self) -> List[str]:
+        """Compare the maintained metrics with a full recomputation; returns mismatching paths."""
+        mismatches: List[str] = []
+
+        def compare(a: Any, b: Any, path: str):
+            if isinstance(a, dict) and isinstance(b, dict):
+                for key in sorted(set(a) | set(b)):
+                    compare(a.get(key), b.get(key), f"{path}.{key}" if path else key)
+            elif isinstance(a, float) or isinstance(b, float):
+                if a is None or b is None or abs(a - b) > 1e-9:
+                    mismatches.append(path)
+            elif a != b:
+                mismatches.append(path)
+
+        compare(self.metrics(), full_metrics(self.edges, self.nodes), '')
+        return mismatches
+
+    def write_reports(self, database_dir: Path) -> List[Path]:
+        """Update hypergraph_statistics.json and the metrics of hypergraph_analysis.json."""
+        metrics = self.metrics()
+        timestamp = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        written = []
+
+        statistics_path = database_dir / 'hypergraph_statistics.json'
+        with open(statistics_path, 'w', encoding='utf-8') as f:
+            json.dump({'timestamp': timestamp, **metrics['statistics']}, f, indent=2)
+        written.append(statistics_path)
+
+        analysis_path = database_dir / 'hypergraph_analysis.json'
+        analysis: Dict[str, Any] = {}
+        if analysis_path.exists():
+            with open(analysis_path, 'r', encoding='utf-8') as f:
+                analysis = json.load(f)
+        analysis['timestamp'] = timestamp
+        analysis['metrics'] = metrics['analysis']
+        with open(analysis_path, 'w', encoding='utf-8') as f:
+            json.dump(analysis, f, indent=2)
+        written.append(analysis_path)
+        return written
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Incrementally maintained hypergraph statistics")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--state', help="State file (default: <vessels_root>/hypergraph_stats_state.json)")
+    parser.add_argument('--full', action='store_true', help="Ignore the state file and re-read everything")
+    parser.add_argument('--verify', action='store_true', help="Check the counters against a full recomputation")
+    parser.add_argument('--write', action='store_true',
+                        help="Update database/hypergraph_statistics.json and hypergraph_analysis.json")
+    args = parser.parse_args()
+
+    hypergraph = HypergraphStatistics(args.vessels_root, args.state)
+    if not args.full and hypergraph.load_state():
+        print(f"Loaded state for {len(hypergraph.files)} files")
+    changes = hypergraph.refresh()
+    hypergraph.save_state()
+    print(f"Files: {len(hypergraph.files)} (added {changes['added']}, changed {changes['changed']}, "
+          f"removed {changes['removed']}, unchanged {changes['unchanged']})")
+
+    analysis = hypergraph.metrics()['analysis']
+    print(f"  Nodes: {analysis['nodes']['products']} products, {analysis['nodes']['ingredients']} ingredients, "
+          f"{analysis['nodes']['suppliers']} suppliers in the edge layers")
+    print(f"  Edges: {analysis['edges']['total']} ({analysis['edges']['formulation']} formulation, "
+          f"{analysis['edges']['supply']} supply)")
+    print(f"  Density: formulation {analysis['density']['formulation_layer']:.3%}, "
+          f"supply {analysis['density']['supply_layer']:.3%}")
+    complexity = analysis['complexity']
+    print(f"  Product complexity: avg {complexity['avg_product_ingredients']:.1f}, "
+          f"range {complexity['min_product_ingredients']}-{complexity['max_product_ingredients']}")
+
+    code = 0
+    if args.verify:
+        mismatches = hypergraph.verify()
+        if mismatches:
+            print(f"✗ Incremental counters disagree with a full recomputation: {', '.join(mismatches)}")
+            code = 1
+        else:
+            print("✓ Incremental counters match a full recomputation")
+
+    if args.write:
+        for path in hypergraph.write_reports(Path(args.vessels_root) / 'database'):
+            print(f"✓ Updated {path}")
+    sys.exit(code)
+
+
+if __name__ == '__main__':
+    main()
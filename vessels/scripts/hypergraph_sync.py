@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Hypergraph Sync to PostgreSQL
+Streams vessel nodes (ingredients, products, suppliers, formulations) and
+edges into skin_twin.hypergraph_nodes / skin_twin.hypergraph_edges.
+
+Rows are COPYed into temporary staging tables and merged with set-based
+statements in one transaction. The merge is diff-based: only rows whose
+type, label, weight or properties differ are updated, new rows are inserted
+and, with --prune, rows that no longer exist in vessels are deleted.
+Unchanged rows are not rewritten, which keeps index churn and WAL low.
+
+Nodes are read from every vessel format (.json, .inci, .supp, .prod, .form).
+Edges are keyed by (edge_type, source_id, target_id). Products and
+formulations that share an id become one node; the product wins. Other
+duplicates keep the first row in file order.
+
+Works against Neon, Supabase or a local Postgres (psycopg 3):
+    python hypergraph_sync.py .. --dsn postgresql://localhost/skin_twin --ensure-schema
+"""
+
+import json
+import os
+import sys
+import argparse
+from pathlib import Path
+from typing import Dict, List, Iterator, Tuple
+
+from jsonl_export import iter_json_files
+from vessel_reader import iter_vessel_files, read_vessel, vessel_id
+
+SCHEMA = 'skin_twin'
+
+# (directory, node_type, label fields); earlier entries win on id collisions,
+# then the first file in path order
+NODE_SOURCES = [
+    ('ingredients', 'ingredient', ('inci_name', 'label')),
+    ('suppliers', 'supplier', ('label', 'name')),
+    ('products', 'product', ('label', 'name', 'product_name')),
+    ('formulations', 'formulation', ('name', 'label', 'product_name')),
+]
+
+SCHEMA_DDL = [
+    f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}",
+    f"""CREATE TABLE IF NOT EXISTS {SCHEMA}.hypergraph_edges (
+        id SERIAL PRIMARY KEY,
+        edge_type VARCHAR(50) NOT NULL,
+        source_id VARCHAR(50) NOT NULL,
+        target_id VARCHAR(50) NOT NULL,
+        weight DECIMAL(10, 4) DEFAULT 1.0,
+        properties JSONB,
+        created_at TIMESTAMP DEFAULT NOW(),
+        updated_at TIMESTAMP DEFAULT NOW()
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS {SCHEMA}.hypergraph_nodes (
+        id VARCHAR(50) PRIMARY KEY,
+        node_type VARCHAR(50) NOT NULL,
+        label VARCHAR(255) NOT NULL,
+        properties JSONB,
+        created_at TIMESTAMP DEFAULT NOW(),
+        updated_at TIMESTAMP DEFAULT NOW()
+    )""",
+    f"CREATE INDEX IF NOT EXISTS idx_hypergraph_edges_type ON {SCHEMA}.hypergraph_edges(edge_type)",
+    f"CREATE INDEX IF NOT EXISTS idx_hypergraph_edges_source ON {SCHEMA}.hypergraph_edges(source_id)",
+    f"CREATE INDEX IF NOT EXISTS idx_hypergraph_edges_target ON {SCHEMA}.hypergraph_edges(target_id)",
+    f"CREATE INDEX IF NOT EXISTS idx_hypergraph_edges_weight ON {SCHEMA}.hypergraph_edges(weight DESC)",
+    f"CREATE INDEX IF NOT EXISTS idx_hypergraph_edges_key ON {SCHEMA}.hypergraph_edges(edge_type, source_id, target_id)",
+    f"CREATE INDEX IF NOT EXISTS idx_hypergraph_nodes_type ON {SCHEMA}.hypergraph_nodes(node_type)",
+    f"CREATE INDEX IF NOT EXISTS idx_hypergraph_nodes_label ON {SCHEMA}.hypergraph_nodes(label)",
+]
+
+
+def iter_node_rows(vessels_root: Path) -> Iterator[Tuple[str, str, str, str, int]]:
+    """(id, node_type, label, properties JSON, priority) for every vessel node, any format."""
+    for priority, (directory, node_type, label_fields) in enumerate(NODE_SOURCES):
+        for path in iter_vessel_files(vessels_root / directory):
+            try:
+                document = read_vessel(path)
+            except (OSError, ValueError) as e:
+                print(f"  ⚠ Skipping {path.name}: {e}", file=sys.stderr)
+                continue
+            data = document['data']
+            node_id = vessel_id(document) or ''
+            if not isinstance(data, dict) or not node_id or len(node_id) > 50:
+                continue
+            label = next((str(data[f]) for f in label_fields if data.get(f)), node_id)[:255]
+            properties = {k: v for k, v in data.items() if k != 'id'}
+            yield node_id, node_type, label, json.dumps(properties, ensure_ascii=False), priority
+
+
+def iter_edge_rows(vessels_root: Path) -> Iterator[Tuple[str, str, str, float, str]]:
+    """(edge_type, source_id, target_id, weight, properties JSON) for every edge file."""
+    for edge in iter_json_files(vessels_root / 'edges', 'B19EDG_*.json'):
+        if not (edge.get('type') and edge.get('source_id') and edge.get('target_id')):
+            continue
+        properties = dict(edge.get('properties') or {})
+        weight = properties.get('weight', 1)
+        properties.update({
+            'vessel_edge_id': edge.get('id'),
+            'source_type': edge.get('source_type'),
+            'target_type': edge.get('target_type'),
+        })
+        yield (edge['type'], edge['source_id'], edge['target_id'],
+               weight if isinstance(weight, (int, float)) else 1,
+               json.dumps(properties, ensure_ascii=False))
+
+
+class HypergraphSync:
+    def __init__(self, conn, vessels_root: str = ".", prune: bool = False):
+        self.conn = conn
+        self.vessels_root = Path(vessels_root)
+        self.prune = prune
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def ensure_schema(self):
+        with self.conn.cursor() as cur:
+            for statement in SCHEMA_DDL:
+                cur.execute(statement)
+
+    def _copy(self, cur, table: str, columns: List[str], rows) -> int:
+        """COPY rows into a staging table, appending their position as `seq` (the tiebreak)."""
+        count = 0
+        with cur.copy(f"COPY {table} ({', '.join(columns)}, seq) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row((*row, count))
+                count += 1
+        return count
+
+    def sync_nodes(self) -> Dict[str, int]:
+        target = f"{SCHEMA}.hypergraph_nodes"
+        with self.conn.cursor() as cur:
+            cur.execute("""CREATE TEMP TABLE stage_nodes (
+                id VARCHAR(50), node_type VARCHAR(50), label VARCHAR(255),
+                properties JSONB, priority INTEGER, seq INTEGER) ON COMMIT DROP""")
+            staged = self._copy(cur, 'stage_nodes', ['id', 'node_type', 'label', 'properties', 'priority'],
+                                iter_node_rows(self.vessels_root))
+            cur.execute("""CREATE TEMP TABLE src_nodes ON COMMIT DROP AS
+                SELECT DISTINCT ON (id) id, node_type, label, properties
+                FROM stage_nodes ORDER BY id, priority, seq""")
+            cur.execute("ANALYZE src_nodes")
+            cur.execute("SELECT count(*) FROM src_nodes")
+            distinct = cur.fetchone()[0]
+
+            cur.execute(f"""UPDATE {target} t
+                SET node_type = s.node_type, label = s.label, properties = s.properties, updated_at = NOW()
+                FROM src_nodes s
+                WHERE t.id = s.id
+                  AND (t.node_type, t.label, t.properties) IS DISTINCT FROM (s.node_type, s.label, s.properties)""")
+            updated = cur.rowcount
+            cur.execute(f"""INSERT INTO {target} (id, node_type, label, properties)
+                SELECT s.id, s.node_type, s.label, s.properties FROM src_nodes s
+                WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.id = s.id)""")
+            inserted = cur.rowcount
+            deleted = 0
+            if self.prune:
+                cur.execute(f"""DELETE FROM {target} t
+                    WHERE t.node_type = ANY(%s)
+                      AND NOT EXISTS (SELECT 1 FROM src_nodes s WHERE s.id = t.id)""",
+                            ([node_type for _, node_type, _ in NODE_SOURCES],))
+                deleted = cur.rowcount
+
+        self.stats['nodes'] = {
+            'staged': staged, 'shared_ids': staged - distinct, 'inserted': inserted,
+            'updated': updated, 'unchanged': distinct - inserted - updated, 'deleted': deleted,
+        }
+        return self.stats['nodes']
+
+    def sync_edges(self) -> Dict[str, int]:
+        target = f"{SCHEMA}.hypergraph_edges"
+        key = "t.edge_type = s.edge_type AND t.source_id = s.source_id AND t.target_id = s.target_id"
+        with self.conn.cursor() as cur:
+            cur.execute("""CREATE TEMP TABLE stage_edges (
+                edge_type VARCHAR(50), source_id VARCHAR(50), target_id VARCHAR(50),
+                weight DECIMAL(10, 4), properties JSONB, seq INTEGER) ON COMMIT DROP""")
+            staged = self._copy(cur, 'stage_edges', ['edge_type', 'source_id', 'target_id', 'weight', 'properties'],
+                                iter_edge_rows(self.vessels_root))
+            cur.execute("""CREATE TEMP TABLE src_edges ON COMMIT DROP AS
+                SELECT DISTINCT ON (edge_type, source_id, target_id)
+                    edge_type, source_id, target_id, weight, properties
+                FROM stage_edges ORDER BY edge_type, source_id, target_id, seq""")
+            cur.execute("ANALYZE src_edges")
+            cur.execute("SELECT count(*) FROM src_edges")
+            distinct = cur.fetchone()[0]
+
+            cur.execute(f"""UPDATE {target} t
+                SET weight = s.weight, properties = s.properties, updated_at = NOW()
+                FROM src_edges s
+                WHERE {key}
+                  AND (t.weight, t.properties) IS DISTINCT FROM (s.weight, s.properties)""")
+            updated = cur.rowcount
+            cur.execute(f"""INSERT INTO {target} (edge_type, source_id, target_id, weight, properties)
+                SELECT s.edge_type, s.source_id, s.target_id, s.weight, s.properties FROM src_edges s
+                WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE {key})""")
+            inserted = cur.rowcount
+            deleted = 0
+            if self.prune:
+                # Only edges this tool created (tagged with their vessel edge id)
+                cur.execute(f"""DELETE FROM {target} t
+                    WHERE t.properties ? 'vessel_edge_id'
+                      AND NOT EXISTS (SELECT 1 FROM src_edges s WHERE {key})""")
+                deleted = cur.rowcount
+
+        self.stats['edges'] = {
+            'staged': staged, 'duplicates': staged - distinct, 'inserted': inserted,
+            'updated': updated, 'unchanged': distinct - inserted - updated, 'deleted': deleted,
+        }
+        return self.stats['edges']
+
+    def run(self, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+        """Sync nodes then edges in one transaction (rolled back on dry run)."""
+        with self.conn.transaction(force_rollback=dry_run):
+            self.sync_nodes()
+            self.sync_edges()
+        return self.stats
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Sync vessel nodes and edges into skin_twin hypergraph tables")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'),
+                        help="PostgreSQL connection string (default: $DATABASE_URL)")
+    parser.add_argument('--ensure-schema', action='store_true', help="Create the schema, tables and indexes if missing")
+    parser.add_argument('--prune', action='store_true', help="Delete nodes/edges no longer present in vessels")
+    parser.add_argument('--dry-run', action='store_true', help="Compute the diff and roll back")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        print("✗ No database: pass --dsn or set DATABASE_URL")
+        sys.exit(1)
+    try:
+        import psycopg
+    except ImportError:
+        print("✗ psycopg is required: pip install 'psycopg[binary]'")
+        sys.exit(1)
+
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        sync = HypergraphSync(conn, args.vessels_root, args.prune)
+        if args.ensure_schema:
+            sync.ensure_schema()
+        stats = sync.run(args.dry_run)
+
+    print("Hypergraph sync" + (" (dry run, rolled back)" if args.dry_run else ""))
+    for table, counts in stats.items():
+        print(f"  {table}: " + ', '.join(f"{k} {v}" for k, v in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
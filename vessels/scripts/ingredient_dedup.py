@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Ingredient Near-Duplicate Detection
+Groups raw-material records that are likely the same substance under
+different codes and spellings ("De Ion Water" / "Deionised Water", trade names
+with grade suffixes). Candidates come from MinHash signatures over character
+shingles of the normalized name, bucketed with LSH banding so the work grows
+with the number of records rather than the number of pairs, plus exact
+CAS/COSING-id agreement. Each merge candidate carries its evidence.
+"""
+
+import json
+import zlib
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Any, Iterable, Tuple
+
+import numpy as np
+
+from advanced_ingredient_enrichment import TRADE_NAME_PATTERNS, normalize_name
+from cosing_catalog import split_cas_numbers
+from similarity import ratio
+from vessel_reader import iter_vessel_files, read_vessel, vessel_id
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16          # 16 bands x 4 rows: ~50% Jaccard at the LSH threshold
+MAX_BUCKET = 200    # buckets larger than this carry no signal (e.g. a shared "OIL")
+THRESHOLD = 0.6            # name Jaccard for pairs whose CAS or COSING id agrees
+NAME_ONLY_THRESHOLD = 0.85  # Jaccard and similarity for pairs no CAS/COSING id corroborates
+LSH_SLACK = 0.1             # MinHash estimates below THRESHOLD by this much still get scored exactly
+
+
+def canonical_name(name: str) -> str:
+    """Normalized name with known trade names mapped to their INCI equivalent."""
+    normalized = normalize_name(name)
+    return TRADE_NAME_PATTERNS.get(normalized, normalized)
+
+
+def grade_conflict(a: str, b: str) -> bool:
+    """Canonical names that differ only in grade codes ("Montanov L" / "Montanov S")."""
+    differing = set(a.split()) ^ set(b.split())
+    return bool(differing) and all(len(token) <= 2 or token.isdigit() for token in differing)
+
+
+def shingles(name: str, size: int = SHINGLE_SIZE) -> List[int]:
+    """Hashed character shingles of a canonical name (spaces removed)."""
+    compact = name.replace(' ', '')
+    if len(compact) <= size:
+        grams = {compact} if compact else set()
+    else:
+        grams = {compact[i:i + size] for i in range(len(compact) - size + 1)}
+    return sorted(zlib.crc32(g.encode('utf-8')) for g in grams)
+
+
+class MinHasher:
+    """Multiply-shift MinHash over 32-bit shingle hashes, vectorized across records."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signatures(self, shingle_sets: List[List[int]], chunk: int = 250_000) -> np.ndarray:
+        """Signature matrix (records x num_perm); empty sets get all-max rows."""
+        n = len(shingle_sets)
+        sigs = np.full((n, self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        lengths = np.array([len(s) for s in shingle_sets], dtype=np.int64)
+        owners = np.repeat(np.arange(n), lengths)
+        values = np.fromiter((h for s in shingle_sets for h in s), dtype=np.uint64, count=int(lengths.sum()))
+
+        for start in range(0, len(values), chunk):
+            x = values[start:start + chunk]
+            rec = owners[start:start + chunk]
+            hashed = ((x[:, None] * self.a[None, :] + self.b[None, :]) >> np.uint64(32)).astype(np.uint32)
+            # Reduce per record: runs of equal owners are contiguous
+            starts = np.flatnonzero(np.r_[True, rec[1:] != rec[:-1]])
+            mins = np.minimum.reduceat(hashed, starts, axis=0)
+            np.minimum.at(sigs, rec[starts], mins)
+        return sigs
+
+
+def lsh_candidate_pairs(sigs: np.ndarray, bands: int = BANDS,
+                        max_bucket: int = MAX_BUCKET) -> Iterable[Tuple[int, int]]:
+    """Record pairs sharing at least one LSH band bucket."""
+    n, num_perm = sigs.shape
+    rows = num_perm // bands
+    coeff = np.random.default_rng(7).integers(1, 2 ** 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    seen = set()
+    for band in range(bands):
+        block = sigs[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        keys = (block * coeff).sum(axis=1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        boundaries = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1], True])
+        for lo, hi in zip(boundaries[:-1], boundaries[1:]):
+            size = hi - lo
+            if size < 2 or size > max_bucket:
+                continue
+            members = sorted(order[lo:hi].tolist())
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if (a, b) not in seen:
+                        seen.add((a, b))
+                        yield a, b
+
+
+class IngredientDeduplicator:
+    def __init__(self, vessels_root: str = ".", threshold: float = THRESHOLD,
+                 name_only_threshold: float = NAME_ONLY_THRESHOLD):
+        self.vessels_root = Path(vessels_root)
+        self.threshold = threshold
+        self.name_only_threshold = name_only_threshold
+        self.records: List[Dict[str, Any]] = []
+        self.stats = defaultdict(int)
+
+    def load_ingredients(self):
+        """Load raw-material records from vessels/ingredients: JSON files, then .inci vessels.
+
+        An .inci vessel whose id already came from a JSON file is the same
+        record, not a duplicate, and is skipped.
+        """
+        ingredients_dir = self.vessels_root / 'ingredients'
+        if not ingredients_dir.exists():
+            print("  ✗ Ingredients directory not found")
+            return
+        seen = set()
+        for path in iter_vessel_files(ingredients_dir, ('*.json',)) + iter_vessel_files(ingredients_dir, ('*.inci',)):
+            try:
+                document = read_vessel(path)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"  ✗ Error reading {path.name}: {e}")
+                continue
+            if not isinstance(document['data'], dict):
+                continue
+            ingredient_id = vessel_id(document) or path.stem
+            if path.suffix == '.inci' and ingredient_id in seen:
+                continue
+            seen.add(ingredient_id)
+            self.add_record(dict(document['data'], id=ingredient_id), path.name)
+
+    def add_record(self, data: Dict[str, Any], file_name: str = ''):
+        name = data.get('inci_name') or data.get('label') or ''
+        self.records.append({
+            'id': data.get('id') or Path(file_name).stem,
+            'name': name,
+            'file': file_name,
+            'canonical': canonical_name(name),
+            'cas': set(split_cas_numbers(data.get('cas_number', '') or '')),
+            'cosing_id': str(data.get('cosing_ref_no') or data.get('cosing_id') or ''),
+            'usage': data.get('network_properties', {}).get('usage_frequency', 0) or 0,
+        })
+
+    def candidate_pairs(self) -> Dict[Tuple[int, int], List[str]]:
+        """Candidate record pairs with the blocking source(s) that proposed them.
+
+        Records with the same canonical name are paired with the first record
+        of their name group; MinHash/LSH then runs once per distinct name and
+        pairs are pre-filtered on the signature estimate before any per-pair
+        Python work.
+        """
+        pairs: Dict[Tuple[int, int], List[str]] = defaultdict(list)
+
+        by_name: Dict[str, List[int]] = defaultdict(list)
+        for i, record in enumerate(self.records):
+            by_name[record['canonical']].append(i)
+        names = list(by_name)
+        representatives = [by_name[name][0] for name in names]
+        for members in by_name.values():
+            for other in members[1:]:
+                pairs[(members[0], other)].append('canonical_name')
+
+        self.shingle_sets = {name: set(s) for name, s in zip(names, map(shingles, names))}
+        sigs = MinHasher().signatures([sorted(self.shingle_sets[name]) for name in names])
+        lsh_pairs = np.array(list(lsh_candidate_pairs(sigs)), dtype=np.int64).reshape(-1, 2)
+        if len(lsh_pairs):
+            estimate = (sigs[lsh_pairs[:, 0]] == sigs[lsh_pairs[:, 1]]).mean(axis=1)
+            self.stats['lsh_pairs'] = len(lsh_pairs)
+            # The 64-permutation estimate is noisy; keep near misses for the exact Jaccard
+            for a, b in lsh_pairs[estimate >= self.threshold - LSH_SLACK].tolist():
+                pairs[tuple(sorted((representatives[a], representatives[b])))].append('minhash')
+
+        for key in ('cas', 'cosing_id'):
+            buckets = defaultdict(list)
+            for i, record in enumerate(self.records):
+                values = record[key] if isinstance(record[key], set) else {record[key]}
+                for value in values:
+                    if value:
+                        buckets[value].append(i)
+            for members in buckets.values():
+                if len(members) > MAX_BUCKET:
+                    continue
+                for i, a in enumerate(members):
+                    for b in members[i + 1:]:
+                        pairs[(a, b)].append(key)
+
+        self.stats['candidate_pairs'] = len(pairs)
+        return pairs
+
+    def evidence(self, a: int, b: int, sources: List[str]) -> Dict[str, Any]:
+        ra, rb = self.records[a], self.records[b]
+        sa, sb = self.shingle_sets[ra['canonical']], self.shingle_sets[rb['canonical']]
+        jaccard = len(sa & sb) / len(sa | sb) if sa or sb else 0.0
+
+        cas = 'missing'
+        if ra['cas'] and rb['cas']:
+            cas = 'agree' if ra['cas'] & rb['cas'] else 'conflict'
+        cosing = 'missing'
+        if ra['cosing_id'] and rb['cosing_id']:
+            cosing = 'agree' if ra['cosing_id'] == rb['cosing_id'] else 'conflict'
+
+        return {
+            'a': ra['id'],
+            'b': rb['id'],
+            'names': [ra['name'], rb['name']],
+            'canonical_match': ra['canonical'] == rb['canonical'],
+            'grade_conflict': grade_conflict(ra['canonical'], rb['canonical']),
+            'name_jaccard': round(jaccard, 3),
+            'name_similarity': round(ratio(ra['canonical'], rb['canonical']), 3),
+            'cas': cas,
+            'cosing_id': cosing,
+            'proposed_by': sorted(set(sources)),
+        }
+
+    def is_duplicate(self, ev: Dict[str, Any]) -> bool:
+        """Accept a pair on strong name evidence, or on identifier agreement with related names.
+
+        Identifiers alone are not enough: CAS numbers and COSING ids in the
+        corpus were partly filled in by partial-name matching. Names alone
+        need the stricter name_only_threshold and must not differ only in a
+        grade code, since trade-name grades are usually different materials.
+        """
+        if ev['cas'] == 'conflict':
+            return False
+        if ev['canonical_match']:
+            return True
+        if ev['cas'] == 'agree' or ev['cosing_id'] == 'agree':
+            return ev['name_jaccard'] >= self.threshold
+        return (not ev['grade_conflict']
+                and ev['name_jaccard'] >= self.name_only_threshold
+                and ev['name_similarity'] >= self.name_only_threshold)
+
+    def find_groups(self) -> List[Dict[str, Any]]:
+        """Union accepted pairs into duplicate groups with their evidence."""
+        parent = list(range(len(self.records)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        accepted = []
+        for (a, b), sources in self.candidate_pairs().items():
+            ev = self.evidence(a, b, sources)
+            if self.is_duplicate(ev):
+                accepted.append((a, ev))
+                parent[find(a)] = find(b)
+        self.stats['accepted_pairs'] = len(accepted)
+
+        members = defaultdict(list)
+        for i in range(len(self.records)):
+            members[find(i)].append(i)
+        group_evidence = defaultdict(list)
+        for a, ev in accepted:
+            group_evidence[find(a)].append(ev)
+
+        groups = []
+        for root, indexes in members.items():
+            if len(indexes) < 2:
+                continue
+            ranked = sorted(indexes, key=lambda i: (-self.records[i]['usage'], self.records[i]['id']))
+            groups.append({
+                'canonical_id': self.records[ranked[0]]['id'],
+                'members': [{k: self.records[i][k] for k in ('id', 'name', 'file')} for i in ranked],
+                'evidence': group_evidence[root],
+            })
+        groups.sort(key=lambda g: (-len(g['members']), g['canonical_id']))
+        self.stats['groups'] = len(groups)
+        return groups
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Find near-duplicate ingredient records")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="Minimum name Jaccard for pairs whose CAS or COSING id agrees")
+    parser.add_argument('--name-only-threshold', type=float, default=NAME_ONLY_THRESHOLD,
+                        help="Minimum name Jaccard/similarity for pairs without identifier agreement")
+    parser.add_argument('--output', help="Output path (default: <vessels_root>/ingredient_merge_candidates.json)")
+    args = parser.parse_args()
+
+    dedup = IngredientDeduplicator(args.vessels_root, args.threshold, args.name_only_threshold)
+    print("Loading ingredients...")
+    dedup.load_ingredients()
+    print(f"  Loaded {len(dedup.records)} records")
+
+    groups = dedup.find_groups()
+    print(f"\n  Candidate pairs: {dedup.stats['candidate_pairs']}")
+    print(f"  Accepted pairs: {dedup.stats['accepted_pairs']}")
+    print(f"  Duplicate groups: {dedup.stats['groups']}")
+    for group in groups[:20]:
+        names = ', '.join(f"{m['id']} ({m['name']})" for m in group['members'])
+        print(f"    {group['canonical_id']}: {names}")
+
+    output = Path(args.output) if args.output else Path(args.vessels_root) / 'ingredient_merge_candidates.json'
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'stats': dict(dedup.stats), 'groups': groups}, f, indent=2, ensure_ascii=False)
+    print(f"\nMerge candidates saved to: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Streaming JSONL Export
+Streams vessel entities into chunked JSONL files (optionally gzipped) with a
+manifest of row counts and content hashes. Replaces the monolithic
+enriched_ingredients_for_db.json and database_schemas/*_data.json seed files.
+
+Rows are produced by generators and written one at a time, so memory stays
+flat regardless of catalog size. Each chunk is renamed into place when
+complete and the manifest is rewritten after every chunk; readers following
+the manifest can start loading while the export is still running.
+"""
+
+import csv
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Callable
+
+from vessel_reader import load_vessel
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+DEFAULT_CHUNK_ROWS = 10_000
+FOLLOW_TIMEOUT = 600.0    # seconds a follower waits for the next chunk
+
+INGREDIENT_ID = re.compile(r'^R\d+$')
+
+
+# ----------------------------------------------------------------------
+# Datasets
+# ----------------------------------------------------------------------
+
+def _blank_to_none(value: Optional[str]) -> Optional[str]:
+    value = (value or '').strip()
+    return value or None
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_bool(value: Optional[str]) -> bool:
+    return (value or '').strip().lower() in ('yes', 'true', '1', 'y')
+
+
+def iter_json_files(directory: Path, pattern: str = '*.json') -> Iterator[Dict[str, Any]]:
+    """Yield parsed JSON objects from a directory, one file at a time."""
+    for json_file in sorted(directory.glob(pattern)):
+        try:
+            data = load_vessel(json_file)
+        except Exception as e:
+            print(f"  ⚠ Skipping {json_file.name}: {e}", file=sys.stderr)
+            continue
+        if isinstance(data, dict):
+            yield data
+
+
+def ingredient_suppliers(vessels_root: Path) -> Dict[str, str]:
+    """Ingredient -> supplier from SUPPLIER_PROVIDES_INGREDIENT edge files."""
+    suppliers = {}
+    for edge in iter_json_files(vessels_root / 'edges', 'B19EDG_*.json'):
+        if edge.get('type') == 'SUPPLIER_PROVIDES_INGREDIENT':
+            suppliers.setdefault(edge['target_id'], edge['source_id'])
+    return suppliers
+
+
+def iter_rs_nodes(repo_root: Path) -> Iterator[Dict[str, str]]:
+    nodes_csv = repo_root / 'RSNodes_updated.csv'
+    if not nodes_csv.exists():
+        return
+    with open(nodes_csv, 'r', encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def node_row(row: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        'id': row['Id'],
+        'label': row.get('Label', ''),
+        'timeset': _blank_to_none(row.get('timeset')),
+        'modularity_class': _to_int(row.get('modularity_class')),
+        'availability_status': _blank_to_none(row.get('Availability_Status')),
+        'research_notes': _blank_to_none(row.get('Research_Notes')),
+        'contact_required': _to_bool(row.get('Contact_Required')),
+        'strategic_priority': _blank_to_none(row.get('Strategic_Priority')),
+    }
+
+
+def iter_suppliers(vessels_root: Path, repo_root: Path) -> Iterator[Dict[str, Any]]:
+    """Supplier rows for the suppliers table (RSNodes_updated.csv)."""
+    for row in iter_rs_nodes(repo_root):
+        if INGREDIENT_ID.match(row.get('Id', '')):
+            continue
+        record = node_row(row)
+        record.update({
+            'website_url': _blank_to_none(row.get('Website_URL')),
+            'product_count': _to_int(row.get('Product_Count')) or 0,
+            'pricing_available': _to_bool(row.get('Pricing_Available')),
+            'new_products': _blank_to_none(row.get('New_Products')),
+            'discontinued_products': _blank_to_none(row.get('Discontinued_Products')),
+            'technical_support': _blank_to_none(row.get('Technical_Support')),
+            'certifications': _blank_to_none(row.get('Certifications')),
+            'supply_chain_risk': _blank_to_none(row.get('Supply_Chain_Risk')),
+            'contact_info': _blank_to_none(row.get('Contact_Info')),
+            'last_updated': _blank_to_none(row.get('Last_Updated')),
+        })
+        yield record
+
+
+def iter_ingredients(vessels_root: Path, repo_root: Path) -> Iterator[Dict[str, Any]]:
+    """Ingredient rows for the ingredients table, with their supplier."""
+    suppliers = ingredient_suppliers(vessels_root)
+    for row in iter_rs_nodes(repo_root):
+        if not INGREDIENT_ID.match(row.get('Id', '')):
+            continue
+        record = node_row(row)
+        record['supplier_id'] = suppliers.get(record['id'])
+        yield record
+
+
+def iter_edges(vessels_root: Path, repo_root: Path) -> Iterator[Dict[str, Any]]:
+    """Ingredient -> supplier rows for the supplier_edges table."""
+    for edge in iter_json_files(vessels_root / 'edges', 'B19EDG_*.json'):
+        if edge.get('type') != 'SUPPLIER_PROVIDES_INGREDIENT':
+            continue
+        yield {
+            'source': edge['target_id'],
+            'target': edge['source_id'],
+            'type': 'Directed',
+            'label': None,
+            'timeset': None,
+            'weight': edge.get('properties', {}).get('weight', 1),
+        }
+
+
+def iter_capabilities(vessels_root: Path, repo_root: Path) -> Iterator[Dict[str, Any]]:
+    """Rows for the supplier_capabilities table (supplier_capability_matrix.csv)."""
+    matrix_csv = repo_root / 'supplier_capability_matrix.csv'
+    if not matrix_csv.exists():
+        return
+    with open(matrix_csv, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            record = {key.lower(): _blank_to_none(value) for key, value in row.items()}
+            record['ingredients_count'] = _to_int(row.get('Ingredients_Count')) or 0
+            yield record
+
+
+def iter_enriched_ingredients(vessels_root: Path, repo_root: Path) -> Iterator[Dict[str, Any]]:
+    """COSING-enriched raw materials from vessels/ingredients."""
+    for data in iter_json_files(vessels_root / 'ingredients'):
+        if not (data.get('cosing_id') or data.get('cas_number')):
+            continue
+        yield {
+            'id': data.get('id'),
+            'inci_name': data.get('inci_name', ''),
+            'cas_number': data.get('cas_number', ''),
+            'function': data.get('function', ''),
+            'cosing_id': data.get('cosing_id', ''),
+            'cosing_inci_name': data.get('cosing_inci_name', ''),
+        }
+
+
+DATASETS: Dict[str, Callable[[Path, Path], Iterator[Dict[str, Any]]]] = {
+    'suppliers': iter_suppliers,
+    'ingredients': iter_ingredients,
+    'edges': iter_edges,
+    'capabilities': iter_capabilities,
+    'enriched_ingredients': iter_enriched_ingredients,
+}
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+
+def _write_json_atomic(path: Path, payload: Dict[str, Any]):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class JsonlExporter:
+    """Writes datasets as chunked JSONL and keeps the manifest current."""
+
+    def __init__(self, out_dir, chunk_rows: int = DEFAULT_CHUNK_ROWS, compress: bool = False):
+        self.out_dir = Path(out_dir)
+        self.chunk_rows = chunk_rows
+        self.compress = compress
+        self.manifest = {
+            'version': MANIFEST_VERSION,
+            'created_at': datetime.now().isoformat(),
+            'complete': False,
+            'datasets': {},
+        }
+
+    def _save_manifest(self):
+        _write_json_atomic(self.out_dir / MANIFEST_NAME, self.manifest)
+
+    def _open_chunk(self, dataset: str, number: int):
+        suffix = '.jsonl.gz' if self.compress else '.jsonl'
+        final = self.out_dir / f"{dataset}-{number:05d}{suffix}"
+        part = final.with_name(final.name + '.part')
+        handle = gzip.open(part, 'wb', compresslevel=6) if self.compress else open(part, 'wb')
+        return final, part, handle
+
+    def write_dataset(self, dataset: str, rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Stream rows into chunk files; returns the dataset's manifest entry."""
+        entry = {'rows': 0, 'chunks': [], 'complete': False}
+        self.manifest['datasets'][dataset] = entry
+        self._save_manifest()
+
+        handle = None
+        for row in rows:
+            if handle is None:
+                final, part, handle = self._open_chunk(dataset, len(entry['chunks']))
+                digest, count = hashlib.sha256(), 0
+            line = json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+            handle.write(line)
+            digest.update(line)
+            count += 1
+            if count >= self.chunk_rows:
+                self._close_chunk(entry, final, part, handle, digest, count)
+                handle = None
+        if handle is not None:
+            self._close_chunk(entry, final, part, handle, digest, count)
+
+        entry['complete'] = True
+        self._save_manifest()
+        return entry
+
+    def _close_chunk(self, entry, final: Path, part: Path, handle, digest, count: int):
+        handle.close()
+        os.replace(part, final)
+        entry['chunks'].append({'file': final.name, 'rows': count, 'sha256': digest.hexdigest()})
+        entry['rows'] += count
+        self._save_manifest()
+
+    def export(self, datasets: Dict[str, Iterable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        for dataset, rows in datasets.items():
+            self.write_dataset(dataset, rows)
+        self.manifest['complete'] = True
+        self._save_manifest()
+        return self.manifest
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+
+class ManifestError(Exception):
+    """Raised when an export is missing, unfinished or fails verification."""
+
+
+def read_manifest(export_dir) -> Dict[str, Any]:
+    path = Path(export_dir) / MANIFEST_NAME
+    if not path.exists():
+        raise ManifestError(f"No manifest in {export_dir}")
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ManifestError(f"Unsupported manifest version: {manifest.get('version')}")
+    return manifest
+
+
+def iter_chunk(path: Path, expected_sha256: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Yield rows of one chunk; its content hash is checked before the first row."""
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rb') as f:
+        content = f.read()
+    if expected_sha256 and hashlib.sha256(content).hexdigest() != expected_sha256:
+        raise ManifestError(f"Hash mismatch in {path.name}")
+    for line in content.splitlines():
+        yield json.loads(line)
+
+
+def iter_rows(export_dir, dataset: str, verify: bool = True, follow: bool = False,
+              poll_interval: float = 0.5, timeout: Optional[float] = FOLLOW_TIMEOUT) -> Iterator[Dict[str, Any]]:
+    """Stream the rows of a dataset.
+
+    With `follow=True` the reader waits for chunks of an export that is still
+    being written and stops once the dataset is marked complete. It gives up
+    when the finished export lacks the dataset, or when no new chunk has
+    appeared for `timeout` seconds (None waits indefinitely).
+    """
+    export_dir = Path(export_dir)
+    consumed = 0
+    last_progress = time.monotonic()
+    while True:
+        try:
+            manifest = read_manifest(export_dir)
+        except ManifestError:
+            if not follow:
+                raise
+            manifest = {'datasets': {}}
+        entry = manifest['datasets'].get(dataset)
+        if entry is None and (not follow or manifest.get('complete')):
+            raise ManifestError(f"Dataset {dataset} not in export {export_dir}")
+
+        chunks = entry['chunks'] if entry else []
+        for chunk in chunks[consumed:]:
+            yield from iter_chunk(export_dir / chunk['file'], chunk['sha256'] if verify else None)
+            consumed += 1
+            last_progress = time.monotonic()
+
+        if entry and entry.get('complete'):
+            return
+        if not follow:
+            raise ManifestError(f"Dataset {dataset} in {export_dir} is incomplete")
+        if timeout is not None and time.monotonic() - last_progress > timeout:
+            raise ManifestError(f"Timed out waiting for {dataset} in {export_dir}")
+        time.sleep(poll_interval)
+
+
+def iter_batches(rows: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Group a row stream into lists of at most batch_size rows."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def verify_export(export_dir) -> Dict[str, int]:
+    """Re-read every chunk and check row counts and hashes against the manifest."""
+    manifest = read_manifest(export_dir)
+    counts = {}
+    for dataset, entry in manifest['datasets'].items():
+        rows = 0
+        for chunk in entry['chunks']:
+            chunk_rows = sum(1 for _ in iter_chunk(Path(export_dir) / chunk['file'], chunk['sha256']))
+            if chunk_rows != chunk['rows']:
+                raise ManifestError(f"{chunk['file']}: {chunk_rows} rows, manifest says {chunk['rows']}")
+            rows += chunk_rows
+        counts[dataset] = rows
+    return counts
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Stream vessel entities into chunked JSONL")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--repo-root', help="Directory holding RSNodes_updated.csv (default: parent of vessels_root)")
+    parser.add_argument('--out', help="Export directory (default: <vessels_root>/exports)")
+    parser.add_argument('--dataset', action='append', choices=sorted(DATASETS),
+                        help="Dataset to export (repeatable; default: all)")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--gzip', action='store_true', help="Gzip chunk files")
+    parser.add_argument('--verify', action='store_true', help="Verify an existing export instead of writing")
+    args = parser.parse_args()
+
+    vessels_root = Path(args.vessels_root)
+    repo_root = Path(args.repo_root) if args.repo_root else vessels_root.resolve().parent
+    out_dir = Path(args.out) if args.out else vessels_root / 'exports'
+
+    if args.verify:
+        try:
+            counts = verify_export(out_dir)
+        except ManifestError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        for dataset, rows in counts.items():
+            print(f"  ✓ {dataset}: {rows} rows")
+        return
+
+    names = args.dataset or list(DATASETS)
+    exporter = JsonlExporter(out_dir, args.chunk_rows, args.gzip)
+    print(f"Exporting {', '.join(names)} to {out_dir}...")
+    manifest = exporter.export({name: DATASETS[name](vessels_root, repo_root) for name in names})
+    for dataset, entry in manifest['datasets'].items():
+        print(f"  ✓ {dataset}: {entry['rows']} rows in {len(entry['chunks'])} chunk(s)")
+    print(f"\nManifest saved to: {out_dir / MANIFEST_NAME}")
+
+
+if __name__ == '__main__':
+    main()
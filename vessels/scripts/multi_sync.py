@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Multi-Sink Sync
+Refreshes Supabase and Neon (or a SQL file) from one pass over the COSING
+export and the vessel datasets:
+
+- the COSING rows (mapped with the importer's to_ingredient) and the
+  jsonl_export datasets are read and transformed once, on the main thread;
+- every row chunk is handed to each sink's bounded queue, and one worker
+  thread per sink (batch_worker.BatchWorker) re-batches it to that sink's batch size and writes it,
+  retrying a failed batch with exponential backoff;
+- a slow sink only holds the producer back once its buffer is full, so the
+  other sinks never fall more than one buffer behind it and the run takes
+  about as long as the slowest sink.
+
+    python multi_sync.py .. --sink supabase --sink neon:500
+
+Rows are shared between the sinks and must not be modified by them.
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+from batch_worker import BatchWorker
+from jsonl_export import DATASETS
+from seed_loader import TABLES, open_sink
+
+SCRIPTS_ROOT = Path(__file__).resolve().parents[2] / 'scripts'
+SINKS = ('supabase', 'neon', 'sql')
+
+# Dataset -> table, in foreign-key order; COSING lives in public, the seed tables in skin_twin
+SYNC_TABLES = {'cosing': 'public.cosing_ingredients',
+               **{dataset: f'skin_twin.{table}' for dataset, table in TABLES.items()}}
+
+BATCH_SIZE = 100
+BUFFER_ROWS = 5000       # rows a sink may fall behind before the producer waits
+CHUNK_ROWS = 100         # rows per queue item
+MAX_RETRIES = 3
+BACKOFF = 1.0            # seconds before the first retry; doubles per attempt, capped at 30
+
+
+def iter_cosing(vessels_root: Path, repo_root: Path) -> Iterator[Dict[str, Any]]:
+    """cosing_ingredients records, mapped like scripts/import_cosing_to_supabase.py."""
+    from cosing_catalog import find_cosing_file, iter_cosing_rows
+    if str(SCRIPTS_ROOT) not in sys.path:
+        sys.path.append(str(SCRIPTS_ROOT))
+    from import_cosing_to_supabase import to_ingredient
+
+    cosing_csv = find_cosing_file(vessels_root)
+    if cosing_csv is None:
+        raise FileNotFoundError(f"No COSING export under {Path(vessels_root) / 'cosing'}")
+    for row in iter_cosing_rows(cosing_csv):
+        try:
+            yield to_ingredient(row)
+        except (KeyError, ValueError):
+            continue
+
+
+SOURCES = {'cosing': iter_cosing, **{dataset: DATASETS[dataset] for dataset in TABLES}}
+
+
+# ----------------------------------------------------------------------
+# Sink workers
+# ----------------------------------------------------------------------
+
+class SinkWorker(BatchWorker):
+    """Bounded queue + writer thread for one sink, with its own batching and retries."""
+
+    def __init__(self, name: str, sink, batch_size: int = BATCH_SIZE, buffer_rows: int = BUFFER_ROWS,
+                 max_retries: int = MAX_RETRIES, backoff: float = BACKOFF):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        super().__init__(name, sink, batch_size, buffer_rows // CHUNK_ROWS)
+
+    def _write(self, table: str, rows: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.write(table, rows)
+                self.writer_stats['written'] += len(rows)
+                self.writer_stats['batches'] += 1
+                break
+            except Exception as e:
+                error = f"{table}: {str(e)[:200]}"
+                if attempt < self.max_retries:
+                    self.writer_stats['retries'] += 1
+                    time.sleep(min(self.backoff * 2 ** attempt, 30))
+        else:
+            self.writer_stats['failed'] += len(rows)
+            self.last_error = error
+        self.writer_stats['write_seconds'] += time.perf_counter() - started
+
+
+# ----------------------------------------------------------------------
+# Fan-out
+# ----------------------------------------------------------------------
+
+class MultiSinkSync:
+    """Reads and transforms each dataset once and fans the rows out to every sink."""
+
+    def __init__(self, vessels_root, workers: List[SinkWorker], repo_root=None):
+        self.vessels_root = Path(vessels_root)
+        self.repo_root = Path(repo_root) if repo_root else self.vessels_root.resolve().parent
+        self.workers = workers
+        self.stats = defaultdict(int)
+
+    def _chunks(self, dataset: str) -> Iterator[List[Dict[str, Any]]]:
+        chunk: List[Dict[str, Any]] = []
+        for row in SOURCES[dataset](self.vessels_root, self.repo_root):
+            chunk.append(row)
+            if len(chunk) >= CHUNK_ROWS:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, datasets: List[str]) -> Tuple[float, Dict[str, Dict[str, Any]]]:
+        """Sync the datasets in SYNC_TABLES order; returns the wall time and per-sink metrics."""
+        started = time.perf_counter()
+        try:
+            for dataset in [name for name in SYNC_TABLES if name in datasets]:
+                table = SYNC_TABLES[dataset]
+                before = self.stats['rows']
+                for chunk in self._chunks(dataset):
+                    self.stats['rows'] += len(chunk)
+                    for worker in self.workers:
+                        worker.put(table, chunk)
+                self.stats[dataset] = self.stats['rows'] - before
+                print(f"  ✓ {dataset}: {self.stats[dataset]} rows read -> {table}")
+        finally:
+            metrics = {worker.name: worker.close() for worker in self.workers}
+        return time.perf_counter() - started, metrics
+
+
+def parse_sink(value: str) -> Tuple[str, Optional[int]]:
+    """`name` or `name:batch_size` for --sink."""
+    name, _, size = value.partition(':')
+    if name not in SINKS:
+        raise argparse.ArgumentTypeError(f"unknown sink {name!r} (choose from {', '.join(SINKS)})")
+    try:
+        return name, int(size) if size else None
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid batch size in {value!r}")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Sync COSING and vessel data to several sinks in one pass")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--repo-root', help="Directory holding RSNodes_updated.csv (default: parent of vessels_root)")
+    parser.add_argument('--sink', action='append', type=parse_sink, required=True, metavar='NAME[:BATCH]',
+                        help=f"Sink to write ({', '.join(SINKS)}), optionally with its batch size (repeatable)")
+    parser.add_argument('--dataset', action='append', choices=list(SYNC_TABLES),
+                        help="Dataset to sync (repeatable; default: all)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Default batch size per sink")
+    parser.add_argument('--buffer', type=int, default=BUFFER_ROWS,
+                        help="Rows a sink may fall behind before reading waits for it")
+    parser.add_argument('--retries', type=int, default=MAX_RETRIES)
+    parser.add_argument('--sql-out', default='sync_data.sql', help="Output file for --sink sql")
+    args = parser.parse_args()
+
+    names = [name for name, _ in args.sink]
+    if len(set(names)) != len(names):
+        parser.error("each sink may be given once")
+    datasets = args.dataset or list(SYNC_TABLES)
+
+    workers = []
+    for name, batch_size in args.sink:
+        try:
+            sink = open_sink(name, args.sql_out)
+        except Exception as e:
+            for worker in workers:
+                worker.close()
+            print(f"✗ {name}: {e}")
+            sys.exit(1)
+        workers.append(SinkWorker(name, sink, batch_size or args.batch_size, args.buffer, args.retries))
+
+    print(f"Syncing {', '.join(datasets)} to {', '.join(names)}...")
+    sync = MultiSinkSync(args.vessels_root, workers, args.repo_root)
+    elapsed, metrics = sync.run(datasets)
+
+    print(f"\n{sync.stats['rows']} rows read once in {elapsed:.2f}s")
+    failed = False
+    for name, stats in metrics.items():
+        marker = '✗' if stats.get('failed') else '✓'
+        failed = failed or bool(stats.get('failed'))
+        print(f"  {marker} {name}: {stats.get('written', 0)} written in {stats.get('batches', 0)} batch(es), "
+              f"{stats.get('failed', 0)} failed, {stats.get('retries', 0)} retries; "
+              f"done at {stats.get('finished_seconds', 0):.2f}s, "
+              f"reading waited {stats.get('blocked_seconds', 0):.2f}s on it")
+        if stats.get('last_error'):
+            print(f"      {stats['last_error']}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Seed Data Loader
+Feeds a JSONL export (see jsonl_export.py) into Supabase or Neon batch by
+batch. Rows are streamed from the chunk files, so only one batch is held in
+memory, and `--follow` starts loading while the export is still running.
+
+Sinks:
+  supabase  REST upserts via supabase-py (SUPABASE_URL / SUPABASE_KEY)
+  neon      INSERT transactions via manus-mcp-cli (NEON_PROJECT_ID)
+  sql       INSERT statements written to a file, for review or psql
+
+Tables with a key in UPSERT_KEYS are upserted (ON CONFLICT ... DO UPDATE),
+so loading a newer export refreshes the rows already there; other tables
+(append-only logs) skip rows that conflict.
+"""
+
+import json
+import math
+import os
+import subprocess
+import sys
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Tuple
+
+from jsonl_export import iter_rows, iter_batches, read_manifest, ManifestError
+
+# Dataset -> table, in foreign-key order
+TABLES = {
+    'suppliers': 'suppliers',
+    'ingredients': 'ingredients',
+    'edges': 'supplier_edges',
+    'capabilities': 'supplier_capabilities',
+}
+# Conflict key per table, backed by a primary key or unique index (see
+# database_schemas/*_schema.sql); a re-sent row updates the stored one
+UPSERT_KEYS: Dict[str, Tuple[str, ...]] = {
+    'cosing_ingredients': ('cosing_ref_no',),
+    'suppliers': ('id',),
+    'ingredients': ('id',),
+    'supplier_edges': ('source', 'target'),
+    'supplier_capabilities': ('supplier_id',),
+}
+# Supabase keeps the seed tables in public (database_schemas/supabase_schema.sql)
+SUPABASE_PUBLIC = frozenset(TABLES.values()) | {'cosing_ingredients'}
+
+NEON_PROJECT_ID = os.environ.get('NEON_PROJECT_ID', 'damp-brook-31747632')
+
+
+def sql_literal(value: Any) -> str:
+    """Render a JSON value as a PostgreSQL literal."""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and not math.isfinite(value):
+        return "'NaN'::float8" if math.isnan(value) else f"'{'-' if value < 0 else ''}Infinity'::float8"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (dict, list)):
+        return sql_literal(json.dumps(value, ensure_ascii=False)) + '::jsonb'
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def upsert_key(table: str) -> Optional[Tuple[str, ...]]:
+    """Conflict key of a (possibly schema-qualified) table, if it has one."""
+    return UPSERT_KEYS.get(table.rpartition('.')[2])
+
+
+def unique_rows(rows: List[Dict[str, Any]], key: Optional[Tuple[str, ...]]) -> List[Dict[str, Any]]:
+    """The last row per key (one statement may not upsert the same row twice)."""
+    if not key:
+        return rows
+    return list({tuple(row.get(column) for column in key): row for row in rows}.values())
+
+
+def insert_statement(table: str, rows: List[Dict[str, Any]]) -> str:
+    """Multi-row upsert for a batch over the union of its rows' columns (missing -> NULL)."""
+    key = upsert_key(table)
+    rows = unique_rows(rows, key)
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    values = ',\n'.join('(' + ', '.join(sql_literal(row.get(c)) for c in columns) + ')' for row in rows)
+    updates = [column for column in columns if column not in (key or ())]
+    if key and updates:
+        conflict = (f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET "
+                    + ', '.join(f"{column} = EXCLUDED.{column}" for column in updates))
+    else:
+        conflict = "ON CONFLICT DO NOTHING"
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES\n{values}\n{conflict}"
+
+
+def qualified(table: str, schema: Optional[str]) -> str:
+    """Prefix the sink's schema unless the table name already carries one."""
+    return f"{schema}.{table}" if schema and '.' not in table else table
+
+
+class SupabaseSink:
+    def __init__(self):
+        from supabase import create_client
+        url = os.environ.get("SUPABASE_URL")
+        key = os.environ.get("SUPABASE_KEY")
+        if not url or not key:
+            raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set")
+        self.client = create_client(url, key)
+
+    def write(self, table: str, rows: List[Dict[str, Any]]):
+        schema, _, name = table.rpartition('.')
+        if not schema or name in SUPABASE_PUBLIC:
+            target = self.client.table(name)
+        else:
+            # Must be one of the project's exposed schemas
+            target = self.client.schema(schema).table(name)
+        key = upsert_key(name)
+        if key:
+            target.upsert(unique_rows(rows, key), on_conflict=','.join(key),
+                          ignore_duplicates=False).execute()
+        else:
+            target.insert(rows).execute()
+
+    def close(self):
+        pass
+
+
+class NeonSink:
+    def __init__(self, project_id: str = NEON_PROJECT_ID, schema: str = 'skin_twin'):
+        self.project_id = project_id
+        self.schema = schema
+
+    def write(self, table: str, rows: List[Dict[str, Any]]):
+        input_data = {
+            "params": {
+                "projectId": self.project_id,
+                "sqlStatements": [insert_statement(qualified(table, self.schema), rows)],
+            }
+        }
+        cmd = ["manus-mcp-cli", "tool", "call", "run_sql_transaction",
+               "--server", "neon", "--input", json.dumps(input_data)]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"manus-mcp-cli exited {result.returncode}")
+
+    def close(self):
+        pass
+
+
+class SqlFileSink:
+    def __init__(self, path, schema: Optional[str] = None):
+        self.schema = schema
+        self.handle = open(path, 'w', encoding='utf-8')
+
+    def write(self, table: str, rows: List[Dict[str, Any]]):
+        self.handle.write(insert_statement(qualified(table, self.schema), rows) + ';\n\n')
+
+    def close(self):
+        self.handle.close()
+
+
+def open_sink(name: str, sql_out: str = 'seed_data.sql', sql_schema: Optional[str] = None):
+    """Sink for a --sink choice."""
+    if name == 'supabase':
+        return SupabaseSink()
+    if name == 'neon':
+        return NeonSink()
+    return SqlFileSink(sql_out, sql_schema)
+
+
+class SeedLoader:
+    def __init__(self, export_dir, sink, batch_size: int = 100):
+        self.export_dir = Path(export_dir)
+        self.sink = sink
+        self.batch_size = batch_size
+        self.stats = defaultdict(int)
+
+    def load_dataset(self, dataset: str, table: Optional[str] = None, follow: bool = False):
+        table = table or TABLES[dataset]
+        print(f"Loading {dataset} -> {table}...")
+        for batch_num, batch in enumerate(iter_batches(iter_rows(self.export_dir, dataset, follow=follow),
+                                                       self.batch_size), 1):
+            try:
+                self.sink.write(table, batch)
+                self.stats[f'{dataset}_loaded'] += len(batch)
+            except Exception as e:
+                self.stats[f'{dataset}_errors'] += len(batch)
+                print(f"  ✗ Batch {batch_num} ({len(batch)} rows): {str(e)[:100]}")
+        print(f"  ✓ {self.stats[f'{dataset}_loaded']} rows loaded, "
+              f"{self.stats[f'{dataset}_errors']} failed")
+
+    def load(self, datasets: List[str], follow: bool = False):
+        for dataset in datasets:
+            self.load_dataset(dataset, follow=follow)
+        self.sink.close()
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Load a JSONL export into Supabase or Neon")
+    parser.add_argument('export_dir', help="Directory holding manifest.json")
+    parser.add_argument('--sink', choices=['supabase', 'neon', 'sql'], required=True)
+    parser.add_argument('--sql-out', default='seed_data.sql', help="Output file for --sink sql")
+    parser.add_argument('--dataset', action='append', choices=sorted(TABLES),
+                        help="Dataset to load (repeatable; default: all seed tables)")
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--follow', action='store_true', help="Wait for an export that is still running")
+    args = parser.parse_args()
+
+    datasets = [name for name in TABLES if name in (args.dataset or TABLES)]
+    if not args.follow:
+        try:
+            read_manifest(args.export_dir)
+        except ManifestError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+
+    loader = SeedLoader(args.export_dir, open_sink(args.sink, args.sql_out), args.batch_size)
+    loader.load(datasets, follow=args.follow)
+    if any(key.endswith('_errors') and count for key, count in loader.stats.items()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
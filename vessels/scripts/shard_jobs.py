@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Sharded Validation and Enrichment Jobs
+Runs VesselsDataValidator, the enrichers and FormulationFixer over one shard
+of the vessel tree (see sharding.py) and writes a partial result; a reduce
+step merges the partials into the usual reports.
+
+Shard jobs are independent: run them as local processes (`local`) or on
+separate machines (`run` on each, then copy the partial and findings files
+together and `reduce`). Reference integrity crosses shards, so validation
+partials carry the ingredient IDs each shard defines and the references it
+makes, and the reduce step checks references against the union.
+
+    python shard_jobs.py run validate ../ --shard 0 --num-shards 4
+    python shard_jobs.py reduce validate ../ --num-shards 4
+    python shard_jobs.py local validate ../ --num-shards 4 --workers 4
+"""
+
+import json
+import subprocess
+import sys
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any
+
+from sharding import merge_stats
+
+JOBS = ['validate', 'enrich', 'advanced-enrich', 'fix']
+
+
+def partial_path(partials_dir: Path, job: str, shard: int, num_shards: int) -> Path:
+    return partials_dir / f"{job}-{shard}-of-{num_shards}.json"
+
+
+def findings_path(partials_dir: Path, shard: int, num_shards: int) -> Path:
+    return partials_dir / f"validate-{shard}-of-{num_shards}.findings.jsonl"
+
+
+def cosing_csv_path(vessels_root: str) -> Path:
+    return Path(vessels_root) / "cosing" / "ingredients.csv"
+
+
+# ----------------------------------------------------------------------
+# Map: one shard
+# ----------------------------------------------------------------------
+
+def run_validate(vessels_root: str, shard: int, num_shards: int, partials_dir: Path) -> Dict[str, Any]:
+    from validate_vessels_data import VesselsDataValidator
+    from validation_report import ValidationReporter
+
+    partials_dir.mkdir(parents=True, exist_ok=True)
+    with ValidationReporter(findings_path(partials_dir, shard, num_shards)) as reporter:
+        validator = VesselsDataValidator(vessels_root, shard, num_shards, report=reporter)
+        print(f"Validating shard {shard + 1}/{num_shards}...")
+        validator.validate_json_files()
+        validator.validate_formulations()
+        validator.validate_ingredients()
+        validator.validate_products()
+        validator.validate_edges()
+        ingredient_ids, references = validator.collect_reference_sets()
+    return {
+        'report': reporter.summary(),
+        'stats': dict(validator.stats),
+        'ingredient_ids': sorted(ingredient_ids),
+        'references': references,
+    }
+
+
+def run_enrich(vessels_root: str, shard: int, num_shards: int, partials_dir: Path) -> Dict[str, Any]:
+    from enrich_ingredients_and_fix_formulations import IngredientEnricher
+
+    enricher = IngredientEnricher(str(cosing_csv_path(vessels_root)), vessels_root)
+    enricher.enrich_all_ingredients(shard, num_shards)
+    return {'stats': dict(enricher.stats)}
+
+
+def run_advanced_enrich(vessels_root: str, shard: int, num_shards: int, partials_dir: Path) -> Dict[str, Any]:
+    from advanced_ingredient_enrichment import AdvancedIngredientEnricher
+
+    enricher = AdvancedIngredientEnricher(str(cosing_csv_path(vessels_root)), vessels_root)
+    enricher.enrich_all_ingredients(shard, num_shards)
+    return {'stats': dict(enricher.stats)}
+
+
+def run_fix(vessels_root: str, shard: int, num_shards: int, partials_dir: Path) -> Dict[str, Any]:
+    from enrich_ingredients_and_fix_formulations import FormulationFixer
+    from formulation_history import FormulationHistory
+
+    with FormulationHistory.open(vessels_root) as history:
+        fixer = FormulationFixer(vessels_root, history)
+        fixer.fix_all_formulations(shard, num_shards)
+    return {'stats': dict(fixer.stats)}
+
+
+RUNNERS = {
+    'validate': run_validate,
+    'enrich': run_enrich,
+    'advanced-enrich': run_advanced_enrich,
+    'fix': run_fix,
+}
+
+
+def run_shard(job: str, vessels_root: str, shard: int, num_shards: int, partials_dir: Path) -> Path:
+    """Run one shard of a job and write its partial result."""
+    if job in ('enrich', 'advanced-enrich') and not cosing_csv_path(vessels_root).exists():
+        raise FileNotFoundError(f"COSING database not found: {cosing_csv_path(vessels_root)}")
+    result = RUNNERS[job](vessels_root, shard, num_shards, partials_dir)
+    result.update({'job': job, 'shard': shard, 'num_shards': num_shards})
+
+    partials_dir.mkdir(parents=True, exist_ok=True)
+    path = partial_path(partials_dir, job, shard, num_shards)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    tmp.replace(path)
+    return path
+
+
+# ----------------------------------------------------------------------
+# Reduce
+# ----------------------------------------------------------------------
+
+def load_partials(job: str, num_shards: int, partials_dir: Path) -> List[Dict[str, Any]]:
+    """Load every shard's partial result; all shards must be present."""
+    partials, missing = [], []
+    for shard in range(num_shards):
+        path = partial_path(partials_dir, job, shard, num_shards)
+        if not path.exists():
+            missing.append(shard)
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            partials.append(json.load(f))
+    if missing:
+        raise FileNotFoundError(f"Missing {job} partials for shards: {', '.join(map(str, missing))}")
+    return partials
+
+
+def reduce_validate(vessels_root: str, partials: List[Dict[str, Any]], partials_dir: Path) -> Dict[str, Any]:
+    """Merge validation partials and check references across shards.
+
+    Shard findings files are concatenated into the root findings stream
+    (copied, never loaded); the summaries merge as counters and samples.
+    """
+    from validate_vessels_data import VesselsDataValidator
+    from validation_report import ValidationReporter
+
+    with ValidationReporter(Path(vessels_root) / 'validation_findings.jsonl') as reporter:
+        validator = VesselsDataValidator(vessels_root, report=reporter)
+        stats: Dict[str, Any] = {}
+        ingredient_ids = set()
+        for part in partials:
+            reporter.merge(part['report'])
+            shard_findings = findings_path(partials_dir, part['shard'], part['num_shards'])
+            if shard_findings.exists():
+                reporter.append_findings(shard_findings)
+            else:
+                print(f"⚠ Missing {shard_findings.name}; its findings are only counted")
+            merge_stats(stats, part['stats'])
+            ingredient_ids.update(part['ingredient_ids'])
+        validator.stats.update(stats)
+
+        print("\n[6/6] Validating cross-references across shards...")
+        for part in partials:
+            validator.check_references(ingredient_ids, part['references'])
+        print(f"   Missing ingredient references: {validator.stats['missing_ingredient_refs']}")
+
+        report = validator.generate_report()
+    report['stats']['shards'] = len(partials)
+    return report
+
+
+def reduce_stats(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {}
+    for part in partials:
+        merge_stats(stats, part['stats'])
+    return {'stats': stats, 'shards': len(partials)}
+
+
+def reduce_job(job: str, vessels_root: str, num_shards: int, partials_dir: Path) -> int:
+    """Merge partials into the job's report; returns the process exit code."""
+    partials = load_partials(job, num_shards, partials_dir)
+    if job == 'validate':
+        report = reduce_validate(vessels_root, partials, partials_dir)
+        report_file = Path(vessels_root) / 'validation_report.json'
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to: {report_file}")
+        return 1 if report['totals']['errors'] > 0 else 0
+
+    merged = reduce_stats(partials)
+    print(f"\n{job} results across {merged['shards']} shards:")
+    for key, value in sorted(merged['stats'].items()):
+        print(f"  {key}: {value}")
+    summary_file = partials_dir / f"{job}-summary.json"
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, indent=2)
+    print(f"\nSummary saved to: {summary_file}")
+    return 1 if merged['stats'].get('errors') else 0
+
+
+# ----------------------------------------------------------------------
+# Local driver
+# ----------------------------------------------------------------------
+
+def run_local(job: str, vessels_root: str, num_shards: int, workers: int, partials_dir: Path) -> int:
+    """Run every shard as a separate local process, then reduce."""
+    script = Path(__file__).resolve()
+
+    def launch(shard: int) -> int:
+        cmd = [sys.executable, str(script), 'run', job, vessels_root,
+               '--shard', str(shard), '--num-shards', str(num_shards), '--partials', str(partials_dir)]
+        log_file = partials_dir / f"{job}-{shard}-of-{num_shards}.log"
+        with open(log_file, 'w', encoding='utf-8') as log:
+            return subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT, cwd=script.parent).returncode
+
+    partials_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Running {job} as {num_shards} shard processes ({workers} at a time)...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        codes = list(pool.map(launch, range(num_shards)))
+    failed = [shard for shard, code in enumerate(codes) if code != 0]
+    for shard in range(num_shards):
+        print(f"  {'✗' if shard in failed else '✓'} shard {shard}")
+    if failed:
+        print(f"✗ Shards failed: {', '.join(map(str, failed))} (see logs in {partials_dir})")
+        return 1
+    return reduce_job(job, vessels_root, num_shards, partials_dir)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Sharded vessel validation and enrichment")
+    parser.add_argument('mode', choices=['run', 'reduce', 'local'])
+    parser.add_argument('job', choices=JOBS)
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--shard', type=int, default=0, help="Shard to run (mode 'run')")
+    parser.add_argument('--num-shards', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent processes (mode 'local')")
+    parser.add_argument('--partials', help="Partial results directory (default: <vessels_root>/shard_results)")
+    # Intermixed, so vessels_root may also follow the options
+    args = parser.parse_intermixed_args()
+
+    vessels_root = str(Path(args.vessels_root).resolve())
+    partials_dir = Path(args.partials).resolve() if args.partials else Path(vessels_root) / 'shard_results'
+    if not 0 <= args.shard < args.num_shards:
+        print(f"✗ --shard must be between 0 and {args.num_shards - 1}")
+        sys.exit(2)
+
+    try:
+        if args.mode == 'run':
+            path = run_shard(args.job, vessels_root, args.shard, args.num_shards, partials_dir)
+            print(f"\nPartial result saved to: {path}")
+            code = 0
+        elif args.mode == 'reduce':
+            code = reduce_job(args.job, vessels_root, args.num_shards, partials_dir)
+        else:
+            code = run_local(args.job, vessels_root, args.num_shards, args.workers, partials_dir)
+    except FileNotFoundError as e:
+        print(f"✗ {e}")
+        code = 1
+    sys.exit(code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Vessel Sharding
+Partitions the vessel tree into N shards by a stable hash of each entity id,
+so validation and enrichment can run as independent per-shard jobs on one or
+many machines. The entity id is the file stem, which keeps the .json and
+.form/.prod/.supp/.inci files of one entity in the same shard.
+"""
+
+import zlib
+from pathlib import Path
+from typing import Dict, List, Any, Iterable
+
+
+def entity_key(path) -> str:
+    """Entity id a vessel file belongs to (its name without extensions)."""
+    return Path(path).name.split('.', 1)[0]
+
+
+def shard_of(key: str, num_shards: int) -> int:
+    """Stable shard number of an entity id (identical across processes and machines)."""
+    if num_shards <= 1:
+        return 0
+    return zlib.crc32(key.encode('utf-8')) % num_shards
+
+
+def owns(path, shard: int, num_shards: int) -> bool:
+    return shard_of(entity_key(path), num_shards) == shard
+
+
+def shard_files(paths: Iterable[Path], shard: int, num_shards: int) -> List[Path]:
+    """The subset of paths owned by one shard, in sorted order."""
+    return sorted(p for p in paths if owns(p, shard, num_shards))
+
+
+def merge_stats(total: Dict[str, Any], part: Dict[str, Any]) -> Dict[str, Any]:
+    """Sum numeric counters from a partial result into a running total (nested dicts too)."""
+    for key, value in part.items():
+        if isinstance(value, dict):
+            merge_stats(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+        else:
+            total.setdefault(key, value)
+    return total
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+String Similarity Scoring for Ingredient Name Matching
+Bit-parallel Indel/Levenshtein distances and Jaro-Winkler similarity with
+score cutoffs, cached query patterns and a batch API for scoring one query
+against a block of candidates.
+
+`ratio` is the normalized Indel similarity 2*LCS/(len1+len2). This is the
+quantity difflib.SequenceMatcher.ratio() approximates with its matching-block
+heuristic, so thresholds tuned against SequenceMatcher (e.g. 0.85) keep their
+meaning; SequenceMatcher can only under-report it.
+"""
+
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Scorer = Callable[..., float]
+
+
+@lru_cache(maxsize=4096)
+def _pattern(s: str) -> Dict[str, int]:
+    """Build the per-character position bitmask of a string (cached per query)."""
+    masks: Dict[str, int] = {}
+    bit = 1
+    for ch in s:
+        masks[ch] = masks.get(ch, 0) | bit
+        bit <<= 1
+    return masks
+
+
+def lcs_length(s1: str, s2: str, min_lcs: int = 0) -> int:
+    """Longest common subsequence length using the bit-parallel LCS recurrence.
+
+    Returns 0 as soon as the LCS can no longer reach `min_lcs`.
+    """
+    if not s1 or not s2:
+        return 0
+    m = len(s1)
+    mask = (1 << m) - 1
+    pm = _pattern(s1)
+    S = mask
+    remaining = len(s2)
+    for ch in s2:
+        u = S & pm.get(ch, 0)
+        S = ((S + u) | (S - u)) & mask
+        remaining -= 1
+        if min_lcs and (m - S.bit_count()) + remaining < min_lcs:
+            return 0
+    return m - S.bit_count()
+
+
+def indel_distance(s1: str, s2: str, score_cutoff: Optional[int] = None) -> int:
+    """Minimum number of insertions and deletions turning s1 into s2.
+
+    If `score_cutoff` is given and the distance exceeds it, `score_cutoff + 1`
+    is returned without finishing the computation.
+    """
+    total = len(s1) + len(s2)
+    if score_cutoff is not None:
+        if abs(len(s1) - len(s2)) > score_cutoff:
+            return score_cutoff + 1
+        min_lcs = max(0, -(-(total - score_cutoff) // 2))
+        lcs = lcs_length(s1, s2, min_lcs)
+        dist = total - 2 * lcs
+        return dist if dist <= score_cutoff else score_cutoff + 1
+    return total - 2 * lcs_length(s1, s2)
+
+
+def levenshtein_distance(s1: str, s2: str, score_cutoff: Optional[int] = None) -> int:
+    """Unit-cost Levenshtein distance using Hyyrö's bit-parallel algorithm.
+
+    If `score_cutoff` is given and the distance exceeds it, `score_cutoff + 1`
+    is returned; the scan aborts once the remaining characters cannot bring
+    the distance back under the cutoff.
+    """
+    m, n = len(s1), len(s2)
+    if score_cutoff is not None and abs(m - n) > score_cutoff:
+        return score_cutoff + 1
+    if not m or not n:
+        dist = m or n
+        return dist if score_cutoff is None or dist <= score_cutoff else score_cutoff + 1
+
+    pm = _pattern(s1)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    VP, VN, dist = mask, 0, m
+    remaining = n
+    for ch in s2:
+        X = pm.get(ch, 0) | VN
+        D0 = ((((X & VP) + VP) ^ VP) | X) & mask
+        HP = (VN | ~(D0 | VP)) & mask
+        HN = VP & D0
+        if HP & last:
+            dist += 1
+        elif HN & last:
+            dist -= 1
+        HP = ((HP << 1) | 1) & mask
+        HN = (HN << 1) & mask
+        VP = (HN | ~(D0 | HP)) & mask
+        VN = HP & D0
+        remaining -= 1
+        if score_cutoff is not None and dist - remaining > score_cutoff:
+            return score_cutoff + 1
+    return dist if score_cutoff is None or dist <= score_cutoff else score_cutoff + 1
+
+
+def ratio(s1: str, s2: str, score_cutoff: float = 0.0) -> float:
+    """Normalized Indel similarity in [0, 1], on the SequenceMatcher.ratio() scale.
+
+    Returns 0.0 when the score is below `score_cutoff`.
+    """
+    total = len(s1) + len(s2)
+    if not total:
+        return 1.0
+    max_dist = int((1.0 - score_cutoff) * total + 1e-9)
+    dist = indel_distance(s1, s2, max_dist)
+    if dist > max_dist:
+        return 0.0
+    score = 1.0 - dist / total
+    return score if score >= score_cutoff else 0.0
+
+
+def levenshtein_ratio(s1: str, s2: str, score_cutoff: float = 0.0) -> float:
+    """Levenshtein similarity normalized by the longer string length."""
+    longest = max(len(s1), len(s2))
+    if not longest:
+        return 1.0
+    max_dist = int((1.0 - score_cutoff) * longest + 1e-9)
+    dist = levenshtein_distance(s1, s2, max_dist)
+    if dist > max_dist:
+        return 0.0
+    score = 1.0 - dist / longest
+    return score if score >= score_cutoff else 0.0
+
+
+def jaro_similarity(s1: str, s2: str, score_cutoff: float = 0.0) -> float:
+    """Jaro similarity with bit-parallel match flagging."""
+    len1, len2 = len(s1), len(s2)
+    if not len1 and not len2:
+        return 1.0
+    if not len1 or not len2:
+        return 0.0
+
+    # Upper bound assuming every character of the shorter string matches
+    shorter = min(len1, len2)
+    if (shorter / len1 + shorter / len2 + 1.0) / 3.0 < score_cutoff:
+        return 0.0
+
+    window = max(0, max(len1, len2) // 2 - 1)
+    pm = _pattern(s1)
+    flagged1 = 0
+    flagged2 = 0
+    matches = 0
+    for j, ch in enumerate(s2):
+        lo = max(0, j - window)
+        hi = min(len1, j + window + 1)
+        if lo >= hi:
+            continue
+        bound = ((1 << hi) - 1) ^ ((1 << lo) - 1)
+        candidates = pm.get(ch, 0) & bound & ~flagged1
+        if candidates:
+            flagged1 |= candidates & -candidates
+            flagged2 |= 1 << j
+            matches += 1
+
+    if not matches:
+        return 0.0
+
+    transpositions = 0
+    f1, f2 = flagged1, flagged2
+    while f2:
+        j = (f2 & -f2).bit_length() - 1
+        i = (f1 & -f1).bit_length() - 1
+        if s1[i] != s2[j]:
+            transpositions += 1
+        f1 &= f1 - 1
+        f2 &= f2 - 1
+
+    score = (matches / len1 + matches / len2 + (matches - transpositions // 2) / matches) / 3.0
+    return score if score >= score_cutoff else 0.0
+
+
+def jaro_winkler_similarity(s1: str, s2: str, prefix_weight: float = 0.1,
+                            score_cutoff: float = 0.0) -> float:
+    """Jaro-Winkler similarity (common prefix bonus capped at 4 characters)."""
+    prefix = 0
+    for a, b in zip(s1[:4], s2[:4]):
+        if a != b:
+            break
+        prefix += 1
+
+    # Translate the cutoff into the Jaro score it requires
+    jaro_cutoff = score_cutoff
+    if score_cutoff > 0.7 and prefix:
+        bonus = prefix * prefix_weight
+        jaro_cutoff = max(0.7, (score_cutoff - bonus) / (1.0 - bonus)) if bonus < 1.0 else 0.7
+
+    score = jaro_similarity(s1, s2, jaro_cutoff)
+    if score > 0.7:
+        score += prefix * prefix_weight * (1.0 - score)
+    return score if score >= score_cutoff else 0.0
+
+
+class CandidateBlock:
+    """A preprocessed block of candidate strings scored together against a query.
+
+    Candidates are processed once and bucketed by length, so a score cutoff
+    skips every bucket whose length alone rules out a match.
+    """
+
+    def __init__(self, choices: Iterable[str], processor: Optional[Callable[[str], str]] = None):
+        self.choices: List[str] = list(choices)
+        self.processed: List[str] = [processor(c) for c in self.choices] if processor else list(self.choices)
+        self.by_length: Dict[int, List[int]] = {}
+        for index, text in enumerate(self.processed):
+            self.by_length.setdefault(len(text), []).append(index)
+        self.lengths = sorted(self.by_length)
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def _eligible(self, query_len: int, scorer: Scorer, score_cutoff: float) -> Iterable[int]:
+        """Yield candidate indexes whose length can still reach the cutoff."""
+        for length in self.lengths:
+            if score_cutoff > 0 and not _length_can_match(scorer, query_len, length, score_cutoff):
+                continue
+            yield from self.by_length[length]
+
+    def extract(self, query: str, scorer: Scorer = ratio, score_cutoff: float = 0.0,
+                limit: Optional[int] = None) -> List[Tuple[str, float, int]]:
+        """Score `query` against every candidate, best first.
+
+        Returns (choice, score, index) tuples with score >= score_cutoff.
+        """
+        results = []
+        for index in self._eligible(len(query), scorer, score_cutoff):
+            score = scorer(query, self.processed[index], score_cutoff=score_cutoff)
+            if score and score >= score_cutoff:
+                results.append((self.choices[index], score, index))
+        results.sort(key=lambda r: (-r[1], r[2]))
+        return results[:limit] if limit is not None else results
+
+    def extract_one(self, query: str, scorer: Scorer = ratio,
+                    score_cutoff: float = 0.0) -> Optional[Tuple[str, float, int]]:
+        """Return the best (choice, score, index), or None below the cutoff.
+
+        The cutoff is raised to the best score found so far, so later
+        candidates abort as soon as they cannot win. Ties go to the
+        candidate that comes first in the block.
+        """
+        best: Optional[Tuple[str, float, int]] = None
+        cutoff = score_cutoff
+        for index in self._eligible(len(query), scorer, score_cutoff):
+            score = scorer(query, self.processed[index], score_cutoff=cutoff)
+            if not score or score < cutoff:
+                continue
+            if best is None or score > best[1] or (score == best[1] and index < best[2]):
+                best = (self.choices[index], score, index)
+                cutoff = score
+        return best
+
+
+def _length_can_match(scorer: Scorer, len1: int, len2: int, score_cutoff: float) -> bool:
+    """Check the length-only upper bound of a scorer against the cutoff."""
+    shorter, longer = min(len1, len2), max(len1, len2)
+    if not longer:
+        return True
+    if scorer is ratio:
+        return 2.0 * shorter / (len1 + len2) >= score_cutoff - 1e-9
+    if scorer is levenshtein_ratio:
+        return shorter / longer >= score_cutoff - 1e-9
+    if scorer is jaro_similarity:
+        if not shorter:
+            return False
+        return (shorter / len1 + shorter / len2 + 1.0) / 3.0 >= score_cutoff - 1e-9
+    return True
+
+
+def extract(query: str, choices: Sequence[str], scorer: Scorer = ratio, score_cutoff: float = 0.0,
+            limit: Optional[int] = None) -> List[Tuple[str, float, int]]:
+    """Score one query against a list of candidates (see CandidateBlock.extract)."""
+    return CandidateBlock(choices).extract(query, scorer, score_cutoff, limit)
+
+
+def extract_one(query: str, choices: Sequence[str], scorer: Scorer = ratio,
+                score_cutoff: float = 0.0) -> Optional[Tuple[str, float, int]]:
+    """Best match of one query in a list of candidates (see CandidateBlock.extract_one)."""
+    return CandidateBlock(choices).extract_one(query, scorer, score_cutoff)
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Supplier Sourcing Index
+Answers coverage, minimal supplier-set and single-point-of-failure questions
+over the sourcing graph. Each supplier holds one ingredient bitset, so
+coverage and risk queries reduce to integer AND/OR operations.
+
+Sources: SUPPLIER_PROVIDES_INGREDIENT edges, vessels/suppliers/*.json and
+*.supp portfolios, RSNodes_updated.csv and supplier_capability_matrix.csv.
+"""
+
+import csv
+import sys
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Iterable
+
+from formulation_engine import phase_ingredients
+from vessel_reader import iter_vessel_files, load_vessel, read_vessel, vessel_id
+
+# Supply_Chain_Risk levels in increasing order; free-text values are reduced
+# to the highest level they mention ("Low to Medium" -> Medium)
+RISK_LEVELS = ['Low', 'Medium', 'High', 'Unknown']
+
+
+def normalize_risk(value: Optional[str]) -> str:
+    """Reduce a free-text Supply_Chain_Risk value to one of RISK_LEVELS."""
+    if not value:
+        return 'Unknown'
+    head = value.split('(')[0].upper()
+    for level in ('High', 'Medium', 'Low'):
+        if level.upper() in head:
+            return level
+    return 'Unknown'
+
+
+def iter_bits(mask: int) -> Iterable[int]:
+    """Yield the positions of the set bits of a mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class SourcingIndex:
+    def __init__(self, vessels_root: str = ".", repo_root: Optional[str] = None):
+        self.vessels_root = Path(vessels_root)
+        self.repo_root = Path(repo_root) if repo_root else self.vessels_root.resolve().parent
+
+        self.ingredient_bits: Dict[str, int] = {}
+        self.ingredient_ids: List[str] = []
+        self.supplier_masks: Dict[str, int] = defaultdict(int)
+        self.supplier_info: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        self.formulation_masks: Dict[str, int] = defaultdict(int)
+        self.formulation_names: Dict[str, str] = {}
+        self.stats = defaultdict(int)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def bit(self, ingredient_id: str) -> int:
+        """Return the bitmask of an ingredient, assigning a position if new."""
+        position = self.ingredient_bits.get(ingredient_id)
+        if position is None:
+            position = len(self.ingredient_ids)
+            self.ingredient_bits[ingredient_id] = position
+            self.ingredient_ids.append(ingredient_id)
+        return 1 << position
+
+    def mask_of(self, ingredient_ids: Iterable[str]) -> int:
+        mask = 0
+        for ingredient_id in ingredient_ids:
+            mask |= self.bit(ingredient_id)
+        return mask
+
+    def ids_of(self, mask: int) -> List[str]:
+        return [self.ingredient_ids[i] for i in iter_bits(mask)]
+
+    def add_supply(self, supplier_id: str, ingredient_id: str):
+        self.supplier_masks[supplier_id] |= self.bit(ingredient_id)
+
+    def add_formulation(self, formulation_id: str, ingredient_ids: Iterable[str], name: str = ''):
+        self.formulation_masks[formulation_id] |= self.mask_of(ingredient_ids)
+        if name:
+            self.formulation_names[formulation_id] = name
+
+    def load(self) -> 'SourcingIndex':
+        """Load every sourcing source found under the vessels and repo roots."""
+        self.load_edges()
+        self.load_supplier_files()
+        self.load_supplier_attributes()
+        self.load_formulations()
+        return self
+
+    def _iter_edges(self) -> Iterable[Dict[str, Any]]:
+        edges_dir = self.vessels_root / 'edges'
+        if not edges_dir.exists():
+            return
+        for json_file in sorted(edges_dir.glob('*.json')):
+            try:
+                data = load_vessel(json_file)
+            except Exception:
+                self.stats['unreadable_edge_files'] += 1
+                continue
+            yield from (data if isinstance(data, list) else [data])
+
+    def load_edges(self):
+        """Load supplier and formulation membership from hypergraph edges."""
+        for edge in self._iter_edges():
+            edge_type = edge.get('type')
+            source = edge.get('source_id') or edge.get('source')
+            target = edge.get('target_id') or edge.get('target')
+            if not source or not target:
+                continue
+            if edge_type == 'SUPPLIER_PROVIDES_INGREDIENT':
+                self.add_supply(source, target)
+                self.stats['supply_edges'] += 1
+            elif edge_type == 'INGREDIENT_IN_FORMULATION':
+                self.add_formulation(target, [source])
+                self.stats['formulation_edges'] += 1
+
+    def load_supplier_files(self):
+        """Load supplier portfolios from vessels/suppliers (.json and .supp)."""
+        for json_file in iter_vessel_files(self.vessels_root / 'suppliers', ['*.json', '*.supp']):
+            try:
+                data = load_vessel(json_file)
+            except Exception:
+                self.stats['unreadable_supplier_files'] += 1
+                continue
+            supplier_id = data.get('id') or data.get('supplier_id')
+            if not supplier_id:
+                continue
+            info = self.supplier_info[supplier_id]
+            info.setdefault('name', data.get('name') or data.get('label', ''))
+            portfolio = data.get('portfolio', {}).get('ingredient_ids', []) or data.get('ingredient_portfolio', [])
+            for ingredient_id in portfolio:
+                self.add_supply(supplier_id, ingredient_id)
+            self.supplier_masks.setdefault(supplier_id, 0)
+
+    def load_supplier_attributes(self):
+        """Load Supply_Chain_Risk and Availability_Status from the repo CSVs."""
+        rs_nodes = self.repo_root / 'RSNodes_updated.csv'
+        if rs_nodes.exists():
+            with open(rs_nodes, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    supplier_id = row.get('Id', '')
+                    if supplier_id not in self.supplier_masks and not row.get('Supply_Chain_Risk'):
+                        continue  # ingredient rows share this file
+                    info = self.supplier_info[supplier_id]
+                    info.setdefault('name', row.get('Label', ''))
+                    info['availability'] = row.get('Availability_Status') or 'Unknown'
+                    if row.get('Supply_Chain_Risk'):
+                        info['risk'] = normalize_risk(row['Supply_Chain_Risk'])
+
+        matrix = self.repo_root / 'supplier_capability_matrix.csv'
+        if matrix.exists():
+            with open(matrix, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    info = self.supplier_info[row.get('Supplier_ID', '')]
+                    info.setdefault('name', row.get('Supplier_Name', ''))
+                    info.setdefault('risk', normalize_risk(row.get('Supply_Chain_Risk')))
+                    if 'availability' not in info:
+                        confirmed = row.get('Availability_Confirmed') == 'Confirmed'
+                        info['availability'] = 'Available' if confirmed else 'Unknown'
+
+        for supplier_id in self.supplier_masks:
+            info = self.supplier_info[supplier_id]
+            info.setdefault('risk', 'Unknown')
+            info.setdefault('availability', 'Unknown')
+
+    def load_formulations(self):
+        """Load formulation ingredient lists from vessels/formulations.
+
+        JSON files come first; a .form vessel contributes the ingredient ids
+        of its formulation_phases unless its id already came from a JSON file.
+        """
+        formulations_dir = self.vessels_root / 'formulations'
+        seen = set()
+        for path in iter_vessel_files(formulations_dir, ('*.json',)) + iter_vessel_files(formulations_dir, ('*.form',)):
+            try:
+                document = read_vessel(path)
+            except Exception:
+                self.stats['unreadable_formulation_files'] += 1
+                continue
+            data = document['data']
+            formulation_id = vessel_id(document) or path.stem
+            if path.suffix == '.form':
+                if formulation_id in seen:
+                    continue
+                data = dict(data, name=data.get('name') or data.get('product_name'),
+                            ingredients=phase_ingredients(data))
+            seen.add(formulation_id)
+            ingredient_ids = [ing['ingredient_id'] for ing in data.get('ingredients', [])
+                              if ing.get('ingredient_id')]
+            self.add_formulation(formulation_id, ingredient_ids, data.get('name') or '')
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def allowed_suppliers(self, max_risk: Optional[str] = None,
+                          availability: Optional[Iterable[str]] = None,
+                          exclude: Iterable[str] = ()) -> Dict[str, int]:
+        """Return supplier masks passing the risk/availability filters."""
+        max_rank = RISK_LEVELS.index(max_risk) if max_risk else len(RISK_LEVELS)
+        statuses = set(availability) if availability else None
+        excluded = set(exclude)
+        allowed = {}
+        for supplier_id, mask in self.supplier_masks.items():
+            if supplier_id in excluded or not mask:
+                continue
+            info = self.supplier_info[supplier_id]
+            if RISK_LEVELS.index(info['risk']) > max_rank:
+                continue
+            if statuses is not None and info['availability'] not in statuses:
+                continue
+            allowed[supplier_id] = mask
+        return allowed
+
+    def requirement(self, formulation_id: str) -> int:
+        if formulation_id not in self.formulation_masks:
+            raise KeyError(f"Unknown formulation: {formulation_id}")
+        return self.formulation_masks[formulation_id]
+
+    def coverage(self, formulation_id: str, **filters) -> Dict[str, Any]:
+        """Which ingredients of a formulation can be sourced at all."""
+        required = self.requirement(formulation_id)
+        available = 0
+        for mask in self.allowed_suppliers(**filters).values():
+            available |= mask
+        covered = required & available
+        total = required.bit_count()
+        return {
+            'formulation_id': formulation_id,
+            'required': total,
+            'covered': covered.bit_count(),
+            'coverage': covered.bit_count() / total if total else 1.0,
+            'uncovered_ingredients': self.ids_of(required & ~available),
+        }
+
+    def minimal_supplier_set(self, formulation_id: str, exact: bool = False,
+                             max_exact_suppliers: int = 40, **filters) -> Dict[str, Any]:
+        """Smallest supplier set sourcing every coverable ingredient of a formulation.
+
+        Uses greedy set cover; `exact=True` runs a branch-and-bound search
+        seeded with the greedy answer (falls back to greedy when more than
+        `max_exact_suppliers` suppliers are relevant).
+        """
+        required = self.requirement(formulation_id)
+        relevant = {s: m & required for s, m in self.allowed_suppliers(**filters).items() if m & required}
+        coverable = 0
+        for mask in relevant.values():
+            coverable |= mask
+
+        chosen = self._greedy_cover(coverable, relevant)
+        method = 'greedy'
+        if exact and len(relevant) <= max_exact_suppliers:
+            chosen = self._exact_cover(coverable, relevant, chosen)
+            method = 'exact'
+
+        return {
+            'formulation_id': formulation_id,
+            'suppliers': chosen,
+            'method': method,
+            'uncovered_ingredients': self.ids_of(required & ~coverable),
+        }
+
+    @staticmethod
+    def _greedy_cover(target: int, masks: Dict[str, int]) -> List[str]:
+        chosen = []
+        remaining = target
+        while remaining:
+            supplier_id = max(masks, key=lambda s: ((masks[s] & remaining).bit_count(), s))
+            chosen.append(supplier_id)
+            remaining &= ~masks[supplier_id]
+        return chosen
+
+    @staticmethod
+    def _exact_cover(target: int, masks: Dict[str, int], upper: List[str]) -> List[str]:
+        best = list(upper)
+        largest = max((m.bit_count() for m in masks.values()), default=1)
+
+        def search(remaining: int, chosen: List[str]):
+            nonlocal best
+            if not remaining:
+                if len(chosen) < len(best):
+                    best = list(chosen)
+                return
+            # Lower bound: even the largest supplier set covers `largest` bits
+            if len(chosen) + -(-remaining.bit_count() // largest) >= len(best):
+                return
+            # Branch on the remaining ingredient with the fewest suppliers
+            low_bit = min(iter_bits(remaining),
+                          key=lambda b: sum(1 for m in masks.values() if m >> b & 1))
+            options = sorted((s for s, m in masks.items() if m >> low_bit & 1),
+                             key=lambda s: -(masks[s] & remaining).bit_count())
+            for supplier_id in options:
+                chosen.append(supplier_id)
+                search(remaining & ~masks[supplier_id], chosen)
+                chosen.pop()
+
+        search(target, [])
+        return best
+
+    def _redundancy(self, masks: Iterable[int]):
+        """Bit-sliced counters: ingredients sourced by >=1 and by >=2 suppliers."""
+        once = twice = 0
+        for mask in masks:
+            twice |= once & mask
+            once |= mask
+        return once, twice
+
+    def single_points_of_failure(self, formulation_id: Optional[str] = None,
+                                 **filters) -> Dict[str, List[str]]:
+        """Map supplier -> ingredients only that supplier can source.
+
+        Restricted to one formulation's ingredients when `formulation_id` is given.
+        """
+        allowed = self.allowed_suppliers(**filters)
+        once, twice = self._redundancy(allowed.values())
+        single = once & ~twice
+        if formulation_id is not None:
+            single &= self.requirement(formulation_id)
+        return {s: self.ids_of(m & single) for s, m in sorted(allowed.items()) if m & single}
+
+    def supplier_removal_impact(self, supplier_id: str, **filters) -> Dict[str, List[str]]:
+        """Map formulation -> ingredients that become unsourceable without a supplier."""
+        if supplier_id not in self.supplier_masks and supplier_id not in self.supplier_info:
+            raise KeyError(f"Unknown supplier: {supplier_id}")
+        allowed = self.allowed_suppliers(**filters)
+        before = 0
+        for mask in allowed.values():
+            before |= mask
+        after = 0
+        for other, mask in allowed.items():
+            if other != supplier_id:
+                after |= mask
+        lost = before & ~after
+        if not lost:
+            return {}
+        return {f: self.ids_of(m & lost) for f, m in sorted(self.formulation_masks.items()) if m & lost}
+
+    def risk_scan(self, formulation_ids: Optional[Iterable[str]] = None,
+                  **filters) -> List[Dict[str, Any]]:
+        """Catalog-wide coverage and single-sourcing scan, one row per formulation."""
+        allowed = self.allowed_suppliers(**filters)
+        once, twice = self._redundancy(allowed.values())
+        single = once & ~twice
+        owner = {}
+        for supplier_id, mask in allowed.items():
+            for position in iter_bits(mask & single):
+                owner[position] = supplier_id
+
+        rows = []
+        ids: Iterable[str] = formulation_ids if formulation_ids is not None else sorted(self.formulation_masks)
+        for formulation_id in ids:
+            required = self.requirement(formulation_id)
+            total = required.bit_count()
+            single_sourced = required & single
+            rows.append({
+                'formulation_id': formulation_id,
+                'name': self.formulation_names.get(formulation_id, ''),
+                'ingredients': total,
+                'coverage': (required & once).bit_count() / total if total else 1.0,
+                'unsourced': (required & ~once).bit_count(),
+                'single_sourced': single_sourced.bit_count(),
+                'critical_suppliers': sorted({owner[p] for p in iter_bits(single_sourced)}),
+            })
+        rows.sort(key=lambda r: (r['coverage'], -r['single_sourced'], r['formulation_id']))
+        return rows
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Supplier coverage and risk queries")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--formulation', help="Formulation ID to analyse (default: whole catalog)")
+    parser.add_argument('--max-risk', choices=RISK_LEVELS, help="Highest Supply_Chain_Risk allowed")
+    parser.add_argument('--availability', action='append',
+                        help="Allowed Availability_Status (repeatable)")
+    parser.add_argument('--exact', action='store_true', help="Exact minimal supplier set")
+    parser.add_argument('--remove-supplier', help="Show what breaks without this supplier")
+    args = parser.parse_args()
+
+    index = SourcingIndex(args.vessels_root).load()
+    filters = {'max_risk': args.max_risk, 'availability': args.availability}
+    print(f"Indexed {len(index.ingredient_ids)} ingredients, {len(index.supplier_masks)} suppliers, "
+          f"{len(index.formulation_masks)} formulations")
+
+    if args.remove_supplier:
+        try:
+            impact = index.supplier_removal_impact(args.remove_supplier, **filters)
+        except KeyError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        print(f"\nRemoving {args.remove_supplier} breaks {len(impact)} formulations")
+        for formulation_id, ingredient_ids in impact.items():
+            print(f"  {formulation_id}: {', '.join(ingredient_ids)}")
+        return
+
+    if args.formulation:
+        try:
+            coverage = index.coverage(args.formulation, **filters)
+        except KeyError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        cover = index.minimal_supplier_set(args.formulation, exact=args.exact, **filters)
+        print(f"\n{args.formulation}: {coverage['covered']}/{coverage['required']} ingredients sourceable")
+        print(f"  Minimal supplier set ({cover['method']}): {', '.join(cover['suppliers']) or '-'}")
+        if coverage['uncovered_ingredients']:
+            print(f"  Unsourced: {', '.join(coverage['uncovered_ingredients'])}")
+        for supplier_id, ingredient_ids in index.single_points_of_failure(args.formulation, **filters).items():
+            print(f"  Single source {supplier_id}: {', '.join(ingredient_ids)}")
+        return
+
+    print("\nCatalog risk scan (lowest coverage first):")
+    for row in index.risk_scan(**filters):
+        print(f"  {row['formulation_id']}: coverage {row['coverage']:.0%}, "
+              f"single-sourced {row['single_sourced']}, unsourced {row['unsourced']}"
+              + (f", critical: {', '.join(row['critical_suppliers'])}" if row['critical_suppliers'] else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The vessel scripts import each other flat
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,46 @@
+"""
+AuditLogWriter's writer thread survives sink and spool failures: flush()
+returns and every row is accounted for as written, spooled or failed.
+"""
+
+import json
+import threading
+
+from audit_log import AuditLogWriter
+
+
+class FailingSink:
+    def write(self, table, rows):
+        raise ConnectionError("sink down")
+
+    def close(self):
+        pass
+
+
+def flush_within(writer, seconds=5.0):
+    done = threading.Event()
+    threading.Thread(target=lambda: (writer.flush(), done.set()), daemon=True).start()
+    return done.wait(seconds)
+
+
+def test_unserializable_changes_are_spooled(tmp_path):
+    spool = tmp_path / 'audit' / 'audit_spool.jsonl'
+    writer = AuditLogWriter(FailingSink(), spool, flush_interval=0.01)
+    writer.log('formulation', 'F1', 'update', changes={1, 2})
+    assert flush_within(writer)
+    metrics = writer.close()
+    assert metrics['spooled'] == 1
+    assert json.loads(spool.read_text(encoding='utf-8'))['changes'] == '{1, 2}'
+
+
+def test_spool_failure_does_not_stop_the_writer(tmp_path):
+    blocker = tmp_path / 'not_a_directory'
+    blocker.write_text('')
+    writer = AuditLogWriter(FailingSink(), blocker / 'audit_spool.jsonl', batch_size=2,
+                            flush_interval=0.01, max_queue=4)
+    for i in range(10):
+        writer.log('ingredient', f'I{i}', 'update')
+    assert flush_within(writer)
+    metrics = writer.close()
+    assert metrics['failed'] == 10
+    assert 'last_error' in metrics
@@ -0,0 +1,68 @@
+"""
+batch_scheduler: branch and bound against exhaustive search on small
+orders, the heuristic never beating the optimum, and the O(1) move deltas
+against recomputing the sequence.
+"""
+
+import random
+from itertools import permutations, product
+
+import pytest
+
+from batch_scheduler import BatchScheduler, load_process
+
+
+def random_instance(rng, formulations=3, vessels=2):
+    processes = {}
+    for f in range(formulations):
+        phases = {f'phase_{p}': {'temperature': rng.choice([25, 45, 75, 80]), 'mixing_time': rng.randint(5, 30)}
+                  for p in range(rng.randint(1, 3))}
+        vessel_type = rng.choice(['Reactor', 'Reactor', 'Mixer'])
+        processes[f'F{f}'] = load_process(f'F{f}', {'formulation_phases': phases, 'vessel_type': vessel_type})
+    fleet = [{'id': 'V1', 'vessel_type': 'Reactor', 'accepts': ['Mixer']}]
+    fleet += [{'id': f'V{v + 2}', 'vessel_type': rng.choice(['Reactor', 'Mixer'])} for v in range(vessels - 1)]
+    order = {f: rng.randint(1, 2) for f in processes}
+    return BatchScheduler(processes, fleet), order
+
+
+def brute_force(scheduler, batches):
+    best = float('inf')
+    for sequence in set(permutations(batches)):
+        for vessels in product(range(len(scheduler.vessels)), repeat=len(sequence)):
+            if any(v not in scheduler.eligible[f] for f, v in zip(sequence, vessels)):
+                continue
+            sequences = [[f for f, v in zip(sequence, vessels) if v == vessel]
+                         for vessel in range(len(scheduler.vessels))]
+            best = min(best, scheduler.makespan(sequences))
+    return best
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_exact_matches_exhaustive_search(seed):
+    scheduler, order = random_instance(random.Random(seed))
+    batches = scheduler.batches(order)
+    optimum = brute_force(scheduler, batches)
+
+    found, complete = scheduler.exact(batches, float('inf'))
+    assert complete
+    assert sorted(f for s in found for f in s) == sorted(batches)
+    assert scheduler.makespan(found) == pytest.approx(optimum)
+    assert scheduler.makespan(scheduler.heuristic(batches)) >= optimum - 1e-9
+
+    plan = scheduler.schedule(order, exact=True)
+    assert plan['optimal']
+
+
+def test_move_deltas_match_recomputation():
+    rng = random.Random(3)
+    scheduler, order = random_instance(rng, formulations=4)
+    scheduler.batches(order)
+    sequence = [rng.choice(list(order)) for _ in range(8)]
+    end = scheduler.sequence_end(sequence)
+    for i in range(len(sequence)):
+        removed = sequence[:i] + sequence[i + 1:]
+        assert end + scheduler.removal_delta(sequence, i) == pytest.approx(scheduler.sequence_end(removed))
+        for formulation_id in order:
+            inserted = sequence[:i] + [formulation_id] + sequence[i:]
+            assert end + scheduler.insertion_delta(sequence, i, formulation_id) == pytest.approx(
+                scheduler.sequence_end(inserted))
@@ -0,0 +1,63 @@
+"""
+BatchWorker re-batching and failure handling, through the two writers built
+on it (multi_sync.SinkWorker and audit_log.AuditLogWriter).
+"""
+
+from multi_sync import SinkWorker
+
+
+class RecordingSink:
+    def __init__(self, fail_tables=()):
+        self.batches = []
+        self.fail_tables = set(fail_tables)
+        self.closed = False
+
+    def write(self, table, rows):
+        if table in self.fail_tables:
+            raise RuntimeError(f"cannot write {table}")
+        self.batches.append((table, [row['n'] for row in rows]))
+
+    def close(self):
+        self.closed = True
+
+
+def rows(start, count):
+    return [{'n': n} for n in range(start, start + count)]
+
+
+def test_rows_are_rebatched_per_table():
+    sink = RecordingSink()
+    worker = SinkWorker('test', sink, batch_size=3, buffer_rows=200)
+    worker.put('a', rows(0, 2))
+    worker.put('a', rows(2, 2))
+    worker.put('b', rows(4, 1))
+    metrics = worker.close()
+    assert sink.batches == [('a', [0, 1, 2]), ('a', [3]), ('b', [4])]
+    assert sink.closed
+    assert metrics['written'] == 5 and metrics['batches'] == 3
+
+
+def test_failed_table_does_not_stop_the_worker():
+    sink = RecordingSink(fail_tables={'a'})
+    worker = SinkWorker('test', sink, batch_size=2, buffer_rows=100, max_retries=1, backoff=0)
+    worker.put('a', rows(0, 3))
+    worker.put('b', rows(3, 2))
+    worker.flush()
+    metrics = worker.close()
+    assert sink.batches == [('b', [3, 4])]
+    assert metrics['failed'] == 3 and metrics['retries'] == 2
+    assert metrics['last_error'].startswith('a: ')
+
+
+def test_unexpected_write_error_is_counted():
+    class BrokenWorker(SinkWorker):
+        def _write(self, table, rows):
+            raise TypeError("boom")
+
+    worker = BrokenWorker('test', RecordingSink(), batch_size=2, buffer_rows=100)
+    for i in range(5):
+        worker.put('a', rows(i, 1))
+    worker.flush()
+    metrics = worker.close()
+    assert metrics['failed'] == 5
+    assert metrics['last_error'] == 'a: boom'
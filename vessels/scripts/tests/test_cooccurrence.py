@@ -0,0 +1,61 @@
+"""
+cooccurrence: FP-growth compared with brute-force itemset counting, and the
+incremental refresh over formulation JSON files and .form vessels.
+"""
+
+import json
+import random
+from collections import Counter
+from itertools import combinations
+
+from cooccurrence import CooccurrenceIndex, fp_growth
+
+
+def brute_force(transactions, min_count, max_len):
+    counts = Counter()
+    for items, count in transactions:
+        items = sorted(set(items))
+        for size in range(1, max_len + 1):
+            for itemset in combinations(items, size):
+                counts[frozenset(itemset)] += count
+    return {itemset: c for itemset, c in counts.items() if c >= min_count}
+
+
+def test_fp_growth_matches_brute_force():
+    rng = random.Random(11)
+    items = 'ABCDEFGH'
+    for _ in range(20):
+        transactions = [(rng.sample(items, rng.randint(0, 6)), rng.randint(1, 3)) for _ in range(25)]
+        for min_count, max_len in [(2, 2), (4, 3), (8, 5)]:
+            assert fp_growth(transactions, min_count, max_len) == brute_force(transactions, min_count, max_len)
+
+
+def write_json(path, formulation_id, *lines):
+    path.write_text(json.dumps({'id': formulation_id, 'ingredients': [
+        {'ingredient_id': item, 'concentration': conc} for item, conc in lines]}), encoding='utf-8')
+
+
+def write_form(path, formulation_id, phases):
+    path.write_text(f"// Formulation ID: {formulation_id}\n"
+                    + json.dumps({'formulation_id': formulation_id, 'formulation_phases': phases}),
+                    encoding='utf-8')
+
+
+def test_refresh_reads_json_and_form_vessels(tmp_path):
+    formulations = tmp_path / 'formulations'
+    formulations.mkdir()
+    write_json(formulations / 'F1.json', 'F1', ('R1', 5), ('R2', 1))
+    write_form(formulations / 'F1.form', 'F1', {'phase_a': {'R9': 3}})
+    write_form(formulations / 'F2.form', 'F2', {'phase_a': {'R1': '10%', 'glycerin': 2, 'temperature': 75}})
+
+    index = CooccurrenceIndex(tmp_path, state_path=tmp_path / 'state.json')
+    assert index.refresh() == {'added': 2, 'changed': 0, 'removed': 0, 'unchanged': 0}
+    assert index.formulations['F1']['lines'] == {'R1': 5.0, 'R2': 1.0}
+    assert index.formulations['F2']['lines'] == {'R1': 10.0, 'INCI:GLYCERIN': 2.0}
+    assert index.item_counts['R1'] == 2
+
+    (formulations / 'F1.json').unlink()
+    changes = index.refresh()
+    assert changes['removed'] == 1 and changes['unchanged'] == 1
+    assert changes['added'] == 1 and index.formulations['F1']['lines'] == {'R9': 3.0}
+    assert index.item_counts['R1'] == 1
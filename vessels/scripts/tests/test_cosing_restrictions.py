@@ -0,0 +1,99 @@
+"""
+cosing_restrictions: restriction text compilation and the vectorized rule
+evaluation, checked against fixed cases and a per-pair brute force.
+"""
+
+import random
+
+import numpy as np
+
+from cosing_restrictions import (COMPLIANT, KINDS, NON_COMPLIANT, REVIEW, RestrictionIndex,
+                                 compile_restriction, scope_mask)
+
+LEAVE_ON = scope_mask(['leave_on'])
+ORAL = scope_mask(['oral'])
+
+
+def rules_of(text):
+    return [(r['reference'], r['kind'], r['max_concentration'], r['scope']) for r in compile_restriction(text)]
+
+
+def test_limits_per_scope():
+    assert rules_of("V/7 maximum concentration of 0,15 % in leave-on and 0,2 % in rinse-off") == [
+        ('V/7', 'preservative', 0.15, ['leave_on']),
+        ('V/7', 'preservative', 0.2, ['rinse_off']),
+    ]
+
+
+def test_entry_continuation():
+    assert [r[0] for r in rules_of("III/15a, 15d Maximum 2 %")] == ['III/15a', 'III/15d']
+
+
+def test_prohibition_is_its_own_rule():
+    assert rules_of("III/12 Maximum concentration 2 % in rinse-off products. Not to be used in oral products") == [
+        ('III/12', 'restricted', 2.0, ['rinse_off']),
+        ('III/12', 'prohibited', None, ['oral']),
+    ]
+
+
+def test_limit_next_to_prohibition_keeps_annex_kind():
+    index = RestrictionIndex()
+    index.add(1, "III/62 Maximum concentration 0,5 % in leave-on products. "
+                 "Not to be used in products for children under 3 years")
+    lines, _, _ = index.evaluate(np.array([1, 1]), np.array([0.1, 0.8]), np.array([LEAVE_ON, LEAVE_ON]))
+    assert lines.tolist() == [1]     # 0.1 % is within the limit, 0.8 % is not
+
+
+def test_limits_table_does_not_fill_prohibitions():
+    index = RestrictionIndex({'III/12': {'max_concentration': 1.0}})
+    index.add(1, "III/12 Not to be used in oral products. Restricted in leave-on products")
+    kinds = sorted((r['kind'], r['max_concentration']) for r in index.rules)
+    assert kinds == [('prohibited', None), ('restricted', 1.0)]
+    _, _, severity = index.evaluate(np.array([1]), np.array([0.5]), np.array([ORAL]))
+    assert severity.tolist() == [NON_COMPLIANT]
+
+
+def brute_force(rules, refs, concs, scopes):
+    expected = set()
+    for line, (ref, conc, line_scope) in enumerate(zip(refs, concs, scopes)):
+        for rule_index, rule in enumerate(rules):
+            if rule['cosing_ref_no'] != ref:
+                continue
+            mask = scope_mask(rule['scope'])
+            if mask and not mask & line_scope:
+                continue
+            level = COMPLIANT
+            if rule['kind'] == 'prohibited':
+                level = NON_COMPLIANT if conc > 0 else COMPLIANT
+            elif rule['max_concentration'] is not None:
+                level = NON_COMPLIANT if conc > rule['max_concentration'] else COMPLIANT
+            elif rule['kind'] != 'colorant':
+                level = REVIEW
+            if level > COMPLIANT:
+                expected.add((line, rule_index, level))
+    return expected
+
+
+def test_evaluate_matches_brute_force():
+    texts = [
+        "III/1 Maximum 1 % in leave-on and 3 % in rinse-off",
+        "III/2 Not to be used in eye products",
+        "V/3 maximum concentration 0,5 %",
+        "IV/4",
+        "II/5",
+        "III/6 Maximum 2 % in leave-on products. Not to be used in oral products",
+        "VI/7",
+    ]
+    index = RestrictionIndex()
+    for ref, text in enumerate(texts, 1):
+        index.add(ref, text)
+    assert {r['kind'] for r in index.rules} <= set(KINDS)
+
+    rng = random.Random(7)
+    count = 400
+    refs = [rng.randint(0, len(texts) + 1) for _ in range(count)]
+    concs = [rng.choice([0.0, 0.2, 0.5, 1.0, 2.5, 4.0]) for _ in range(count)]
+    scopes = [rng.randrange(1 << 7) for _ in range(count)]
+    lines, rule_indexes, severity = index.evaluate(np.array(refs), np.array(concs), np.array(scopes))
+    got = set(zip(lines.tolist(), rule_indexes.tolist(), severity.tolist()))
+    assert got == brute_force(index.rules, refs, concs, scopes)
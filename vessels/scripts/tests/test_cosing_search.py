@@ -0,0 +1,48 @@
+"""
+cosing_search ranking against the COSING export shipped under vessels/cosing.
+The index is built into a temporary directory, never next to the export.
+"""
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from cosing_catalog import find_cosing_file
+from cosing_search import CosingSearch
+
+VESSELS_ROOT = Path(__file__).resolve().parents[2]
+pytestmark = pytest.mark.skipif(find_cosing_file(VESSELS_ROOT) is None, reason="no COSING export")
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    return CosingSearch.open(VESSELS_ROOT, tmp_path_factory.mktemp('cosing') / 'search_index.npz')
+
+
+@pytest.mark.parametrize('query, ref_no', [
+    ('sodium hyaluronate', 79556),
+    ('hyaluronate sodium', 79556),
+    ('glycerin', 34040),
+    ('niacinamide', 35499),
+])
+def test_exact_inci_name_ranks_first(index, query, ref_no):
+    assert index.search(query, limit=10)[0]['cosing_ref_no'] == ref_no
+
+
+def test_synonyms_are_searchable(index):
+    hits = index.search('synonyms:glycerolum', limit=10)
+    assert 34040 in [hit['cosing_ref_no'] for hit in hits]
+
+
+def test_derivatives_still_match(index):
+    names = [hit['inci_name'] for hit in index.search('sodium hyaluronate', limit=10)]
+    assert 'SODIUM SULFATED HYALURONATE' in names
+
+
+def test_index_round_trip(index, tmp_path):
+    path = tmp_path / 'search_index.npz'
+    index.save(path)
+    loaded = CosingSearch.load(path)
+    assert loaded.search('sodium hyaluronate', limit=3) == index.search('sodium hyaluronate', limit=3)
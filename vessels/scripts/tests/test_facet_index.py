@@ -0,0 +1,51 @@
+"""
+facet_index: facet keys of single rows, and bitmap queries over the shipped
+COSING export compared with a row-by-row brute force.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from cosing_catalog import find_cosing_file, iter_cosing_rows, split_cas_numbers
+from facet_index import FacetIndex, split_functions
+
+VESSELS_ROOT = Path(__file__).resolve().parents[2]
+COSING_CSV = find_cosing_file(VESSELS_ROOT)
+
+
+def row(**fields):
+    return {'cosing_ref_no': '1', 'inci_name': 'TEST', **fields}
+
+
+@pytest.mark.parametrize('cas_no, ec_no, expected', [
+    ('56-81-5', '200-289-5', {'has_cas', 'has_ec'}),
+    ('-', '- / -', set()),
+    ('- / 8043-29-6', '*200-066-2 (I)', {'has_cas', 'has_ec'}),
+    ('', '', set()),
+])
+def test_identifier_placeholders_are_not_values(cas_no, ec_no, expected):
+    keys = FacetIndex.facet_keys(row(cas_no=cas_no, ec_no=ec_no))
+    assert keys & {'has_cas', 'has_ec'} == expected
+
+
+def test_function_facets():
+    keys = FacetIndex.facet_keys(row(function='SKIN CONDITIONING - EMOLLIENT, HUMECTANT'))
+    assert {'function:SKIN CONDITIONING - EMOLLIENT', 'function_group:SKIN CONDITIONING',
+            'function:HUMECTANT', 'function_group:HUMECTANT'} <= keys
+
+
+@pytest.mark.skipif(COSING_CSV is None, reason="no COSING export")
+def test_query_matches_brute_force(tmp_path):
+    index = FacetIndex.build(COSING_CSV)
+    rows = [r for r in iter_cosing_rows(COSING_CSV) if r.get('cosing_ref_no', '').isdigit()]
+    expected = [int(r['cosing_ref_no']) for r in rows
+                if 'HUMECTANT' in split_functions(r.get('function', ''))
+                and split_cas_numbers(r.get('cas_no', ''))
+                and not r.get('restriction')]
+    mask = index.query(all_of=['function:HUMECTANT', 'has_cas'], none_of=['restricted'])
+    assert sorted(index.ref_nos_of(mask)) == sorted(expected)
+
+    path = tmp_path / 'facet_index.json'
+    index.save(path)
+    assert FacetIndex.load(path).query(all_of=['function:HUMECTANT', 'has_cas'], none_of=['restricted']) == mask
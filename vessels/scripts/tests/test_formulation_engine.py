@@ -0,0 +1,108 @@
+"""
+formulation_engine: CSR arithmetic and what-if balancing compared with a
+per-formulation Python computation on random matrices.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from formulation_engine import (FormulationMatrix, _price_per_kg, phase_concentration,
+                                phase_ingredients)
+
+NAMES = ['AQUA', 'GLYCERIN', 'CETEARYL ALCOHOL', 'NIACINAMIDE', 'WATER', 'PHENOXYETHANOL']
+
+
+def random_matrix(rng, rows=40):
+    entries = []
+    for f in range(rows):
+        for name in rng.sample(NAMES, rng.randint(1, len(NAMES))):
+            entries.append((f'F{f}', name, name.title(), rng.choice(['', 'a', 'b']),
+                            rng.choice([0.0, 0.5, 2.0, rng.uniform(0, 60)])))
+    return FormulationMatrix.from_entries(entries), entries
+
+
+def rows_of(entries):
+    rows = {}
+    for formulation_id, column, _, phase, concentration in entries:
+        rows.setdefault(formulation_id, []).append([column, phase, concentration])
+    return rows
+
+
+def test_totals_phase_totals_and_costs_match_per_row_sums():
+    matrix, entries = random_matrix(random.Random(1))
+    rows = rows_of(entries)
+    prices = {'AQUA': 0.01, 'GLYCERIN': 25.0, 'NIACINAMIDE': 400.0}
+    cost, coverage = matrix.costs(matrix.price_vector(prices))
+    phase_totals = matrix.phase_totals()
+    for i, formulation_id in enumerate(matrix.formulation_ids):
+        lines = rows[formulation_id]
+        total = sum(c for _, _, c in lines)
+        assert matrix.totals()[i] == pytest.approx(total)
+        for p, phase in enumerate(matrix.phase_names):
+            assert phase_totals[i, p] == pytest.approx(sum(c for _, ph, c in lines if ph == phase))
+        assert cost[i] == pytest.approx(sum(c / 100 * prices[n] for n, _, c in lines if n in prices))
+        priced = sum(c for n, _, c in lines if n in prices)
+        assert coverage[i] == pytest.approx(priced / total if total else 0.0)
+
+
+def test_normalized_rows_sum_exactly():
+    matrix, _ = random_matrix(random.Random(2))
+    units = np.round(matrix.normalized().totals() * 10 ** 4)
+    positive = matrix.totals() > 0
+    assert (units[positive] == 10 ** 6).all() and (units[~positive] == 0).all()
+
+
+def brute_what_if(lines, targets, delta, proportional):
+    lines = [list(line) for line in lines]
+    target = [line for line in lines if line[0] in targets]
+    if not target:
+        return lines
+    target_sum = sum(line[2] for line in target)
+    for line in target:
+        line[2] += delta * (line[2] / target_sum if target_sum > 0 else 1 / len(target))
+    water = [line for line in lines if line[0] not in targets and line[0] in ('AQUA', 'WATER')]
+    if water and not proportional:
+        max(water, key=lambda line: line[2])[2] -= delta
+        return lines
+    rest = [line for line in lines if line[0] not in targets]
+    rest_sum = sum(line[2] for line in rest)
+    for line in rest:
+        line[2] *= (rest_sum - delta) / rest_sum if rest_sum > 0 else 1.0
+    return lines
+
+
+@pytest.mark.parametrize('proportional', [False, True])
+@pytest.mark.parametrize('name, delta', [('GLYCERIN', 1.0), ('NIACINAMIDE', -2.0), ('CETEARYL ALCOHOL', 30.0)])
+def test_what_if_matches_per_row_balancing(name, delta, proportional):
+    matrix, entries = random_matrix(random.Random(3))
+    rows = rows_of(entries)
+    changed, infeasible = matrix.what_if(matrix.find_columns(name), delta, proportional)
+    for i, formulation_id in enumerate(matrix.formulation_ids):
+        start, end = matrix.indptr[i], matrix.indptr[i + 1]
+        expected = brute_what_if(rows[formulation_id], {name}, delta, proportional)
+        assert changed.data[start:end].tolist() == pytest.approx([c for _, _, c in expected])
+        assert infeasible[i] == any(c < -1e-9 for _, _, c in expected)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (5, 5.0), ('8.0%', 8.0), (' 2 % ', 2.0), ('to taste', None), (True, None), (None, None),
+])
+def test_phase_concentration(value, expected):
+    assert phase_concentration(value) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    (85, 850.0), ('850.00/100g', 8500.0), ('120/1kg', 120.0), ({'500ml': 50, '1l': 80}, 80.0), ('n/a', None),
+])
+def test_price_per_kg(value, expected):
+    assert _price_per_kg(value) == (expected if expected is None else pytest.approx(expected))
+
+
+def test_phase_ingredients():
+    data = {'formulation_phases': {'a': {'R12': 3, 'glycerin': '5%', 'temperature': 75, 'notes': 'x'}}}
+    assert phase_ingredients(data) == [
+        {'ingredient_id': 'R12', 'inci_name': 'R12', 'concentration': 3.0},
+        {'ingredient_id': None, 'inci_name': 'glycerin', 'concentration': 5.0},
+    ]
@@ -0,0 +1,78 @@
+"""
+formulation_history: versions read back by number, by time and by replaying
+the stored patches all give the recorded documents, across a reopen.
+"""
+
+import copy
+import json
+import random
+
+import pytest
+
+from formulation_history import CONCENTRATION_CHANGE, CREATE, INGREDIENT_ADD, FormulationHistory
+
+
+def random_versions(rng, count):
+    document = {'id': 'F1', 'name': 'Cream', 'ingredients': []}
+    versions = [copy.deepcopy(document)]
+    while len(versions) < count:
+        lines = document['ingredients']
+        action = rng.choice(['add', 'remove', 'concentration', 'rename'])
+        if action == 'add' or not lines:
+            lines.insert(rng.randint(0, len(lines)), {'ingredient_id': f'R{rng.randint(1, 50)}',
+                                                      'concentration': rng.randint(1, 20)})
+        elif action == 'remove':
+            lines.pop(rng.randrange(len(lines)))
+        elif action == 'concentration':
+            rng.choice(lines)['concentration'] = rng.randint(1, 20)
+        else:
+            document['name'] = f'Cream {len(versions)}'
+        if document != versions[-1]:
+            versions.append(copy.deepcopy(document))
+    return versions
+
+
+def test_as_of_and_replay_return_recorded_documents(tmp_path):
+    versions = random_versions(random.Random(4), 30)
+    times = [f'2026-01-{day:02d}T12:00:00' for day in range(1, 31)]
+    with FormulationHistory(tmp_path) as history:
+        for document, at in zip(versions, times):
+            history.record('F1', document, 'tester', changed_at=at)
+
+    with FormulationHistory(tmp_path) as history:
+        assert [e['version'] for e in history.versions('F1')] == list(range(1, 31))
+        for number, (document, at) in enumerate(zip(versions, times), 1):
+            assert history.as_of('F1', version=number) == document
+            assert history.as_of('F1', at=at) == document
+            assert history.as_of('F1', at=at.replace('12:00', '18:00')) == document
+        assert history.as_of('F1', at='2025-12-31T00:00:00') is None
+        assert [document for _, document in history.replay('F1')] == versions
+        assert history.as_of('F1') == versions[-1]
+        with pytest.raises(KeyError):
+            history.entry_at('F1', version=31)
+
+
+def test_unchanged_documents_and_change_types(tmp_path):
+    document = {'id': 'F1', 'ingredients': [{'ingredient_id': 'R1', 'concentration': 5}]}
+    with FormulationHistory(tmp_path) as history:
+        assert history.record('F1', document)['change_type'] == CREATE
+        assert history.record('F1', copy.deepcopy(document)) is None
+        document['ingredients'][0]['concentration'] = 6
+        assert history.record('F1', document)['change_type'] == CONCENTRATION_CHANGE
+        document['ingredients'].append({'ingredient_id': 'R2', 'concentration': 1})
+        assert history.record('F1', document)['change_type'] == INGREDIENT_ADD
+
+
+def test_snapshot_tree_reads_json_and_form_vessels(tmp_path):
+    formulations = tmp_path / 'formulations'
+    formulations.mkdir()
+    (formulations / 'F1.json').write_text(json.dumps({'id': 'F1', 'ingredients': []}))
+    (formulations / 'F1.form').write_text(json.dumps({'formulation_id': 'F1', 'formulation_phases': {}}))
+    (formulations / 'F2.form').write_text('// Formulation ID: F2\n{"formulation_id": "F2"}')
+    (formulations / 'broken.form').write_text('{"formulation_id": ')
+    with FormulationHistory.open(tmp_path) as history:
+        assert history.snapshot_tree(tmp_path) == 2
+        assert history.as_of('F1') == {'id': 'F1', 'ingredients': []}
+        assert history.as_of('F2') == {'formulation_id': 'F2'}
+        assert history.stats['unreadable_files'] == 1
+        assert history.snapshot_tree(tmp_path) == 0
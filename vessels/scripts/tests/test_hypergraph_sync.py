@@ -0,0 +1,77 @@
+"""
+hypergraph_sync against a local Postgres. Set HYPERGRAPH_TEST_DSN to a server
+where the user may create databases; each run uses a scratch database that is
+dropped afterwards. Skipped without psycopg or a DSN.
+"""
+
+import json
+import os
+import uuid
+
+import pytest
+
+psycopg = pytest.importorskip('psycopg')
+DSN = os.environ.get('HYPERGRAPH_TEST_DSN')
+pytestmark = pytest.mark.skipif(not DSN, reason="HYPERGRAPH_TEST_DSN not set")
+
+from hypergraph_sync import HypergraphSync, SCHEMA
+
+
+def write(path, data, header=''):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(header + json.dumps(data), encoding='utf-8')
+
+
+@pytest.fixture
+def vessels(tmp_path):
+    write(tmp_path / 'ingredients' / 'R1.json', {'id': 'R1', 'inci_name': 'Aqua'})
+    write(tmp_path / 'ingredients' / 'R2.inci', {'id': 'R2', 'inci_name': 'Glycerin'}, '// Glycerin\n')
+    write(tmp_path / 'suppliers' / 'S1.supp', {'supplier_id': 'S1', 'name': 'Supplier One'})
+    write(tmp_path / 'products' / 'P1.prod', {'product_id': 'P1', 'product_name': 'Serum'})
+    write(tmp_path / 'formulations' / 'P1.form', {'formulation_id': 'P1', 'product_name': 'Serum base'})
+    edge = {'type': 'CONTAINS', 'source_id': 'P1', 'target_id': 'R1'}
+    write(tmp_path / 'edges' / 'B19EDG_001.json', dict(edge, id='E1', properties={'weight': 2}))
+    write(tmp_path / 'edges' / 'B19EDG_002.json', dict(edge, id='E2', properties={'weight': 5}))
+    return tmp_path
+
+
+@pytest.fixture
+def conn():
+    name = f"hypergraph_test_{uuid.uuid4().hex[:8]}"
+    with psycopg.connect(DSN, autocommit=True) as admin:
+        admin.execute(f"CREATE DATABASE {name} ENCODING 'UTF8' TEMPLATE template0")
+    info = psycopg.conninfo.conninfo_to_dict(DSN)
+    info['dbname'] = name
+    try:
+        with psycopg.connect(psycopg.conninfo.make_conninfo(**info), autocommit=True) as connection:
+            yield connection
+    finally:
+        with psycopg.connect(DSN, autocommit=True) as admin:
+            admin.execute(f"DROP DATABASE IF EXISTS {name}")
+
+
+def test_sync_reads_every_format_and_is_idempotent(vessels, conn):
+    sync = HypergraphSync(conn, vessels)
+    sync.ensure_schema()
+    stats = sync.run()
+    assert stats['nodes']['inserted'] == 4
+    assert stats['nodes']['shared_ids'] == 1
+    assert stats['edges'] == {'staged': 2, 'duplicates': 1, 'inserted': 1,
+                              'updated': 0, 'unchanged': 0, 'deleted': 0}
+
+    nodes = dict(conn.execute(f"SELECT id, node_type FROM {SCHEMA}.hypergraph_nodes").fetchall())
+    assert nodes == {'R1': 'ingredient', 'R2': 'ingredient', 'S1': 'supplier', 'P1': 'product'}
+    weight, edge_id = conn.execute(f"SELECT weight, properties->>'vessel_edge_id' "
+                                   f"FROM {SCHEMA}.hypergraph_edges").fetchone()
+    assert (float(weight), edge_id) == (2.0, 'E1')  # first file in path order wins
+
+    again = HypergraphSync(conn, vessels).run()
+    assert again['nodes']['unchanged'] == 4 and again['nodes']['updated'] == 0
+    assert again['edges']['unchanged'] == 1 and again['edges']['updated'] == 0
+
+
+def test_dry_run_rolls_back(vessels, conn):
+    sync = HypergraphSync(conn, vessels)
+    sync.ensure_schema()
+    assert sync.run(dry_run=True)['nodes']['inserted'] == 4
+    assert conn.execute(f"SELECT count(*) FROM {SCHEMA}.hypergraph_nodes").fetchone()[0] == 0
@@ -0,0 +1,64 @@
+"""
+ingredient_dedup: MinHash signatures and LSH banding compared with a
+brute force, the acceptance thresholds applied as given, and record loading
+from JSON files and .inci vessels.
+"""
+
+import json
+import random
+
+import numpy as np
+
+from ingredient_dedup import BANDS, IngredientDeduplicator, MinHasher, lsh_candidate_pairs, shingles
+
+
+def test_signatures_match_per_record_minimum():
+    hasher = MinHasher(num_perm=8)
+    sets = [shingles('GLYCERIN'), shingles('AQUA'), [], shingles('SODIUM CHLORIDE')]
+    sigs = hasher.signatures(sets, chunk=5)
+    for row, values in zip(sigs, sets):
+        expected = [min((((h * int(a) + int(b)) % 2 ** 64) >> 32 for h in values), default=2 ** 32 - 1)
+                    for a, b in zip(hasher.a, hasher.b)]
+        assert row.tolist() == expected
+
+
+def test_lsh_pairs_match_shared_bands():
+    rng = random.Random(3)
+    sigs = np.array([[rng.randint(0, 2) for _ in range(16)] for _ in range(30)], dtype=np.uint32)
+    rows = sigs.shape[1] // BANDS
+    expected = {(a, b) for a in range(len(sigs)) for b in range(a + 1, len(sigs))
+                if any((sigs[a, i:i + rows] == sigs[b, i:i + rows]).all() for i in range(0, 16, rows))}
+    assert set(lsh_candidate_pairs(sigs)) == expected
+
+
+def evidence(jaccard, cas='missing', cosing='missing'):
+    return {'cas': cas, 'cosing_id': cosing, 'canonical_match': False, 'grade_conflict': False,
+            'name_jaccard': jaccard, 'name_similarity': jaccard}
+
+
+def test_identifier_agreement_uses_threshold_as_given():
+    dedup = IngredientDeduplicator(threshold=0.6)
+    assert dedup.is_duplicate(evidence(0.6, cas='agree'))
+    assert not dedup.is_duplicate(evidence(0.55, cas='agree'))
+    assert not dedup.is_duplicate(evidence(0.9, cas='conflict', cosing='agree'))
+    assert not dedup.is_duplicate(evidence(0.8))
+
+
+def test_groups():
+    dedup = IngredientDeduplicator()
+    for i, (name, cas) in enumerate([('Glycerin', '56-81-5'), ('GLYCERINE', '56-81-5'),
+                                     ('Aqua', ''), ('Sodium Chloride', '7647-14-5')]):
+        dedup.add_record({'id': f'I{i}', 'inci_name': name, 'cas_number': cas})
+    groups = dedup.find_groups()
+    assert [[m['id'] for m in g['members']] for g in groups] == [['I0', 'I1']]
+
+
+def test_loads_json_and_inci_vessels(tmp_path):
+    ingredients = tmp_path / 'ingredients'
+    ingredients.mkdir()
+    (ingredients / 'R1.json').write_text(json.dumps({'id': 'R1', 'inci_name': 'Glycerin'}))
+    (ingredients / 'R1.inci').write_text('// INCI: Glycerin\n' + json.dumps({'id': 'R1', 'inci_name': 'Glycerin'}))
+    (ingredients / 'R2.inci').write_text('// INCI: Aqua\n' + json.dumps({'id': 'R2', 'inci_name': 'Aqua'}))
+    dedup = IngredientDeduplicator(tmp_path)
+    dedup.load_ingredients()
+    assert [(r['id'], r['file']) for r in dedup.records] == [('R1', 'R1.json'), ('R2', 'R2.inci')]
@@ -0,0 +1,25 @@
+"""
+seed_loader statements: keyed tables are upserted so a refresh updates the
+stored rows; tables without a key keep skipping conflicting rows.
+"""
+
+from seed_loader import insert_statement
+
+
+def test_keyed_table_updates_on_conflict():
+    sql = insert_statement('skin_twin.suppliers', [{'id': 'S1', 'label': 'One'}])
+    assert sql.endswith("ON CONFLICT (id) DO UPDATE SET label = EXCLUDED.label")
+
+
+def test_composite_key_keeps_last_row_per_key():
+    rows = [{'source': 'R1', 'target': 'S1', 'weight': 1},
+            {'source': 'R1', 'target': 'S1', 'weight': 2},
+            {'source': 'R2', 'target': 'S1', 'weight': 3}]
+    sql = insert_statement('supplier_edges', rows)
+    assert "ON CONFLICT (source, target) DO UPDATE SET weight = EXCLUDED.weight" in sql
+    assert "('R1', 'S1', 2)" in sql and "('R1', 'S1', 1)" not in sql
+
+
+def test_unkeyed_table_skips_conflicts():
+    sql = insert_statement('skin_twin.audit_log', [{'entity_type': 'formulation', 'entity_id': 'F1'}])
+    assert sql.endswith("ON CONFLICT DO NOTHING")
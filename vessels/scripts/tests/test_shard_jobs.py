@@ -0,0 +1,74 @@
+"""
+shard_jobs: a sharded validation run merges to the single-process report,
+with the vessels root given before or after the options.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from sharding import shard_files
+
+SCRIPTS = Path(__file__).resolve().parents[1]
+
+
+def run(script, *args, cwd):
+    return subprocess.run([sys.executable, str(SCRIPTS / script), *args], cwd=cwd,
+                          capture_output=True, text=True)
+
+
+@pytest.fixture
+def vessels_tree(tmp_path):
+    root = tmp_path / 'vessels'
+    (root / 'formulations').mkdir(parents=True)
+    (root / 'ingredients').mkdir()
+    for i in range(6):
+        (root / 'ingredients' / f'R{i}.json').write_text(json.dumps({'id': f'R{i}', 'inci_name': f'Name {i}'}))
+        (root / 'formulations' / f'F{i}.json').write_text(json.dumps({
+            'id': f'F{i}', 'name': f'Formulation {i}',
+            'ingredients': [{'ingredient_id': f'R{i}', 'inci_name': f'Name {i}', 'concentration': 60},
+                            {'ingredient_id': f'R{i + 1}', 'inci_name': 'Missing', 'concentration': 30}]}))
+    (root / 'formulations' / 'broken.form').write_text('// Formulation ID: X\n{"id": "X"} {')
+    return root
+
+
+def comparable(report):
+    sections = {}
+    for severity in ('errors', 'warnings'):
+        for kind, entry in report[severity].items():
+            samples = sorted(json.dumps(s, sort_keys=True) for s in entry['samples'])
+            sections[(severity, kind)] = (entry['count'], samples)
+    stats = {k: v for k, v in report['stats'].items() if k != 'shards'}
+    return report['totals'], sections, stats
+
+
+def test_sharded_report_matches_single_process(vessels_tree):
+    # Reports and partials go outside the tree, so no run validates another's output
+    report = vessels_tree / 'validation_report.json'
+    partials = str(vessels_tree.parent / 'shard_results')
+    assert run('validate_vessels_data.py', '.', cwd=vessels_tree).returncode == 1
+    single = json.loads(report.read_text())
+    report.unlink()
+
+    assert run('shard_jobs.py', 'run', 'validate', '--shard', '0', '--num-shards', '2', '.',
+               '--partials', partials, cwd=vessels_tree).returncode == 0
+    assert run('shard_jobs.py', 'run', 'validate', '.', '--shard', '1', '--num-shards', '2',
+               '--partials', partials, cwd=vessels_tree).returncode == 0
+    assert run('shard_jobs.py', 'reduce', 'validate', '--num-shards', '2', '--partials', partials, '.',
+               cwd=vessels_tree).returncode == 1
+    sharded = json.loads(report.read_text())
+
+    assert comparable(sharded) == comparable(single)
+    assert sharded['errors']['json_parse']['samples'] == [
+        {'file': 'formulations/broken.form', 'error': 'formulations/broken.form:2:13: Extra data'}]
+    assert sharded['stats']['shards'] == 2
+
+
+def test_shards_partition_the_files(vessels_tree):
+    paths = list(vessels_tree.rglob('*.json')) + list(vessels_tree.rglob('*.form'))
+    parts = [shard_files(paths, shard, 3) for shard in range(3)]
+    assert sorted(p for part in parts for p in part) == sorted(paths)
+    assert sum(len(part) for part in parts) == len(paths)
@@ -0,0 +1,112 @@
+"""
+similarity: the bit-parallel scorers compared with textbook dynamic
+programming and a direct Jaro implementation, including score cutoffs and
+the batch extract API.
+"""
+
+import random
+
+import pytest
+
+from similarity import (CandidateBlock, indel_distance, jaro_similarity, jaro_winkler_similarity,
+                        lcs_length, levenshtein_distance, levenshtein_ratio, ratio)
+
+
+def naive_levenshtein(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+    return row[-1]
+
+
+def naive_lcs(a, b):
+    row = [0] * (len(b) + 1)
+    for ca in a:
+        prev = 0
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], prev + 1 if ca == cb else max(row[j], row[j - 1])
+    return row[-1]
+
+
+def naive_jaro(a, b):
+    if not a and not b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    window = max(0, max(len(a), len(b)) // 2 - 1)
+    used = [False] * len(a)
+    matched_b = []
+    for j, ch in enumerate(b):
+        for i in range(max(0, j - window), min(len(a), j + window + 1)):
+            if not used[i] and a[i] == ch:
+                used[i] = True
+                matched_b.append(ch)
+                break
+    m = len(matched_b)
+    if not m:
+        return 0.0
+    matched_a = [ch for i, ch in enumerate(a) if used[i]]
+    half = sum(x != y for x, y in zip(matched_a, matched_b)) // 2
+    return (m / len(a) + m / len(b) + (m - half) / m) / 3.0
+
+
+def random_pairs(count=400, seed=1):
+    rng = random.Random(seed)
+    alphabet = 'ABCDE GLYCERIN'
+    for _ in range(count):
+        a = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 14)))
+        b = list(a) if rng.random() < 0.5 else [rng.choice(alphabet) for _ in range(rng.randint(0, 14))]
+        for _ in range(rng.randint(0, 3)):
+            if b and rng.random() < 0.5:
+                b.pop(rng.randrange(len(b)))
+            else:
+                b.insert(rng.randint(0, len(b)), rng.choice(alphabet))
+        yield a, ''.join(b)
+    yield 'X' * 70, 'X' * 69 + 'Y'   # longer than one machine word
+
+
+def test_distances_match_dynamic_programming():
+    for a, b in random_pairs():
+        assert levenshtein_distance(a, b) == naive_levenshtein(a, b)
+        assert lcs_length(a, b) == naive_lcs(a, b)
+        assert indel_distance(a, b) == len(a) + len(b) - 2 * naive_lcs(a, b)
+
+
+def test_cutoffs_only_cap_the_result():
+    for a, b in random_pairs(seed=2):
+        lev, indel = naive_levenshtein(a, b), len(a) + len(b) - 2 * naive_lcs(a, b)
+        for cutoff in range(4):
+            assert levenshtein_distance(a, b, cutoff) == min(lev, cutoff + 1)
+            assert indel_distance(a, b, cutoff) == min(indel, cutoff + 1)
+        for score_cutoff in (0.5, 0.8):
+            for scorer in (ratio, levenshtein_ratio, jaro_similarity, jaro_winkler_similarity):
+                full = scorer(a, b)
+                assert scorer(a, b, score_cutoff=score_cutoff) == (full if full >= score_cutoff else 0.0)
+
+
+def test_jaro_matches_direct_implementation():
+    for a, b in random_pairs(seed=3):
+        assert jaro_similarity(a, b) == pytest.approx(naive_jaro(a, b))
+
+
+@pytest.mark.parametrize('a, b, expected', [
+    ('MARTHA', 'MARHTA', 0.961),
+    ('DWAYNE', 'DUANE', 0.84),
+    ('DIXON', 'DICKSONX', 0.813),
+])
+def test_jaro_winkler_reference_values(a, b, expected):
+    assert jaro_winkler_similarity(a, b) == pytest.approx(expected, abs=1e-3)
+
+
+def test_extract_matches_scoring_every_candidate():
+    rng = random.Random(4)
+    choices = [''.join(rng.choice('ABCD') for _ in range(rng.randint(1, 9))) for _ in range(200)]
+    block = CandidateBlock(choices)
+    for query in ('ABCD', 'AAB', 'DCBADCBA'):
+        for scorer in (ratio, levenshtein_ratio, jaro_similarity):
+            scored = [(c, scorer(query, c), i) for i, c in enumerate(choices)]
+            expected = sorted((r for r in scored if r[1] >= 0.6), key=lambda r: (-r[1], r[2]))
+            assert block.extract(query, scorer, score_cutoff=0.6) == expected
+            assert block.extract_one(query, scorer, score_cutoff=0.6) == (expected[0] if expected else None)
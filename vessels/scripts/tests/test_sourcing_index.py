@@ -0,0 +1,73 @@
+"""
+sourcing_index: exact supplier cover and single points of failure compared
+with brute force, and formulation loading from JSON files and .form vessels.
+"""
+
+import json
+import random
+from itertools import combinations
+
+from sourcing_index import SourcingIndex
+
+
+def random_index(rng, suppliers=9, ingredients=12):
+    index = SourcingIndex()
+    for s in range(suppliers):
+        for i in rng.sample(range(ingredients), rng.randint(1, 5)):
+            index.add_supply(f'S{s}', f'R{i}')
+        index.supplier_info[f'S{s}'].update(risk='Low', availability='Available')
+    index.add_formulation('F1', [f'R{i}' for i in range(ingredients + 1)])
+    return index
+
+
+def test_exact_cover_matches_brute_force():
+    rng = random.Random(5)
+    for _ in range(25):
+        index = random_index(rng)
+        result = index.minimal_supplier_set('F1', exact=True)
+        masks = index.supplier_masks
+        coverable = 0
+        for mask in masks.values():
+            coverable |= mask
+        smallest = next(size for size in range(len(masks) + 1)
+                        for combo in combinations(masks, size)
+                        if coverable & ~_union(masks, combo) == 0)
+        assert len(result['suppliers']) == smallest
+        assert coverable & ~_union(masks, result['suppliers']) == 0
+        assert set(result['uncovered_ingredients']) == {f'R{i}' for i in range(13)} - set(index.ids_of(coverable))
+
+
+def _union(masks, suppliers):
+    union = 0
+    for s in suppliers:
+        union |= masks[s]
+    return union
+
+
+def test_single_points_of_failure_match_brute_force():
+    rng = random.Random(9)
+    index = random_index(rng)
+    expected = {}
+    for s, mask in sorted(index.supplier_masks.items()):
+        only = [i for i in index.ids_of(mask)
+                if sum(1 for m in index.supplier_masks.values() if m & index.bit(i)) == 1]
+        if only:
+            expected[s] = sorted(only, key=index.ingredient_bits.get)
+    assert index.single_points_of_failure() == expected
+
+
+def test_formulations_from_json_and_form_vessels(tmp_path):
+    formulations = tmp_path / 'formulations'
+    formulations.mkdir()
+    (formulations / 'F1.json').write_text(json.dumps({
+        'id': 'F1', 'name': 'Cream', 'ingredients': [{'ingredient_id': 'R1'}, {'inci_name': 'AQUA'}]}))
+    (formulations / 'F1.form').write_text(json.dumps({
+        'formulation_id': 'F1', 'formulation_phases': {'a': {'R9': 1}}}))
+    (formulations / 'F2.form').write_text(json.dumps({
+        'formulation_id': 'F2', 'product_name': 'Serum',
+        'formulation_phases': {'a': {'R2': '5%', 'glycerin': 3}, 'b': {'R3': 'to taste'}}}))
+
+    index = SourcingIndex(tmp_path)
+    index.load_formulations()
+    assert {f: index.ids_of(m) for f, m in index.formulation_masks.items()} == {'F1': ['R1'], 'F2': ['R2']}
+    assert index.formulation_names == {'F1': 'Cream', 'F2': 'Serum'}
@@ -0,0 +1,104 @@
+"""
+vessel_corpus: largest-remainder rounding, group medians and outlier scores
+compared with per-group Python, and the vectorized formulation checks on a
+small tree.
+"""
+
+import json
+import math
+import random
+import statistics
+
+import numpy as np
+import pytest
+
+from vessel_corpus import (CORRECT, INCOMPLETE, NORMALIZE, OUTLIER_THRESHOLD, _group_medians,
+                           concentration_outliers, concentration_status, formulation_totals,
+                           load_corpus, normalized_concentrations, round_to_sum)
+
+
+def brute_round_to_sum(values, groups, targets, decimals):
+    unit = 10 ** decimals
+    result = [0.0] * len(values)
+    for group, target in enumerate(targets):
+        members = [i for i, g in enumerate(groups) if g == group]
+        floors = {i: math.floor(values[i] * unit + 1e-9) for i in members}
+        missing = round(target * unit) - sum(floors.values())
+        missing = max(0, min(len(members), missing))
+        ranked = sorted(members, key=lambda i: (-(values[i] * unit - floors[i]), i))
+        for rank, i in enumerate(ranked):
+            result[i] = (floors[i] + (rank < missing)) / unit
+    return result
+
+
+def test_round_to_sum_matches_largest_remainder():
+    rng = random.Random(2)
+    for _ in range(50):
+        groups = sorted(rng.randrange(5) for _ in range(rng.randint(5, 40)))
+        groups = [sorted(set(groups)).index(g) for g in groups]
+        raw = [rng.random() for _ in groups]
+        totals = [sum(v for v, g in zip(raw, groups) if g == k) for k in range(max(groups) + 1)]
+        values = [100 * v / totals[g] for v, g in zip(raw, groups)]
+        targets = [100.0] * len(totals)
+        for decimals in (0, 2, 4):
+            rounded = round_to_sum(np.array(values), np.array(groups), np.array(targets), decimals)
+            assert rounded.tolist() == brute_round_to_sum(values, groups, targets, decimals)
+            sums = np.bincount(groups, weights=rounded * 10 ** decimals)
+            assert np.round(sums).tolist() == [100 * 10 ** decimals] * len(targets)
+            assert np.all(np.abs(rounded - values) < 10 ** -decimals + 1e-9)
+
+
+def test_group_medians_match_statistics():
+    rng = random.Random(6)
+    groups = np.array([rng.randrange(6) for _ in range(200)] + list(range(6)))
+    values = np.array([rng.choice([0.5, 1.0, 2.0, rng.random() * 10]) for _ in groups])
+    expected = [statistics.median(values[groups == g].tolist()) for g in range(6)]
+    assert _group_medians(groups, values).tolist() == pytest.approx(expected)
+
+
+def test_concentration_status():
+    totals = np.array([100.0, 100.05, 99.0, 120.0, 49.0, 151.0, 0.0])
+    assert concentration_status(totals).tolist() == [CORRECT, CORRECT, NORMALIZE, NORMALIZE,
+                                                     INCOMPLETE, INCOMPLETE, INCOMPLETE]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    formulations = tmp_path / 'formulations'
+    formulations.mkdir()
+    lines = {
+        'F1': [('AQUA', 70.0), ('GLYCERIN', 5.0), ('CETEARYL ALCOHOL', 25.0)],
+        'F2': [('AQUA', 60.0), ('GLYCERIN', 3.0), ('CETEARYL ALCOHOL', 7.0)],
+        'F3': [('AQUA', 75.0), ('GLYCERIN', 4.0), ('CETEARYL ALCOHOL', 21.0)],
+        'F4': [('AQUA', 30.0), ('GLYCERIN', 50.0), ('CETEARYL ALCOHOL', 20.0)],
+        'F5': [('AQUA', 80.0), ('GLYCERIN', 5.0), ('CETEARYL ALCOHOL', 15.0)],
+        'F6': [('AQUA', 33.0), ('GLYCERIN', 33.0), ('CETEARYL ALCOHOL', 33.0)],
+    }
+    for formulation_id, ingredients in lines.items():
+        (formulations / f'{formulation_id}.json').write_text(json.dumps({
+            'id': formulation_id, 'name': formulation_id,
+            'ingredients': [{'inci_name': name, 'concentration': c} for name, c in ingredients]}))
+    return load_corpus(tmp_path), lines
+
+
+def test_formulation_checks(corpus):
+    corpus, lines = corpus
+    ids = corpus.formulations['id'].tolist()
+    totals = formulation_totals(corpus)
+    assert dict(zip(ids, totals.tolist())) == {f: sum(c for _, c in ls) for f, ls in lines.items()}
+
+    normalized = normalized_concentrations(corpus, totals)
+    sums = np.bincount(corpus.lines['formulation'], weights=normalized)
+    assert sums == pytest.approx([100.0] * len(ids), abs=1e-9)
+
+    outliers = concentration_outliers(corpus)
+    flagged = {(ids[corpus.lines['formulation'][i]], corpus.inci_names[corpus.lines['inci'][i]])
+               for i in outliers['line'].tolist()}
+    expected = set()
+    for name in ('AQUA', 'GLYCERIN', 'CETEARYL ALCOHOL'):
+        values = {f: dict(ls)[name] for f, ls in lines.items()}
+        median = statistics.median(values.values())
+        mad = statistics.median(abs(v - median) for v in values.values())
+        spread = mad / 0.6745 if mad else statistics.mean(abs(v - median) for v in values.values()) * 1.2533
+        expected |= {(f, name) for f, v in values.items() if spread and abs(v - median) / spread > OUTLIER_THRESHOLD}
+    assert flagged == expected and ('F4', 'GLYCERIN') in flagged
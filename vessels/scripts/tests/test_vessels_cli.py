@@ -0,0 +1,23 @@
+"""
+The vessels CLI stays cheap to start: `vessels self-check` (startup budget,
+no heavy imports, every command resolves) must pass.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import vessels
+
+CLI = str(Path(vessels.__file__).resolve())
+
+
+def test_self_check_passes():
+    result = subprocess.run([sys.executable, CLI, 'self-check'], capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_help_lists_every_command():
+    result = subprocess.run([sys.executable, CLI, '--help'], capture_output=True, text=True, check=True)
+    for name in list(vessels.COMMANDS) + list(vessels.BUILTINS):
+        assert name in result.stdout
@@ -6,17 +6,53 @@ Validates and corrects data integrity issues in the vessels folder.
 
 import json
 import sys
+import argparse
 from pathlib import Path
 from collections import defaultdict
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Optional, Set
+
+from sharding import shard_files
+from vessel_reader import VESSEL_PATTERNS, VesselParseError, read_vessel, vessel_id
+from vessel_schema import Formulation, Ingredient, Product, ENTITY_TYPES, SchemaError, load_entity
+from validation_report import ValidationReporter, SAMPLE_SIZE
+from vessel_corpus import TOTAL_TOLERANCE, SCORE_LABELS, quality_scores
+
+EDGE_FILE = ENTITY_TYPES['edges']
+
+# Formulation fields reported as formulation_missing_field when absent or empty
+FORMULATION_REQUIRED = ('id', 'name', 'ingredients')
+
+# Decode failures at these paths keep their dedicated report keys
+FIELD_ERRORS = {
+    ('edge', '$.source_id'): 'edge_missing_source',
+    ('edge', '$.target_id'): 'edge_missing_target',
+    ('edge', '$.type'): 'edge_missing_type',
+}
 
 class VesselsDataValidator:
-    def __init__(self, vessels_root: str = "."):
+    def __init__(self, vessels_root: str = ".", shard: int = 0, num_shards: int = 1,
+                 report: Optional[ValidationReporter] = None):
         self.vessels_root = Path(vessels_root)
-        self.errors = defaultdict(list)
-        self.warnings = defaultdict(list)
+        self.shard = shard
+        self.num_shards = num_shards
+        # Findings are streamed by the reporter; only counters and samples stay in memory
+        self.report = report or ValidationReporter()
         self.stats = defaultdict(int)
+        # Files that failed to parse in the first pass; the entity passes skip them
+        self.unreadable: Set[Path] = set()
+    
+    def files(self, directory: Path, patterns: Iterable[str] = VESSEL_PATTERNS, recursive: bool = False) -> List[Path]:
+        """Vessel files (.json/.form/.prod/.supp/.inci) in a directory owned by this validator's shard."""
+        paths = set()
+        for pattern in patterns:
+            paths.update(directory.rglob(pattern) if recursive else directory.glob(pattern))
+        return shard_files(paths - self.unreadable, self.shard, self.num_shards)
         
+    def missing_directory(self, name: str):
+        """Report a missing top-level directory once, from shard 0, not once per shard."""
+        if self.shard == 0:
+            self.report.error('missing_directory', name)
+
     def validate_all(self) -> Dict[str, Any]:
         """Run all validation checks."""
         print("Starting comprehensive vessels data validation...")
@@ -31,77 +67,122 @@ class VesselsDataValidator:
         return self.generate_report()
     
     def validate_json_files(self):
-        """Validate all JSON files can be parsed."""
-        print("\n[1/6] Validating JSON files...")
+        """Validate all vessel files can be parsed."""
+        print("\n[1/6] Validating JSON and comment-headed vessel files...")
         
-        for json_file in self.vessels_root.rglob('*.json'):
+        for json_file in self.files(self.vessels_root, recursive=True):
             self.stats['total_json_files'] += 1
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    json.load(f)
+                document = read_vessel(json_file)
                 self.stats['valid_json_files'] += 1
+                if document['format'] != 'json':
+                    self.stats['commented_vessel_files'] += 1
+                if document['repairs']:
+                    self.report.warning('vessel_bare_values', {
+                        'file': str(json_file.relative_to(self.vessels_root)),
+                        'values': document['repairs']
+                    })
             except Exception as e:
-                self.errors['json_parse'].append({
-                    'file': str(json_file.relative_to(self.vessels_root)),
-                    'error': str(e)
+                file = str(json_file.relative_to(self.vessels_root))
+                message = str(e)
+                if isinstance(e, VesselParseError):
+                    # Relative path in the message too, so reports agree whatever root was given
+                    message = str(VesselParseError(e.message, file, e.line, e.column))
+                self.report.error('json_parse', {
+                    'file': file,
+                    'error': message
                 })
                 self.stats['invalid_json_files'] += 1
+                self.unreadable.add(json_file)
         
         print(f"   Valid: {self.stats['valid_json_files']}/{self.stats['total_json_files']}")
     
+    def schema_error(self, kind: str, json_file: Path, error: SchemaError):
+        """Record an entity that failed to decode, keyed by its JSON path."""
+        if error.syntax:
+            self.report.error(f'{kind}_parse', {
+                'file': json_file.name,
+                'error': error.message
+            })
+        elif (kind, error.path) in FIELD_ERRORS:
+            self.report.error(FIELD_ERRORS[(kind, error.path)], json_file.name)
+        elif error.missing_field:
+            self.report.error(f'{kind}_missing_field', {
+                'file': json_file.name,
+                'field': error.missing_field,
+                'path': error.path
+            })
+        else:
+            self.report.error(f'{kind}_schema', {
+                'file': json_file.name,
+                'path': error.path,
+                'error': error.message
+            })
+    
     def validate_formulations(self):
         """Validate formulation data integrity."""
         print("\n[2/6] Validating formulations...")
         
         formulations_dir = self.vessels_root / 'formulations'
         if not formulations_dir.exists():
-            self.errors['missing_directory'].append('formulations')
+            self.missing_directory('formulations')
             return
         
-        for json_file in formulations_dir.glob('*.json'):
+        for json_file in self.files(formulations_dir):
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                self.stats['total_formulations'] += 1
-                
-                # Check required fields
-                required_fields = ['id', 'name', 'ingredients']
-                for field in required_fields:
-                    if field not in data:
-                        self.errors['formulation_missing_field'].append({
+                if json_file.suffix != '.json':
+                    # Phase-based .form files: no line items to total up
+                    document = read_vessel(json_file)
+                    self.stats['total_formulation_vessels'] += 1
+                    if not vessel_id(document):
+                        self.report.error('formulation_missing_field', {
                             'file': json_file.name,
-                            'field': field
+                            'field': 'formulation_id'
                         })
+                    continue
                 
-                # Check concentration
-                if 'ingredients' in data:
-                    total = sum(ing.get('concentration', 0) for ing in data['ingredients'])
-                    
-                    if abs(total - 100) > 0.1:
-                        self.errors['formulation_concentration'].append({
-                            'file': json_file.name,
-                            'total': total,
-                            'difference': 100 - total
-                        })
-                        self.stats['formulations_concentration_error'] += 1
-                    
-                    # Check for unknown functions
-                    for ing in data['ingredients']:
-                        if ing.get('function') == 'Unknown':
-                            self.warnings['unknown_ingredient_function'].append({
-                                'formulation': json_file.name,
-                                'ingredient': ing.get('inci_name', 'Unknown')
-                            })
-                            self.stats['unknown_functions'] += 1
-            
+                # Field types are checked while decoding, required fields below
+                formulation = load_entity(json_file, Formulation)
+            except SchemaError as e:
+                self.schema_error('formulation', json_file, e)
+                continue
             except Exception as e:
-                self.errors['formulation_parse'].append({
+                self.report.error('formulation_parse', {
                     'file': json_file.name,
                     'error': str(e)
                 })
+                continue
+            
+            self.stats['total_formulations'] += 1
+            
+            # Check required fields
+            for field in FORMULATION_REQUIRED:
+                if not getattr(formulation, field):
+                    self.report.error('formulation_missing_field', {
+                        'file': json_file.name,
+                        'field': field
+                    })
+            
+            # Check concentration
+            total = formulation.total
+            if abs(total - 100) > TOTAL_TOLERANCE:
+                self.report.error('formulation_concentration', {
+                    'file': json_file.name,
+                    'total': total,
+                    'difference': 100 - total
+                })
+                self.stats['formulations_concentration_error'] += 1
+            
+            # Check for unknown functions
+            for line in formulation.ingredients:
+                if line.function == 'Unknown':
+                    self.report.warning('unknown_ingredient_function', {
+                        'formulation': json_file.name,
+                        'ingredient': line.inci_name
+                    })
+                    self.stats['unknown_functions'] += 1
         
-        print(f"   Total: {self.stats['total_formulations']}")
+        print(f"   Total: {self.stats['total_formulations']} (+{self.stats['total_formulation_vessels']} .form)")
         print(f"   Concentration errors: {self.stats['formulations_concentration_error']}")
         print(f"   Unknown functions: {self.stats['unknown_functions']}")
     
@@ -111,34 +192,43 @@ class VesselsDataValidator:
         
         ingredients_dir = self.vessels_root / 'ingredients'
         if not ingredients_dir.exists():
-            self.errors['missing_directory'].append('ingredients')
+            self.missing_directory('ingredients')
             return
         
-        for json_file in ingredients_dir.glob('*.json'):
+        for json_file in self.files(ingredients_dir):
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                self.stats['total_ingredients'] += 1
-                
-                # Check for missing critical fields
-                if not data.get('inci_name'):
-                    self.errors['ingredient_missing_inci'].append(json_file.name)
-                
-                if not data.get('cas_number'):
-                    self.stats['ingredients_missing_cas'] += 1
-                
-                if not data.get('supplier_id'):
-                    self.stats['ingredients_missing_supplier'] += 1
-                
-                if not data.get('function'):
-                    self.stats['ingredients_missing_function'] += 1
-            
+                if json_file.suffix == '.json':
+                    ingredient = load_entity(json_file, Ingredient)
+                    fields = (ingredient.inci_name, ingredient.cas_number,
+                              ingredient.supplier_id, ingredient.function)
+                else:
+                    data = read_vessel(json_file)['data']
+                    fields = tuple(data.get(k) for k in ('inci_name', 'cas_number', 'supplier_id', 'function'))
+            except SchemaError as e:
+                self.schema_error('ingredient', json_file, e)
+                continue
             except Exception as e:
-                self.errors['ingredient_parse'].append({
+                self.report.error('ingredient_parse', {
                     'file': json_file.name,
                     'error': str(e)
                 })
+                continue
+            
+            self.stats['total_ingredients'] += 1
+            inci_name, cas_number, supplier_id, function = fields
+            
+            # Check for missing critical fields
+            if not inci_name:
+                self.report.error('ingredient_missing_inci', json_file.name)
+            
+            if not cas_number:
+                self.stats['ingredients_missing_cas'] += 1
+            
+            if not supplier_id:
+                self.stats['ingredients_missing_supplier'] += 1
+            
+            if not function:
+                self.stats['ingredients_missing_function'] += 1
         
         print(f"   Total: {self.stats['total_ingredients']}")
         print(f"   Missing CAS: {self.stats['ingredients_missing_cas']}")
@@ -151,28 +241,38 @@ class VesselsDataValidator:
         
         products_dir = self.vessels_root / 'products'
         if not products_dir.exists():
-            self.errors['missing_directory'].append('products')
+            self.missing_directory('products')
             return
         
-        for json_file in products_dir.glob('*.json'):
+        for json_file in self.files(products_dir):
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                self.stats['total_products'] += 1
-                
-                # Check for placeholder values
-                if data.get('color') == 'Unknown':
-                    self.warnings['product_unknown_color'].append(json_file.name)
-                
-                if data.get('age_range') == '25-65+':
-                    self.warnings['product_generic_age'].append(json_file.name)
-            
+                if json_file.suffix == '.json':
+                    product = load_entity(json_file, Product)
+                    color = product.metadata.color if product.metadata else None
+                    age_range = None
+                else:
+                    # .prod files keep these under specifications/demographics
+                    data = read_vessel(json_file)['data']
+                    color = (data.get('product_specifications') or {}).get('color')
+                    age_range = (data.get('target_demographics') or {}).get('age_range')
+            except SchemaError as e:
+                self.schema_error('product', json_file, e)
+                continue
             except Exception as e:
-                self.errors['product_parse'].append({
+                self.report.error('product_parse', {
                     'file': json_file.name,
                     'error': str(e)
                 })
+                continue
+            
+            self.stats['total_products'] += 1
+            
+            # Check for placeholder values
+            if color == 'Unknown':
+                self.report.warning('product_unknown_color', json_file.name)
+            
+            if age_range == '25-65+':
+                self.report.warning('product_generic_age', json_file.name)
         
         print(f"   Total: {self.stats['total_products']}")
     
@@ -182,34 +282,29 @@ class VesselsDataValidator:
         
         edges_dir = self.vessels_root / 'edges'
         if not edges_dir.exists():
-            self.errors['missing_directory'].append('edges')
+            self.missing_directory('edges')
             return
         
         edge_types = defaultdict(int)
         
-        for json_file in edges_dir.glob('*.json'):
+        for json_file in self.files(edges_dir, ['*.json']):
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                self.stats['total_edges'] += 1
-                edge_types[data.get('type', 'Unknown')] += 1
-                
-                # Check for required fields
-                if not data.get('source') and not data.get('source_id'):
-                    self.errors['edge_missing_source'].append(json_file.name)
-                
-                if not data.get('target') and not data.get('target_id'):
-                    self.errors['edge_missing_target'].append(json_file.name)
-                
-                if not data.get('type'):
-                    self.errors['edge_missing_type'].append(json_file.name)
-            
+                # Source, target and type are required by the Edge struct
+                edge = load_entity(json_file, EDGE_FILE)
+            except SchemaError as e:
+                self.schema_error('edge', json_file, e)
+                continue
             except Exception as e:
-                self.errors['edge_parse'].append({
+                self.report.error('edge_parse', {
                     'file': json_file.name,
                     'error': str(e)
                 })
+                continue
+            
+            self.stats['total_edges'] += 1
+            if isinstance(edge, list):
+                continue  # all_edges.json aggregates the individual edge files
+            edge_types[edge.type] += 1
         
         self.stats['edge_types'] = dict(edge_types)
         print(f"   Total: {self.stats['total_edges']}")
@@ -219,39 +314,56 @@ class VesselsDataValidator:
         """Validate cross-references between entities."""
         print("\n[6/6] Validating cross-references...")
         
+        ingredient_ids, references = self.collect_reference_sets()
+        self.check_references(ingredient_ids, references)
+        
+        print(f"   Missing ingredient references: {self.stats['missing_ingredient_refs']}")
+    
+    def collect_reference_sets(self):
+        """Ingredient IDs defined and referenced by this shard's files.
+        
+        Sharded runs exchange these sets instead of files so that
+        reference integrity can be checked across shards in the reduce step.
+        """
         # Load all ingredient IDs
         ingredient_ids = set()
         ingredients_dir = self.vessels_root / 'ingredients'
         if ingredients_dir.exists():
-            for json_file in ingredients_dir.glob('*.json'):
+            for json_file in self.files(ingredients_dir):
                 try:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if 'id' in data:
-                            ingredient_ids.add(data['id'])
-                except:
+                    if json_file.suffix == '.json':
+                        ingredient_ids.add(load_entity(json_file, Ingredient).id)
+                    else:
+                        ingredient_id = vessel_id(read_vessel(json_file))
+                        if ingredient_id:
+                            ingredient_ids.add(ingredient_id)
+                except (OSError, ValueError):
                     pass
         
-        # Check formulation ingredient references
+        # Collect formulation ingredient references
+        references = []
         formulations_dir = self.vessels_root / 'formulations'
         if formulations_dir.exists():
-            for json_file in formulations_dir.glob('*.json'):
+            for json_file in self.files(formulations_dir, ['*.json']):
                 try:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    for ing in data.get('ingredients', []):
-                        ing_id = ing.get('ingredient_id')
-                        if ing_id and ing_id not in ingredient_ids:
-                            self.warnings['ingredient_reference_not_found'].append({
-                                'formulation': json_file.name,
-                                'ingredient_id': ing_id
-                            })
-                            self.stats['missing_ingredient_refs'] += 1
-                except:
-                    pass
+                    formulation = load_entity(json_file, Formulation)
+                except (OSError, ValueError):
+                    continue
+                for line in formulation.ingredients:
+                    if line.ingredient_id:
+                        references.append((json_file.name, line.ingredient_id))
         
-        print(f"   Missing ingredient references: {self.stats['missing_ingredient_refs']}")
+        return ingredient_ids, references
+    
+    def check_references(self, ingredient_ids: Set[str], references: Iterable):
+        """Record formulation references to ingredient IDs that do not exist."""
+        for formulation, ing_id in references:
+            if ing_id not in ingredient_ids:
+                self.report.warning('ingredient_reference_not_found', {
+                    'formulation': formulation,
+                    'ingredient_id': ing_id
+                })
+                self.stats['missing_ingredient_refs'] += 1
     
     def generate_report(self) -> Dict[str, Any]:
         """Generate validation report."""
@@ -259,63 +371,52 @@ class VesselsDataValidator:
         print("VALIDATION REPORT")
         print("="*60)
         
-        total_errors = sum(len(v) for v in self.errors.values())
-        total_warnings = sum(len(v) for v in self.warnings.values())
+        total_errors = self.report.total_errors
+        total_warnings = self.report.total_warnings
         
         print(f"\nTotal Errors: {total_errors}")
         print(f"Total Warnings: {total_warnings}")
         
         if total_errors > 0:
             print("\nError Summary:")
-            for error_type, error_list in self.errors.items():
-                print(f"  {error_type}: {len(error_list)}")
+            for error_type, count in self.report.counts['error'].items():
+                print(f"  {error_type}: {count}")
         
         if total_warnings > 0:
             print("\nWarning Summary:")
-            for warning_type, warning_list in self.warnings.items():
-                print(f"  {warning_type}: {len(warning_list)}")
+            for warning_type, count in self.report.counts['warning'].items():
+                print(f"  {warning_type}: {count}")
         
         print("\nData Quality Score:")
-        if self.stats['total_json_files'] > 0:
-            json_validity = (self.stats['valid_json_files'] / self.stats['total_json_files']) * 100
-            print(f"  JSON Validity: {json_validity:.1f}%")
-        
-        if self.stats['total_formulations'] > 0:
-            formulation_quality = ((self.stats['total_formulations'] - self.stats['formulations_concentration_error']) / 
-                                   self.stats['total_formulations']) * 100
-            print(f"  Formulation Quality: {formulation_quality:.1f}%")
-        
-        if self.stats['total_ingredients'] > 0:
-            ingredient_completeness = ((self.stats['total_ingredients'] - 
-                                       self.stats['ingredients_missing_cas'] - 
-                                       self.stats['ingredients_missing_supplier'] - 
-                                       self.stats['ingredients_missing_function']) / 
-                                      (self.stats['total_ingredients'] * 3)) * 100
-            print(f"  Ingredient Completeness: {ingredient_completeness:.1f}%")
+        for name, score in quality_scores(self.stats).items():
+            print(f"  {SCORE_LABELS[name]}: {score:.1f}%")
         
-        return {
-            'errors': dict(self.errors),
-            'warnings': dict(self.warnings),
-            'stats': dict(self.stats)
-        }
+        return self.report.summary(self.stats)
 
 def main():
     """Main entry point."""
-    vessels_root = sys.argv[1] if len(sys.argv) > 1 else "."
+    parser = argparse.ArgumentParser(description="Validate vessel data integrity")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--findings', help="Findings stream (default: <vessels_root>/validation_findings.jsonl)")
+    parser.add_argument('--samples', type=int, default=SAMPLE_SIZE, help="Samples kept per finding kind in the report")
+    args = parser.parse_args()
     
-    validator = VesselsDataValidator(vessels_root)
-    report = validator.validate_all()
+    vessels_root = args.vessels_root
+    findings = args.findings or Path(vessels_root) / 'validation_findings.jsonl'
+    with ValidationReporter(findings, args.samples) as reporter:
+        validator = VesselsDataValidator(vessels_root, report=reporter)
+        report = validator.validate_all()
     
-    # Save detailed report
+    # Save the compact summary; every finding is in the findings stream
     report_file = Path(vessels_root) / 'validation_report.json'
     with open(report_file, 'w', encoding='utf-8') as f:
         json.dump(report, f, indent=2)
     
-    print(f"\nDetailed report saved to: {report_file}")
+    print(f"\nReport saved to: {report_file}")
+    print(f"Findings streamed to: {findings}")
     
     # Exit with error code if there are errors
-    total_errors = sum(len(v) for v in report['errors'].values())
-    sys.exit(1 if total_errors > 0 else 0)
+    sys.exit(1 if report['totals']['errors'] > 0 else 0)
 
 if __name__ == '__main__':
     main()
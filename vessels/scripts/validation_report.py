@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Streaming Validation Report
+Collects validator findings without holding them in memory: every error and
+warning is appended to a JSONL findings file the moment it is recorded
+(line-buffered, so CI can `tail -f` it during a run), while memory keeps only
+a counter and the first few samples per finding kind. The compact summary
+becomes validation_report.json:
+
+    {"totals": {"errors": 52, "warnings": 604},
+     "errors": {"formulation_concentration": {"count": 52, "samples": [...]}},
+     "warnings": {...}, "stats": {...}, "findings": "validation_findings.jsonl"}
+
+Each findings line is {"severity": "error"|"warning", "kind": ..., "item": ...}.
+"""
+
+import json
+import shutil
+import argparse
+from pathlib import Path
+from collections import Counter
+from typing import Dict, List, Any, Optional, Iterator
+
+SAMPLE_SIZE = 10
+SEVERITIES = ('error', 'warning')
+
+
+class ValidationReporter:
+    """Streams findings to JSONL and keeps per-kind counters and samples."""
+
+    def __init__(self, findings_path=None, sample_size: int = SAMPLE_SIZE):
+        self.findings_path = Path(findings_path) if findings_path else None
+        self.sample_size = sample_size
+        self.counts: Dict[str, Counter] = {severity: Counter() for severity in SEVERITIES}
+        self.samples: Dict[str, Dict[str, List[Any]]] = {severity: {} for severity in SEVERITIES}
+        self._stream = None
+        if self.findings_path:
+            self.findings_path.parent.mkdir(parents=True, exist_ok=True)
+            self._stream = open(self.findings_path, 'w', encoding='utf-8', buffering=1)
+
+    def __enter__(self) -> 'ValidationReporter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def record(self, severity: str, kind: str, item: Any) -> None:
+        """Count a finding, keep it if its kind has room for samples, and stream it."""
+        self.counts[severity][kind] += 1
+        samples = self.samples[severity].setdefault(kind, [])
+        if len(samples) < self.sample_size:
+            samples.append(item)
+        if self._stream is not None:
+            self._stream.write(json.dumps({'severity': severity, 'kind': kind, 'item': item},
+                                          ensure_ascii=False) + '\n')
+
+    def error(self, kind: str, item: Any) -> None:
+        self.record('error', kind, item)
+
+    def warning(self, kind: str, item: Any) -> None:
+        self.record('warning', kind, item)
+
+    @property
+    def total_errors(self) -> int:
+        return sum(self.counts['error'].values())
+
+    @property
+    def total_warnings(self) -> int:
+        return sum(self.counts['warning'].values())
+
+    def section(self, severity: str) -> Dict[str, Dict[str, Any]]:
+        return {
+            kind: {'count': count, 'samples': self.samples[severity].get(kind, [])}
+            for kind, count in self.counts[severity].items()
+        }
+
+    def summary(self, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """The compact report: totals, per-kind counts and samples, stats."""
+        return {
+            'totals': {'errors': self.total_errors, 'warnings': self.total_warnings},
+            'errors': self.section('error'),
+            'warnings': self.section('warning'),
+            'stats': dict(stats or {}),
+            'findings': self.findings_path.name if self.findings_path else None,
+        }
+
+    def merge(self, summary: Dict[str, Any]) -> None:
+        """Add another reporter's summary (e.g. a shard's) to the counters and samples."""
+        for severity, section in (('error', summary.get('errors', {})), ('warning', summary.get('warnings', {}))):
+            for kind, entry in section.items():
+                self.counts[severity][kind] += entry['count']
+                samples = self.samples[severity].setdefault(kind, [])
+                samples.extend(entry['samples'][:self.sample_size - len(samples)])
+
+    def append_findings(self, path: Path) -> None:
+        """Copy another findings file into this reporter's stream."""
+        if self._stream is None:
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            shutil.copyfileobj(f, self._stream)
+        self._stream.flush()
+
+
+def iter_findings(path, severity: Optional[str] = None, kind: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Findings from a JSONL file, optionally filtered by severity and kind."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            finding = json.loads(line)
+            if severity and finding['severity'] != severity:
+                continue
+            if kind and finding['kind'] != kind:
+                continue
+            yield finding
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Filter a validation findings file")
+    parser.add_argument('findings', nargs='?', default='validation_findings.jsonl')
+    parser.add_argument('--severity', choices=SEVERITIES)
+    parser.add_argument('--kind', help="Only findings of this kind")
+    parser.add_argument('--count', action='store_true', help="Print counts per kind instead of findings")
+    args = parser.parse_args()
+
+    findings = iter_findings(args.findings, args.severity, args.kind)
+    if args.count:
+        counts = Counter((f['severity'], f['kind']) for f in findings)
+        for (severity, kind), count in sorted(counts.items()):
+            print(f"  {severity} {kind}: {count}")
+        return
+    for finding in findings:
+        print(json.dumps(finding, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
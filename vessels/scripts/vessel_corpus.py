@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Columnar Vessel Corpus
+Loads the vessel entities once into typed column tables (numpy arrays):
+ingredients, formulations, formulation lines, products and edges. Corpus-wide
+data-quality checks then run as vectorized group-by operations over the
+formulation-line table instead of per-file Python loops:
+
+- concentration totals per formulation (one bincount over the lines)
+- the fixer's classification (correct / normalize / mark incomplete) and
+  the normalized concentrations of every line (exact-sum rounded)
+- ingredient and per-formulation completeness
+- concentration outliers per INCI name (robust z-scores from grouped
+  medians and median absolute deviations)
+
+The quality scores use the same formulas as the validator report
+(`quality_scores`), computed from counters the tables produce directly.
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from sharding import shard_files
+from vessel_reader import read_vessel, vessel_id
+from vessel_schema import Formulation, Ingredient, Product, Edge, SchemaError, load_entity
+
+# Concentration totals (percent) shared by the validator and the fixer
+TOTAL_TOLERANCE = 0.1
+INCOMPLETE_BELOW = 50
+INCOMPLETE_ABOVE = 150
+
+# Formulation classification by concentration total
+CORRECT, NORMALIZE, INCOMPLETE = 0, 1, 2
+STATUS_NAMES = ['correct', 'normalize', 'incomplete']
+
+SCORE_LABELS = {
+    'json_validity': 'JSON Validity',
+    'formulation_quality': 'Formulation Quality',
+    'ingredient_completeness': 'Ingredient Completeness',
+}
+
+OUTLIER_THRESHOLD = 3.5   # modified z-score (Iglewicz and Hoaglin)
+OUTLIER_MIN_LINES = 3
+
+Table = Dict[str, np.ndarray]
+
+
+def _strings(values: List[str]) -> np.ndarray:
+    return np.array(values, dtype=object)
+
+
+def _codes(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Dictionary-encode strings: (sorted unique values, int32 codes)."""
+    if not values:
+        return np.zeros(0, dtype=object), np.zeros(0, dtype=np.int32)
+    uniques, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+    return uniques, codes.astype(np.int32)
+
+
+class Corpus:
+    """Vessel entities as column tables; strings are dictionary-encoded where grouped on."""
+
+    def __init__(self, vessels_root: str = ".", shard: int = 0, num_shards: int = 1):
+        self.vessels_root = Path(vessels_root)
+        self.shard = shard
+        self.num_shards = num_shards
+        self.ingredients: Table = {}
+        self.formulations: Table = {}
+        self.lines: Table = {}
+        self.products: Table = {}
+        self.edges: Table = {}
+        self.inci_names = np.zeros(0, dtype=object)     # line inci code -> INCI name
+        self.edge_types = np.zeros(0, dtype=object)     # edge type code -> type
+        self.nodes = np.zeros(0, dtype=object)          # edge node code -> id
+        self.errors: List[Dict[str, str]] = []
+        self.stats = defaultdict(int)
+
+    def files(self, directory: str, patterns=('*.json',)) -> List[Path]:
+        path = self.vessels_root / directory
+        paths = set()
+        for pattern in patterns:
+            paths.update(path.glob(pattern))
+        return shard_files(paths, self.shard, self.num_shards)
+
+    def _failed(self, path: Path, error: Exception):
+        self.stats['invalid_files'] += 1
+        self.errors.append({'file': str(path.relative_to(self.vessels_root)), 'error': str(error)})
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load(self) -> 'Corpus':
+        self.load_ingredients()
+        self.load_formulations()
+        self.load_products()
+        self.load_edges()
+        return self
+
+    def load_ingredients(self):
+        ids, has_inci, has_cas, has_supplier, has_function = [], [], [], [], []
+        for path in self.files('ingredients', ('*.json', '*.inci')):
+            self.stats['files'] += 1
+            try:
+                if path.suffix == '.json':
+                    ingredient = load_entity(path, Ingredient)
+                    values = (ingredient.id, ingredient.inci_name, ingredient.cas_number,
+                              ingredient.supplier_id, ingredient.function)
+                else:
+                    document = read_vessel(path)
+                    data = document['data']
+                    values = (vessel_id(document),) + tuple(
+                        data.get(k) for k in ('inci_name', 'cas_number', 'supplier_id', 'function'))
+            except (OSError, ValueError) as e:
+                self._failed(path, e)
+                continue
+            ids.append(values[0] or path.stem)
+            has_inci.append(bool(values[1]))
+            has_cas.append(bool(values[2]))
+            has_supplier.append(bool(values[3]))
+            has_function.append(bool(values[4]))
+        self.ingredients = {
+            'id': _strings(ids),
+            'has_inci': np.array(has_inci, dtype=bool),
+            'has_cas': np.array(has_cas, dtype=bool),
+            'has_supplier': np.array(has_supplier, dtype=bool),
+            'has_function': np.array(has_function, dtype=bool),
+        }
+
+    def load_formulations(self):
+        ids, files = [], []
+        line_form, line_ingredient, line_inci, line_conc, line_known = [], [], [], [], []
+        ingredient_index = {ingredient_id: i for i, ingredient_id in enumerate(self.ingredients.get('id', []))}
+        for path in self.files('formulations'):
+            self.stats['files'] += 1
+            try:
+                formulation = load_entity(path, Formulation)
+            except (OSError, SchemaError) as e:
+                self._failed(path, e)
+                continue
+            index = len(ids)
+            ids.append(formulation.id or path.stem)
+            files.append(path.name)
+            for line in formulation.ingredients:
+                line_form.append(index)
+                line_ingredient.append(ingredient_index.get(line.ingredient_id, -1))
+                line_inci.append(line.inci_name.strip().upper())
+                line_conc.append(line.concentration)
+                line_known.append(line.function != 'Unknown')
+        self.stats['formulation_vessels'] = len(self.files('formulations', ('*.form',)))
+        self.inci_names, inci_codes = _codes(line_inci)
+        self.formulations = {'id': _strings(ids), 'file': _strings(files)}
+        self.lines = {
+            'formulation': np.array(line_form, dtype=np.int32),
+            'ingredient': np.array(line_ingredient, dtype=np.int32),
+            'inci': inci_codes,
+            'concentration': np.array(line_conc, dtype=np.float64),
+            'function_known': np.array(line_known, dtype=bool),
+        }
+
+    def load_products(self):
+        ids, colors, ages = [], [], []
+        for path in self.files('products', ('*.json', '*.prod')):
+            self.stats['files'] += 1
+            try:
+                if path.suffix == '.json':
+                    product = load_entity(path, Product)
+                    ids.append(product.id or path.stem)
+                    colors.append((product.metadata.color if product.metadata else None) or '')
+                    ages.append('')
+                else:
+                    data = read_vessel(path)['data']
+                    ids.append(data.get('product_id') or path.stem)
+                    colors.append((data.get('product_specifications') or {}).get('color') or '')
+                    ages.append((data.get('target_demographics') or {}).get('age_range') or '')
+            except (OSError, ValueError) as e:
+                self._failed(path, e)
+        self.products = {'id': _strings(ids), 'color': _strings(colors), 'age_range': _strings(ages)}
+
+    def load_edges(self):
+        types, sources, targets = [], [], []
+        for path in self.files('edges'):
+            if path.name == 'all_edges.json':
+                continue  # aggregate of the individual edge files
+            self.stats['files'] += 1
+            try:
+                edge = load_entity(path, Edge)
+            except (OSError, SchemaError) as e:
+                self._failed(path, e)
+                continue
+            types.append(edge.type)
+            sources.append(edge.source_id)
+            targets.append(edge.target_id)
+        self.edge_types, type_codes = _codes(types)
+        self.nodes, node_codes = _codes(sources + targets)
+        self.edges = {
+            'type': type_codes,
+            'source': node_codes[:len(sources)],
+            'target': node_codes[len(sources):],
+        }
+
+
+def load_corpus(vessels_root: str = ".", shard: int = 0, num_shards: int = 1) -> Corpus:
+    return Corpus(vessels_root, shard, num_shards).load()
+
+
+# ----------------------------------------------------------------------
+# Vectorized checks
+# ----------------------------------------------------------------------
+
+def formulation_line_counts(corpus: Corpus) -> np.ndarray:
+    """Number of lines per formulation; a formulation's lines are contiguous in the line table."""
+    return np.bincount(corpus.lines['formulation'], minlength=len(corpus.formulations['id']))
+
+
+def formulation_totals(corpus: Corpus) -> np.ndarray:
+    """Concentration total of every formulation (a group-by sum over the lines)."""
+    return np.bincount(corpus.lines['formulation'], weights=corpus.lines['concentration'],
+                       minlength=len(corpus.formulations['id']))
+
+
+def concentration_status(totals: np.ndarray) -> np.ndarray:
+    """CORRECT, NORMALIZE or INCOMPLETE per formulation, as FormulationFixer decides."""
+    status = np.full(len(totals), NORMALIZE, dtype=np.int8)
+    status[np.abs(totals - 100) < TOTAL_TOLERANCE] = CORRECT
+    status[(totals < INCOMPLETE_BELOW) | (totals > INCOMPLETE_ABOVE)] = INCOMPLETE
+    return status
+
+
+def round_to_sum(values: np.ndarray, groups: np.ndarray, targets: np.ndarray,
+                 decimals: int = 4) -> np.ndarray:
+    """Round values to `decimals` places so that each group sums exactly to its target.
+
+    Largest-remainder rounding: every value is floored to the rounding unit
+    and the units still missing in a group go to its values with the largest
+    remainders (ties to the earlier value).
+    """
+    unit = 10 ** decimals
+    scaled = values * unit
+    floors = np.floor(scaled + 1e-9)
+    remainders = scaled - floors
+    counts = np.bincount(groups, minlength=len(targets))
+    missing = np.round(targets * unit) - np.bincount(groups, weights=floors, minlength=len(targets))
+    missing = np.clip(missing, 0, counts).astype(np.int64)
+    order = np.lexsort((-remainders, groups))
+    starts = np.cumsum(counts) - counts
+    rank = np.empty(len(values), dtype=np.int64)
+    rank[order] = np.arange(len(values)) - starts[groups[order]]
+    return (floors + (rank < missing[groups])) / unit
+
+
+def normalized_concentrations(corpus: Corpus, totals: Optional[np.ndarray] = None) -> np.ndarray:
+    """Every line scaled so its formulation totals 100%, rounded to 4 places without drifting off 100."""
+    if totals is None:
+        totals = formulation_totals(corpus)
+    scale = np.divide(100, totals, out=np.ones_like(totals), where=totals > 0)
+    lines = corpus.lines['formulation']
+    targets = np.where(totals > 0, 100.0, 0.0)
+    return round_to_sum(corpus.lines['concentration'] * scale[lines], lines, targets)
+
+
+def formulation_completeness(corpus: Corpus) -> np.ndarray:
+    """Share of each formulation's lines with a known function and a resolved ingredient."""
+    lines = corpus.lines
+    complete = lines['function_known'] & (lines['ingredient'] >= 0)
+    count = len(corpus.formulations['id'])
+    per_form = formulation_line_counts(corpus)
+    done = np.bincount(lines['formulation'], weights=complete, minlength=count)
+    return np.divide(done, per_form, out=np.zeros(count), where=per_form > 0)
+
+
+def _group_medians(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Median of values per group code (every code 0..n-1 must occur)."""
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups)
+    starts = np.cumsum(counts) - counts
+    return (sorted_values[starts + (counts - 1) // 2] + sorted_values[starts + counts // 2]) / 2
+
+
+def concentration_outliers(corpus: Corpus, threshold: float = OUTLIER_THRESHOLD,
+                           min_lines: int = OUTLIER_MIN_LINES) -> Dict[str, np.ndarray]:
+    """Lines whose concentration is far from the usual level of the same INCI name.
+
+    Uses the modified z-score 0.6745 * (x - median) / MAD per INCI group; when
+    the MAD is 0 the mean absolute deviation (scaled by 1.2533) stands in.
+    Groups with fewer than `min_lines` lines are not scored.
+    """
+    lines = corpus.lines
+    groups = lines['inci']
+    values = lines['concentration']
+    if not len(values):
+        empty = np.zeros(0, dtype=np.int64)
+        return {'line': empty, 'score': np.zeros(0), 'median': np.zeros(0)}
+    counts = np.bincount(groups)
+    median = _group_medians(groups, values)
+    deviation = np.abs(values - median[groups])
+    mad = _group_medians(groups, deviation)
+    mean_dev = np.bincount(groups, weights=deviation) / np.maximum(counts, 1)
+    spread = np.where(mad > 0, mad / 0.6745, mean_dev * 1.2533)
+    line_spread = spread[groups]
+    score = np.divide(values - median[groups], line_spread,
+                      out=np.zeros(len(values)), where=line_spread > 0)
+    flagged = np.flatnonzero((np.abs(score) > threshold) & (counts[groups] >= min_lines))
+    return {'line': flagged, 'score': score[flagged], 'median': median[groups][flagged]}
+
+
+def corpus_stats(corpus: Corpus, totals: Optional[np.ndarray] = None) -> Dict[str, int]:
+    """The validator's quality counters, computed from the tables."""
+    if totals is None:
+        totals = formulation_totals(corpus)
+    ingredients = corpus.ingredients
+    products = corpus.products
+    return {
+        'total_json_files': corpus.stats['files'],
+        'valid_json_files': corpus.stats['files'] - corpus.stats['invalid_files'],
+        'total_formulations': len(totals),
+        'total_formulation_vessels': corpus.stats['formulation_vessels'],
+        'formulations_concentration_error': int((np.abs(totals - 100) > TOTAL_TOLERANCE).sum()),
+        'unknown_functions': int((~corpus.lines['function_known']).sum()),
+        'total_ingredients': len(ingredients['id']),
+        'ingredients_missing_inci': int((~ingredients['has_inci']).sum()),
+        'ingredients_missing_cas': int((~ingredients['has_cas']).sum()),
+        'ingredients_missing_supplier': int((~ingredients['has_supplier']).sum()),
+        'ingredients_missing_function': int((~ingredients['has_function']).sum()),
+        'total_products': len(products['id']),
+        'products_unknown_color': int((products['color'] == 'Unknown').sum()),
+        'products_generic_age': int((products['age_range'] == '25-65+').sum()),
+        'total_edges': len(corpus.edges['type']),
+    }
+
+
+def quality_scores(stats: Dict[str, Any]) -> Dict[str, float]:
+    """Data quality scores (percent) from validator counters."""
+    scores = {}
+    if stats.get('total_json_files', 0) > 0:
+        scores['json_validity'] = stats['valid_json_files'] / stats['total_json_files'] * 100
+    if stats.get('total_formulations', 0) > 0:
+        scores['formulation_quality'] = ((stats['total_formulations'] - stats['formulations_concentration_error']) /
+                                         stats['total_formulations']) * 100
+    if stats.get('total_ingredients', 0) > 0:
+        # Three tracked fields per ingredient
+        scores['ingredient_completeness'] = ((stats['total_ingredients'] * 3 -
+                                              stats['ingredients_missing_cas'] -
+                                              stats['ingredients_missing_supplier'] -
+                                              stats['ingredients_missing_function']) /
+                                             (stats['total_ingredients'] * 3)) * 100
+    return scores
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Corpus-wide vectorized data-quality checks")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--threshold', type=float, default=OUTLIER_THRESHOLD, help="Outlier modified z-score")
+    parser.add_argument('--limit', type=int, default=10, help="Outliers and errors to list")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    corpus = load_corpus(args.vessels_root)
+    loaded = time.perf_counter()
+    totals = formulation_totals(corpus)
+    status = concentration_status(totals)
+    normalized_concentrations(corpus, totals)
+    completeness = formulation_completeness(corpus)
+    outliers = concentration_outliers(corpus, args.threshold)
+    stats = corpus_stats(corpus, totals)
+    scores = quality_scores(stats)
+    checked = time.perf_counter()
+
+    print(f"Corpus: {stats['total_ingredients']} ingredients, {stats['total_formulations']} formulations "
+          f"({len(corpus.lines['formulation'])} lines), {stats['total_products']} products, "
+          f"{stats['total_edges']} edges")
+    print(f"  Loaded in {(loaded - started) * 1000:.0f} ms, checked in {(checked - loaded) * 1000:.1f} ms")
+    counts = np.bincount(status, minlength=len(STATUS_NAMES))
+    print("  Concentration totals: " + ', '.join(f"{name} {count}" for name, count in zip(STATUS_NAMES, counts)))
+    print(f"  Unknown line functions: {stats['unknown_functions']}")
+    print(f"  Mean formulation completeness: {completeness.mean() * 100 if len(completeness) else 0:.1f}%")
+    print("Data Quality Score:")
+    for name, score in scores.items():
+        print(f"  {SCORE_LABELS[name]}: {score:.1f}%")
+
+    print(f"Concentration outliers: {len(outliers['line'])}")
+    ranked = np.argsort(-np.abs(outliers['score']))[:args.limit]
+    for i in ranked:
+        line = outliers['line'][i]
+        formulation = corpus.formulations['id'][corpus.lines['formulation'][line]]
+        print(f"  ⚠ {formulation}: {corpus.inci_names[corpus.lines['inci'][line]]} at "
+              f"{corpus.lines['concentration'][line]}% (usual {outliers['median'][i]}%, z={outliers['score'][i]:.1f})")
+    for error in corpus.errors[:args.limit]:
+        print(f"  ✗ {error['file']}: {error['error']}")
+
+    sys.exit(1 if corpus.errors or stats['formulations_concentration_error'] else 0)
+
+
+if __name__ == '__main__':
+    main()
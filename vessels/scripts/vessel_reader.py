@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Vessel File Reader
+One reader for every vessel file format: plain .json and the comment-headed
+formulations/*.form, products/*.prod, suppliers/*.supp and
+ingredients/*.inci files, e.g.
+
+    // Natchem CC - Leading Cosmetic Ingredient Supplier
+    // Supplier ID: NAT0001
+    {
+      "supplier_id": "NAT0001",
+      "ingredient_portfolio": [
+        "R0101114",  // B.P. Glycerine
+        ...
+
+The leading comment block becomes header metadata (first line -> title,
+"Key: Value" lines -> fields). Comments inside the body are removed by a
+single-pass scanner that tracks string state, so "//" inside string values
+(URLs) survives. Bare values that are not JSON literals, such as
+`"ph": 5.5-6.5`, are quoted and counted as repairs. The scanner only runs
+when the body fails to decode as-is, so plain JSON costs one decode.
+Decoding uses orjson when installed.
+"""
+
+import json
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson else 'json'
+
+# Extension -> format name
+VESSEL_FORMATS = {
+    '.json': 'json',
+    '.form': 'formulation',
+    '.prod': 'product',
+    '.supp': 'supplier',
+    '.inci': 'ingredient',
+}
+VESSEL_PATTERNS = tuple(f"*{ext}" for ext in VESSEL_FORMATS)
+
+# Id fields of the comment-headed formats, in lookup order
+ID_FIELDS = ('id', 'formulation_id', 'product_id', 'supplier_id', 'ingredient_id')
+
+_NUMBER = re.compile(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?')
+_STRUCTURAL = frozenset(' \t\r\n{}[],:')
+_TOKEN_END = frozenset(',:]}\n"')
+
+
+class VesselParseError(ValueError):
+    """A vessel file that cannot be decoded, with its position."""
+
+    def __init__(self, message: str, path: str = '<string>', line: int = 0, column: int = 0):
+        self.message = message
+        self.path = path
+        self.line = line
+        self.column = column
+        super().__init__(f"{path}:{line}:{column}: {message}" if line else f"{path}: {message}")
+
+
+def _position(text: str, offset: int) -> Tuple[int, int]:
+    line = text.count('\n', 0, offset) + 1
+    return line, offset - (text.rfind('\n', 0, offset) + 1) + 1
+
+
+def _decode(text: str) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass  # stdlib accepts NaN and big ints; it also reports the error
+    return json.loads(text)
+
+
+def parse_header(lines: List[str]) -> Dict[str, str]:
+    """Header metadata from leading comment lines (without the // markers)."""
+    header: Dict[str, str] = {}
+    notes = []
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        if i == 0:
+            header['title'] = line
+            continue
+        key, sep, value = line.partition(':')
+        if sep and key.strip() and value.strip():
+            header[key.strip()] = value.strip()
+        else:
+            notes.append(line)
+    if notes:
+        header['notes'] = ' '.join(notes)
+    return header
+
+
+def split_header(text: str) -> Tuple[List[str], int]:
+    """Leading // comment lines and the offset where the body starts."""
+    lines = []
+    offset = 1 if text.startswith('\ufeff') else 0
+    while True:
+        start = offset
+        while start < len(text) and text[start] in ' \t':
+            start += 1
+        if not text.startswith('//', start):
+            return lines, offset
+        end = text.find('\n', start)
+        lines.append(text[start + 2:end if end >= 0 else len(text)].rstrip('\r'))
+        if end < 0:
+            return lines, len(text)
+        offset = end + 1
+
+
+def strip_comments(text: str, start: int = 0, path: str = '<string>') -> Tuple[str, int]:
+    """Remove comments outside strings and quote bare values in one pass.
+
+    Line breaks are preserved so decoder errors keep their line numbers.
+    Returns the JSON text and the number of bare values quoted.
+    """
+    out = []
+    repairs = 0
+    i, n = start, len(text)
+    while i < n:
+        c = text[i]
+        if c == '"':
+            j = i + 1
+            while True:
+                j = text.find('"', j)
+                if j < 0:
+                    raise VesselParseError('unterminated string', path, *_position(text, i))
+                k = j - 1
+                while text[k] == '\\':
+                    k -= 1
+                if (j - 1 - k) % 2 == 0:
+                    break
+                j += 1
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif c == '/' and text.startswith('//', i):
+            j = text.find('\n', i)
+            i = n if j < 0 else j
+        elif c == '/' and text.startswith('/*', i):
+            j = text.find('*/', i + 2)
+            if j < 0:
+                raise VesselParseError('unterminated comment', path, *_position(text, i))
+            out.append('\n' * text.count('\n', i, j))
+            i = j + 2
+        elif c in _STRUCTURAL:
+            j = i + 1
+            while j < n and text[j] in _STRUCTURAL:
+                j += 1
+            out.append(text[i:j])
+            i = j
+        else:
+            j = i + 1
+            while j < n and text[j] not in _TOKEN_END and not text.startswith('//', j):
+                j += 1
+            token = text[i:j].rstrip()
+            if token in ('true', 'false', 'null') or _NUMBER.fullmatch(token):
+                out.append(token)
+            else:
+                out.append(json.dumps(token, ensure_ascii=False))
+                repairs += 1
+            out.append(text[i + len(token):j])
+            i = j
+    return ''.join(out), repairs
+
+
+def parse_vessel(text: str, path: str = '<string>', fmt: Optional[str] = None) -> Dict[str, Any]:
+    """Parse vessel file content into {'data', 'header', 'format', 'repairs'}."""
+    header_lines, offset = split_header(text)
+    body = text[offset:] if offset else text
+    repairs = 0
+    try:
+        data = _decode(body)
+    except ValueError:
+        stripped, repairs = strip_comments(text, offset, path)
+        stripped = '\n' * text.count('\n', 0, offset) + stripped
+        try:
+            data = _decode(stripped)
+        except json.JSONDecodeError as e:
+            raise VesselParseError(e.msg, path, e.lineno, e.colno) from None
+    return {
+        'data': data,
+        'header': parse_header(header_lines),
+        'format': fmt or 'json',
+        'repairs': repairs,
+    }
+
+
+def read_vessel(path) -> Dict[str, Any]:
+    """Read and parse one vessel file of any supported format."""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return parse_vessel(text, str(path), VESSEL_FORMATS.get(path.suffix, 'json'))
+
+
+def load_vessel(path) -> Any:
+    """The decoded content of a vessel file (header dropped)."""
+    return read_vessel(path)['data']
+
+
+def vessel_id(document: Dict[str, Any]) -> Optional[str]:
+    """Entity id of a parsed vessel: an id field, else an "... ID"/"... Code" header."""
+    data = document['data']
+    if isinstance(data, dict):
+        for field in ID_FIELDS:
+            if data.get(field):
+                return str(data[field])
+    for key, value in document['header'].items():
+        if key.endswith(' ID') or key.endswith(' Code'):
+            return value
+    return None
+
+
+def iter_vessel_files(directory: Path, patterns: Iterable[str] = VESSEL_PATTERNS,
+                      recursive: bool = False) -> List[Path]:
+    """Vessel files of the given patterns in a directory, sorted."""
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    paths = set()
+    for pattern in patterns:
+        paths.update(directory.rglob(pattern) if recursive else directory.glob(pattern))
+    return sorted(paths)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Parse every vessel file and report failures")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    parser.add_argument('--verbose', action='store_true', help="Print each file's header metadata")
+    args = parser.parse_args()
+
+    counts = defaultdict(lambda: defaultdict(int))
+    failures = []
+    started = time.perf_counter()
+    for path in iter_vessel_files(Path(args.vessels_root), recursive=True):
+        fmt = VESSEL_FORMATS.get(path.suffix, 'json')
+        counts[fmt]['files'] += 1
+        try:
+            document = read_vessel(path)
+        except (OSError, ValueError) as e:
+            counts[fmt]['failed'] += 1
+            failures.append(str(e))
+            continue
+        if document['repairs']:
+            counts[fmt]['repaired'] += 1
+        if args.verbose and document['header']:
+            print(f"  {path.name}: {document['header']}")
+    elapsed = time.perf_counter() - started
+
+    print(f"Vessel files ({JSON_BACKEND}, {elapsed * 1000:.0f} ms):")
+    for fmt, c in sorted(counts.items()):
+        print(f"  {fmt}: {c['files']} files, {c['failed']} failed, {c['repaired']} with quoted bare values")
+    for failure in failures:
+        print(f"  ✗ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
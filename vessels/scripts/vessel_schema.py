@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Typed Vessel Entities
+msgspec structs for the vessel JSON entities (formulations, ingredients,
+products, suppliers, edges) so that decoding and structural validation
+happen in one compiled pass: a missing field, a wrong type or a negative
+concentration is reported as a SchemaError with the exact
+JSON path, e.g. `$.ingredients[3].concentration`.
+
+The entities follow vessels/schemas/*_SCHEMA.md, restricted to the fields
+the stored vessel files actually carry (the schema documents describe the
+full target model). Only what the mutators cannot work without is
+required (an edge's endpoints and type); ids, names and line order default
+so that the fixer and enrichers still handle sparse files, and the
+validator reports the empty ones. Free-form metadata blocks stay dicts.
+Structs are created without GC tracking and hold far less memory than dicts.
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Tuple, Union, Annotated
+
+import msgspec
+from msgspec import Meta, Struct, field
+
+# Line-level upper bounds are left to the formulation total checks
+Concentration = Annotated[float, Meta(ge=0)]
+NonEmpty = Annotated[str, Meta(min_length=1)]
+
+
+class Entity(Struct, kw_only=True, gc=False):
+    """Base of all vessel entities."""
+
+
+# ----------------------------------------------------------------------
+# Formulations (FORMULATIONS_SCHEMA.md: FormulationSchema, IngredientUsage)
+# ----------------------------------------------------------------------
+
+class FormulationLine(Entity):
+    order: Optional[Annotated[int, Meta(ge=1)]] = None   # list position when absent
+    inci_name: str = ''
+    concentration: Concentration = 0.0
+    function: str = 'Unknown'
+    ingredient_id: Optional[str] = None
+
+
+class Formulation(Entity):
+    id: str = ''
+    name: str = ''
+    ingredients: List[FormulationLine] = []
+    product_reference: Optional[str] = None
+    total_concentration: Optional[float] = None
+    complexity_score: Optional[int] = None
+    status: Optional[str] = None
+    notes: Optional[str] = None
+    hypergraph_metadata: Optional[Dict[str, Any]] = None
+    extraction_metadata: Optional[Dict[str, Any]] = None
+
+    def __post_init__(self):
+        for position, line in enumerate(self.ingredients, 1):
+            if line.order is None:
+                line.order = position
+
+    @property
+    def total(self) -> float:
+        return sum(line.concentration for line in self.ingredients)
+
+
+# ----------------------------------------------------------------------
+# Ingredients (INGREDIENTS_SCHEMA.md: IngredientSchema)
+# ----------------------------------------------------------------------
+
+class ConcentrationRange(Entity):
+    min: Concentration
+    max: Concentration
+
+
+class IngredientNetwork(Entity):
+    usage_frequency: int = 0
+    max_concentration: float = 0
+    centrality_score: float = 0
+    clustering_coefficient: float = 0
+
+
+class Ingredient(Entity):
+    id: str = ''
+    inci_name: str = ''
+    label: str = ''
+    category: str = ''
+    functions: List[str] = []
+    concentration_range: Optional[ConcentrationRange] = None
+    network_properties: Optional[IngredientNetwork] = None
+    suppliers: List[str] = []
+    supplier_id: Optional[str] = None   # schema `supplier`
+    hypergraph_metadata: Optional[Dict[str, Any]] = None
+    cas_number: Optional[str] = None
+    function: Optional[str] = None
+    cosing_id: Optional[str] = None
+    cosing_inci_name: Optional[str] = None
+    molecular_weight: Optional[Union[float, str]] = None
+    is_restricted: Optional[bool] = None
+    is_natural: Optional[bool] = None
+
+    @property
+    def enriched(self) -> bool:
+        return bool(self.cas_number and self.function and self.function != 'Unknown')
+
+
+# ----------------------------------------------------------------------
+# Products (PRODUCTS_SCHEMA.md: ProductSchema)
+# ----------------------------------------------------------------------
+
+class ProductMetadata(Entity):
+    manufacturer_code: Optional[str] = None
+    color: Optional[str] = None
+    pack_size: Optional[str] = None
+    normal_use: Optional[str] = None
+
+
+class Product(Entity):
+    id: str = ''
+    label: str = ''
+    type: str = ''
+    form: str = ''
+    category: str = ''
+    ingredient_count: Annotated[int, Meta(ge=0)] = 0
+    source: Dict[str, Any] = {}
+    metadata: Optional[ProductMetadata] = None
+    hypergraph_metadata: Optional[Dict[str, Any]] = None
+    formulation_metadata: Optional[Dict[str, Any]] = None
+    network_properties: Optional[Dict[str, Any]] = None
+
+
+# ----------------------------------------------------------------------
+# Suppliers (SUPPLIERS_SCHEMA.md: SupplierSchema)
+# ----------------------------------------------------------------------
+
+class SupplierPortfolio(Entity):
+    ingredient_count: Annotated[int, Meta(ge=0)] = 0
+    ingredient_ids: List[str] = []
+    specialization_index: float = 0
+    market_coverage: float = 0
+
+
+class Supplier(Entity):
+    id: str = ''
+    name: str = ''
+    label: str = ''
+    category: str = ''
+    location: str = ''
+    portfolio: Optional[SupplierPortfolio] = None
+    hypergraph_metadata: Optional[Dict[str, Any]] = None
+    network_properties: Optional[Dict[str, Any]] = None
+
+
+# ----------------------------------------------------------------------
+# Hypergraph edges
+# ----------------------------------------------------------------------
+
+class EdgeProperties(Entity):
+    created_at: Optional[str] = None
+    weight: Optional[float] = None
+    concentration: Optional[Concentration] = None
+    document_source: Optional[str] = None
+    ingredient_count: Optional[int] = None
+    total_concentration: Optional[float] = None
+    extraction_date: Optional[str] = None
+
+
+class Edge(Entity):
+    type: NonEmpty
+    source_id: NonEmpty
+    target_id: NonEmpty
+    id: str = ''
+    source_type: str = ''
+    target_type: str = ''
+    properties: EdgeProperties = field(default_factory=EdgeProperties)
+
+
+# Directory -> entity type; edges/all_edges.json holds a list of edges
+ENTITY_TYPES: Dict[str, Any] = {
+    'formulations': Formulation,
+    'ingredients': Ingredient,
+    'products': Product,
+    'suppliers': Supplier,
+    'edges': Union[Edge, List[Edge]],
+}
+
+
+class SchemaError(ValueError):
+    """A vessel file that does not decode into its entity type."""
+
+    def __init__(self, message: str, path: str = '$', file: str = '<bytes>', syntax: bool = False):
+        self.message = message
+        self.path = path
+        self.file = file
+        self.syntax = syntax
+        super().__init__(f"{file}: {message}")
+
+    def __str__(self) -> str:
+        return f"{self.file}: {self.message} at {self.path}"
+
+    @property
+    def missing_field(self) -> Optional[str]:
+        """Name of the missing required field, if that is the error."""
+        marker = 'missing required field `'
+        if marker not in self.message:
+            return None
+        return self.message.split(marker, 1)[1].split('`', 1)[0]
+
+
+_decoders: Dict[Any, msgspec.json.Decoder] = {}
+
+
+def decoder(entity_type) -> msgspec.json.Decoder:
+    """Cached compiled decoder for an entity type."""
+    found = _decoders.get(entity_type)
+    if found is None:
+        found = _decoders[entity_type] = msgspec.json.Decoder(entity_type)
+    return found
+
+
+def decode(raw: bytes, entity_type, file: str = '<bytes>'):
+    """Decode and validate JSON bytes in one pass; raises SchemaError."""
+    try:
+        return decoder(entity_type).decode(raw)
+    except msgspec.ValidationError as e:
+        message, _, path = str(e).partition(' - at `')
+        error = SchemaError(message, path.rstrip('`') or '$', file)
+        if error.missing_field:
+            error.path = f"{error.path}.{error.missing_field}"
+        raise error from None
+    except msgspec.DecodeError as e:
+        raise SchemaError(str(e), '$', file, syntax=True) from None
+
+
+def load_entity(path, entity_type):
+    """Read and decode one vessel JSON file into its entity type."""
+    path = Path(path)
+    return decode(path.read_bytes(), entity_type, path.name)
+
+
+def read_entity(path, entity_type) -> Tuple[Any, Dict[str, Any]]:
+    """The typed entity and the plain document of a file (for tools that patch files)."""
+    path = Path(path)
+    raw = path.read_bytes()
+    return decode(raw, entity_type, path.name), msgspec.json.decode(raw)
+
+
+def to_dict(entity) -> Dict[str, Any]:
+    return msgspec.to_builtins(entity)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Decode every vessel JSON entity and report schema errors")
+    parser.add_argument('vessels_root', nargs='?', default='.')
+    args = parser.parse_args()
+
+    counts = defaultdict(lambda: defaultdict(int))
+    failures: List[SchemaError] = []
+    started = time.perf_counter()
+    for directory, entity_type in ENTITY_TYPES.items():
+        for path in sorted((Path(args.vessels_root) / directory).glob('*.json')):
+            counts[directory]['files'] += 1
+            try:
+                load_entity(path, entity_type)
+            except SchemaError as e:
+                counts[directory]['failed'] += 1
+                failures.append(e)
+    elapsed = time.perf_counter() - started
+
+    print(f"Vessel entities ({elapsed * 1000:.0f} ms):")
+    for directory, c in counts.items():
+        print(f"  {directory}: {c['files']} files, {c['failed']} invalid")
+    for e in failures:
+        print(f"  ✗ {e}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Vessels CLI
+One entry point for the vessel tools:
+
+    python vessels.py validate ..
+    python vessels.py fix .. --dry-run
+    python vessels.py search .. "angelica root extract"
+
+A subcommand is resolved to its script only when it runs: the script's
+module is imported (or, for the repository-level scripts, executed) and its
+main() parses the remaining arguments, so `vessels <command> --help` shows
+that script's own options. Starting the CLI imports nothing beyond argparse;
+numpy, msgspec, the database clients and the COSING indexes load with the
+command that needs them.
+
+`self-check` measures cold start against STARTUP_BUDGET_MS and fails if a
+heavy module is imported before a command runs; tests/test_vessels_cli.py
+runs it with the other script tests. `completion` prints a bash completion
+script.
+"""
+
+import os
+import sys
+import argparse
+
+# Startup stays with os/sys/argparse: no pathlib or typing (builtin generics instead)
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(SCRIPTS_DIR))
+
+# name -> (module in vessels/scripts or repository-relative .py path, fixed arguments, help)
+COMMANDS: dict[str, tuple[str, list[str], str]] = {
+    'validate': ('validate_vessels_data', [], "Validate vessel data and write validation_report.json"),
+    'enrich': ('enrich_ingredients_and_fix_formulations', ['--only', 'enrich'],
+               "Enrich ingredients with COSING data"),
+    'enrich-advanced': ('advanced_ingredient_enrichment', [], "Enrich ingredients with fuzzy COSING matching"),
+    'fix': ('enrich_ingredients_and_fix_formulations', ['--only', 'fix'],
+            "Normalize or flag formulations whose concentrations do not total 100%"),
+    'import': ('scripts/import_cosing_to_supabase.py', [], "Import the COSING export into Supabase"),
+    'deploy': ('scripts/deploy-neon-schema.py', [], "Deploy the skin_twin schema to Neon"),
+    'sync': ('multi_sync', [], "Sync COSING and vessel data to Supabase and Neon in one pass"),
+    'stats': ('hypergraph_stats', [], "Incrementally maintained hypergraph statistics"),
+    'search': ('cosing_search', [], "BM25 full-text search over COSING"),
+    'history': ('formulation_history', [], "Local formulation version history"),
+    'audit': ('audit_log', [], "Inspect or replay the audit-log spool"),
+    'costs': ('formulation_engine', [], "Catalog-wide formulation totals, costs and what-ifs"),
+    'schedule': ('batch_scheduler', [], "Schedule formulation batches on the vessel fleet"),
+}
+BUILTINS = {
+    'self-check': "Check the startup budget and that every command resolves",
+    'completion': "Print a bash completion script",
+}
+
+STARTUP_BUDGET_MS = 50      # CLI startup on top of a bare interpreter
+STARTUP_RUNS = 5
+# Modules that must only load with the command that needs them
+HEAVY_MODULES = ('numpy', 'msgspec', 'orjson', 'supabase', 'psycopg', 'psycopg2', 'csv', 'json')
+
+
+def run_command(name: str, argv: list[str]) -> None:
+    """Import (or execute) the command's script and run its main() with argv."""
+    target, fixed, _ = COMMANDS[name]
+    sys.argv = [f"vessels {name}"] + fixed + argv
+    if target.endswith('.py'):
+        import runpy
+        path = os.path.join(REPO_ROOT, target)
+        sys.path.insert(0, os.path.dirname(path))
+        runpy.run_path(path, run_name='__main__')
+        return
+    import importlib
+    importlib.import_module(target).main()
+
+
+# ----------------------------------------------------------------------
+# Built-in commands
+# ----------------------------------------------------------------------
+
+def _startup_ms(command: list[str], runs: int) -> float:
+    import subprocess
+    import time
+    best = float('inf')
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def self_check(argv: list[str]) -> None:
+    import importlib.util
+    import subprocess
+
+    parser = argparse.ArgumentParser(prog='vessels self-check', description=BUILTINS['self-check'])
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET_MS, help="Startup budget in ms")
+    parser.add_argument('--runs', type=int, default=STARTUP_RUNS)
+    args = parser.parse_args(argv)
+    failures = 0
+
+    # Every command target resolves without importing it
+    sys.path.insert(0, SCRIPTS_DIR)
+    for name, (target, _, _) in COMMANDS.items():
+        found = (os.path.exists(os.path.join(REPO_ROOT, target)) if target.endswith('.py')
+                 else importlib.util.find_spec(target))
+        if not found:
+            failures += 1
+            print(f"  ✗ {name}: {target} not found")
+    print(f"  ✓ {len(COMMANDS) - failures}/{len(COMMANDS)} commands resolve")
+
+    # Nothing heavy is imported before a command runs
+    trace = subprocess.run([sys.executable, '-X', 'importtime', __file__, '--help'],
+                           capture_output=True, text=True, check=True).stderr
+    imported = {line.rsplit('|', 1)[-1].strip() for line in trace.splitlines() if '|' in line}
+    eager = [module for module in HEAVY_MODULES if module in imported]
+    if eager:
+        failures += 1
+        print(f"  ✗ Imported at startup: {', '.join(eager)}")
+    else:
+        print(f"  ✓ No heavy imports at startup ({len(imported)} modules)")
+
+    # Cold start over a bare interpreter
+    baseline = _startup_ms([sys.executable, '-c', 'pass'], args.runs)
+    startup = _startup_ms([sys.executable, __file__, '--help'], args.runs)
+    overhead = startup - baseline
+    marker = '✓' if overhead <= args.budget else '✗'
+    failures += overhead > args.budget
+    print(f"  {marker} Startup {startup:.1f} ms, {overhead:.1f} ms over the interpreter "
+          f"(budget {args.budget:.0f} ms)")
+    sys.exit(1 if failures else 0)
+
+
+def completion(argv: list[str]) -> None:
+    words = ' '.join(sorted(list(COMMANDS) + list(BUILTINS)))
+    print(f'''_vessels() {{
+    if [ "$COMP_CWORD" -eq 1 ]; then
+        COMPREPLY=( $(compgen -W "{words}" -- "${{COMP_WORDS[1]}}") )
+    fi
+}}
+complete -o default -F _vessels vessels vessels.py''')
+
+
+def main():
+    """Main entry point."""
+    described = [(name, help_text) for name, (_, _, help_text) in COMMANDS.items()] + list(BUILTINS.items())
+    commands = '\n'.join(f"  {name:<16} {help_text}" for name, help_text in described)
+    parser = argparse.ArgumentParser(
+        prog='vessels', description="Vessel data tools",
+        epilog=f"commands:\n{commands}\n\nRun `vessels <command> --help` for a command's options.",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=list(COMMANDS) + list(BUILTINS), metavar='command')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.command == 'self-check':
+        self_check(args.args)
+    elif args.command == 'completion':
+        completion(args.args)
+    else:
+        run_command(args.command, args.args)
+
+
+if __name__ == '__main__':
+    main()